@@ -8,24 +8,49 @@ from collections import OrderedDict
 from ccc_model_common import ArgumentsHandler
 from ccc_model_common import NoServerConfigurationFound
 from ccc_model_common import piecewise_linear_function
+from ccc_model_common import PiecewiseLinearFunction
 from ccc_model_common import determine_usable_storage
+from ccc_model_common import get_required_param
+from ccc_model_common import get_required_number
 from ccc_model_common import parse_model_params_file
+from ec2_pricing import load_ec2_pricing_model
+from ec2_pricing import load_pricing_index
+from ec2_pricing import parse_memory_in_GiB
+from tco_cache import compute_stage
+from tco_cache import StageCache
+from tco_profile import profile_stage
+from tco_profile import add_profile_count
+from tco_profile import dump_cost_dict
+from mixed_fleet import enumerate_cover_solutions
 
 class AmazonArgumentsHandler(ArgumentsHandler):
 
     m_ec2_pricing_model=None
     m_aws_support=None
+    m_locations=None
+    m_operating_systems=None
 
     def add_amazon_required_arguments(self, parser):
-        required_named_args_group = parser.add_argument_group('Required named arguments for Amazon pricing');
-        required_named_args_group.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', required=True);
+        required_named_args_group = parser.add_argument_group('Required named arguments for Amazon pricing (at least one)');
+        required_named_args_group.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+        required_named_args_group.add_argument('--ec2_pricing_index_file',
+                help='Path to a pricing index created by "ec2_pricing.py build-index" - rebuilt if the JSON file is also given and has changed',
+                default=None);
 
     def add_amazon_optional_arguments(self, parser):
         parser.add_argument('--aws_support', choices=['business', 'enterprise'], default=None);
+        parser.add_argument('--locations', nargs='+', default=None,
+                help='Compare these locations (regions) instead of the location in the model - default: the location in the model');
+        parser.add_argument('--operating_systems', nargs='+', default=None,
+                help='Compare these operating systems - default: the operating system in the model');
+        parser.add_argument('--storage_iops_requested', help='Aggregate IOPS the EBS volumes must deliver - volumes are striped as needed',
+                default=None, type=float);
+        parser.add_argument('--storage_throughput_requested', help='Aggregate throughput (in MB/s) the EBS volumes must deliver'
+                ' - volumes are striped as needed', default=None, type=float);
 
     def __init__(self, argparse_obj=None, model_parameters_file=None, model_parameters_dict=None,
-            ec2_pricing_json_file=None, ec2_pricing_dict=None, num_cores=None, memory_per_core=None, storage=None,
-            bandwidth=None, bandwidth_utilization=None, **kwargs):
+            ec2_pricing_json_file=None, ec2_pricing_dict=None, ec2_pricing_index_file=None, num_cores=None, memory_per_core=None,
+            storage=None, bandwidth=None, bandwidth_utilization=None, **kwargs):
         
         if(argparse_obj):
             self.add_amazon_required_arguments(argparse_obj);
@@ -35,33 +60,53 @@ class AmazonArgumentsHandler(ArgumentsHandler):
                 storage=storage, bandwidth=bandwidth, bandwidth_utilization=bandwidth_utilization, **kwargs);
         if(argparse_obj):
             arguments = argparse_obj.parse_args();
+            if(not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file):
+                argparse_obj.error('one of --ec2_pricing_json_file or --ec2_pricing_index_file is required');
             ec2_pricing_json_file = arguments.ec2_pricing_json_file;
-            self.m_ec2_pricing_model = parse_model_params_file(ec2_pricing_json_file);
+            ec2_pricing_index_file = arguments.ec2_pricing_index_file;
             self.m_aws_support = arguments.aws_support;
+            self.m_locations = arguments.locations;
+            self.m_operating_systems = arguments.operating_systems;
+            self.m_storage_iops_requested = arguments.storage_iops_requested;
+            self.m_storage_throughput_requested = arguments.storage_throughput_requested;
+        #All regions are loaded in one pass over the offer file
+        if(ec2_pricing_dict):
+            self.m_ec2_pricing_model = ec2_pricing_dict;
+        elif(ec2_pricing_index_file):
+            with profile_stage(self.m_profiler, 'load_ec2_pricing'):
+                self.m_ec2_pricing_model = load_pricing_index(ec2_pricing_index_file, self.m_model['compute'],
+                        ec2_pricing_json_file=ec2_pricing_json_file, locations=self.m_locations, operating_systems=self.m_operating_systems);
         else:
-            if(ec2_pricing_dict):
-                self.m_ec2_pricing_model = ec2_pricing_dict;
-            else:
-                self.m_ec2_pricing_model = parse_model_params_file(ec2_pricing_json_file);
-        product_types = set();
-        for product_key,product_info in self.m_ec2_pricing_model['products'].iteritems():
-            if('productFamily' in product_info):
-                product_types.add(product_info['productFamily']);
+            with profile_stage(self.m_profiler, 'load_ec2_pricing'):
+                self.m_ec2_pricing_model = load_ec2_pricing_model(ec2_pricing_json_file, self.m_model['compute'],
+                        locations=self.m_locations, operating_systems=self.m_operating_systems, profiler=self.m_profiler);
 
-def create_instance_to_products_list(model, ec2_pricing_model):
+    def get_regions(self):
+        #(location, operating_system) pairs to compare
+        return get_regions(self.m_model['compute'], self.m_locations, self.m_operating_systems);
+
+def get_regions(model, locations=None, operating_systems=None):
+    return [ (location, operating_system) for location in (locations if locations else [ model['location'] ])
+            for operating_system in (operating_systems if operating_systems else [ model['operating_system'] ]) ];
+
+def create_region_instance_to_products_lists(model, ec2_pricing_model, regions):
+    #One pass over the products for all (location, operating_system) regions - returns { region: instance_to_products_list }
     instances_set = set(model['instances']);
-    location = model['location'];
-    operating_system = model['operating_system'];
-    instance_to_products_list = OrderedDict();
+    region_instance_to_products_lists = OrderedDict([ (region, OrderedDict()) for region in regions ]);
     for product_key, product_info in ec2_pricing_model['products'].iteritems():
         if('productFamily' in product_info and product_info['productFamily'] == 'Compute Instance'):
             instance_type = product_info['attributes']['instanceType'];
-            if(instance_type in instances_set and product_info['attributes']['location'] == location and \
-                    product_info['attributes']['operatingSystem'] == operating_system):
+            region = (product_info['attributes']['location'], product_info['attributes']['operatingSystem']);
+            if(instance_type in instances_set and region in region_instance_to_products_lists):
+                instance_to_products_list = region_instance_to_products_lists[region];
                 if(instance_type not in instance_to_products_list):
                     instance_to_products_list[instance_type] = [];
                 instance_to_products_list[instance_type].append(product_info);
-    return instance_to_products_list;
+    return region_instance_to_products_lists;
+
+def create_instance_to_products_list(model, ec2_pricing_model):
+    region = (model['location'], model['operating_system']);
+    return create_region_instance_to_products_lists(model, ec2_pricing_model, [ region ])[region];
 
 def get_num_cores_in_instance(model, instance_to_products_list, instance_type):
     if((instance_type not in instance_to_products_list) or (len(instance_to_products_list[instance_type]) == 0)):
@@ -75,99 +120,347 @@ def get_memory_in_instance(instance_to_products_list, instance_type):
     if((instance_type not in instance_to_products_list) or (len(instance_to_products_list[instance_type]) == 0)):
         return None;
     product_info = instance_to_products_list[instance_type][0];
-    unit_string_to_GiB_convert_factor = { 'GiB':1, 'TiB':1024, 'MiB': 1/1024 };
-    tokens = product_info['attributes']['memory'].split();
-    memory_in_instance = float(tokens[0])*unit_string_to_GiB_convert_factor[tokens[1]];
-    return memory_in_instance;
+    return parse_memory_in_GiB(product_info['attributes']['memory']);
 
-def is_instance_adequate(model, instance_to_products_list, instance_type, memory_per_core):
-    if((instance_type not in instance_to_products_list) or (len(instance_to_products_list[instance_type]) == 0)):
-        return False;
-    memory_in_instance = get_memory_in_instance(instance_to_products_list, instance_type);
-    return (memory_in_instance and memory_in_instance >= memory_per_core);
-
-def determine_num_usable_cores_in_instance_type(model, instance_to_products_list, instance_type, memory_per_core):
-    num_cores = get_num_cores_in_instance(model, instance_to_products_list, instance_type);
-    memory_in_instance = get_memory_in_instance(instance_to_products_list, instance_type);
-    if(num_cores and memory_in_instance):
-        num_usable_cores = int(float(memory_in_instance)/memory_per_core);
-        return min(num_usable_cores, num_cores);
-    else:
+class PricingCandidate:
+
+    def __init__(self, instance_type, tenancy, offer_term, sku, offer_term_code, num_cores, memory, hourly_rate, upfront_rate,
+            duration):
+        self.m_instance_type = instance_type;
+        self.m_tenancy = tenancy;
+        self.m_offer_term = offer_term;
+        self.m_sku = sku;
+        self.m_offer_term_code = offer_term_code;
+        self.m_num_cores = num_cores;
+        self.m_memory = memory;
+        self.m_hourly_rate = hourly_rate;
+        self.m_upfront_rate = upfront_rate;
+        self.m_duration = duration;
+
+#Relative slack on the bounds of the pruned search so that floating point rounding can never prune the optimum
+SEARCH_BOUND_MARGIN = 1e-9;
+#Number of (operating_period_in_years, core_utilization) pairs whose search bounds are remembered by a PricingCatalog
+SEARCH_BOUNDS_CACHE_SIZE = 64;
+
+class InstanceTypeGroup:
+
+    #Candidates of one instance type - they share cores and memory and therefore the number of instances for every query
+    def __init__(self, num_cores, memory):
+        self.m_num_cores = num_cores;
+        self.m_memory = memory;
+        self.m_candidate_indices = [];
+
+class EbsTier(object):
+
+    __slots__ = ('m_name', 'm_baseline_iops_per_GB', 'm_baseline_bandwidth_per_TB', 'm_price_per_iops_per_month', 'm_price_per_GB_per_month',
+            'm_max_iops_per_volume', 'm_max_bandwidth_per_volume', 'm_max_size_per_volume_GB', 'm_min_size_per_volume_GB');
+
+    def __init__(self, storage_config, path):
+        self.m_name = get_required_param(storage_config, 'name', path);
+        self.m_baseline_iops_per_GB = storage_config.get('baseline_iops_per_GB');
+        self.m_baseline_bandwidth_per_TB = storage_config.get('baseline_bandwidth_per_TB');
+        self.m_price_per_iops_per_month = storage_config.get('price_per_iops_per_month');
+        self.m_price_per_GB_per_month = get_required_number(storage_config, 'price_per_GB_per_month', path);
+        self.m_max_iops_per_volume = storage_config.get('max_iops_per_volume');
+        self.m_max_bandwidth_per_volume = storage_config.get('max_bandwidth_per_volume');
+        self.m_max_size_per_volume_GB = storage_config.get('max_size_per_volume_GB');
+        self.m_min_size_per_volume_GB = storage_config.get('min_size_per_volume_GB');
+
+    def is_adequate(self, iops_per_GB_requested, bandwidth_per_TB_requested):
+        #Same conditions as compute_storage_cost
+        if(iops_per_GB_requested):
+            return self.m_baseline_iops_per_GB is not None and self.m_baseline_iops_per_GB >= iops_per_GB_requested;
+        if(bandwidth_per_TB_requested):
+            return self.m_baseline_bandwidth_per_TB is not None and self.m_baseline_bandwidth_per_TB >= bandwidth_per_TB_requested;
+        return True;
+
+    def determine_volume_layout(self, storage_GB, iops_requested, throughput_requested):
+        #Cheapest layout of this tier that stores storage_GB and delivers the aggregate IOPS and MB/s - returns
+        #(provisioned_GB, num_volumes, provisioned_iops) or None if the tier cannot deliver them.
+        #Data is striped evenly, so n volumes holding provisioned_GB deliver min(n*per volume limit, provisioned_GB*per GB rate):
+        #the rates set the provisioned size (gp2, st1 and sc1 are grown beyond storage_GB if needed), the limits the number of volumes.
+        #io1 provisions exactly the requested IOPS, baseline_iops_per_GB being its maximum IOPS to size ratio.
+        provisioned_GB = float(storage_GB);
+        num_volumes = 1;
+        provisioned_iops = 0;
+        for requested, rate_per_GB, max_per_volume in [
+                (iops_requested, self.m_baseline_iops_per_GB, self.m_max_iops_per_volume),
+                (throughput_requested, float(self.m_baseline_bandwidth_per_TB)/1024 if self.m_baseline_bandwidth_per_TB is not None else None,
+                    self.m_max_bandwidth_per_volume) ]:
+            if(not requested):
+                continue;
+            if(rate_per_GB is None and max_per_volume is None):
+                return None;
+            if(rate_per_GB is not None):
+                provisioned_GB = max(provisioned_GB, float(requested)/rate_per_GB);
+            if(max_per_volume is not None):
+                num_volumes = max(num_volumes, int(math.ceil(float(requested)/max_per_volume)));
+        if(iops_requested and self.m_price_per_iops_per_month is not None):
+            provisioned_iops = iops_requested;
+        if(self.m_max_size_per_volume_GB is not None):
+            num_volumes = max(num_volumes, int(math.ceil(provisioned_GB/self.m_max_size_per_volume_GB)));
+        if(self.m_min_size_per_volume_GB is not None):
+            provisioned_GB = max(provisioned_GB, float(num_volumes*self.m_min_size_per_volume_GB));
+        return (provisioned_GB, num_volumes, provisioned_iops);
+
+def create_ebs_tiers(model):
+    return [ EbsTier(storage_config, 'storage.ebs.pricing_tiers.%d'%(idx)) for idx, storage_config in
+            enumerate(get_required_param(get_required_param(get_required_param(model, 'storage', 'model'), 'ebs', 'storage'),
+                'pricing_tiers', 'storage.ebs')) ];
+
+class PricingCatalog:
+
+    #Resolves every (instance, tenancy, offer_term) of the model to numeric cores, memory and prices once, in the order of the model.
+    #The first product of an instance type with the tenancy is used, and a term without an hourly or upfront rate leaves no candidate.
+    #The EBS, data transfer and support tier tables are compiled at the same time. region is a (location, operating_system)
+    #pair, by default the one in the model.
+    def __init__(self, model, ec2_pricing_model, region=None, instance_to_products_list=None):
+        self.m_ebs_tiers = create_ebs_tiers(model);
+        network_params = get_required_param(model, 'network', 'model');
+        get_required_number(network_params, 'percentage_outbound_traffic', 'network');
+        self.m_network_pricing_function = PiecewiseLinearFunction(get_required_param(network_params, 'pricing_tiers', 'network'),
+                'segment_limit_GB', 'cost_per_GB');
+        self.m_support_functions = dict([ (support_type, PiecewiseLinearFunction(support_tiers, 'segment_limit', 'rate'))
+            for support_type, support_tiers in model.get('support', {}).iteritems() ]);
+        model = get_required_param(model, 'compute', 'model');
+        self.m_region = region if region else (get_required_param(model, 'location', 'compute'),
+                get_required_param(model, 'operating_system', 'compute'));
+        if(instance_to_products_list is None):
+            instance_to_products_list = create_region_instance_to_products_lists(model, ec2_pricing_model, [ self.m_region ])[self.m_region];
+        upfront_portion_code = model['offer_term_parameters']['upfront_portion_code']['code'];
+        hourly_payment_code = model['offer_term_parameters']['hourly_payment_code']['code'];
+        self.m_reserved_discount_function = PiecewiseLinearFunction(model['reserved_discount_tiers'], 'segment_limit', 'rate');
+        self.m_candidates = [];
+        self.m_instance_type_groups = [];
+        self.m_search_bounds = {};
+        self.m_candidate_arrays = None;
+        for instance_type in model['instances']:
+            if((instance_type not in instance_to_products_list) or (len(instance_to_products_list[instance_type]) == 0)):
+                continue;
+            num_cores = get_num_cores_in_instance(model, instance_to_products_list, instance_type);
+            memory_in_instance = get_memory_in_instance(instance_to_products_list, instance_type);
+            instance_type_group = InstanceTypeGroup(num_cores, memory_in_instance);
+            for tenancy in model['tenancies']:
+                product_info = None;
+                for curr_product_info in instance_to_products_list[instance_type]:
+                    if(curr_product_info['attributes']['tenancy'] == tenancy):
+                        product_info = curr_product_info;
+                        break;
+                if(not product_info):
+                    continue;
+                sku_code = product_info['sku'];
+                for offer_term in model['offer_terms']:
+                    terms_dict = ec2_pricing_model['terms']['OnDemand'] if offer_term == 'OnDemand' else ec2_pricing_model['terms']['Reserved'];
+                    offer_term_code = model['offer_term_parameters'][offer_term]['code'];
+                    sku_term_key = sku_code+'.'+offer_term_code;
+                    if(sku_code not in terms_dict or sku_term_key not in terms_dict[sku_code]):
+                        continue;
+                    pricing_dict = terms_dict[sku_code][sku_term_key]['priceDimensions'];
+                    hourly_rate_key = sku_term_key+'.'+hourly_payment_code;
+                    upfront_rate_key = sku_term_key+'.'+upfront_portion_code;
+                    if(hourly_rate_key not in pricing_dict and upfront_rate_key not in pricing_dict):
+                        continue;
+                    hourly_rate = float(pricing_dict[hourly_rate_key]['pricePerUnit']['USD']) if hourly_rate_key in pricing_dict else None;
+                    upfront_rate = float(pricing_dict[upfront_rate_key]['pricePerUnit']['USD']) if upfront_rate_key in pricing_dict else None;
+                    instance_type_group.m_candidate_indices.append(len(self.m_candidates));
+                    self.m_candidates.append(PricingCandidate(instance_type, tenancy, offer_term, sku_code, offer_term_code,
+                        num_cores, memory_in_instance, hourly_rate, upfront_rate,
+                        model['offer_term_parameters'][offer_term].get('duration')));
+            if(len(instance_type_group.m_candidate_indices) > 0):
+                self.m_instance_type_groups.append(instance_type_group);
+
+    def get_search_bounds(self, operating_period_in_years, core_utilization):
+        #Returns ([ (instance_type_group, min_cost_per_instance) ], num_dominated_candidates) - groups dominated by another group
+        #with at least as many cores and as much memory at a strictly lower cost per instance are left out, since the other
+        #group then needs no more instances for any memory per core.
+        #The cache is shared by the threads of tco_server - it is read once and the result returned from a local, so that
+        #another thread clearing it in between cannot fail the lookup (at worst both threads compute the same bounds).
+        key = (operating_period_in_years, core_utilization);
+        result = self.m_search_bounds.get(key);
+        if(result is not None):
+            return result;
+        group_rates = [];
+        for instance_type_group in self.m_instance_type_groups:
+            min_rate = min([ compute_candidate_cost_per_instance(self.m_candidates[idx], operating_period_in_years, core_utilization)
+                for idx in instance_type_group.m_candidate_indices ]);
+            group_rates.append((instance_type_group, min_rate));
+        search_bounds = [];
+        num_dominated_candidates = 0;
+        for instance_type_group, min_rate in group_rates:
+            is_dominated = False;
+            if(instance_type_group.m_num_cores and instance_type_group.m_memory):
+                for other_group, other_min_rate in group_rates:
+                    if(other_group is not instance_type_group and other_group.m_num_cores >= instance_type_group.m_num_cores and \
+                            other_group.m_memory >= instance_type_group.m_memory and \
+                            other_min_rate*(1+SEARCH_BOUND_MARGIN) < min_rate*(1-SEARCH_BOUND_MARGIN)):
+                        is_dominated = True;
+                        break;
+            if(is_dominated):
+                num_dominated_candidates += len(instance_type_group.m_candidate_indices);
+            else:
+                search_bounds.append((instance_type_group, min_rate));
+        result = (search_bounds, num_dominated_candidates);
+        if(len(self.m_search_bounds) >= SEARCH_BOUNDS_CACHE_SIZE):
+            self.m_search_bounds.clear();
+        self.m_search_bounds[key] = result;
+        return result;
+
+    def get_candidate_arrays(self):
+        #Columns of the candidates for the vectorized frontier search, built on first use - missing cores and memory are 0,
+        #missing rates and durations are nan
+        if(self.m_candidate_arrays is None):
+            import numpy as np
+            to_array = lambda values: np.array([ value if value is not None else np.nan for value in values ], dtype=np.float64);
+            self.m_candidate_arrays = {
+                    'num_cores': to_array([ candidate.m_num_cores or 0 for candidate in self.m_candidates ]),
+                    'memory': to_array([ candidate.m_memory or 0 for candidate in self.m_candidates ]),
+                    'hourly_rate': to_array([ candidate.m_hourly_rate for candidate in self.m_candidates ]),
+                    'upfront_rate': to_array([ candidate.m_upfront_rate for candidate in self.m_candidates ]),
+                    'duration': to_array([ candidate.m_duration for candidate in self.m_candidates ]),
+                    'is_on_demand': np.array([ candidate.m_offer_term == 'OnDemand' for candidate in self.m_candidates ], dtype=bool)
+                    };
+        return self.m_candidate_arrays;
+
+def create_pricing_catalogs(model, ec2_pricing_model, regions):
+    #{ region: PricingCatalog } - the products are scanned once for all regions
+    region_instance_to_products_lists = create_region_instance_to_products_lists(model['compute'], ec2_pricing_model, regions);
+    return OrderedDict([ (region, PricingCatalog(model, ec2_pricing_model, region=region, instance_to_products_list=instance_to_products_list))
+        for region, instance_to_products_list in region_instance_to_products_lists.iteritems() ]);
+
+def compute_num_usable_cores_per_instance(num_cores_in_instance, memory_in_instance, memory_per_core):
+    if(not (memory_in_instance and memory_in_instance >= memory_per_core)):
         return 0;
+    if(num_cores_in_instance and memory_in_instance):
+        return min(int(float(memory_in_instance)/memory_per_core), num_cores_in_instance);
+    return 0;
+
+def compute_candidate_cost_per_instance(candidate, operating_period_in_years, core_utilization):
+    #Same terms as compute_candidate_cost for a single instance
+    hours_used = operating_period_in_years*365*24;
+    if(candidate.m_offer_term == 'OnDemand'):
+        hours_used = float(hours_used*core_utilization)/100;
+    cost = 0;
+    if(candidate.m_hourly_rate is not None):
+        cost += candidate.m_hourly_rate*hours_used;
+    if(candidate.m_upfront_rate is not None):
+        num_cycles = 1;
+        if(candidate.m_duration is not None):
+            num_cycles = int(math.ceil(float(operating_period_in_years)/candidate.m_duration));
+        cost += candidate.m_upfront_rate*num_cycles;
+    return cost;
 
-def compute_instance_type_cost(model, ec2_pricing_model, instance_to_products_list, instance_type, tenancy, offer_term,
-        num_cores, core_utilization, memory_per_core, operating_period_in_years):
-    num_usable_cores_per_instance = determine_num_usable_cores_in_instance_type(model, instance_to_products_list, instance_type, memory_per_core);
+def compute_candidate_cost(candidate, num_cores, core_utilization, memory_per_core, operating_period_in_years):
+    #Returns (num_usable_cores_per_instance, num_instances, hourly_cost, upfront_cost, total_cost) or None
+    if(not (candidate.m_memory and candidate.m_memory >= memory_per_core)):
+        return None;
+    if(candidate.m_num_cores and candidate.m_memory):
+        num_usable_cores_per_instance = min(int(float(candidate.m_memory)/memory_per_core), candidate.m_num_cores);
+    else:
+        num_usable_cores_per_instance = 0;
     if(num_usable_cores_per_instance < 1):
         return None;
     num_instances = int(math.ceil(float(num_cores)/num_usable_cores_per_instance));
-    upfront_portion_code = model['offer_term_parameters']['upfront_portion_code']['code'];
-    hourly_payment_code = model['offer_term_parameters']['hourly_payment_code']['code'];
     hours_used = operating_period_in_years*365*24;
-    if(offer_term  == 'OnDemand'):
-        hours_used = float(hours_used*core_utilization)/100; 
-    for product_info in instance_to_products_list[instance_type]:
-        if(product_info['attributes']['tenancy'] == tenancy):
-            sku_code = product_info['sku'];
-            terms_dict = None;
-            if(offer_term == 'OnDemand'):
-                terms_dict = ec2_pricing_model['terms']['OnDemand'];
-            else:
-                terms_dict = ec2_pricing_model['terms']['Reserved'];
-            offer_term_code = model['offer_term_parameters'][offer_term]['code'];
-            sku_term_key = sku_code+'.'+offer_term_code;
-            if(sku_code in terms_dict and sku_term_key in terms_dict[sku_code]):
-                pricing_dict = terms_dict[sku_code][sku_term_key]['priceDimensions'];
-                hourly_rate_key = sku_term_key+'.'+hourly_payment_code;
-                upfront_rate_key = sku_term_key+'.'+upfront_portion_code;
-                if(hourly_rate_key in pricing_dict or upfront_rate_key in pricing_dict):
-                    hourly_cost = None;
-                    upfront_cost = None;
-                    total_cost = 0;
-                    if(hourly_rate_key in pricing_dict):
-                        hourly_cost = num_instances*float(pricing_dict[hourly_rate_key]['pricePerUnit']['USD'])*hours_used;
-                        total_cost += hourly_cost;
-                    if(upfront_rate_key in pricing_dict):
-                        num_cycles = 1;
-                        if('duration' in model['offer_term_parameters'][offer_term]):
-                            num_cycles = int(math.ceil(float(operating_period_in_years)/model['offer_term_parameters'][offer_term]['duration']));
-                        upfront_cost = num_instances*float(pricing_dict[upfront_rate_key]['pricePerUnit']['USD'])*num_cycles;
-                        total_cost += upfront_cost;
-                    return OrderedDict([ ('instance_type', instance_type), ('tenancy', tenancy), ('offer_term', offer_term),
-                        ('sku', sku_code), ('offer_term_code', offer_term_code),
-                        ('num_usable_cores_per_instance', num_usable_cores_per_instance),
-                        ('memory', get_memory_in_instance(instance_to_products_list, instance_type)),
-                        ('num_instances', num_instances), 
-                        ('total_hourly_cost', hourly_cost), ('total_upfront_cost', upfront_cost), ('total_cost', total_cost) ]);
-                else:
-                    return None
-            else:
-                return None;
-    return None
+    if(candidate.m_offer_term == 'OnDemand'):
+        hours_used = float(hours_used*core_utilization)/100;
+    hourly_cost = None;
+    upfront_cost = None;
+    total_cost = 0;
+    if(candidate.m_hourly_rate is not None):
+        hourly_cost = num_instances*candidate.m_hourly_rate*hours_used;
+        total_cost += hourly_cost;
+    if(candidate.m_upfront_rate is not None):
+        num_cycles = 1;
+        if(candidate.m_duration is not None):
+            num_cycles = int(math.ceil(float(operating_period_in_years)/candidate.m_duration));
+        upfront_cost = num_instances*candidate.m_upfront_rate*num_cycles;
+        total_cost += upfront_cost;
+    return (num_usable_cores_per_instance, num_instances, hourly_cost, upfront_cost, total_cost);
 
-def select_optimal_server_configuration(model, ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years, core_utilization):
-    model = model['compute'];
-    instance_to_products_list = create_instance_to_products_list(model, ec2_pricing_model);
+def create_candidate_cost_dict(candidate, candidate_cost):
+    num_usable_cores_per_instance, num_instances, hourly_cost, upfront_cost, total_cost = candidate_cost;
+    return OrderedDict([ ('instance_type', candidate.m_instance_type), ('tenancy', candidate.m_tenancy),
+        ('offer_term', candidate.m_offer_term), ('sku', candidate.m_sku), ('offer_term_code', candidate.m_offer_term_code),
+        ('num_usable_cores_per_instance', num_usable_cores_per_instance),
+        ('memory', candidate.m_memory),
+        ('num_instances', num_instances), 
+        ('total_hourly_cost', hourly_cost), ('total_upfront_cost', upfront_cost), ('total_cost', total_cost) ]);
+
+def select_optimal_candidate_exhaustive(pricing_catalog, num_cores, memory_per_core, operating_period_in_years, core_utilization, profiler=None):
+    min_cost = 100000000000000;
+    min_cost_candidate = None;
+    min_cost_candidate_cost = None;
+    num_infeasible = 0;
+    for candidate in pricing_catalog.m_candidates:
+        candidate_cost = compute_candidate_cost(candidate, num_cores, core_utilization, memory_per_core, operating_period_in_years);
+        if(not candidate_cost):
+            num_infeasible += 1;
+        elif(candidate_cost[4] < min_cost):
+            min_cost = candidate_cost[4];
+            min_cost_candidate = candidate;
+            min_cost_candidate_cost = candidate_cost;
+    add_profile_count(profiler, 'aws.compute.candidates_evaluated', len(pricing_catalog.m_candidates)-num_infeasible);
+    add_profile_count(profiler, 'aws.compute.candidates_infeasible', num_infeasible);
+    return min_cost_candidate, min_cost_candidate_cost;
+
+def select_optimal_candidate_pruned(pricing_catalog, num_cores, memory_per_core, operating_period_in_years, core_utilization, profiler=None):
+    #Visits instance types in increasing order of their lower bound (number of instances x cheapest cost per instance) and stops
+    #once the bound exceeds the best cost found. Ties are broken by catalog order, so the result is the same as the exhaustive search.
+    search_bounds, num_dominated = pricing_catalog.get_search_bounds(operating_period_in_years, core_utilization);
+    num_infeasible = 0;
+    feasible_groups = [];
+    for instance_type_group, min_rate in search_bounds:
+        num_usable_cores_per_instance = compute_num_usable_cores_per_instance(instance_type_group.m_num_cores, instance_type_group.m_memory,
+                memory_per_core);
+        if(num_usable_cores_per_instance < 1):
+            num_infeasible += len(instance_type_group.m_candidate_indices);
+            continue;
+        num_instances = int(math.ceil(float(num_cores)/num_usable_cores_per_instance));
+        feasible_groups.append((num_instances*min_rate*(1-SEARCH_BOUND_MARGIN), instance_type_group.m_candidate_indices[0], instance_type_group));
+    feasible_groups.sort();
     min_cost = 100000000000000;
-    min_cost_dict = None
-    for instance_type in model['instances']:
-        #Instance may not have enough memory
-        if(not is_instance_adequate(model, instance_to_products_list, instance_type, memory_per_core)):
+    min_cost_idx = -1;
+    min_cost_candidate_cost = None;
+    num_evaluated = 0;
+    num_pruned_by_bound = 0;
+    for lower_bound, first_idx, instance_type_group in feasible_groups:
+        if(lower_bound > min_cost):
+            num_pruned_by_bound += len(instance_type_group.m_candidate_indices);
             continue;
-        for tenancy in model['tenancies']:
-            for offer_term in model['offer_terms']:
-                curr_cost_params = compute_instance_type_cost(model, ec2_pricing_model, instance_to_products_list, instance_type,
-                        tenancy, offer_term, num_cores, core_utilization, memory_per_core, operating_period_in_years);
-                if(curr_cost_params and curr_cost_params['total_cost'] < min_cost):
-                    min_cost = curr_cost_params['total_cost']
-                    min_cost_dict = curr_cost_params;
+        for idx in instance_type_group.m_candidate_indices:
+            candidate_cost = compute_candidate_cost(pricing_catalog.m_candidates[idx], num_cores, core_utilization, memory_per_core,
+                    operating_period_in_years);
+            num_evaluated += 1;
+            if(candidate_cost[4] < min_cost or (candidate_cost[4] == min_cost and idx < min_cost_idx)):
+                min_cost = candidate_cost[4];
+                min_cost_idx = idx;
+                min_cost_candidate_cost = candidate_cost;
+    add_profile_count(profiler, 'aws.compute.candidates_evaluated', num_evaluated);
+    add_profile_count(profiler, 'aws.compute.candidates_infeasible', num_infeasible);
+    add_profile_count(profiler, 'aws.compute.candidates_pruned_by_bound', num_pruned_by_bound);
+    add_profile_count(profiler, 'aws.compute.candidates_pruned_by_dominance', num_dominated);
+    return (pricing_catalog.m_candidates[min_cost_idx] if min_cost_idx >= 0 else None), min_cost_candidate_cost;
+
+def select_optimal_server_configuration(model, ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years, core_utilization,
+        pricing_catalog=None, profiler=None, prune=True):
+    if(not pricing_catalog):
+        with profile_stage(profiler, 'aws.create_pricing_catalog'):
+            pricing_catalog = PricingCatalog(model, ec2_pricing_model);
+    model = model['compute'];
+    if(prune):
+        min_cost_candidate, min_cost_candidate_cost = select_optimal_candidate_pruned(pricing_catalog, num_cores, memory_per_core,
+                operating_period_in_years, core_utilization, profiler=profiler);
+    else:
+        min_cost_candidate, min_cost_candidate_cost = select_optimal_candidate_exhaustive(pricing_catalog, num_cores, memory_per_core,
+                operating_period_in_years, core_utilization, profiler=profiler);
+    min_cost_dict = create_candidate_cost_dict(min_cost_candidate, min_cost_candidate_cost) if min_cost_candidate else None;
     if(not min_cost_dict):
         raise NoServerConfigurationFound(('No valid EC2 instance found for specified memory per core value : %d')%(memory_per_core)); 
     cost_dict = min_cost_dict;
     discount_value = 0;
     #apply reserved instance discount
     if(min_cost_dict['offer_term'] != 'OnDemand'):
-        discount_value = piecewise_linear_function(model['reserved_discount_tiers'], 'segment_limit', 'rate', min_cost_dict['total_cost']);
+        discount_value = pricing_catalog.m_reserved_discount_function(min_cost_dict['total_cost']);
     cost_dict['summary'] = OrderedDict();
     cost_dict['summary']['ec2_cost'] = min_cost_dict['total_cost'];
     cost_dict['summary']['ec2_hourly_cost'] = min_cost_dict['total_hourly_cost'];
@@ -175,33 +468,179 @@ def select_optimal_server_configuration(model, ec2_pricing_model, num_cores, mem
     cost_dict['summary']['discount'] = discount_value;
     cost_dict['summary']['total_cost'] = min_cost_dict['total_cost'] - discount_value;
     return cost_dict;
+
+def select_pareto_frontier(model, ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years, core_utilization,
+        pricing_catalog=None, profiler=None):
+    #Every (instance, tenancy, offer_term) candidate not dominated in total cost, spare cores, spare memory and number of instances,
+    #cheapest first. All candidates are priced at once with numpy, only the frontier is priced again with compute_candidate_cost
+    #so that its costs are identical to select_optimal_server_configuration.
+    import numpy as np
+    from pareto import create_objective_points
+    from pareto import find_skyline
+    if(not pricing_catalog):
+        with profile_stage(profiler, 'aws.create_pricing_catalog'):
+            pricing_catalog = PricingCatalog(model, ec2_pricing_model);
+    candidate_arrays = pricing_catalog.get_candidate_arrays();
+    memory = candidate_arrays['memory'];
+    with np.errstate(divide='ignore', invalid='ignore'):
+        num_usable_cores_per_instance = np.where(memory >= memory_per_core,
+                np.minimum(np.floor(memory/memory_per_core), candidate_arrays['num_cores']), 0);
+    feasible_indices = np.flatnonzero(num_usable_cores_per_instance >= 1);
+    add_profile_count(profiler, 'aws.compute.candidates_evaluated', len(feasible_indices));
+    add_profile_count(profiler, 'aws.compute.candidates_infeasible', len(pricing_catalog.m_candidates)-len(feasible_indices));
+    if(len(feasible_indices) == 0):
+        raise NoServerConfigurationFound(('No valid EC2 instance found for specified memory per core value : %d')%(memory_per_core));
+    num_usable_cores_per_instance = num_usable_cores_per_instance[feasible_indices];
+    num_instances = np.ceil(float(num_cores)/num_usable_cores_per_instance);
+    hours_used = operating_period_in_years*365*24;
+    is_on_demand = candidate_arrays['is_on_demand'][feasible_indices];
+    hours_used = np.where(is_on_demand, float(hours_used*core_utilization)/100, hours_used);
+    hourly_cost = num_instances*candidate_arrays['hourly_rate'][feasible_indices]*hours_used;
+    duration = candidate_arrays['duration'][feasible_indices];
+    num_cycles = np.where(np.isnan(duration), 1, np.ceil(float(operating_period_in_years)/duration));
+    upfront_cost = num_instances*candidate_arrays['upfront_rate'][feasible_indices]*num_cycles;
+    ec2_cost = np.where(np.isnan(hourly_cost), 0, hourly_cost)+np.where(np.isnan(upfront_cost), 0, upfront_cost);
+    discount = np.where(is_on_demand, 0, pricing_catalog.m_reserved_discount_function.evaluate_array(ec2_cost));
+    points = create_objective_points({ 'total_cost': ec2_cost-discount,
+        'spare_cores': num_instances*num_usable_cores_per_instance-num_cores,
+        'spare_memory': num_instances*memory[feasible_indices]-num_cores*memory_per_core,
+        'num_machines': num_instances });
+    frontier = [];
+    for idx in feasible_indices[find_skyline(points)]:
+        candidate = pricing_catalog.m_candidates[idx];
+        candidate_cost = compute_candidate_cost(candidate, num_cores, core_utilization, memory_per_core, operating_period_in_years);
+        cost_dict = create_candidate_cost_dict(candidate, candidate_cost);
+        cost_dict['spare_cores'] = cost_dict['num_instances']*cost_dict['num_usable_cores_per_instance']-num_cores;
+        cost_dict['spare_memory'] = cost_dict['num_instances']*candidate.m_memory-num_cores*memory_per_core;
+        discount_value = 0;
+        if(candidate.m_offer_term != 'OnDemand'):
+            discount_value = pricing_catalog.m_reserved_discount_function(cost_dict['total_cost']);
+        cost_dict['summary'] = OrderedDict();
+        cost_dict['summary']['ec2_cost'] = cost_dict['total_cost'];
+        cost_dict['summary']['ec2_hourly_cost'] = cost_dict['total_hourly_cost'];
+        cost_dict['summary']['ec2_upfront_cost'] = cost_dict['total_upfront_cost'];
+        cost_dict['summary']['discount'] = discount_value;
+        cost_dict['summary']['total_cost'] = cost_dict['total_cost'] - discount_value;
+        frontier.append(cost_dict);
+    add_profile_count(profiler, 'aws.compute.frontier_size', len(frontier));
+    return frontier;
+
+def evaluate_mixed_fleet(pricing_catalog, fleet_counts, memory_per_core, operating_period_in_years, core_utilization):
+    #fleet_counts: { candidate index: number of instances }. The reserved instance discount applies to the reserved part of the fleet.
+    cost_dict = OrderedDict();
+    cost_dict['fleet'] = [];
+    cost_dict['num_instances'] = 0;
+    cost_dict['num_usable_cores'] = 0;
+    ec2_cost = 0;
+    reserved_cost = 0;
+    hourly_cost = None;
+    upfront_cost = None;
+    for idx in sorted(fleet_counts.keys()):
+        candidate = pricing_catalog.m_candidates[idx];
+        num_usable_cores_per_instance = compute_num_usable_cores_per_instance(candidate.m_num_cores, candidate.m_memory, memory_per_core);
+        candidate_cost = compute_candidate_cost(candidate, fleet_counts[idx]*num_usable_cores_per_instance, core_utilization, memory_per_core,
+                operating_period_in_years);
+        cost_dict['fleet'].append(create_candidate_cost_dict(candidate, candidate_cost));
+        cost_dict['num_instances'] += candidate_cost[1];
+        cost_dict['num_usable_cores'] += candidate_cost[0]*candidate_cost[1];
+        if(candidate_cost[2] is not None):
+            hourly_cost = candidate_cost[2] if hourly_cost is None else hourly_cost+candidate_cost[2];
+        if(candidate_cost[3] is not None):
+            upfront_cost = candidate_cost[3] if upfront_cost is None else upfront_cost+candidate_cost[3];
+        ec2_cost += candidate_cost[4];
+        if(candidate.m_offer_term != 'OnDemand'):
+            reserved_cost += candidate_cost[4];
+    discount_value = pricing_catalog.m_reserved_discount_function(reserved_cost) if reserved_cost > 0 else 0;
+    cost_dict['summary'] = OrderedDict();
+    cost_dict['summary']['ec2_cost'] = ec2_cost;
+    cost_dict['summary']['ec2_hourly_cost'] = hourly_cost;
+    cost_dict['summary']['ec2_upfront_cost'] = upfront_cost;
+    cost_dict['summary']['discount'] = discount_value;
+    cost_dict['summary']['total_cost'] = ec2_cost - discount_value;
+    return cost_dict;
+
+def select_optimal_mixed_fleet(model, ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years, core_utilization,
+        pricing_catalog=None, profiler=None):
+    #Cheapest multiset of (instance, tenancy, offer_term) candidates covering num_cores - never worse than the best single candidate.
+    #The covering DP prices instances before the reserved discount, the fleets it proposes are then priced exactly.
+    if(not pricing_catalog):
+        with profile_stage(profiler, 'aws.create_pricing_catalog'):
+            pricing_catalog = PricingCatalog(model, ec2_pricing_model);
+    single_candidate, single_candidate_cost = select_optimal_candidate_pruned(pricing_catalog, num_cores, memory_per_core,
+            operating_period_in_years, core_utilization, profiler=profiler);
+    if(not single_candidate):
+        raise NoServerConfigurationFound(('No valid EC2 instance found for specified memory per core value : %d')%(memory_per_core));
+    fleets = [ { pricing_catalog.m_candidates.index(single_candidate): single_candidate_cost[1] } ];
+    cover_items = [ (compute_num_usable_cores_per_instance(candidate.m_num_cores, candidate.m_memory, memory_per_core),
+        compute_candidate_cost_per_instance(candidate, operating_period_in_years, core_utilization)) for candidate in pricing_catalog.m_candidates ];
+    fleets += [ fleet_counts for estimated_cost, fleet_counts in enumerate_cover_solutions(cover_items, num_cores) ];
+    min_cost_dict = None;
+    for fleet_counts in fleets:
+        cost_dict = evaluate_mixed_fleet(pricing_catalog, fleet_counts, memory_per_core, operating_period_in_years, core_utilization);
+        if(min_cost_dict is None or cost_dict['summary']['total_cost'] < min_cost_dict['summary']['total_cost']):
+            min_cost_dict = cost_dict;
+    add_profile_count(profiler, 'aws.compute.mixed_fleets_evaluated', len(fleets));
+    return min_cost_dict;
     
-def compute_storage_cost(model, raw_storage_size, storage_utilization_percentage, operating_period_in_years, backup_percentage_per_month,
-        iops_per_GB_requested=None, bandwidth_per_TB_requested=None):
+def select_ebs_volume_layout(ebs_tiers, usable_storage, effective_operating_period_in_months, iops_requested, throughput_requested):
+    #usable_storage in TB, iops_requested and throughput_requested (MB/s) are aggregate over all volumes
     min_cost_dict = None;
+    for ebs_tier in ebs_tiers:
+        layout = ebs_tier.determine_volume_layout(usable_storage*1024, iops_requested, throughput_requested);
+        if(layout is None):
+            continue;
+        provisioned_GB, num_volumes, provisioned_iops = layout;
+        curr_cost = provisioned_GB*ebs_tier.m_price_per_GB_per_month*effective_operating_period_in_months;
+        if(provisioned_iops):
+            curr_cost += provisioned_iops*ebs_tier.m_price_per_iops_per_month*effective_operating_period_in_months;
+        if(min_cost_dict is None or curr_cost < min_cost_dict['ebs_cost']):
+            min_cost_dict = OrderedDict([
+                ('ebs_type', ebs_tier.m_name),
+                ('usable_storage', usable_storage),
+                ('provisioned_storage_GB', provisioned_GB),
+                ('num_volumes', num_volumes),
+                ('storage_per_volume_GB', provisioned_GB/num_volumes),
+                ('provisioned_iops', provisioned_iops),
+                ('ebs_cost', curr_cost)
+                ]);
+    if(not min_cost_dict):
+        raise NoServerConfigurationFound('Could not find storage type with required specification');
+    return min_cost_dict;
+
+def compute_storage_cost(model, raw_storage_size, storage_utilization_percentage, operating_period_in_years, backup_percentage_per_month,
+        iops_per_GB_requested=None, bandwidth_per_TB_requested=None, pricing_catalog=None, iops_requested=None, throughput_requested=None):
+    #iops_requested and throughput_requested (MB/s) are aggregate requirements - if either is given the volumes are sized by
+    #select_ebs_volume_layout and the per GB/TB requirements are added to them
+    min_cost_tier = None;
     min_cost = 100000000000000;
     effective_operating_period_in_months = float(12*operating_period_in_years*storage_utilization_percentage)/100;
     usable_storage = determine_usable_storage(model, raw_storage_size);
-    for storage_config in model['storage']['ebs']['pricing_tiers']:
-        if((iops_per_GB_requested and 'baseline_iops_per_GB' in storage_config and \
-            storage_config['baseline_iops_per_GB'] >= iops_per_GB_requested) or \
-            (not iops_per_GB_requested and bandwidth_per_TB_requested and 'baseline_bandwidth_per_TB' in storage_config \
-            and storage_config['baseline_bandwidth_per_TB'] >= bandwidth_per_TB_requested) or
-            (not iops_per_GB_requested and not bandwidth_per_TB_requested)):
+    ebs_tiers = pricing_catalog.m_ebs_tiers if pricing_catalog else create_ebs_tiers(model);
+    if(iops_requested or throughput_requested):
+        min_cost_dict = select_ebs_volume_layout(ebs_tiers, usable_storage, effective_operating_period_in_months,
+                max(iops_requested or 0, (iops_per_GB_requested or 0)*usable_storage*1024),
+                max(throughput_requested or 0, (bandwidth_per_TB_requested or 0)*usable_storage));
+        return add_backup_cost(model, min_cost_dict, usable_storage, operating_period_in_years, backup_percentage_per_month);
+    for ebs_tier in ebs_tiers:
+        if(ebs_tier.is_adequate(iops_per_GB_requested, bandwidth_per_TB_requested)):
             curr_cost = 0;
-            if(iops_per_GB_requested and 'price_per_iops_per_month' in storage_config):
+            if(iops_per_GB_requested and ebs_tier.m_price_per_iops_per_month is not None):
                 curr_cost += iops_per_GB_requested*effective_operating_period_in_months* \
-                        storage_config['price_per_iops_per_month'];
-            curr_cost += usable_storage*1024*storage_config['price_per_GB_per_month']*effective_operating_period_in_months;
+                        ebs_tier.m_price_per_iops_per_month;
+            curr_cost += usable_storage*1024*ebs_tier.m_price_per_GB_per_month*effective_operating_period_in_months;
             if(curr_cost < min_cost):
                 min_cost = curr_cost
-                min_cost_dict = OrderedDict([
-                    ('ebs_type', storage_config['name']),
-                    ('usable_storage', usable_storage),
-                    ('ebs_cost', curr_cost)
-                    ]);
-    if(not min_cost_dict):
+                min_cost_tier = ebs_tier;
+    if(not min_cost_tier):
         raise NoServerConfigurationFound('Could not find storage type with required specification');
+    min_cost_dict = OrderedDict([
+        ('ebs_type', min_cost_tier.m_name),
+        ('usable_storage', usable_storage),
+        ('ebs_cost', min_cost)
+        ]);
+    return add_backup_cost(model, min_cost_dict, usable_storage, operating_period_in_years, backup_percentage_per_month);
+
+def add_backup_cost(model, min_cost_dict, usable_storage, operating_period_in_years, backup_percentage_per_month):
     backup_onetime_cost = usable_storage*model['storage']['snapshot_cost_per_TB'];
     backup_monthly_cost = (12*operating_period_in_years*float(usable_storage*backup_percentage_per_month)/100)*model['storage']['snapshot_cost_per_TB'];
     min_cost_dict['backup_onetime_cost'] = backup_onetime_cost;
@@ -212,39 +651,84 @@ def compute_storage_cost(model, raw_storage_size, storage_utilization_percentage
     min_cost_dict['summary']['total_cost'] = min_cost_dict['ebs_cost']+min_cost_dict['summary']['backup_cost'];
     return min_cost_dict;
 
-def compute_network_cost(model, bandwidth, bandwidth_utilization, operating_period_in_years):
+def compute_network_cost(model, bandwidth, bandwidth_utilization, operating_period_in_years, pricing_catalog=None):
     cost_dict = OrderedDict();
     #Data transfer/month
     data_transfer_per_month = (float(bandwidth*bandwidth_utilization*30*24*3600)/100)*(float(10**6)/(8*1024**3))* \
             (float(model['network']['percentage_outbound_traffic'])/100);
-    per_month_cost = piecewise_linear_function(model['network']['pricing_tiers'], "segment_limit_GB", "cost_per_GB", data_transfer_per_month);
+    if(pricing_catalog):
+        per_month_cost = pricing_catalog.m_network_pricing_function(data_transfer_per_month);
+    else:
+        per_month_cost = piecewise_linear_function(model['network']['pricing_tiers'], "segment_limit_GB", "cost_per_GB", data_transfer_per_month);
     cost_dict['data_transferred_per_month_in_GB'] = data_transfer_per_month;
     cost_dict['summary'] = OrderedDict();
     cost_dict['summary']['total_cost'] = per_month_cost*12*operating_period_in_years;
     return cost_dict;
 
-def compute_support_cost(model, support_type, total_cost, operating_period_in_years):
+def compute_support_cost(model, support_type, total_cost, operating_period_in_years, pricing_catalog=None):
     cost_dict = { 'summary': { 'total_cost': 0 } };
     if(support_type and support_type in model['support']):
         monthly_cost = float(total_cost)/(12*operating_period_in_years);
-        cost_dict['summary']['total_cost'] = (12*operating_period_in_years)* \
-                piecewise_linear_function(model['support'][support_type], 'segment_limit', 'rate', monthly_cost);
+        if(pricing_catalog and support_type in pricing_catalog.m_support_functions):
+            monthly_support_cost = pricing_catalog.m_support_functions[support_type](monthly_cost);
+        else:
+            monthly_support_cost = piecewise_linear_function(model['support'][support_type], 'segment_limit', 'rate', monthly_cost);
+        cost_dict['summary']['total_cost'] = (12*operating_period_in_years)*monthly_support_cost;
     return cost_dict;
 
-def compute_tco(args_handler, do_print=False):
+def compute_tco(args_handler, do_print=False, pricing_catalog=None, stage_cache=None):
     model = args_handler.m_model;
     ec2_pricing_model = args_handler.m_ec2_pricing_model;
+    num_cores = args_handler.m_num_cores;
+    memory_per_core = args_handler.m_memory_per_core;
+    storage = args_handler.m_storage;
+    bandwidth = args_handler.m_bandwidth;
+    bandwidth_utilization = args_handler.m_bandwidth_utilization;
+    operating_period_in_years = args_handler.m_operating_period_in_years;
+    core_utilization = args_handler.m_core_utilization;
+    storage_utilization = args_handler.m_storage_utilization;
+    backup_percentage_per_month = args_handler.m_backup_percentage_per_month;
+    iops_per_GB_requested = args_handler.m_iops_per_GB_requested;
+    storage_bandwidth_per_TB_requested = args_handler.m_storage_bandwidth_per_TB_requested;
+    storage_iops_requested = args_handler.m_storage_iops_requested;
+    storage_throughput_requested = args_handler.m_storage_throughput_requested;
+    aws_support = args_handler.m_aws_support;
+    mixed_fleet = args_handler.m_mixed_fleet;
+    compute_frontier = args_handler.m_compute_frontier;
+    profiler = args_handler.m_profiler;
     cost_dict = OrderedDict();
-    cost_dict['compute'] = select_optimal_server_configuration(model, ec2_pricing_model, args_handler.m_num_cores, args_handler.m_memory_per_core,
-            args_handler.m_operating_period_in_years, args_handler.m_core_utilization);
-    cost_dict['storage'] = compute_storage_cost(model, args_handler.m_storage, args_handler.m_storage_utilization,
-            args_handler.m_operating_period_in_years, args_handler.m_backup_percentage_per_month,
-            args_handler.m_iops_per_GB_requested, args_handler.m_storage_bandwidth_per_TB_requested);
-    cost_dict['network'] = compute_network_cost(model, args_handler.m_bandwidth, args_handler.m_bandwidth_utilization,
-            args_handler.m_operating_period_in_years);
+    select_function = select_optimal_mixed_fleet if mixed_fleet else select_optimal_server_configuration;
+    #The catalogs of the regions compared by compare_regions share the model and the pricing
+    region = pricing_catalog.m_region if pricing_catalog else None;
+    with profile_stage(profiler, 'aws.compute'):
+        cost_dict['compute'] = compute_stage(stage_cache, 'compute', (model, ec2_pricing_model),
+                (num_cores, memory_per_core, operating_period_in_years, core_utilization, mixed_fleet, region),
+                lambda: select_function(model, ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years,
+                    core_utilization, pricing_catalog=pricing_catalog, profiler=profiler));
+    #The cheapest configuration stays the compute cost, the frontier shows the alternatives
+    if(compute_frontier):
+        with profile_stage(profiler, 'aws.compute_frontier'):
+            cost_dict['compute_frontier'] = compute_stage(stage_cache, 'compute_frontier', (model, ec2_pricing_model),
+                    (num_cores, memory_per_core, operating_period_in_years, core_utilization, region),
+                    lambda: select_pareto_frontier(model, ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years,
+                        core_utilization, pricing_catalog=pricing_catalog, profiler=profiler));
+    with profile_stage(profiler, 'aws.storage'):
+        cost_dict['storage'] = compute_stage(stage_cache, 'storage', (model,),
+                (storage, storage_utilization, operating_period_in_years, backup_percentage_per_month, iops_per_GB_requested,
+                    storage_bandwidth_per_TB_requested, storage_iops_requested, storage_throughput_requested),
+                lambda: compute_storage_cost(model, storage, storage_utilization, operating_period_in_years, backup_percentage_per_month,
+                    iops_per_GB_requested, storage_bandwidth_per_TB_requested, pricing_catalog=pricing_catalog,
+                    iops_requested=storage_iops_requested, throughput_requested=storage_throughput_requested));
+    with profile_stage(profiler, 'aws.network'):
+        cost_dict['network'] = compute_stage(stage_cache, 'network', (model,), (bandwidth, bandwidth_utilization, operating_period_in_years),
+                lambda: compute_network_cost(model, bandwidth, bandwidth_utilization, operating_period_in_years,
+                    pricing_catalog=pricing_catalog));
     total_cost = cost_dict['compute']['summary']['total_cost']+cost_dict['storage']['summary']['total_cost']+ \
             cost_dict['network']['summary']['total_cost'];
-    cost_dict['support'] = compute_support_cost(model, args_handler.m_aws_support, total_cost, args_handler.m_operating_period_in_years);
+    with profile_stage(profiler, 'aws.support'):
+        cost_dict['support'] = compute_stage(stage_cache, 'support', (model,), (aws_support, total_cost, operating_period_in_years),
+                lambda: compute_support_cost(model, aws_support, total_cost, operating_period_in_years,
+                    pricing_catalog=pricing_catalog));
     cost_dict['summary'] = OrderedDict([
         ('compute', cost_dict['compute']['summary']['total_cost']),
         ('storage', cost_dict['storage']['summary']['total_cost']),
@@ -253,13 +737,51 @@ def compute_tco(args_handler, do_print=False):
         ('total_cost', total_cost+cost_dict['support']['summary']['total_cost']),
         ]);
     if(do_print):
-        print(json.dumps(cost_dict, indent=4, separators=(',', ': ')));
+        print(dump_cost_dict(cost_dict, profiler, indent=4, separators=(',', ': ')));
     return cost_dict;
 
+def compare_regions(args_handler, regions=None, pricing_catalogs=None, stage_cache=None, do_print=False):
+    #Evaluates the workload in every (location, operating_system) region and ranks them by total cost. Storage and network
+    #costs do not depend on the region - the stage cache computes them once.
+    if(regions is None):
+        regions = args_handler.get_regions();
+    profiler = args_handler.m_profiler;
+    if(not pricing_catalogs):
+        with profile_stage(profiler, 'aws.create_pricing_catalog'):
+            pricing_catalogs = create_pricing_catalogs(args_handler.m_model, args_handler.m_ec2_pricing_model, regions);
+    if(stage_cache is None):
+        stage_cache = StageCache();
+    region_cost_dicts = [];
+    for region in regions:
+        region_cost_dict = OrderedDict([ ('location', region[0]), ('operating_system', region[1]) ]);
+        try:
+            cost_dict = compute_tco(args_handler, pricing_catalog=pricing_catalogs[region], stage_cache=stage_cache);
+            region_cost_dict['summary'] = cost_dict['summary'];
+            region_cost_dict['compute'] = cost_dict['compute'];
+        except NoServerConfigurationFound as e:
+            region_cost_dict['error'] = e.value;
+        region_cost_dicts.append(region_cost_dict);
+    #Regions without a valid instance go last
+    region_cost_dicts.sort(key=lambda region_cost_dict: (0, region_cost_dict['summary']['total_cost']) if 'summary' in region_cost_dict
+            else (1, 0));
+    comparison_dict = OrderedDict();
+    comparison_dict['regions'] = region_cost_dicts;
+    for rank, region_cost_dict in enumerate(region_cost_dicts):
+        if('summary' in region_cost_dict):
+            region_cost_dict['rank'] = rank+1;
+            region_cost_dict['cost_relative_to_cheapest'] = region_cost_dict['summary']['total_cost']/region_cost_dicts[0]['summary']['total_cost'] \
+                    if region_cost_dicts[0]['summary']['total_cost'] > 0 else None;
+    if(do_print):
+        print(dump_cost_dict(comparison_dict, profiler, indent=4, separators=(',', ': ')));
+    return comparison_dict;
+
 def main():
     parser = argparse.ArgumentParser(description='Cost model for AWS cloud based on Amazon\'s TCO calculator');
     args_handler = AmazonArgumentsHandler(parser);
-    compute_tco(args_handler, do_print=True);
+    if(args_handler.m_locations or args_handler.m_operating_systems):
+        compare_regions(args_handler, do_print=True);
+    else:
+        compute_tco(args_handler, do_print=True);
 
 if __name__ == "__main__":
     main()
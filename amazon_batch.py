@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+import numpy as np
+from collections import OrderedDict
+from ccc_model_common import NoServerConfigurationFound
+from ccc_batch_common import as_scenario_column
+from ccc_batch_common import get_num_scenarios
+
+#Batch (NumPy) version of the AWS model. The PricingCatalog candidates are turned once into a price matrix laid out
+#along axis 1 and scenarios along axis 0 as (S,1) columns. All arithmetic is done in the same order as the scalar
+#functions in amazon.py so that the results are bit-for-bit identical.
+
+class Ec2PriceMatrix:
+
+    def __init__(self, pricing_catalog):
+        candidates = pricing_catalog.m_candidates;
+        self.m_candidates = candidates;
+        self.m_num_cores = np.array([ [ candidate.m_num_cores or 0 for candidate in candidates ] ], dtype=np.float64);
+        self.m_memory = np.array([ [ candidate.m_memory or 0 for candidate in candidates ] ], dtype=np.float64);
+        self.m_has_hourly_rate = np.array([ [ candidate.m_hourly_rate is not None for candidate in candidates ] ]);
+        self.m_hourly_rate = np.array([ [ candidate.m_hourly_rate or 0 for candidate in candidates ] ], dtype=np.float64);
+        self.m_has_upfront_rate = np.array([ [ candidate.m_upfront_rate is not None for candidate in candidates ] ]);
+        self.m_upfront_rate = np.array([ [ candidate.m_upfront_rate or 0 for candidate in candidates ] ], dtype=np.float64);
+        self.m_has_duration = np.array([ [ candidate.m_duration is not None for candidate in candidates ] ]);
+        self.m_duration = np.array([ [ candidate.m_duration or 1 for candidate in candidates ] ], dtype=np.float64);
+        self.m_is_on_demand = np.array([ [ candidate.m_offer_term == 'OnDemand' for candidate in candidates ] ]);
+        #Tier tables compiled once by the catalog - their evaluate_array arrays are then also built once
+        self.m_reserved_discount_function = pricing_catalog.m_reserved_discount_function;
+        self.m_network_pricing_function = pricing_catalog.m_network_pricing_function;
+        self.m_support_functions = pricing_catalog.m_support_functions;
+
+def compute_candidate_costs_batch(price_matrix, num_cores, memory_per_core, core_utilization, operating_period_in_years):
+    #Returns (S,C) arrays - candidates that cannot be used have a total_cost of inf
+    cost_arrays = OrderedDict();
+    is_valid = (price_matrix.m_memory > 0) & (price_matrix.m_memory >= memory_per_core);
+    num_usable_cores_per_instance = np.where((price_matrix.m_num_cores > 0) & (price_matrix.m_memory > 0),
+            np.minimum(np.floor(price_matrix.m_memory/memory_per_core), price_matrix.m_num_cores), 0);
+    is_valid = is_valid & (num_usable_cores_per_instance >= 1);
+    num_instances = np.ceil(num_cores/np.where(is_valid, num_usable_cores_per_instance, 1));
+    hours_used = operating_period_in_years*365*24;
+    hours_used = np.where(price_matrix.m_is_on_demand, (hours_used*core_utilization)/100, hours_used);
+    num_cycles = np.where(price_matrix.m_has_duration, np.ceil(operating_period_in_years/price_matrix.m_duration), 1);
+    hourly_cost = np.where(price_matrix.m_has_hourly_rate, num_instances*price_matrix.m_hourly_rate*hours_used, np.nan);
+    upfront_cost = np.where(price_matrix.m_has_upfront_rate, num_instances*price_matrix.m_upfront_rate*num_cycles, np.nan);
+    cost_arrays['num_usable_cores_per_instance'] = num_usable_cores_per_instance;
+    cost_arrays['num_instances'] = num_instances;
+    cost_arrays['total_hourly_cost'] = hourly_cost;
+    cost_arrays['total_upfront_cost'] = upfront_cost;
+    cost_arrays['total_cost'] = np.where(price_matrix.m_has_hourly_rate, hourly_cost, 0) \
+            + np.where(price_matrix.m_has_upfront_rate, upfront_cost, 0);
+    cost_arrays['selection_cost'] = np.where(is_valid, cost_arrays['total_cost'], np.inf);
+    return cost_arrays;
+
+def select_optimal_server_configuration_batch(model, price_matrix, num_cores, memory_per_core, operating_period_in_years,
+        core_utilization):
+    #Returns (S,) arrays for the cheapest candidate of every scenario - candidate_index is -1 where none is valid
+    num_scenarios = get_num_scenarios(num_cores, memory_per_core, operating_period_in_years, core_utilization);
+    num_cores = as_scenario_column(num_cores, num_scenarios);
+    memory_per_core = as_scenario_column(memory_per_core, num_scenarios);
+    operating_period_in_years = as_scenario_column(operating_period_in_years, num_scenarios);
+    core_utilization = as_scenario_column(core_utilization, num_scenarios);
+    cost_arrays = compute_candidate_costs_batch(price_matrix, num_cores, memory_per_core, core_utilization, operating_period_in_years);
+    selection_cost = cost_arrays['selection_cost'];
+    scenario_idx = np.arange(num_scenarios);
+    if(selection_cost.shape[1] == 0):
+        raise NoServerConfigurationFound('No EC2 instance found in the pricing catalog');
+    candidate_index = np.argmin(selection_cost, axis=1);
+    has_valid_candidate = np.isfinite(selection_cost[scenario_idx, candidate_index]);
+    result = OrderedDict();
+    result['candidate_index'] = np.where(has_valid_candidate, candidate_index, -1);
+    for key in [ 'num_usable_cores_per_instance', 'num_instances', 'total_hourly_cost', 'total_upfront_cost', 'total_cost' ]:
+        result[key] = np.where(has_valid_candidate, cost_arrays[key][scenario_idx, candidate_index], np.nan);
+    is_reserved = has_valid_candidate & ~price_matrix.m_is_on_demand.ravel()[candidate_index];
+    #apply reserved instance discount
+    discount_value = np.where(is_reserved, price_matrix.m_reserved_discount_function.evaluate_array(
+        np.where(has_valid_candidate, result['total_cost'], 0)), 0);
+    result['ec2_cost'] = result['total_cost'];
+    result['ec2_hourly_cost'] = result['total_hourly_cost'];
+    result['ec2_upfront_cost'] = result['total_upfront_cost'];
+    result['discount'] = np.where(has_valid_candidate, discount_value, np.nan);
+    result['total_cost'] = result['total_cost'] - discount_value;
+    return result;
+
+def compute_storage_cost_batch(model, raw_storage_size, storage_utilization_percentage, operating_period_in_years,
+        backup_percentage_per_month, iops_per_GB_requested=None, bandwidth_per_TB_requested=None):
+    #The tier filter only depends on the (scalar) requested iops/bandwidth, the cost is vectorized over scenarios
+    storage_params = model['storage'];
+    effective_operating_period_in_months = (12*operating_period_in_years*storage_utilization_percentage)/100;
+    usable_storage = ((100-np.asarray(storage_params['os_penalty_percentage'], dtype=np.float64))/100)*raw_storage_size;
+    usable_storage = ((100-np.asarray(storage_params['raid_penalty_percentage'], dtype=np.float64))/100)*usable_storage;
+    tier_names = [];
+    tier_costs = [];
+    for storage_config in storage_params['ebs']['pricing_tiers']:
+        if((iops_per_GB_requested and 'baseline_iops_per_GB' in storage_config and \
+            storage_config['baseline_iops_per_GB'] >= iops_per_GB_requested) or \
+            (not iops_per_GB_requested and bandwidth_per_TB_requested and 'baseline_bandwidth_per_TB' in storage_config \
+            and storage_config['baseline_bandwidth_per_TB'] >= bandwidth_per_TB_requested) or
+            (not iops_per_GB_requested and not bandwidth_per_TB_requested)):
+            curr_cost = 0;
+            if(iops_per_GB_requested and 'price_per_iops_per_month' in storage_config):
+                curr_cost += iops_per_GB_requested*effective_operating_period_in_months*storage_config['price_per_iops_per_month'];
+            curr_cost = curr_cost + usable_storage*1024*storage_config['price_per_GB_per_month']*effective_operating_period_in_months;
+            tier_names.append(storage_config['name']);
+            tier_costs.append(curr_cost.ravel());
+    if(len(tier_costs) == 0):
+        raise NoServerConfigurationFound('Could not find storage type with required specification');
+    tier_costs = np.column_stack(tier_costs);
+    tier_index = np.argmin(tier_costs, axis=1);
+    cost_arrays = OrderedDict();
+    cost_arrays['ebs_tier_names'] = tier_names;
+    cost_arrays['ebs_type_index'] = tier_index;
+    cost_arrays['usable_storage'] = usable_storage.ravel();
+    cost_arrays['ebs_cost'] = tier_costs[np.arange(tier_costs.shape[0]), tier_index];
+    snapshot_cost_per_TB = storage_params['snapshot_cost_per_TB'];
+    cost_arrays['backup_onetime_cost'] = (usable_storage*snapshot_cost_per_TB).ravel();
+    cost_arrays['backup_monthly_cost'] = ((12*operating_period_in_years*(usable_storage*backup_percentage_per_month)/100) \
+            *snapshot_cost_per_TB).ravel();
+    cost_arrays['backup_cost'] = cost_arrays['backup_onetime_cost'] + cost_arrays['backup_monthly_cost'];
+    cost_arrays['total_cost'] = cost_arrays['ebs_cost']+cost_arrays['backup_cost'];
+    return cost_arrays;
+
+def compute_network_cost_batch(model, price_matrix, bandwidth, bandwidth_utilization, operating_period_in_years):
+    cost_arrays = OrderedDict();
+    data_transfer_per_month = ((bandwidth*bandwidth_utilization*30*24*3600)/100)*(float(10**6)/(8*1024**3))* \
+            (np.asarray(model['network']['percentage_outbound_traffic'], dtype=np.float64)/100);
+    per_month_cost = price_matrix.m_network_pricing_function.evaluate_array(data_transfer_per_month);
+    cost_arrays['data_transferred_per_month_in_GB'] = data_transfer_per_month.ravel();
+    cost_arrays['total_cost'] = (per_month_cost*12*operating_period_in_years).ravel();
+    return cost_arrays;
+
+def compute_support_cost_batch(model, price_matrix, support_type, total_cost, operating_period_in_years):
+    if(support_type and support_type in model['support']):
+        monthly_cost = total_cost/(12*operating_period_in_years);
+        return (12*operating_period_in_years)*price_matrix.m_support_functions[support_type].evaluate_array(monthly_cost);
+    return np.zeros_like(total_cost);
+
+def compute_tco_batch(model, price_matrix, num_cores, memory_per_core, storage, bandwidth, bandwidth_utilization,
+        operating_period_in_years=3, core_utilization=100, storage_utilization=100, backup_percentage_per_month=5,
+        iops_per_GB_requested=None, storage_bandwidth_per_TB_requested=None, aws_support=None):
+    #Batch equivalent of amazon.compute_tco - all numeric inputs may be scalars or length S arrays
+    num_scenarios = get_num_scenarios(num_cores, memory_per_core, storage, bandwidth, bandwidth_utilization,
+            operating_period_in_years, core_utilization, storage_utilization, backup_percentage_per_month);
+    storage = as_scenario_column(storage, num_scenarios);
+    bandwidth = as_scenario_column(bandwidth, num_scenarios);
+    bandwidth_utilization = as_scenario_column(bandwidth_utilization, num_scenarios);
+    operating_period_in_years = as_scenario_column(operating_period_in_years, num_scenarios);
+    storage_utilization = as_scenario_column(storage_utilization, num_scenarios);
+    backup_percentage_per_month = as_scenario_column(backup_percentage_per_month, num_scenarios);
+    result = OrderedDict();
+    result['compute'] = select_optimal_server_configuration_batch(model, price_matrix, as_scenario_column(num_cores, num_scenarios),
+            as_scenario_column(memory_per_core, num_scenarios), operating_period_in_years, as_scenario_column(core_utilization, num_scenarios));
+    result['storage'] = compute_storage_cost_batch(model, storage, storage_utilization, operating_period_in_years,
+            backup_percentage_per_month, iops_per_GB_requested, storage_bandwidth_per_TB_requested);
+    result['network'] = compute_network_cost_batch(model, price_matrix, bandwidth, bandwidth_utilization, operating_period_in_years);
+    total_cost = result['compute']['total_cost']+result['storage']['total_cost']+result['network']['total_cost'];
+    support_cost = compute_support_cost_batch(model, price_matrix, aws_support, total_cost, operating_period_in_years.ravel());
+    result['summary'] = OrderedDict([
+        ('compute', result['compute']['total_cost']),
+        ('storage', result['storage']['total_cost']),
+        ('network', result['network']['total_cost']),
+        ('support', support_cost),
+        ('total_cost', total_cost+support_cost),
+        ]);
+    return result;
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from collections import OrderedDict
+import amazon
+import ec2_pricing
+import patient_to_compute
+from ccc_model_common import parse_model_params_file
+from generate_ec2_offer_file import generate_ec2_offer_file
+from tco_profile import get_peak_rss_in_MB
+
+DEFAULT_SIZES = [ 1000, 10000, 100000 ];
+#json.load of the whole offer file needs many times the file size in memory
+DEFAULT_JSON_LOAD_LIMIT = 100000;
+BENCHMARK_REPORT_FORMAT_VERSION = 1;
+#(num_cores, memory_per_core, operating_period_in_years, core_utilization) of the select_optimal_server_configuration queries
+SELECT_QUERIES = [ (1, 1, 3, 100), (8, 2, 1, 50), (64, 4, 3, 100), (500, 8, 5, 80), (5000, 16, 3, 100), (100, 60, 1, 100) ];
+
+#Every stage function does its (untimed) setup and returns the function to time and the number of queries in one call
+
+def setup_load_json(context):
+    return (lambda: parse_model_params_file(context['offer_file'])), 1;
+
+def setup_load_streaming(context):
+    model = context['aws_model']['compute'];
+    return (lambda: ec2_pricing.load_ec2_pricing_model(context['offer_file'], model)), 1;
+
+def setup_build_index(context):
+    model = context['aws_model']['compute'];
+    def run():
+        index = ec2_pricing.create_pricing_index(context['offer_file'], model);
+        ec2_pricing.write_pricing_index(index, context['index_file']);
+    return run, 1;
+
+def setup_load_index(context):
+    model = context['aws_model']['compute'];
+    #Build the index outside the timed part
+    ec2_pricing.load_pricing_index(context['index_file'], model, ec2_pricing_json_file=context['offer_file']);
+    return (lambda: ec2_pricing.load_pricing_index(context['index_file'], model, ec2_pricing_json_file=context['offer_file'])), 1;
+
+def setup_create_instance_to_products_list(context):
+    model = context['aws_model']['compute'];
+    ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(context['offer_file'], model);
+    return (lambda: amazon.create_instance_to_products_list(model, ec2_pricing_model)), 1;
+
+def setup_create_pricing_catalog(context):
+    ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(context['offer_file'], context['aws_model']['compute']);
+    return (lambda: amazon.PricingCatalog(context['aws_model'], ec2_pricing_model)), 1;
+
+def setup_select_optimal_server_configuration(context):
+    aws_model = context['aws_model'];
+    ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(context['offer_file'], aws_model['compute']);
+    pricing_catalog = amazon.PricingCatalog(aws_model, ec2_pricing_model);
+    def run():
+        for num_cores, memory_per_core, operating_period_in_years, core_utilization in SELECT_QUERIES:
+            amazon.select_optimal_server_configuration(aws_model, ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years,
+                    core_utilization, pricing_catalog=pricing_catalog);
+    return run, len(SELECT_QUERIES);
+
+def setup_patient_to_compute(context):
+    argv = [ 'patient_to_compute.py', '--patients_file', context['patients_file'],
+            '--pvt_cloud_model_parameters_file', context['pvt_cloud_model_parameters_file'],
+            '--aws_model_parameters_file', context['aws_model_parameters_file'], '--ec2_pricing_json_file', context['offer_file'],
+            '--memory_per_core', '4', '--bandwidth', '100', '--bandwidth_utilization', '50' ];
+    def run():
+        saved_argv, saved_stdout = sys.argv, sys.stdout;
+        sys.argv = argv;
+        sys.stdout = open(os.devnull, 'w');
+        try:
+            patient_to_compute.main();
+        finally:
+            sys.stdout.close();
+            sys.argv, sys.stdout = saved_argv, saved_stdout;
+    return run, 1;
+
+BENCHMARK_STAGES = OrderedDict([
+    ('load_json', setup_load_json),
+    ('load_streaming', setup_load_streaming),
+    ('build_index', setup_build_index),
+    ('load_index', setup_load_index),
+    ('create_instance_to_products_list', setup_create_instance_to_products_list),
+    ('create_pricing_catalog', setup_create_pricing_catalog),
+    ('select_optimal_server_configuration', setup_select_optimal_server_configuration),
+    ('patient_to_compute', setup_patient_to_compute)
+    ]);
+
+def run_stage(stage, context, num_repeats):
+    #Runs in a fresh process so that the peak RSS belongs to this stage only
+    run, num_queries = BENCHMARK_STAGES[stage](context);
+    setup_peak_rss = get_peak_rss_in_MB();
+    wall_times = [];
+    for repeat in range(num_repeats):
+        start_time = time.time();
+        run();
+        wall_times.append(time.time()-start_time);
+    result = OrderedDict();
+    result['wall_time_s'] = min(wall_times);
+    result['mean_wall_time_s'] = sum(wall_times)/len(wall_times);
+    result['num_queries'] = num_queries;
+    result['time_per_query_ms'] = 1000*min(wall_times)/num_queries;
+    result['setup_peak_rss_MB'] = setup_peak_rss;
+    result['peak_rss_MB'] = get_peak_rss_in_MB();
+    return result;
+
+def run_stage_in_subprocess(stage, context, num_repeats):
+    command = [ sys.executable, os.path.abspath(__file__), '--run_stage', stage, '--num_repeats', str(num_repeats),
+            '--context', json.dumps(context) ];
+    process = subprocess.Popen(command, stdout=subprocess.PIPE);
+    output = process.communicate()[0];
+    if(process.returncode != 0):
+        return OrderedDict([ ('error', 'Stage %s exited with status %d'%(stage, process.returncode)) ]);
+    return json.loads(output, object_pairs_hook=OrderedDict);
+
+def get_offer_file(work_dir, aws_model, num_skus):
+    #Generated files are kept in the work directory and reused by later runs
+    offer_file = os.path.join(work_dir, 'ec2_offer_%d.json'%(num_skus));
+    if(not os.path.exists(offer_file)):
+        sys.stderr.write('Generating %s\n'%(offer_file));
+        tmp_file = offer_file+'.tmp';
+        fptr = open(tmp_file, 'wb');
+        generate_ec2_offer_file(fptr, aws_model['compute'], num_skus);
+        fptr.close();
+        os.rename(tmp_file, offer_file);
+    return offer_file;
+
+def get_environment():
+    environment = OrderedDict();
+    environment['python_version'] = platform.python_version();
+    environment['platform'] = platform.platform();
+    environment['machine'] = platform.machine();
+    environment['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime());
+    return environment;
+
+def compare_with_baseline(results, baseline_report):
+    #Adds the ratio of the wall time to the baseline's for every (num_skus, stage) present in both
+    baseline_times = dict([ ((result['num_skus'], result['stage']), result['wall_time_s']) for result in baseline_report['results']
+        if 'wall_time_s' in result ]);
+    for result in results:
+        key = (result['num_skus'], result['stage']);
+        if('wall_time_s' in result and key in baseline_times and baseline_times[key] > 0):
+            result['ratio_to_baseline'] = result['wall_time_s']/baseline_times[key];
+
+def run_benchmarks(sizes, stages, model_files, work_dir, num_repeats=1, json_load_limit=DEFAULT_JSON_LOAD_LIMIT):
+    aws_model = parse_model_params_file(model_files['aws_model_parameters_file']);
+    results = [];
+    for num_skus in sizes:
+        offer_file = get_offer_file(work_dir, aws_model, num_skus);
+        context = OrderedDict(model_files);
+        context['offer_file'] = offer_file;
+        context['index_file'] = os.path.join(work_dir, 'ec2_offer_%d.index.json'%(num_skus));
+        for stage in stages:
+            result = OrderedDict([ ('num_skus', num_skus), ('file_size_MB', float(os.path.getsize(offer_file))/(1024*1024)), ('stage', stage) ]);
+            if(stage == 'load_json' and num_skus > json_load_limit):
+                result['skipped'] = 'more than %d SKUs'%(json_load_limit);
+            else:
+                sys.stderr.write('Running %s with %d SKUs\n'%(stage, num_skus));
+                result.update(run_stage_in_subprocess(stage, context, num_repeats));
+            results.append(result);
+    return results;
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmarks of the EC2 pricing load and the TCO computation on synthetic offer files');
+    package_dir = os.path.dirname(os.path.abspath(__file__));
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+            help='Numbers of compute SKUs in the generated offer files - default: %s'%(' '.join([ str(size) for size in DEFAULT_SIZES ])));
+    parser.add_argument('--stages', nargs='+', default=list(BENCHMARK_STAGES.keys()), choices=list(BENCHMARK_STAGES.keys()),
+            help='Stages to benchmark - default: all');
+    parser.add_argument('--aws_model_parameters_file', help='Path to AWS model parameters file',
+            default=os.path.join(package_dir, 'models', 'amazon_aws.json'));
+    parser.add_argument('--pvt_cloud_model_parameters_file', help='Path to private cloud model parameters file',
+            default=os.path.join(package_dir, 'models', 'amazon_private_cloud.json'));
+    parser.add_argument('--patients_file', help='JSON file containing patients stats',
+            default=os.path.join(package_dir, 'models', 'patient_to_compute.json'));
+    parser.add_argument('--work_dir', help='Directory for the generated offer files - default: a new temporary directory', default=None);
+    parser.add_argument('--num_repeats', help='Timed runs of every stage, the fastest is reported - default: 1', default=1, type=int);
+    parser.add_argument('--json_load_limit', help='Skip load_json above this number of SKUs - default: %d'%(DEFAULT_JSON_LOAD_LIMIT),
+            default=DEFAULT_JSON_LOAD_LIMIT, type=int);
+    parser.add_argument('--baseline_report', help='Earlier report to compare the wall times with', default=None);
+    parser.add_argument('--output', '-o', help='Report file - default: stdout', default=None);
+    parser.add_argument('--run_stage', help=argparse.SUPPRESS, default=None);
+    parser.add_argument('--context', help=argparse.SUPPRESS, default=None);
+    arguments = parser.parse_args();
+    if(arguments.run_stage):
+        context = json.loads(arguments.context);
+        context['aws_model'] = parse_model_params_file(context['aws_model_parameters_file']);
+        print(json.dumps(run_stage(arguments.run_stage, context, arguments.num_repeats)));
+        return;
+    work_dir = arguments.work_dir if arguments.work_dir else tempfile.mkdtemp(prefix='ccc_benchmark_');
+    if(not os.path.isdir(work_dir)):
+        os.makedirs(work_dir);
+    model_files = OrderedDict([ ('aws_model_parameters_file', os.path.abspath(arguments.aws_model_parameters_file)),
+        ('pvt_cloud_model_parameters_file', os.path.abspath(arguments.pvt_cloud_model_parameters_file)),
+        ('patients_file', os.path.abspath(arguments.patients_file)) ]);
+    report = OrderedDict();
+    report['format_version'] = BENCHMARK_REPORT_FORMAT_VERSION;
+    report['environment'] = get_environment();
+    report['work_dir'] = work_dir;
+    report['results'] = run_benchmarks(arguments.sizes, arguments.stages, model_files, work_dir, num_repeats=arguments.num_repeats,
+            json_load_limit=arguments.json_load_limit);
+    if(arguments.baseline_report):
+        compare_with_baseline(report['results'], parse_model_params_file(arguments.baseline_report));
+    fptr = open(arguments.output, 'wb') if arguments.output else sys.stdout;
+    fptr.write(json.dumps(report, indent=4, separators=(',', ': '))+'\n');
+    if(arguments.output):
+        fptr.close();
+
+if __name__ == "__main__":
+    main()
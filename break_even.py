@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+import json
+import argparse
+from collections import OrderedDict
+import private_cloud
+import amazon
+import ec2_pricing
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from ccc_model_common import determine_raw_storage
+from ccc_model_common import COMMON_SCENARIO_KEYS
+from ccc_model_common import PROVIDER_SCENARIO_KEYS
+from patient_to_compute import determine_cores_and_storage
+from tco_cache import StageCache
+from tco_cache import DEFAULT_STAGE_CACHE_SIZE
+
+#Workload sizes the break-even point can be searched over
+BREAK_EVEN_VARIABLES = [ 'num_cores', 'storage', 'num_patients_per_year' ];
+
+#Every term of the cost models is a ceiling (servers, racks, instances, backup devices, admins), a tier table evaluated on a
+#growing value or a fixed charge - so for a fixed server type or EC2 candidate the total cost is non-decreasing in the workload
+#size, and so is the AWS total (its selection minimizes the compute cost itself). If both providers are bounded on an interval
+#[low, high] and one upper bound is below the other lower bound, there is no crossover in the interval. Only the intervals
+#where the curves may cross are split, so every crossover is located to the unit with O(log(range)) evaluations, while the
+#stretches between the ceilings are skipped in one step.
+#
+#The private cloud picks the server type with the lowest compute (+IT) cost, but its network cost is a percentage of the
+#chosen type's hardware cost - its total can drop when the choice changes. It is bounded through the total cost T_i of every
+#server type i that the selection can pick in [low, high]: type i can only be picked if its compute cost C_i(low) is not
+#above min_j C_j(high), and then T_i(low) <= total <= T_i(high). With --mixed_fleet the fleets are not a fixed set of types,
+#so no bound is used and every value is evaluated.
+
+class CostCurves:
+
+    #Total cost of both providers as a function of one integer workload variable, the other inputs are fixed by the scenario
+    def __init__(self, variable, scenario, private_cloud_model, aws_model, ec2_pricing_model, pricing_catalog=None,
+            patients_config=None, stage_cache=None):
+        self.m_variable = variable;
+        self.m_scenario = scenario;
+        self.m_private_cloud_model = private_cloud_model;
+        self.m_aws_model = aws_model;
+        self.m_ec2_pricing_model = ec2_pricing_model;
+        self.m_pricing_catalog = pricing_catalog if pricing_catalog else amazon.PricingCatalog(aws_model, ec2_pricing_model);
+        self.m_patients_config = patients_config;
+        self.m_stage_cache = stage_cache;
+        self.m_costs = {};
+        self.m_server_type_costs = {};
+        #One model per server type to price the private cloud with that type only
+        self.m_server_type_models = [];
+        for server_info in private_cloud_model['compute']['server_params']:
+            server_type_model = dict(private_cloud_model);
+            server_type_model['compute'] = dict(private_cloud_model['compute']);
+            server_type_model['compute']['server_params'] = [ server_info ];
+            self.m_server_type_models.append(server_type_model);
+        self.m_compiled_models = dict([ (id(model), private_cloud.CompiledPrivateCloudModel(model))
+            for model in [ private_cloud_model ]+self.m_server_type_models ]);
+
+    def get_scenario_params(self, provider, value):
+        params = dict([ (key, scenario_value) for key, scenario_value in self.m_scenario.iteritems()
+            if key in COMMON_SCENARIO_KEYS or key in PROVIDER_SCENARIO_KEYS[provider] ]);
+        if(self.m_variable == 'num_patients_per_year'):
+            patients_config = dict(self.m_patients_config);
+            patients_config['num_patients_per_year'] = value;
+            num_cores, usable_storage = determine_cores_and_storage(patients_config, params.get('operating_period_in_years', 3));
+            params['num_cores'] = num_cores;
+            params['storage'] = determine_raw_storage(self.m_private_cloud_model, usable_storage);
+        else:
+            params[self.m_variable] = value;
+        return params;
+
+    def compute_private_cloud_tco(self, model, value):
+        args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=model, **self.get_scenario_params('private_cloud', value));
+        return private_cloud.compute_tco(args_handler, stage_cache=self.m_stage_cache, compiled_model=self.m_compiled_models[id(model)]);
+
+    def get_costs(self, value):
+        #Returns (private cloud total cost, AWS total cost)
+        if(value not in self.m_costs):
+            private_cloud_cost = self.compute_private_cloud_tco(self.m_private_cloud_model, value)['summary']['total_cost'];
+            args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=self.m_aws_model, ec2_pricing_dict=self.m_ec2_pricing_model,
+                    **self.get_scenario_params('aws', value));
+            aws_cost = amazon.compute_tco(args_handler, pricing_catalog=self.m_pricing_catalog,
+                    stage_cache=self.m_stage_cache)['summary']['total_cost'];
+            self.m_costs[value] = (private_cloud_cost, aws_cost);
+        return self.m_costs[value];
+
+    def get_server_type_costs(self, value):
+        #Returns [ (compute cost used by the selection, total cost) or None if infeasible ] - one entry per server type
+        if(value not in self.m_server_type_costs):
+            server_type_costs = [];
+            for server_type_model in self.m_server_type_models:
+                try:
+                    cost_dict = self.compute_private_cloud_tco(server_type_model, value);
+                except NoServerConfigurationFound:
+                    server_type_costs.append(None);
+                    continue;
+                server_type_costs.append((cost_dict['compute']['summary']['total_cost']+cost_dict['compute'].get('IT_cost', 0),
+                    cost_dict['summary']['total_cost']));
+            self.m_server_type_costs[value] = server_type_costs;
+        return self.m_server_type_costs[value];
+
+    def get_private_cloud_cost_bounds(self, low, high):
+        if(self.m_scenario.get('mixed_fleet')):
+            return None;
+        if(self.m_variable == 'storage'):
+            #The storage does not change the selected server type
+            return (self.get_costs(low)[0], self.get_costs(high)[0]);
+        low_costs = self.get_server_type_costs(low);
+        high_costs = self.get_server_type_costs(high);
+        min_high_compute_cost = min([ costs[0] for costs in high_costs if costs is not None ]);
+        selectable = [ idx for idx in range(len(low_costs)) if low_costs[idx] is not None and low_costs[idx][0] <= min_high_compute_cost ];
+        return (min([ low_costs[idx][1] for idx in selectable ]), max([ high_costs[idx][1] for idx in selectable ]));
+
+    def get_cost_bounds(self, low, high):
+        #Returns ((private cloud lower bound, upper bound), (AWS lower bound, upper bound)) over [low, high] or None if unknown
+        private_cloud_bounds = self.get_private_cloud_cost_bounds(low, high);
+        if(private_cloud_bounds is None):
+            return None;
+        return (private_cloud_bounds, (self.get_costs(low)[1], self.get_costs(high)[1]));
+
+    def get_num_evaluations(self):
+        return len(self.m_costs);
+
+    def get_num_server_type_evaluations(self):
+        return len(self.m_server_type_costs)*len(self.m_server_type_models);
+
+def get_cheaper_provider(costs):
+    if(costs[0] < costs[1]):
+        return 'private_cloud';
+    if(costs[1] < costs[0]):
+        return 'aws';
+    return 'tie';
+
+def cannot_cross(cost_bounds):
+    #One provider at its most expensive is still cheaper than the other at its cheapest
+    if(cost_bounds is None):
+        return False;
+    private_cloud_bounds, aws_bounds = cost_bounds;
+    return private_cloud_bounds[1] < aws_bounds[0] or aws_bounds[1] < private_cloud_bounds[0];
+
+def find_cheaper_provider_changes(cost_curves, low, high):
+    #Returns the sorted values v in [low, high) such that the cheaper provider at v+1 differs from the one at v
+    changes = [];
+    intervals = [ (low, high) ];
+    while(len(intervals) > 0):
+        interval_low, interval_high = intervals.pop();
+        low_costs = cost_curves.get_costs(interval_low);
+        high_costs = cost_curves.get_costs(interval_high);
+        if(interval_high-interval_low <= 1):
+            if(interval_high > interval_low and get_cheaper_provider(low_costs) != get_cheaper_provider(high_costs)):
+                changes.append(interval_low);
+            continue;
+        if(cannot_cross(cost_curves.get_cost_bounds(interval_low, interval_high))):
+            continue;
+        mid = (interval_low+interval_high)//2;
+        intervals.append((mid, interval_high));
+        intervals.append((interval_low, mid));
+    changes.sort();
+    return changes;
+
+def create_curve_point(value, costs):
+    return OrderedDict([ ('value', value), ('private_cloud_cost', costs[0]), ('aws_cost', costs[1]) ]);
+
+def solve_break_even(cost_curves, low, high):
+    changes = find_cheaper_provider_changes(cost_curves, low, high);
+    result = OrderedDict();
+    result['variable'] = cost_curves.m_variable;
+    result['range'] = [ low, high ];
+    result['crossovers'] = [];
+    for value in changes:
+        below_costs = cost_curves.get_costs(value);
+        above_costs = cost_curves.get_costs(value+1);
+        crossover_dict = OrderedDict();
+        crossover_dict['below'] = create_curve_point(value, below_costs);
+        crossover_dict['above'] = create_curve_point(value+1, above_costs);
+        crossover_dict['cheaper_below'] = get_cheaper_provider(below_costs);
+        crossover_dict['cheaper_above'] = get_cheaper_provider(above_costs);
+        result['crossovers'].append(crossover_dict);
+    #Between two crossovers the cheaper provider does not change - the points evaluated by the search sample both cost curves
+    evaluated_values = sorted(cost_curves.m_costs.keys());
+    segment_bounds = [ low ]+[ value+1 for value in changes ];
+    result['segments'] = [];
+    for segment_idx in range(len(segment_bounds)):
+        segment_low = segment_bounds[segment_idx];
+        segment_high = segment_bounds[segment_idx+1]-1 if segment_idx+1 < len(segment_bounds) else high;
+        segment_dict = OrderedDict();
+        segment_dict['from'] = segment_low;
+        segment_dict['to'] = segment_high;
+        segment_dict['cheaper'] = get_cheaper_provider(cost_curves.get_costs(segment_low));
+        segment_dict['curve'] = [ create_curve_point(value, cost_curves.get_costs(value)) for value in evaluated_values
+            if segment_low <= value <= segment_high ];
+        result['segments'].append(segment_dict);
+    result['num_evaluations'] = cost_curves.get_num_evaluations();
+    result['num_server_type_evaluations'] = cost_curves.get_num_server_type_evaluations();
+    return result;
+
+def main():
+    parser = argparse.ArgumentParser(description='Workload sizes at which the private cloud and AWS cost the same');
+    required_named_args_group = parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--scenario', help='JSON file with the fixed inputs of both cost models (sweep parameter names)',
+            required=True);
+    required_named_args_group.add_argument('--variable', help='Workload size to solve for', required=True, choices=BREAK_EVEN_VARIABLES);
+    required_named_args_group.add_argument('--low', help='Lowest value of the variable', required=True, type=int);
+    required_named_args_group.add_argument('--high', help='Highest value of the variable', required=True, type=int);
+    required_named_args_group.add_argument('--pvt_cloud_model_parameters_file', help='Path to private cloud model parameters file',
+            required=True);
+    required_named_args_group.add_argument('--aws_model_parameters_file', help='Path to AWS model parameters file', required=True);
+    parser.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+    parser.add_argument('--ec2_pricing_index_file', help='Path to a pricing index created by "ec2_pricing.py build-index"', default=None);
+    parser.add_argument('--patients_file', help='JSON file containing patients stats - needed for num_patients_per_year', default=None);
+    parser.add_argument('--patients_configuration', help='Index of the configuration in the patients file - default: 0', default=0, type=int);
+    parser.add_argument('--stage_cache_size', help='Maximum number of cached compute_tco stage results, 0 disables the cache'
+            ' - default: %d'%(DEFAULT_STAGE_CACHE_SIZE), default=DEFAULT_STAGE_CACHE_SIZE, type=int);
+    arguments = parser.parse_args();
+    if(not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file):
+        parser.error('one of --ec2_pricing_json_file or --ec2_pricing_index_file is required');
+    if(arguments.variable == 'num_patients_per_year' and not arguments.patients_file):
+        parser.error('--patients_file is required to solve for num_patients_per_year');
+    if(arguments.low < 0 or arguments.high < arguments.low):
+        parser.error('the range must satisfy 0 <= low <= high');
+    scenario = parse_model_params_file(arguments.scenario);
+    private_cloud_model = parse_model_params_file(arguments.pvt_cloud_model_parameters_file);
+    aws_model = parse_model_params_file(arguments.aws_model_parameters_file);
+    if(arguments.ec2_pricing_index_file):
+        ec2_pricing_model = ec2_pricing.load_pricing_index(arguments.ec2_pricing_index_file, aws_model['compute'],
+                ec2_pricing_json_file=arguments.ec2_pricing_json_file);
+    else:
+        ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(arguments.ec2_pricing_json_file, aws_model['compute']);
+    patients_config = None;
+    if(arguments.patients_file):
+        patients_config = parse_model_params_file(arguments.patients_file)['configurations'][arguments.patients_configuration];
+    cost_curves = CostCurves(arguments.variable, scenario, private_cloud_model, aws_model, ec2_pricing_model, patients_config=patients_config,
+            stage_cache=StageCache(arguments.stage_cache_size) if arguments.stage_cache_size > 0 else None);
+    result = solve_break_even(cost_curves, arguments.low, arguments.high);
+    print(json.dumps(result, indent=4, separators=(',', ': ')));
+
+if __name__ == "__main__":
+    main()
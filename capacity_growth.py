@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from collections import OrderedDict
+import amazon
+import ec2_pricing
+import amazon_batch
+import private_cloud
+import private_cloud_batch
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from ccc_model_common import PiecewiseLinearFunction
+from mixed_fleet import reduce_cover_items
+
+#Time-phased version of patient_to_compute: the patient count of every configuration follows a growth curve, demand is
+#computed month by month and capacity is bought when it is needed. Arrays are laid out as (K,M) - configurations along
+#axis 0, months along axis 1 - and as (K,T,M) while the private cloud server types are compared.
+#
+#Private cloud: servers, racks, storage and backup devices are never removed, a purchase made in month b is maintained
+#(and has spares added) for the remaining (M-b)/12 years with the same formulas as private_cloud.py - a plan whose demand is
+#flat from month 0 costs the same as the single-shot model. Every configuration keeps one server type for the whole plan.
+#
+#AWS: for every reserved EC2 offer (size and term) the reservations of each term cover the demand level that is exceeded
+#in at least the break-even fraction of its months, the rest runs on demand. The cheapest reserved offer (or none) is kept.
+#EBS, snapshots, data transfer and support are paid monthly.
+
+HOURS_PER_MONTH = 365*24/12.0;
+DEFAULT_OPERATING_PERIOD_IN_YEARS = 10;
+
+def create_patients_arrays(configurations, num_months):
+    #Returns the (K,M) number of patients per year of every configuration in every month
+    month = np.arange(num_months, dtype=np.float64).reshape(1, -1);
+    rows = [];
+    for config in configurations:
+        growth = config.get('growth', {});
+        if('num_patients_per_year' in growth):
+            #One value per year, the last one holds until the end of the plan
+            yearly_patients = np.asarray(growth['num_patients_per_year'], dtype=np.float64);
+            rows.append(yearly_patients[np.minimum(np.arange(num_months)//12, yearly_patients.size-1)].reshape(1, -1));
+        else:
+            annual_growth = float(growth.get('annual_growth_percentage', 0))/100;
+            rows.append(config['num_patients_per_year']*np.power(1+annual_growth, month/12));
+    return np.vstack(rows);
+
+def create_demand_arrays(private_cloud_model, configurations, num_months):
+    #Same sizing as patient_to_compute.determine_cores_and_storage, month by month - storage accumulates the samples of every month
+    column = lambda key: np.array([ [ config[key] for config in configurations ] ], dtype=np.float64).T;
+    demand = OrderedDict();
+    demand['num_patients_per_year'] = create_patients_arrays(configurations, num_months);
+    num_samples_per_year = demand['num_patients_per_year']*column('num_samples_per_patient_per_year');
+    num_samples_per_day = num_samples_per_year/365;
+    demand['num_cores'] = np.ceil(num_samples_per_day/column('num_samples_processed_per_core_per_day'));
+    demand['usable_storage'] = np.cumsum(num_samples_per_year/12, axis=1)*column('storage_per_sample');
+    storage_params = private_cloud_model['storage'];
+    demand['raw_storage'] = demand['usable_storage']/(((100-np.float64(storage_params['os_penalty_percentage']))/100) \
+            *((100-np.float64(storage_params['raid_penalty_percentage']))/100));
+    return demand;
+
+def get_new_units(num_units):
+    #Units bought in every month for a running total that never decreases
+    num_units = np.maximum.accumulate(num_units, axis=-1);
+    return np.diff(num_units, axis=-1, prepend=0);
+
+def sum_by_year(monthly_values):
+    return monthly_values.reshape(monthly_values.shape[0], -1, 12).sum(axis=2);
+
+def compute_private_cloud_plan(model, demand, memory_per_core, bandwidth, bandwidth_utilization, private_cloud_hosting='colocation',
+        storage_type='NAS', backup_percentage_per_month=5, include_IT_cost=False):
+    compute_params = model['compute'];
+    storage_params = model['storage'];
+    network_params = model['network'];
+    num_configurations, num_months = demand['num_cores'].shape;
+    remaining_years = ((num_months-np.arange(num_months, dtype=np.float64))/12).reshape(1, 1, -1);
+    maintenance_fraction = float(compute_params['server_annual_maintenance_cost_percentage'])/100;
+    spare_fraction = float(compute_params['spare_server_addition_annual_percentage'])/100;
+    #Compute - (K,T,M)
+    server_arrays = private_cloud_batch.create_server_params_arrays(model);
+    num_usable_cores_per_server = private_cloud_batch.determine_num_usable_cores_batch(server_arrays, memory_per_core);
+    is_valid = (num_usable_cores_per_server >= 1).reshape(1, -1);
+    safe_num_usable_cores_per_server = np.where(is_valid, num_usable_cores_per_server, 1);
+    server_unit_purchase_cost = private_cloud_batch.determine_server_purchase_cost_batch(model, server_arrays, memory_per_core,
+            safe_num_usable_cores_per_server)[:, :, np.newaxis];
+    num_servers = np.ceil(np.maximum.accumulate(demand['num_cores'], axis=1)[:, np.newaxis, :] \
+            /safe_num_usable_cores_per_server[:, :, np.newaxis]);
+    new_servers = get_new_units(num_servers);
+    type_arrays = OrderedDict();
+    type_arrays['server_purchase_cost'] = new_servers*server_unit_purchase_cost;
+    type_arrays['server_deployment_cost'] = new_servers*compute_params['server_deployment_cost'];
+    type_arrays['server_maintenance_cost'] = (maintenance_fraction/12)*np.cumsum(type_arrays['server_purchase_cost'], axis=2);
+    type_arrays['spare_server_addition_cost'] = (spare_fraction/12)*np.cumsum(type_arrays['server_purchase_cost'] \
+            *(1+maintenance_fraction*remaining_years), axis=2);
+    max_num_servers_per_rack = private_cloud_batch.determine_max_num_servers_per_rack_batch(model, server_arrays)[:, :, np.newaxis];
+    num_racks = np.ceil(num_servers/max_num_servers_per_rack);
+    new_racks = get_new_units(num_racks);
+    type_arrays['rack_purchase_cost'] = new_racks*compute_params['rack_purchase_cost'];
+    type_arrays['pdu_cost'] = new_racks*compute_params['pdu_cost']*compute_params['num_pdus_per_rack'];
+    type_arrays['top_of_rack_switch_cost'] = new_racks*compute_params['top_of_rack_switch_cost'] \
+            *compute_params['num_top_of_rack_switches_per_rack'];
+    type_arrays['rack_operational_cost'] = num_racks*compute_params['rack_operational_cost_info'][private_cloud_hosting]['monthly_charge_per_rack'];
+    compute_hardware_cost = type_arrays['server_purchase_cost']+type_arrays['server_deployment_cost']+type_arrays['server_maintenance_cost'] \
+            +type_arrays['spare_server_addition_cost']+type_arrays['rack_purchase_cost']+type_arrays['pdu_cost'] \
+            +type_arrays['top_of_rack_switch_cost'];
+    #Network equipment follows the compute hardware spend
+    type_arrays['network_purchase_cost'] = (float(network_params['purchase_percentage_of_compute'])/100)*compute_hardware_cost;
+    type_arrays['network_maintenance_cost'] = (float(network_params['annual_maintenance_overhead_percentage_of_purchase'])/100/12) \
+            *np.cumsum(type_arrays['network_purchase_cost'], axis=2);
+    #Storage - (K,M), the same for every server type
+    raw_storage = np.maximum.accumulate(demand['raw_storage'], axis=1);
+    usable_storage = ((100-np.float64(storage_params['raid_penalty_percentage']))/100) \
+            *(((100-np.float64(storage_params['os_penalty_percentage']))/100)*raw_storage);
+    cost_per_TB = (float(100-storage_params['discount_percentage'])/100)*storage_params['cost_per_TB'][storage_type];
+    plan_arrays = OrderedDict();
+    plan_arrays['storage_purchase_cost'] = get_new_units(raw_storage)*cost_per_TB;
+    num_backup_devices = np.maximum(np.ceil(usable_storage/storage_params['backup_capacity_per_device_in_TB']),
+            np.ceil((((float(backup_percentage_per_month)/100)*usable_storage)*1024*1024) \
+                /(storage_params['backup_speed_per_device_in_MBps']*storage_params['backup_time_window_in_hours']*3600)));
+    plan_arrays['backup_storage_cost'] = get_new_units(num_backup_devices)*storage_params['backup_device_cost'];
+    num_storage_racks = np.ceil(raw_storage/storage_params['rack_storage_capacity']);
+    plan_arrays['storage_rack_operational_cost'] = num_storage_racks*storage_params['rack_monthly_operational_cost'];
+    plan_arrays['bandwidth_cost'] = np.full((num_configurations, num_months), private_cloud.determine_bandwidth_cost(
+        network_params[private_cloud_hosting], bandwidth, bandwidth_utilization, 1)/12);
+    if(include_IT_cost):
+        IT_params = model['IT'];
+        num_compute_admins = np.ceil(num_servers/IT_params['num_servers_per_admin']);
+        num_storage_admins = np.ceil(raw_storage/IT_params['storage_per_admin'])[:, np.newaxis, :];
+        type_arrays['IT_cost'] = (num_compute_admins+num_storage_admins \
+                +(IT_params['network_admin_percentage']*num_compute_admins)/100)*(float(IT_params['admin_annual_salary'])/12);
+    #Keep the server type with the cheapest plan
+    type_total_cost = sum([ values.sum(axis=2) for values in type_arrays.itervalues() ]);
+    type_total_cost = np.where(is_valid, type_total_cost, np.inf);
+    server_index = np.argmin(type_total_cost, axis=1);
+    has_valid_server = np.isfinite(type_total_cost[np.arange(num_configurations), server_index]);
+    configuration_idx = np.arange(num_configurations);
+    plan = OrderedDict();
+    plan['server_index'] = np.where(has_valid_server, server_index, -1);
+    plan['num_servers'] = num_servers[configuration_idx, server_index];
+    plan['num_racks'] = num_racks[configuration_idx, server_index];
+    plan['num_storage_racks'] = num_storage_racks;
+    plan['num_backup_devices'] = np.maximum.accumulate(num_backup_devices, axis=1);
+    plan['raw_storage'] = raw_storage;
+    monthly_costs = OrderedDict([ (key, values[configuration_idx, server_index]) for key, values in type_arrays.iteritems() ]);
+    monthly_costs.update(plan_arrays);
+    monthly_costs['total_cost'] = sum(monthly_costs.values());
+    for key, values in monthly_costs.iteritems():
+        monthly_costs[key] = np.where(has_valid_server[:, np.newaxis], values, np.nan);
+    plan['monthly_costs'] = monthly_costs;
+    return plan;
+
+def create_ec2_offers(pricing_catalog, memory_per_core, core_utilization):
+    #Returns (on demand items, reserved items) - items are (num_usable_cores, cost, candidate index), the on demand cost is
+    #per month and the reserved cost per term. Only the cheapest offer of every size (and term) is kept.
+    on_demand_items = [];
+    reserved_items_by_term = OrderedDict();
+    for idx, candidate in enumerate(pricing_catalog.m_candidates):
+        num_usable_cores = amazon.compute_num_usable_cores_per_instance(candidate.m_num_cores, candidate.m_memory, memory_per_core);
+        if(num_usable_cores < 1):
+            continue;
+        hourly_rate = candidate.m_hourly_rate or 0;
+        if(candidate.m_offer_term == 'OnDemand'):
+            on_demand_items.append((num_usable_cores, hourly_rate*HOURS_PER_MONTH*float(core_utilization)/100, idx));
+        elif(candidate.m_duration):
+            term_months = int(round(12*candidate.m_duration));
+            #Reserved hours are paid whether they are used or not
+            term_cost = (candidate.m_upfront_rate or 0)+hourly_rate*HOURS_PER_MONTH*term_months;
+            reserved_items_by_term.setdefault(term_months, []).append((num_usable_cores, term_cost, idx));
+    #Larger instances that cost no more make smaller ones useless
+    on_demand_items = [ (size, cost, on_demand_items[item_index][2]) for size, cost, item_index in
+            reduce_cover_items([ (size, cost) for size, cost, idx in on_demand_items ]) ];
+    reserved_items = [];
+    for term_months, items in reserved_items_by_term.iteritems():
+        best_per_size = {};
+        for size, cost, idx in items:
+            if(size not in best_per_size or cost < best_per_size[size][1]):
+                best_per_size[size] = (size, cost, idx);
+        reserved_items += [ (term_months,)+best_per_size[size] for size in sorted(best_per_size.keys()) ];
+    return on_demand_items, reserved_items;
+
+def compute_on_demand_cost(on_demand_items, num_cores):
+    #Cheapest single on demand instance type for every residual core count
+    min_cost = np.full(num_cores.shape, np.inf);
+    for size, cost, idx in on_demand_items:
+        min_cost = np.minimum(min_cost, np.ceil(num_cores/size)*cost);
+    return np.where(num_cores > 0, min_cost, 0);
+
+def plan_reservations(reserved_item, on_demand_items, num_cores):
+    #Returns the (K,M) number of reserved instances and the (K,) cost of the reservations plus the on demand remainder
+    term_months, size, term_cost, idx = reserved_item;
+    num_configurations, num_months = num_cores.shape;
+    num_terms = -(-num_months//term_months);
+    #Months after the end of the plan have no demand but the last term is still paid in full
+    padded_num_cores = np.zeros((num_configurations, num_terms*term_months));
+    padded_num_cores[:, :num_months] = num_cores;
+    padded_num_cores = padded_num_cores.reshape(num_configurations, num_terms, term_months);
+    #Reserving a level of cores pays off if it is needed in at least this fraction of the months of the term
+    min_on_demand_cost_per_core = min([ item[1]/item[0] for item in on_demand_items ]) if on_demand_items else np.inf;
+    break_even_fraction = (term_cost/(size*term_months))/min_on_demand_cost_per_core;
+    sorted_num_cores = -np.sort(-padded_num_cores, axis=2);
+    if(break_even_fraction > 1):
+        level = np.zeros((num_configurations, num_terms));
+    else:
+        level = sorted_num_cores[:, :, max(0, int(np.ceil(break_even_fraction*term_months))-1)];
+    best_term_cost = None;
+    best_num_reserved = None;
+    #The break-even level is rounded to whole instances - price both roundings
+    for num_reserved in [ np.floor(level/size), np.ceil(level/size) ]:
+        residual = np.maximum(padded_num_cores-(num_reserved*size)[:, :, np.newaxis], 0);
+        curr_term_cost = num_reserved*term_cost+compute_on_demand_cost(on_demand_items, residual).sum(axis=2);
+        if(best_term_cost is None):
+            best_term_cost, best_num_reserved = curr_term_cost, num_reserved;
+        else:
+            is_better = curr_term_cost < best_term_cost;
+            best_term_cost = np.where(is_better, curr_term_cost, best_term_cost);
+            best_num_reserved = np.where(is_better, num_reserved, best_num_reserved);
+    num_reserved = np.repeat(best_num_reserved, term_months, axis=1)[:, :num_months];
+    return num_reserved, best_term_cost.sum(axis=1);
+
+def compute_aws_plan(model, pricing_catalog, demand, memory_per_core, bandwidth, bandwidth_utilization, core_utilization=100,
+        storage_utilization=100, backup_percentage_per_month=5, iops_per_GB_requested=None, storage_bandwidth_per_TB_requested=None,
+        aws_support=None):
+    num_cores = demand['num_cores'];
+    num_configurations, num_months = num_cores.shape;
+    on_demand_items, reserved_items = create_ec2_offers(pricing_catalog, memory_per_core, core_utilization);
+    if(len(on_demand_items) == 0 and len(reserved_items) == 0):
+        raise NoServerConfigurationFound(('No valid EC2 instance found for specified memory per core value : %d')%(memory_per_core));
+    #Option -1 runs everything on demand
+    best_cost = compute_on_demand_cost(on_demand_items, num_cores).sum(axis=1) if on_demand_items else np.full(num_configurations, np.inf);
+    best_option = np.full(num_configurations, -1);
+    best_num_reserved = np.zeros_like(num_cores);
+    #Without on demand offers the break-even fraction is 0 and the reservations cover the peak of every term
+    for option, reserved_item in enumerate(reserved_items):
+        num_reserved, cost = plan_reservations(reserved_item, on_demand_items, num_cores);
+        is_better = cost < best_cost;
+        best_cost = np.where(is_better, cost, best_cost);
+        best_option = np.where(is_better, option, best_option);
+        best_num_reserved = np.where(is_better[:, np.newaxis], num_reserved, best_num_reserved);
+    #Monthly cash flows of the chosen plans
+    month = np.arange(num_months).reshape(1, -1);
+    reserved_upfront_cost = np.zeros_like(num_cores);
+    reserved_hourly_cost = np.zeros_like(num_cores);
+    reserved_cores = np.zeros_like(num_cores);
+    reserved_commitment_after_plan = np.zeros(num_configurations);
+    for option, (term_months, size, term_cost, idx) in enumerate(reserved_items):
+        is_option = (best_option == option)[:, np.newaxis];
+        if(not np.any(is_option)):
+            continue;
+        candidate = pricing_catalog.m_candidates[idx];
+        upfront_rate = candidate.m_upfront_rate or 0;
+        hourly_rate = candidate.m_hourly_rate or 0;
+        is_term_start = (month % term_months == 0);
+        reserved_upfront_cost = np.where(is_option, np.where(is_term_start, best_num_reserved*upfront_rate, 0), reserved_upfront_cost);
+        reserved_hourly_cost = np.where(is_option, best_num_reserved*hourly_rate*HOURS_PER_MONTH, reserved_hourly_cost);
+        reserved_cores = np.where(is_option, best_num_reserved*size, reserved_cores);
+        num_months_after_plan = -(-num_months//term_months)*term_months-num_months;
+        reserved_commitment_after_plan = np.where(is_option.ravel(),
+                best_num_reserved[:, -1]*hourly_rate*HOURS_PER_MONTH*num_months_after_plan, reserved_commitment_after_plan);
+    monthly_costs = OrderedDict();
+    monthly_costs['ec2_reserved_upfront_cost'] = reserved_upfront_cost;
+    monthly_costs['ec2_reserved_hourly_cost'] = reserved_hourly_cost;
+    monthly_costs['ec2_on_demand_cost'] = compute_on_demand_cost(on_demand_items, np.maximum(num_cores-reserved_cores, 0));
+    #apply reserved instance discount - on the whole reserved spend of the plan, spread over the months it is paid in
+    reserved_cost = reserved_upfront_cost+reserved_hourly_cost;
+    total_reserved_cost = reserved_cost.sum(axis=1)+reserved_commitment_after_plan;
+    discount_value = PiecewiseLinearFunction(model['compute']['reserved_discount_tiers'], 'segment_limit', 'rate').evaluate_array(
+            total_reserved_cost);
+    discount_fraction = np.where(total_reserved_cost > 0, discount_value/np.where(total_reserved_cost > 0, total_reserved_cost, 1), 0);
+    monthly_costs['ec2_discount'] = -reserved_cost*discount_fraction[:, np.newaxis];
+    storage_arrays = amazon_batch.compute_storage_cost_batch(model, demand['raw_storage'].reshape(-1, 1), storage_utilization, 1/12.0, 0,
+            iops_per_GB_requested, storage_bandwidth_per_TB_requested);
+    monthly_costs['ebs_cost'] = storage_arrays['ebs_cost'].reshape(num_configurations, num_months);
+    usable_storage = storage_arrays['usable_storage'].reshape(num_configurations, num_months);
+    #Snapshots: once for every new TB, then the monthly changes
+    snapshot_cost_per_TB = model['storage']['snapshot_cost_per_TB'];
+    monthly_costs['backup_cost'] = get_new_units(usable_storage)*snapshot_cost_per_TB \
+            +((usable_storage*backup_percentage_per_month)/100)*snapshot_cost_per_TB;
+    #The network cost only reads the compiled network tier table, which the price matrix shares with the catalog
+    monthly_costs['network_cost'] = np.full((num_configurations, num_months), amazon_batch.compute_network_cost_batch(model,
+        pricing_catalog, np.float64(bandwidth), np.float64(bandwidth_utilization), 1/12.0)['total_cost'][0]);
+    monthly_costs['support_cost'] = np.zeros_like(num_cores);
+    spend = sum(monthly_costs.values());
+    if(aws_support and aws_support in model['support']):
+        monthly_costs['support_cost'] = PiecewiseLinearFunction(model['support'][aws_support], 'segment_limit', 'rate').evaluate_array(spend);
+    monthly_costs['total_cost'] = spend+monthly_costs['support_cost'];
+    plan = OrderedDict();
+    plan['reserved_candidate_index'] = np.array([ reserved_items[option][3] if option >= 0 else -1 for option in best_option ]);
+    plan['num_reserved_instances'] = best_num_reserved;
+    plan['reserved_cores'] = reserved_cores;
+    plan['on_demand_cores'] = np.maximum(num_cores-reserved_cores, 0);
+    plan['reserved_commitment_after_plan'] = reserved_commitment_after_plan*(1-discount_fraction);
+    plan['monthly_costs'] = monthly_costs;
+    return plan;
+
+def simulate_capacity_growth(configurations, private_cloud_model, aws_model, pricing_catalog, memory_per_core, bandwidth,
+        bandwidth_utilization, operating_period_in_years=DEFAULT_OPERATING_PERIOD_IN_YEARS, private_cloud_hosting='colocation',
+        storage_type='NAS', backup_percentage_per_month=5, include_IT_cost=False, core_utilization=100, storage_utilization=100,
+        aws_support=None):
+    num_months = 12*operating_period_in_years;
+    demand = create_demand_arrays(private_cloud_model, configurations, num_months);
+    private_cloud_plan = compute_private_cloud_plan(private_cloud_model, demand, memory_per_core, bandwidth, bandwidth_utilization,
+            private_cloud_hosting=private_cloud_hosting, storage_type=storage_type, backup_percentage_per_month=backup_percentage_per_month,
+            include_IT_cost=include_IT_cost);
+    aws_plan = compute_aws_plan(aws_model, pricing_catalog, demand, memory_per_core, bandwidth, bandwidth_utilization,
+            core_utilization=core_utilization, storage_utilization=storage_utilization, backup_percentage_per_month=backup_percentage_per_month,
+            aws_support=aws_support);
+    return demand, private_cloud_plan, aws_plan;
+
+def create_configuration_dict(name, idx, demand, private_cloud_plan, aws_plan, pricing_catalog, monthly=False):
+    to_list = lambda values: [ float(value) for value in values ];
+    cost_by_year = lambda monthly_costs: OrderedDict([ (key, to_list(sum_by_year(values[idx:idx+1])[0]))
+        for key, values in monthly_costs.iteritems() ]);
+    config_dict = OrderedDict();
+    config_dict['name'] = name;
+    config_dict['demand'] = OrderedDict([ ('final_num_patients_per_year', float(demand['num_patients_per_year'][idx, -1])),
+        ('peak_num_cores', float(demand['num_cores'][idx].max())), ('final_raw_storage', float(demand['raw_storage'][idx, -1])) ]);
+    private_dict = OrderedDict();
+    private_dict['server_index'] = int(private_cloud_plan['server_index'][idx]);
+    private_dict['final_num_servers'] = float(private_cloud_plan['num_servers'][idx, -1]);
+    private_dict['final_num_racks'] = float(private_cloud_plan['num_racks'][idx, -1]);
+    private_dict['final_num_storage_racks'] = float(private_cloud_plan['num_storage_racks'][idx, -1]);
+    private_dict['final_num_backup_devices'] = float(private_cloud_plan['num_backup_devices'][idx, -1]);
+    private_dict['total_cost'] = float(private_cloud_plan['monthly_costs']['total_cost'][idx].sum());
+    private_dict['cost_by_year'] = cost_by_year(private_cloud_plan['monthly_costs']);
+    aws_dict = OrderedDict();
+    candidate_idx = aws_plan['reserved_candidate_index'][idx];
+    if(candidate_idx >= 0):
+        candidate = pricing_catalog.m_candidates[candidate_idx];
+        aws_dict['reserved_instance'] = '%s/%s/%s'%(candidate.m_instance_type, candidate.m_tenancy, candidate.m_offer_term);
+    else:
+        aws_dict['reserved_instance'] = None;
+    aws_dict['max_num_reserved_instances'] = float(aws_plan['num_reserved_instances'][idx].max());
+    aws_dict['reserved_core_months'] = float(aws_plan['reserved_cores'][idx].sum());
+    aws_dict['on_demand_core_months'] = float(aws_plan['on_demand_cores'][idx].sum());
+    aws_dict['reserved_commitment_after_plan'] = float(aws_plan['reserved_commitment_after_plan'][idx]);
+    aws_dict['total_cost'] = float(aws_plan['monthly_costs']['total_cost'][idx].sum()+aws_plan['reserved_commitment_after_plan'][idx]);
+    aws_dict['cost_by_year'] = cost_by_year(aws_plan['monthly_costs']);
+    if(monthly):
+        config_dict['monthly_num_cores'] = to_list(demand['num_cores'][idx]);
+        private_dict['monthly_total_cost'] = to_list(private_cloud_plan['monthly_costs']['total_cost'][idx]);
+        aws_dict['monthly_total_cost'] = to_list(aws_plan['monthly_costs']['total_cost'][idx]);
+    config_dict['private_cloud'] = private_dict;
+    config_dict['AWS'] = aws_dict;
+    return config_dict;
+
+def main():
+    parser = argparse.ArgumentParser(description='Month by month capacity plan of growing patient cohorts on the private cloud and AWS');
+    required_named_args_group = parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--patients_file', help='JSON file containing patients stats, a configuration may have a'
+            ' "growth" with "annual_growth_percentage" or a list "num_patients_per_year" (one value per year)', required=True);
+    required_named_args_group.add_argument('--pvt_cloud_model_parameters_file', help='Path to private cloud model parameters file',
+            required=True);
+    required_named_args_group.add_argument('--aws_model_parameters_file', help='Path to AWS model parameters file', required=True);
+    required_named_args_group.add_argument('--memory_per_core', help='Memory/RAM (in GB) per core', required=True, type=int);
+    required_named_args_group.add_argument('--bandwidth', '-b', help='External bandwidth (in Mbps)', required=True, type=int);
+    required_named_args_group.add_argument('--bandwidth_utilization', help='Percentage of external bandwidth used', required=True, type=float);
+    parser.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+    parser.add_argument('--ec2_pricing_index_file', help='Path to a pricing index created by "ec2_pricing.py build-index"', default=None);
+    parser.add_argument('--operating_period', help='Length of the plan in years - default: %d years'%(DEFAULT_OPERATING_PERIOD_IN_YEARS),
+            default=DEFAULT_OPERATING_PERIOD_IN_YEARS, type=int);
+    parser.add_argument('--private_cloud_hosting', '-p', help='Type of private cloud hosting - valid options are: colocation(default), on_premise',
+            default='colocation', choices=['colocation', 'on_premise']);
+    parser.add_argument('--storage_type', help='Storage type - NAS(default) or SAN', default='NAS', choices=['SAN','NAS']);
+    parser.add_argument('--backup_percentage_per_month', help='Percentage of total data that changes per month - default: 5%%',
+            default=5, type=float);
+    parser.add_argument('--core_utilization', help='Average utilization per core (as a percentage) - default: 100%%', default=100, type=float);
+    parser.add_argument('--include_IT_cost', help='Include IT cost (default: False)', action='store_true');
+    parser.add_argument('--aws_support', choices=['business', 'enterprise'], default=None);
+    parser.add_argument('--monthly', help='Add the monthly demand and costs to the output', action='store_true');
+    arguments = parser.parse_args();
+    if(not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file):
+        parser.error('one of --ec2_pricing_json_file or --ec2_pricing_index_file is required');
+    if(arguments.operating_period < 1):
+        parser.error('--operating_period must be at least 1 year');
+    configurations = parse_model_params_file(arguments.patients_file)['configurations'];
+    private_cloud_model = parse_model_params_file(arguments.pvt_cloud_model_parameters_file);
+    aws_model = parse_model_params_file(arguments.aws_model_parameters_file);
+    if(arguments.ec2_pricing_index_file):
+        ec2_pricing_model = ec2_pricing.load_pricing_index(arguments.ec2_pricing_index_file, aws_model['compute'],
+                ec2_pricing_json_file=arguments.ec2_pricing_json_file);
+    else:
+        ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(arguments.ec2_pricing_json_file, aws_model['compute']);
+    pricing_catalog = amazon.PricingCatalog(aws_model, ec2_pricing_model);
+    start_time = time.time();
+    demand, private_cloud_plan, aws_plan = simulate_capacity_growth(configurations, private_cloud_model, aws_model, pricing_catalog,
+            arguments.memory_per_core, arguments.bandwidth, arguments.bandwidth_utilization, operating_period_in_years=arguments.operating_period,
+            private_cloud_hosting=arguments.private_cloud_hosting, storage_type=arguments.storage_type,
+            backup_percentage_per_month=arguments.backup_percentage_per_month, include_IT_cost=arguments.include_IT_cost,
+            core_utilization=arguments.core_utilization, aws_support=arguments.aws_support);
+    wall_time = time.time()-start_time;
+    result = OrderedDict();
+    result['operating_period_in_years'] = arguments.operating_period;
+    result['simulation_wall_time_s'] = wall_time;
+    result['configurations'] = [ create_configuration_dict(config.get('name', str(idx)), idx, demand, private_cloud_plan, aws_plan,
+        pricing_catalog, monthly=arguments.monthly) for idx, config in enumerate(configurations) ];
+    print(json.dumps(result, indent=4, separators=(',', ': ')));
+
+if __name__ == "__main__":
+    main()
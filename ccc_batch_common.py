@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+#Helpers shared by the NumPy batch engines. Scenarios are laid out along axis 0 as (S,1) columns so that per-candidate
+#values (laid out along axis 1) and per-scenario model fields broadcast against each other.
+
+def as_scenario_column(value, num_scenarios):
+    value = np.asarray(value, dtype=np.float64);
+    if(value.ndim == 0):
+        return np.full((num_scenarios, 1), value, dtype=np.float64);
+    return value.reshape(-1, 1)*np.ones((num_scenarios, 1));
+
+def get_num_scenarios(*values):
+    num_scenarios = 1;
+    for value in values:
+        size = np.size(value);
+        if(size != 1):
+            if(num_scenarios != 1 and size != num_scenarios):
+                raise ValueError('All scenario arrays must have the same length');
+            num_scenarios = size;
+    return num_scenarios;
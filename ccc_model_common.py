@@ -3,6 +3,18 @@
 import json
 import argparse
 import sys
+import bisect
+from tco_profile import Profiler
+from tco_profile import profile_stage
+
+#Per-scenario inputs accepted by the ArgumentsHandler constructors (as keyword arguments)
+COMMON_SCENARIO_KEYS = [ 'num_cores', 'memory_per_core', 'storage', 'bandwidth', 'bandwidth_utilization', 'operating_period_in_years',
+        'core_utilization', 'backup_percentage_per_month', 'mixed_fleet', 'compute_frontier' ];
+PROVIDER_SCENARIO_KEYS = {
+        'private_cloud': [ 'private_cloud_hosting', 'storage_type', 'include_IT_cost', 'shared_racks' ],
+        'aws': [ 'aws_support', 'storage_utilization', 'iops_per_GB_requested', 'storage_bandwidth_per_TB_requested',
+            'storage_iops_requested', 'storage_throughput_requested' ]
+        };
 
 class NoServerConfigurationFound(Exception):
 
@@ -12,6 +24,26 @@ class NoServerConfigurationFound(Exception):
     def __str__(self):
         return repr(self.value);
 
+class InvalidModelParameters(Exception):
+
+    def __init__(self, value):
+        self.value = value;
+
+    def __str__(self):
+        return repr(self.value);
+
+def get_required_param(params, key, path):
+    #Lookup used while compiling a model - reports the full path of a missing parameter
+    if(not isinstance(params, dict) or key not in params):
+        raise InvalidModelParameters('Missing model parameter %s.%s'%(path, key));
+    return params[key];
+
+def get_required_number(params, key, path):
+    value = get_required_param(params, key, path);
+    if(isinstance(value, bool) or not isinstance(value, (int, long, float))):
+        raise InvalidModelParameters('Model parameter %s.%s must be a number'%(path, key));
+    return value;
+
 def parse_model_params_file(filename):
     fptr = open(filename, 'rb');
     model = json.load(fptr);
@@ -29,10 +61,15 @@ class ArgumentsHandler:
     m_backup_percentage_per_month = 5;
     m_iops_per_GB_requested = None;
     m_storage_bandwidth_per_TB_requested = None;
+    m_storage_iops_requested = None;
+    m_storage_throughput_requested = None;
     m_bandwidth = None;
     m_bandwidth_utilization = None;
     m_operating_period_in_years = 3;
     m_include_IT_cost = False;
+    m_mixed_fleet = False;
+    m_compute_frontier = False;
+    m_profiler = None;
 
     def add_optional_arguments(self, parser):
         parser.add_argument('--core_utilization', help='Average utilization per core (as a percentage) - default: 100%%', default=100, type=float);
@@ -40,6 +77,11 @@ class ArgumentsHandler:
         parser.add_argument('--backup_percentage_per_month', help='Percentage of total data that changes per month - default: 5%%',
                 default=5, type=float);
         parser.add_argument('--include_IT_cost', help='Include IT cost (default: False)', action='store_true');
+        parser.add_argument('--mixed_fleet', help='Allow a mix of instance/server types in the compute fleet (default: False)',
+                action='store_true');
+        parser.add_argument('--compute_frontier', help='Add every compute configuration that is not dominated in cost, spare cores, spare memory, '
+                'number of machines, racks and power (default: False)', action='store_true');
+        parser.add_argument('--profile', help='Add wall time, peak memory and candidate counts per stage to the output', action='store_true');
 
     def add_required_arguments(self, parser):
         required_named_args_group = parser.add_argument_group('Required named arguments');
@@ -57,7 +99,10 @@ class ArgumentsHandler:
             self.add_required_arguments(argparse_obj);
             self.add_optional_arguments(argparse_obj);
             arguments = argparse_obj.parse_args();
-            self.m_model = parse_model_params_file(arguments.model_parameters_file);
+            if(arguments.profile):
+                self.m_profiler = Profiler();
+            with profile_stage(self.m_profiler, 'load_model_parameters'):
+                self.m_model = parse_model_params_file(arguments.model_parameters_file);
             self.m_num_cores = arguments.num_cores;
             self.m_core_utilization = arguments.core_utilization;
             self.m_memory_per_core = arguments.memory_per_core;
@@ -67,6 +112,8 @@ class ArgumentsHandler:
             self.m_operating_period_in_years = arguments.operating_period_in_years;
             self.m_backup_percentage_per_month = arguments.backup_percentage_per_month;
             self.m_include_IT_cost = arguments.include_IT_cost;
+            self.m_mixed_fleet = arguments.mixed_fleet;
+            self.m_compute_frontier = arguments.compute_frontier;
         else:
             if(model_parameters_dict):
                 self.m_model = model_parameters_dict;
@@ -80,6 +127,14 @@ class ArgumentsHandler:
             for k,v in kwargs.iteritems():
                 setattr(self, 'm_'+k, v);
 
+def get_configuration_name(provider, compute_cost_dict):
+    #'instance_type/tenancy/offer_term' for AWS, '<sockets>_sockets_x<servers>' for the private cloud, joined by '+' for mixed fleets
+    if('fleet' in compute_cost_dict):
+        return '+'.join([ get_configuration_name(provider, fleet_cost_dict) for fleet_cost_dict in compute_cost_dict['fleet'] ]);
+    if(provider == 'aws'):
+        return '%s/%s/%s'%(compute_cost_dict['instance_type'], compute_cost_dict['tenancy'], compute_cost_dict['offer_term']);
+    return '%d_sockets_x%d'%(compute_cost_dict['num_sockets_per_server'], compute_cost_dict['num_servers']);
+
 def determine_usable_storage(model, raw_storage_size):
     storage_params = model['storage'];
     usable_storage = (float(100-storage_params['os_penalty_percentage'])/100)*raw_storage_size;
@@ -105,15 +160,75 @@ def piecewise_linear_function(model, segment_key, cost_key, value):
         last_limit_value = range_dict[segment_key];
     return total_cost;
 
-def print_cost_summary_csv(cost_dict_list):
+class PiecewiseLinearFunction:
+
+    #Tier table compiled into cumulative-cost breakpoints - evaluation is a binary search plus one multiply.
+    #The cumulative costs are summed in the same order as piecewise_linear_function so that results are identical.
+    def __init__(self, model, segment_key, cost_key):
+        self.m_limits = [];
+        self.m_previous_limits = [];
+        self.m_widths = [];
+        self.m_rates = [];
+        self.m_cumulative_costs = [];
+        last_limit_value = 0;
+        total_cost = 0;
+        self.m_is_sorted = True;
+        for range_dict in model:
+            if(range_dict[segment_key] < last_limit_value and len(self.m_limits) > 0):
+                self.m_is_sorted = False;
+            self.m_limits.append(range_dict[segment_key]);
+            self.m_previous_limits.append(last_limit_value);
+            self.m_widths.append(range_dict[segment_key]-last_limit_value);
+            self.m_rates.append(range_dict[cost_key]);
+            self.m_cumulative_costs.append(total_cost);
+            total_cost += (range_dict[segment_key]-last_limit_value)*range_dict[cost_key];
+            last_limit_value = range_dict[segment_key];
+        self.m_total_cost = total_cost;
+        self.m_model = model;
+        self.m_segment_key = segment_key;
+        self.m_cost_key = cost_key;
+        self.m_arrays = None;
+
+    def __call__(self, value):
+        if(not self.m_is_sorted):
+            return piecewise_linear_function(self.m_model, self.m_segment_key, self.m_cost_key, value);
+        if(value <= 0 or len(self.m_limits) == 0):
+            return 0;
+        idx = bisect.bisect_left(self.m_limits, value);
+        if(idx == len(self.m_limits)):
+            return self.m_total_cost;
+        return self.m_cumulative_costs[idx] + min(value - self.m_previous_limits[idx], self.m_widths[idx])*self.m_rates[idx];
+
+    def evaluate_array(self, values):
+        #NumPy variant for whole arrays of values
+        import numpy as np
+        values = np.asarray(values, dtype=np.float64);
+        if(not self.m_is_sorted):
+            return np.vectorize(self, otypes=[np.float64])(values);
+        if(len(self.m_limits) == 0):
+            return np.zeros_like(values);
+        if(not self.m_arrays):
+            self.m_arrays = [ np.array(values_list, dtype=np.float64) for values_list in [ self.m_limits, self.m_previous_limits,
+                self.m_widths, self.m_rates, self.m_cumulative_costs ] ];
+        limits, previous_limits, widths, rates, cumulative_costs = self.m_arrays;
+        idx = np.searchsorted(limits, values, side='left');
+        clipped_idx = np.minimum(idx, len(limits)-1);
+        total_cost = np.where(idx == len(limits), self.m_total_cost,
+                cumulative_costs[clipped_idx] + np.minimum(values - previous_limits[clipped_idx], widths[clipped_idx])*rates[clipped_idx]);
+        with np.errstate(invalid='ignore'):
+            return np.where(values > 0, total_cost, 0);
+
+def print_cost_summary_csv(cost_dict_list, fptr=None):
     if(len(cost_dict_list) == 0):
         return;
+    if(fptr is None):
+        fptr = sys.stdout;
     for cost_dict in cost_dict_list:
-        sys.stdout.write(','+cost_dict['name']);
-    sys.stdout.write('\n');
+        fptr.write(','+cost_dict['name']);
+    fptr.write('\n');
     for key in cost_dict_list[0]['summary'].keys():
-        sys.stdout.write(key);
+        fptr.write(key);
         for cost_dict in cost_dict_list:
-            sys.stdout.write(','+str(cost_dict['summary'][key]));
-        sys.stdout.write('\n');
+            fptr.write(','+str(cost_dict['summary'][key]));
+        fptr.write('\n');
 
@@ -0,0 +1,603 @@
+#!/usr/bin/env python
+
+import io
+import os
+import sys
+import time
+import csv
+import json
+import hashlib
+import argparse
+from collections import OrderedDict
+from tco_profile import add_profile_count
+
+JSON_DECODER = json.JSONDecoder();
+READ_CHUNK_SIZE = 1 << 20;
+WHITESPACE = ' \t\n\r';
+#Most SKUs whose terms are held back when an offer file lists 'terms' before 'products' - the terms cannot be matched to a
+#product yet, so every SKU with a needed offer term is kept until the products are read. AWS offer files list 'products'
+#first, so this only guards against reordered files filling the memory.
+MAX_PENDING_TERMS = 100000;
+PRICING_INDEX_FORMAT_VERSION = 1;
+#Coarsest mtime resolution expected (FAT has 2 s) - an offer file modified this close to the time it was hashed may have been
+#rewritten with the same size and mtime after hashing
+MTIME_RESOLUTION_IN_SECONDS = 2;
+PRICING_INDEX_COLUMNS = [ 'location', 'operating_system', 'instance_type', 'tenancy', 'offer_term_code', 'term_type', 'sku', 'vcpu', 'memory',
+        'hourly_price', 'upfront_price' ];
+
+class PricingIndexError(Exception):
+
+    def __init__(self, value):
+        self.value = value;
+
+    def __str__(self):
+        return repr(self.value);
+
+class JSONStreamReader:
+
+    def __init__(self, fptr, chunk_size=READ_CHUNK_SIZE):
+        self.m_fptr = fptr;
+        self.m_chunk_size = chunk_size;
+        self.m_buffer = u'';
+        self.m_pos = 0;
+        self.m_eof = False;
+
+    def read_more(self):
+        if(self.m_eof):
+            return False;
+        chunk = self.m_fptr.read(self.m_chunk_size);
+        if(not chunk):
+            self.m_eof = True;
+            return False;
+        #Drop the consumed prefix so that the buffer only ever holds the value being decoded
+        self.m_buffer = self.m_buffer[self.m_pos:]+chunk;
+        self.m_pos = 0;
+        return True;
+
+    def peek(self):
+        while(True):
+            while(self.m_pos < len(self.m_buffer) and self.m_buffer[self.m_pos] in WHITESPACE):
+                self.m_pos += 1;
+            if(self.m_pos < len(self.m_buffer)):
+                return self.m_buffer[self.m_pos];
+            if(not self.read_more()):
+                return None;
+
+    def expect(self, char):
+        if(self.peek() != char):
+            raise ValueError('Malformed JSON stream: expected \'%s\' at offset %d'%(char, self.m_pos));
+        self.m_pos += 1;
+
+    def read_value(self):
+        self.peek();
+        while(True):
+            try:
+                value, end = JSON_DECODER.raw_decode(self.m_buffer, self.m_pos);
+                #A number at the end of the buffer may continue in the next chunk
+                if(end < len(self.m_buffer) or self.m_eof):
+                    self.m_pos = end;
+                    return value;
+            except ValueError:
+                if(self.m_eof):
+                    raise;
+            self.read_more();
+
+    def iterate_object(self):
+        self.expect('{');
+        if(self.peek() == '}'):
+            self.m_pos += 1;
+            return;
+        while(True):
+            key = self.read_value();
+            self.expect(':');
+            yield key;
+            separator = self.peek();
+            self.m_pos += 1;
+            if(separator == '}'):
+                return;
+            if(separator != ','):
+                raise ValueError('Malformed JSON stream: expected \',\' or \'}\' at offset %d'%(self.m_pos-1));
+
+class Ec2ProductFilter:
+
+    def __init__(self, instances=None, locations=None, operating_systems=None, tenancies=None, offer_term_codes=None):
+        self.m_instances = set(instances) if instances is not None else None;
+        self.m_locations = set(locations) if locations is not None else None;
+        self.m_operating_systems = set(operating_systems) if operating_systems is not None else None;
+        self.m_tenancies = set(tenancies) if tenancies is not None else None;
+        self.m_offer_term_codes = set(offer_term_codes) if offer_term_codes is not None else None;
+
+    def is_product_needed(self, product_info):
+        if(product_info.get('productFamily') != 'Compute Instance'):
+            return False;
+        attributes = product_info.get('attributes', {});
+        for values_set, attribute_key in [ (self.m_instances, 'instanceType'), (self.m_locations, 'location'),
+                (self.m_operating_systems, 'operatingSystem'), (self.m_tenancies, 'tenancy') ]:
+            if(values_set is not None and attributes.get(attribute_key) not in values_set):
+                return False;
+        return True;
+
+    def is_offer_term_needed(self, offer_term_code):
+        return (self.m_offer_term_codes is None or offer_term_code in self.m_offer_term_codes);
+
+def create_product_filter(model, locations=None, operating_systems=None):
+    #model is the 'compute' section of the AWS model
+    offer_term_codes = set();
+    for offer_term in model['offer_terms']:
+        offer_term_codes.add(model['offer_term_parameters'][offer_term]['code']);
+    return Ec2ProductFilter(instances=model['instances'],
+            locations=locations if locations is not None else [ model['location'] ],
+            operating_systems=operating_systems if operating_systems is not None else [ model['operating_system'] ],
+            tenancies=model['tenancies'], offer_term_codes=offer_term_codes);
+
+def filter_sku_terms(product_filter, sku_terms_dict):
+    filtered_dict = {};
+    for sku_term_key, term_info in sku_terms_dict.iteritems():
+        offer_term_code = term_info['offerTermCode'] if 'offerTermCode' in term_info else sku_term_key.split('.')[-1];
+        if(product_filter.is_offer_term_needed(offer_term_code)):
+            filtered_dict[sku_term_key] = term_info;
+    return filtered_dict;
+
+def stream_ec2_pricing_model(fptr, product_filter, profiler=None, max_pending_terms=MAX_PENDING_TERMS):
+    ec2_pricing_model = { 'products': {}, 'terms': {} };
+    num_products_scanned = 0;
+    products_dict = ec2_pricing_model['products'];
+    #Only used if the offer file lists 'terms' before 'products'
+    pending_terms = [];
+    products_seen = False;
+    reader = JSONStreamReader(fptr);
+    for top_level_key in reader.iterate_object():
+        if(top_level_key == 'products'):
+            for sku in reader.iterate_object():
+                product_info = reader.read_value();
+                num_products_scanned += 1;
+                if(product_filter.is_product_needed(product_info)):
+                    products_dict[sku] = product_info;
+            products_seen = True;
+        elif(top_level_key == 'terms'):
+            for term_type in reader.iterate_object():
+                terms_dict = ec2_pricing_model['terms'].setdefault(term_type, {});
+                for sku in reader.iterate_object():
+                    sku_terms_dict = reader.read_value();
+                    if(sku in products_dict):
+                        terms_dict[sku] = filter_sku_terms(product_filter, sku_terms_dict);
+                    elif(not products_seen):
+                        sku_terms_dict = filter_sku_terms(product_filter, sku_terms_dict);
+                        if(not sku_terms_dict):
+                            continue;
+                        if(len(pending_terms) >= max_pending_terms):
+                            raise PricingIndexError('Offer file lists terms before products and more than %d SKUs have needed terms - '
+                                    'reorder the file so that products come first'%(max_pending_terms));
+                        pending_terms.append((terms_dict, sku, sku_terms_dict));
+        else:
+            ec2_pricing_model[top_level_key] = reader.read_value();
+    for terms_dict, sku, sku_terms_dict in pending_terms:
+        if(sku in products_dict):
+            terms_dict[sku] = sku_terms_dict;
+    add_profile_count(profiler, 'ec2_pricing.products_scanned', num_products_scanned);
+    add_profile_count(profiler, 'ec2_pricing.products_kept', len(products_dict));
+    return ec2_pricing_model;
+
+def load_ec2_pricing_model(filename, model, locations=None, operating_systems=None, profiler=None):
+    product_filter = create_product_filter(model, locations=locations, operating_systems=operating_systems);
+    fptr = io.open(filename, 'r', encoding='utf-8');
+    ec2_pricing_model = stream_ec2_pricing_model(fptr, product_filter, profiler=profiler);
+    fptr.close();
+    return ec2_pricing_model;
+
+def parse_memory_in_GiB(memory_string):
+    unit_string_to_GiB_convert_factor = { 'GiB':1, 'TiB':1024, 'MiB': 1/1024 };
+    tokens = memory_string.split();
+    return float(tokens[0])*unit_string_to_GiB_convert_factor[tokens[1]];
+
+def compute_file_hash(filename):
+    sha = hashlib.sha256();
+    fptr = open(filename, 'rb');
+    while(True):
+        chunk = fptr.read(READ_CHUNK_SIZE);
+        if(not chunk):
+            break;
+        sha.update(chunk);
+    fptr.close();
+    return sha.hexdigest();
+
+def get_price_per_unit(pricing_dict, rate_key):
+    if(rate_key in pricing_dict):
+        return float(pricing_dict[rate_key]['pricePerUnit']['USD']);
+    return None;
+
+def build_pricing_index(ec2_pricing_model, model, product_filter, source_hash=None, source_stat=None, source_hash_time=None):
+    #model is the 'compute' section of the AWS model
+    upfront_portion_code = model['offer_term_parameters']['upfront_portion_code']['code'];
+    hourly_payment_code = model['offer_term_parameters']['hourly_payment_code']['code'];
+    entries = [];
+    seen_keys = set();
+    for sku, product_info in ec2_pricing_model['products'].iteritems():
+        attributes = product_info['attributes'];
+        for term_type, terms_dict in ec2_pricing_model['terms'].iteritems():
+            if(sku not in terms_dict):
+                continue;
+            for sku_term_key, term_info in terms_dict[sku].iteritems():
+                offer_term_code = term_info['offerTermCode'] if 'offerTermCode' in term_info else sku_term_key.split('.')[-1];
+                key = (attributes['location'], attributes['operatingSystem'], attributes['instanceType'], attributes['tenancy'],
+                        offer_term_code);
+                #Same first-product-wins rule as amazon.PricingCatalog
+                if(key in seen_keys):
+                    continue;
+                seen_keys.add(key);
+                pricing_dict = term_info['priceDimensions'];
+                entries.append(list(key) + [ term_type, sku, int(attributes['vcpu']), parse_memory_in_GiB(attributes['memory']),
+                    get_price_per_unit(pricing_dict, sku_term_key+'.'+hourly_payment_code),
+                    get_price_per_unit(pricing_dict, sku_term_key+'.'+upfront_portion_code) ]);
+    entries.sort();
+    index = OrderedDict();
+    index['format_version'] = PRICING_INDEX_FORMAT_VERSION;
+    index['source_hash'] = source_hash;
+    index['source_size'] = source_stat.st_size if source_stat else None;
+    index['source_mtime'] = source_stat.st_mtime if source_stat else None;
+    index['source_hash_time'] = source_hash_time;
+    index['filter'] = OrderedDict([
+        ('instances', sorted(product_filter.m_instances) if product_filter.m_instances is not None else None),
+        ('locations', sorted(product_filter.m_locations) if product_filter.m_locations is not None else None),
+        ('operating_systems', sorted(product_filter.m_operating_systems) if product_filter.m_operating_systems is not None else None),
+        ('tenancies', sorted(product_filter.m_tenancies) if product_filter.m_tenancies is not None else None),
+        ('offer_term_codes', sorted(product_filter.m_offer_term_codes) if product_filter.m_offer_term_codes is not None else None)
+        ]);
+    index['hourly_payment_code'] = hourly_payment_code;
+    index['upfront_portion_code'] = upfront_portion_code;
+    index['columns'] = PRICING_INDEX_COLUMNS;
+    index['entries'] = entries;
+    return index;
+
+def create_pricing_index(ec2_pricing_json_file, model, locations=None, operating_systems=None):
+    product_filter = create_product_filter(model, locations=locations, operating_systems=operating_systems);
+    #stat before hashing - a write during hashing then leaves a newer mtime than the one recorded
+    source_stat = os.stat(ec2_pricing_json_file);
+    source_hash_time = time.time();
+    source_hash = compute_file_hash(ec2_pricing_json_file);
+    fptr = io.open(ec2_pricing_json_file, 'r', encoding='utf-8');
+    ec2_pricing_model = stream_ec2_pricing_model(fptr, product_filter);
+    fptr.close();
+    return build_pricing_index(ec2_pricing_model, model, product_filter, source_hash=source_hash, source_stat=source_stat,
+            source_hash_time=source_hash_time);
+
+def write_pricing_index(index, filename):
+    fptr = open(filename, 'wb');
+    json.dump(index, fptr, separators=(',', ':'));
+    fptr.close();
+
+def read_pricing_index(filename):
+    fptr = open(filename, 'rb');
+    index = json.load(fptr, object_pairs_hook=OrderedDict);
+    fptr.close();
+    if(index.get('format_version') != PRICING_INDEX_FORMAT_VERSION):
+        raise PricingIndexError('Unsupported pricing index format in %s - rebuild it with build-index'%(filename));
+    return index;
+
+def is_pricing_index_current(index, ec2_pricing_json_file):
+    source_stat = os.stat(ec2_pricing_json_file);
+    #Cheap check first, the content hash decides when size or mtime differ. Matching size and mtime are only trusted if the
+    #mtime is clearly older than the hash - otherwise the file may have been rewritten within the same mtime tick (indexes
+    #without source_hash_time are always hashed).
+    source_hash_time = index.get('source_hash_time');
+    if(index['source_size'] == source_stat.st_size and index['source_mtime'] == source_stat.st_mtime and \
+            source_hash_time is not None and source_stat.st_mtime < source_hash_time-MTIME_RESOLUTION_IN_SECONDS):
+        return True;
+    return (index['source_hash'] is not None and index['source_hash'] == compute_file_hash(ec2_pricing_json_file));
+
+def check_pricing_index_coverage(index, model, locations=None, operating_systems=None):
+    needed_filter = create_product_filter(model, locations=locations, operating_systems=operating_systems);
+    index_filter = index['filter'];
+    upfront_portion_code = model['offer_term_parameters']['upfront_portion_code']['code'];
+    hourly_payment_code = model['offer_term_parameters']['hourly_payment_code']['code'];
+    if(index['hourly_payment_code'] != hourly_payment_code or index['upfront_portion_code'] != upfront_portion_code):
+        return False;
+    for filter_key, needed_values in [ ('instances', needed_filter.m_instances), ('locations', needed_filter.m_locations),
+            ('operating_systems', needed_filter.m_operating_systems), ('tenancies', needed_filter.m_tenancies),
+            ('offer_term_codes', needed_filter.m_offer_term_codes) ]:
+        if(index_filter[filter_key] is not None and not needed_values.issubset(set(index_filter[filter_key]))):
+            return False;
+    return True;
+
+def ec2_pricing_model_from_index(index):
+    #Rebuilds the (filtered) offer file structure so that the rest of the code is unchanged
+    products_dict = OrderedDict();
+    terms_dict = {};
+    hourly_payment_code = index['hourly_payment_code'];
+    upfront_portion_code = index['upfront_portion_code'];
+    for location, operating_system, instance_type, tenancy, offer_term_code, term_type, sku, vcpu, memory, hourly_price, \
+            upfront_price in index['entries']:
+        if(sku not in products_dict):
+            products_dict[sku] = { 'sku': sku, 'productFamily': 'Compute Instance', 'attributes': {
+                'instanceType': instance_type, 'location': location, 'operatingSystem': operating_system,
+                'tenancy': tenancy, 'vcpu': str(vcpu), 'memory': repr(memory)+' GiB' } };
+        sku_term_key = sku+'.'+offer_term_code;
+        price_dimensions = {};
+        for rate_code, price in [ (hourly_payment_code, hourly_price), (upfront_portion_code, upfront_price) ]:
+            if(price is not None):
+                price_dimensions[sku_term_key+'.'+rate_code] = { 'pricePerUnit': { 'USD': repr(price) } };
+        terms_dict.setdefault(term_type, {}).setdefault(sku, {})[sku_term_key] = { 'offerTermCode': offer_term_code, 'sku': sku,
+                'priceDimensions': price_dimensions };
+    return { 'products': products_dict, 'terms': terms_dict };
+
+def load_pricing_index(index_file, model, ec2_pricing_json_file=None, locations=None, operating_systems=None):
+    #Rebuilds and rewrites the index if the offer file changed or the index does not cover the model
+    index = None;
+    if(os.path.exists(index_file)):
+        index = read_pricing_index(index_file);
+        if(not check_pricing_index_coverage(index, model, locations=locations, operating_systems=operating_systems)):
+            if(not ec2_pricing_json_file):
+                raise PricingIndexError('Pricing index %s does not cover the instances/locations/offer terms in the model'%(index_file));
+            index = None;
+        elif(ec2_pricing_json_file and not is_pricing_index_current(index, ec2_pricing_json_file)):
+            index = None;
+    elif(not ec2_pricing_json_file):
+        raise PricingIndexError('Pricing index %s does not exist'%(index_file));
+    if(not index):
+        index = create_pricing_index(ec2_pricing_json_file, model, locations=locations, operating_systems=operating_systems);
+        write_pricing_index(index, index_file);
+    return ec2_pricing_model_from_index(index);
+
+def get_pricing_index_entry_key(entry):
+    #(location, operating_system, instance_type, tenancy, offer_term_code)
+    return tuple(entry[:5]);
+
+def is_pricing_index_entry_in_filter(entry, index_filter):
+    for value, filter_key in zip(entry[:5], [ 'locations', 'operating_systems', 'instances', 'tenancies', 'offer_term_codes' ]):
+        if(index_filter[filter_key] is not None and value not in index_filter[filter_key]):
+            return False;
+    return True;
+
+def diff_pricing_indexes(old_index, new_index):
+    #Returns { 'added': [ entry ], 'removed': [ entry ], 'repriced': [ (old entry, new entry) ], 'modified': [ (old entry, new entry) ] } -
+    #repriced entries only differ in their prices, modified ones in the SKU or instance attributes (and maybe the prices).
+    #Entries of old_index outside the filter of new_index are ignored.
+    old_entries = dict([ (get_pricing_index_entry_key(entry), entry) for entry in old_index['entries']
+        if is_pricing_index_entry_in_filter(entry, new_index['filter']) ]);
+    changes = OrderedDict([ ('added', []), ('removed', []), ('repriced', []), ('modified', []) ]);
+    new_keys = set();
+    for entry in new_index['entries']:
+        key = get_pricing_index_entry_key(entry);
+        new_keys.add(key);
+        old_entry = old_entries.get(key);
+        if(old_entry is None):
+            changes['added'].append(entry);
+        elif(list(old_entry[5:9]) != list(entry[5:9])):
+            changes['modified'].append((old_entry, entry));
+        elif(list(old_entry[9:]) != list(entry[9:])):
+            changes['repriced'].append((old_entry, entry));
+    changes['removed'] = [ entry for key, entry in sorted(old_entries.iteritems()) if key not in new_keys ];
+    return changes;
+
+def create_offer_term_names(model):
+    #offer_term_code -> offer term name of the model (as used in the configuration names of the results)
+    return dict([ (model['offer_term_parameters'][offer_term]['code'], offer_term) for offer_term in model['offer_terms'] ]);
+
+def create_change_record(change_type, old_entry, new_entry, offer_term_names):
+    entry = new_entry if new_entry is not None else old_entry;
+    record = OrderedDict([ ('change', change_type) ]);
+    for column, value in zip(PRICING_INDEX_COLUMNS[:5], entry[:5]):
+        record[column] = value;
+    record['offer_term'] = offer_term_names.get(entry[4]);
+    for column_idx, column in enumerate(PRICING_INDEX_COLUMNS[5:], 5):
+        if(old_entry is None or new_entry is None or old_entry[column_idx] == new_entry[column_idx]):
+            record[column] = entry[column_idx];
+        else:
+            record['old_'+column] = old_entry[column_idx];
+            record['new_'+column] = new_entry[column_idx];
+    return record;
+
+def is_possibly_cheaper(change_type, old_entry, new_entry):
+    #Could the entry now win a selection it lost before?
+    if(change_type in [ 'added', 'modified' ]):
+        return True;
+    if(change_type == 'removed'):
+        return False;
+    #A missing rate charges nothing, but a term without any rate leaves no candidate (amazon.PricingCatalog)
+    if(old_entry[9] is None and old_entry[10] is None):
+        return True;
+    for column_idx in [ 9, 10 ]:
+        if(old_entry[column_idx] is not None and (new_entry[column_idx] is None or new_entry[column_idx] < old_entry[column_idx])):
+            return True;
+    return False;
+
+def read_result_rows(filename):
+    #Results of sweep.py or patient_to_compute.py (--output_format ndjson or csv)
+    fptr = open(filename, 'rb');
+    if(filename.endswith('.csv')):
+        for row in csv.DictReader(fptr):
+            yield row;
+    else:
+        for line in fptr:
+            if(line.strip()):
+                yield json.loads(line);
+    fptr.close();
+
+def create_changed_candidates(change_records, model_dict, new_index):
+    #{ region: (pricing catalog, [ changed candidate that may now be cheaper ]) } - the candidates are priced from new_index with the
+    #rules of amazon.PricingCatalog
+    from amazon import create_pricing_catalogs
+    region_candidate_keys = OrderedDict();
+    for record in change_records:
+        if(record['possibly_cheaper']):
+            region_candidate_keys.setdefault((record['location'], record['operating_system']), set()).add((record['instance_type'],
+                record['tenancy'], record['offer_term']));
+    if(len(region_candidate_keys) == 0):
+        return {};
+    pricing_catalogs = create_pricing_catalogs(model_dict, ec2_pricing_model_from_index(new_index), region_candidate_keys.keys());
+    return dict([ (region, (pricing_catalog, [ candidate for candidate in pricing_catalog.m_candidates
+        if (candidate.m_instance_type, candidate.m_tenancy, candidate.m_offer_term) in region_candidate_keys[region] ]))
+        for region, pricing_catalog in pricing_catalogs.iteritems() ]);
+
+def get_row_number(row, key, default=None):
+    #CSV rows hold strings, empty for missing values
+    value = row.get(key);
+    if(value is None or value == ''):
+        return default;
+    return float(value);
+
+def find_cheaper_changed_candidate(pricing_catalog, candidates, row):
+    #Returns (candidate, compute cost) of the first changed candidate that is adequate for the inputs of the row and costs less than
+    #its compute cost, (None, None) if there is none, or None if the row lacks the inputs or the compute cost to reprice the
+    #candidates - defaults are not assumed, the row may have been computed with other values
+    from amazon import compute_candidate_cost
+    num_cores = get_row_number(row, 'num_cores');
+    memory_per_core = get_row_number(row, 'memory_per_core');
+    operating_period_in_years = get_row_number(row, 'operating_period_in_years');
+    core_utilization = get_row_number(row, 'core_utilization');
+    #sweep.py rows have compute_cost, patient_to_compute.py rows compute
+    row_compute_cost = get_row_number(row, 'compute_cost', get_row_number(row, 'compute'));
+    if(num_cores is None or memory_per_core is None or operating_period_in_years is None or core_utilization is None or \
+            row_compute_cost is None):
+        return None;
+    for candidate in candidates:
+        candidate_cost = compute_candidate_cost(candidate, num_cores, core_utilization, memory_per_core, operating_period_in_years);
+        if(not candidate_cost):
+            continue;
+        total_cost = candidate_cost[4];
+        if(candidate.m_offer_term != 'OnDemand'):
+            total_cost -= pricing_catalog.m_reserved_discount_function(total_cost);
+        if(total_cost < row_compute_cost):
+            return candidate, total_cost;
+    return None, None;
+
+def find_stale_results(filename, change_records, model, changed_candidates_per_region):
+    #An AWS result is stale if a candidate of its configuration changed, or if a changed candidate of its region is adequate for its
+    #inputs and now costs less than its compute cost (changed_candidates_per_region from create_changed_candidates). Rows without the
+    #inputs to reprice the candidates are reported as cheaper_candidate_possible when their region has such candidates.
+    #Configuration names are 'instance_type/tenancy/offer_term', joined by '+' for mixed fleets (get_configuration_name).
+    #Rows without a location or operating system are in the region of the model.
+    changed_candidates = set();
+    for record in change_records:
+        changed_candidates.add((record['location'], record['operating_system'], record['instance_type'], record['tenancy'],
+            record['offer_term']));
+    stale_results = [];
+    num_rows = 0;
+    for row_idx, row in enumerate(read_result_rows(filename)):
+        num_rows += 1;
+        if(row.get('provider') != 'aws'):
+            continue;
+        region = (row.get('location') or model['location'], row.get('operating_system') or model['operating_system']);
+        reason = None;
+        cheaper_candidate = None;
+        for configuration in (row.get('configuration') or '').split('+'):
+            if(configuration and region+tuple(configuration.split('/')) in changed_candidates):
+                reason = 'configuration_repriced';
+                break;
+        if(not reason and region in changed_candidates_per_region):
+            pricing_catalog, candidates = changed_candidates_per_region[region];
+            cheaper_candidate = find_cheaper_changed_candidate(pricing_catalog, candidates, row);
+            if(cheaper_candidate is None):
+                reason = 'cheaper_candidate_possible' if len(candidates) > 0 else None;
+            elif(cheaper_candidate[0] is not None):
+                reason = 'cheaper_candidate_available';
+        if(reason):
+            stale_result = OrderedDict([ ('row', row_idx) ]);
+            for key in [ 'name', 'configuration', 'total_cost' ]:
+                if(key in row):
+                    stale_result[key] = row[key];
+            stale_result['reason'] = reason;
+            if(reason == 'cheaper_candidate_available'):
+                candidate, compute_cost = cheaper_candidate;
+                stale_result['cheaper_configuration'] = '%s/%s/%s'%(candidate.m_instance_type, candidate.m_tenancy, candidate.m_offer_term);
+                stale_result['cheaper_compute_cost'] = compute_cost;
+            stale_results.append(stale_result);
+    return OrderedDict([ ('results_file', filename), ('num_rows', num_rows), ('num_stale', len(stale_results)),
+        ('stale_results', stale_results) ]);
+
+def refresh_pricing_index(old_index, ec2_pricing_json_file, model, locations=None, operating_systems=None):
+    #Streams the new offer file through the filter of the model and diffs it against old_index - returns (new index, change records)
+    new_index = create_pricing_index(ec2_pricing_json_file, model, locations=locations, operating_systems=operating_systems);
+    changes = diff_pricing_indexes(old_index, new_index);
+    offer_term_names = create_offer_term_names(model);
+    change_records = [];
+    for change_type in [ 'added', 'removed', 'repriced', 'modified' ]:
+        for change in changes[change_type]:
+            old_entry, new_entry = change if change_type in [ 'repriced', 'modified' ] else \
+                    ((None, change) if change_type == 'added' else (change, None));
+            record = create_change_record(change_type, old_entry, new_entry, offer_term_names);
+            record['possibly_cheaper'] = is_possibly_cheaper(change_type, old_entry, new_entry);
+            change_records.append(record);
+    return new_index, change_records;
+
+def refresh_command(arguments):
+    model_dict = json.load(open(arguments.model_parameters_file, 'rb'));
+    model = model_dict['compute'];
+    if(arguments.old_ec2_pricing_json_file):
+        old_index = create_pricing_index(arguments.old_ec2_pricing_json_file, model, locations=arguments.locations,
+                operating_systems=arguments.operating_systems);
+    elif(arguments.index_file):
+        old_index = read_pricing_index(arguments.index_file);
+        if(not check_pricing_index_coverage(old_index, model, locations=arguments.locations, operating_systems=arguments.operating_systems)):
+            raise PricingIndexError('Pricing index %s does not cover the instances/locations/offer terms in the model'%(arguments.index_file));
+    else:
+        raise PricingIndexError('One of --index_file or --old_ec2_pricing_json_file is required');
+    if(arguments.index_file and not arguments.old_ec2_pricing_json_file and old_index['source_hash'] == \
+            compute_file_hash(arguments.ec2_pricing_json_file)):
+        new_index, change_records = old_index, [];
+    else:
+        new_index, change_records = refresh_pricing_index(old_index, arguments.ec2_pricing_json_file, model, locations=arguments.locations,
+                operating_systems=arguments.operating_systems);
+    output_index_file = arguments.output if arguments.output else arguments.index_file;
+    if(output_index_file):
+        write_pricing_index(new_index, output_index_file);
+    report = OrderedDict();
+    report['old_source_hash'] = old_index['source_hash'];
+    report['new_source_hash'] = new_index['source_hash'];
+    report['num_entries'] = len(new_index['entries']);
+    report['num_changes'] = OrderedDict([ (change_type, len([ record for record in change_records if record['change'] == change_type ]))
+        for change_type in [ 'added', 'removed', 'repriced', 'modified' ] ]);
+    report['changes'] = change_records;
+    #Stage caches (tco_server, sweep) key their entries by the hash of the pricing model, so they never return stale results
+    changed_candidates_per_region = create_changed_candidates(change_records, model_dict, new_index) if arguments.results_files else {};
+    report['stale_results'] = [ find_stale_results(filename, change_records, model, changed_candidates_per_region)
+        for filename in (arguments.results_files or []) ];
+    fptr = open(arguments.report, 'wb') if arguments.report else sys.stdout;
+    fptr.write(json.dumps(report, indent=4, separators=(',', ': '))+'\n');
+    if(arguments.report):
+        fptr.close();
+    sys.stderr.write('%d pricing changes%s\n'%(len(change_records), (', wrote %s'%(output_index_file)) if output_index_file else ''));
+
+def build_index_command(arguments):
+    model = json.load(open(arguments.model_parameters_file, 'rb'))['compute'];
+    index = create_pricing_index(arguments.ec2_pricing_json_file, model, locations=arguments.locations,
+            operating_systems=arguments.operating_systems);
+    write_pricing_index(index, arguments.output);
+    sys.stderr.write('Wrote %d pricing entries to %s\n'%(len(index['entries']), arguments.output));
+
+def main():
+    parser = argparse.ArgumentParser(description='Tools for the AWS EC2 offer file');
+    subparsers = parser.add_subparsers(dest='command');
+    build_index_parser = subparsers.add_parser('build-index', help='Build a compact pricing index from the EC2 offer file');
+    required_named_args_group = build_index_parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', required=True);
+    required_named_args_group.add_argument('--model_parameters_file', '-m', help='Path to AWS model parameters file', required=True);
+    required_named_args_group.add_argument('--output', '-o', help='Path to the pricing index file to write', required=True);
+    build_index_parser.add_argument('--locations', nargs='+', default=None,
+            help='Locations to include - default: the location in the model');
+    build_index_parser.add_argument('--operating_systems', nargs='+', default=None,
+            help='Operating systems to include - default: the operating system in the model');
+    build_index_parser.set_defaults(func=build_index_command);
+    refresh_parser = subparsers.add_parser('refresh', help='Diff a new EC2 offer file against a pricing index (or the previous offer file),'
+            ' rewrite the index and report the changed SKUs and the stale results');
+    required_named_args_group = refresh_parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--ec2_pricing_json_file', help='Path to the new AWS EC2 pricing JSON file', required=True);
+    required_named_args_group.add_argument('--model_parameters_file', '-m', help='Path to AWS model parameters file', required=True);
+    refresh_parser.add_argument('--index_file', help='Pricing index built from the previous offer file - rewritten in place unless --output'
+            ' is given', default=None);
+    refresh_parser.add_argument('--old_ec2_pricing_json_file', help='Previous AWS EC2 pricing JSON file (instead of --index_file)',
+            default=None);
+    refresh_parser.add_argument('--output', '-o', help='Path to the pricing index file to write - default: --index_file', default=None);
+    refresh_parser.add_argument('--locations', nargs='+', default=None,
+            help='Locations to include - default: the location in the model');
+    refresh_parser.add_argument('--operating_systems', nargs='+', default=None,
+            help='Operating systems to include - default: the operating system in the model');
+    refresh_parser.add_argument('--results_files', nargs='+', default=None,
+            help='Results of sweep.py or patient_to_compute.py (NDJSON or CSV) to check for stale AWS results');
+    refresh_parser.add_argument('--report', help='Change report file - default: stdout', default=None);
+    refresh_parser.set_defaults(func=refresh_command);
+    arguments = parser.parse_args();
+    arguments.func(arguments);
+
+if __name__ == "__main__":
+    main()
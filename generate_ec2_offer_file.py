@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+import sys
+import json
+import argparse
+from collections import OrderedDict
+from ccc_model_common import parse_model_params_file
+
+#Synthetic EC2 offer file with the structure of the AWS price list: 'products' keyed by SKU with productFamily and
+#attributes, and 'terms' -> 'OnDemand'/'Reserved' -> SKU -> SKU.offerTermCode -> priceDimensions. The location, operating
+#system and instances of the AWS model come first so that even small files can be used with the model.
+#Per-SKU entries use plain dicts - key order is irrelevant to the readers and OrderedDicts are much slower to build.
+
+LOCATIONS = [ 'US West (Oregon)', 'US East (N. Virginia)', 'US East (Ohio)', 'US West (N. California)', 'EU (Ireland)', 'EU (Frankfurt)',
+        'EU (London)', 'Asia Pacific (Tokyo)', 'Asia Pacific (Seoul)', 'Asia Pacific (Singapore)', 'Asia Pacific (Sydney)',
+        'Asia Pacific (Mumbai)', 'South America (Sao Paulo)', 'Canada (Central)', 'AWS GovCloud (US)' ];
+OPERATING_SYSTEMS = [ 'Linux', 'Windows', 'RHEL', 'SUSE' ];
+TENANCIES = [ 'Shared', 'Dedicated', 'Host' ];
+#Variants of the same instance/location/OS/tenancy - the real offer file has one product per pre-installed software
+PRE_INSTALLED_SOFTWARE = [ 'NA', 'SQL Std', 'SQL Web', 'SQL Ent' ];
+#Memory (GiB) per vCPU and relative price per vCPU of every instance family
+INSTANCE_FAMILIES = OrderedDict([
+    ('c4', (1.875, 1.0)), ('c3', (1.875, 1.05)), ('r3', (7.625, 1.66)), ('m4', (4.0, 1.0)), ('m3', (3.75, 1.33)), ('i2', (7.625, 4.26)),
+    ('d2', (7.625, 3.45)), ('t2', (2.0, 0.5)), ('x1', (15.25, 4.17)), ('p2', (15.25, 9.0)), ('g2', (1.875, 3.25)), ('m5', (4.0, 0.96)),
+    ('c5', (2.0, 0.85)), ('r4', (7.625, 1.33)), ('i3', (7.625, 1.56)), ('f1', (15.25, 8.25))
+    ]);
+INSTANCE_SIZES = OrderedDict([ ('medium', 1), ('large', 2), ('xlarge', 4), ('2xlarge', 8), ('4xlarge', 16), ('8xlarge', 32), ('10xlarge', 40),
+    ('16xlarge', 64), ('32xlarge', 128) ]);
+HOURLY_PRICE_PER_VCPU = 0.05;
+NUM_OTHER_PRODUCTS_PER_LOCATION = 8;
+OTHER_PRODUCT_FAMILIES = [ 'Storage', 'Data Transfer', 'Storage Snapshot', 'IP Address', 'Load Balancer', 'NAT Gateway', 'Fee', 'System Operation' ];
+#Upfront fraction of the on-demand price for the term duration and hourly fraction of the on-demand rate
+RESERVED_PAYMENT_OPTIONS = OrderedDict([ ('all', (0.6, None)), ('partial', (0.3, 0.35)), ('no', (None, 0.72)) ]);
+
+def order_model_values_first(values, model_values):
+    return list(model_values) + [ value for value in values if value not in model_values ];
+
+def get_instance_types(model):
+    instance_types = list(model['instances']);
+    for family in INSTANCE_FAMILIES:
+        for size in INSTANCE_SIZES:
+            instance_type = family+'.'+size;
+            if(instance_type not in instance_types):
+                instance_types.append(instance_type);
+    return instance_types;
+
+def get_instance_specs(model, instance_type):
+    family, size = instance_type.split('.');
+    memory_per_vcpu, price_factor = INSTANCE_FAMILIES.get(family, (4.0, 1.0));
+    num_vcpus = max(int(model['core_to_vcpu_factor']*INSTANCE_SIZES.get(size, 2)/2), 1);
+    return num_vcpus, memory_per_vcpu*num_vcpus, price_factor;
+
+def get_price_noise(index):
+    #Deterministic +-5% variation so that prices of similar SKUs differ
+    return 1+0.1*(((index*2654435761) % 1000)/1000.0-0.5);
+
+class OfferFileLayout:
+
+    #Maps SKU numbers to (location, operating system, tenancy, instance type, pre-installed software) with the last one
+    #varying fastest, so that the first SKUs cover the model's location and operating system
+    def __init__(self, model):
+        self.m_instance_types = get_instance_types(model);
+        self.m_locations = order_model_values_first(LOCATIONS, [ model['location'] ]);
+        self.m_operating_systems = order_model_values_first(OPERATING_SYSTEMS, [ model['operating_system'] ]);
+        self.m_tenancies = order_model_values_first(TENANCIES, model['tenancies']);
+        self.m_dimensions = [ PRE_INSTALLED_SOFTWARE, self.m_locations, self.m_operating_systems, self.m_tenancies, self.m_instance_types ];
+        self.m_num_combinations = 1;
+        for values in self.m_dimensions:
+            self.m_num_combinations *= len(values);
+
+    def get_sku_attributes(self, index):
+        #Beyond all combinations the same attributes repeat with a different license model
+        license_cycle, remainder = divmod(index, self.m_num_combinations);
+        values = [];
+        for dimension_values in reversed(self.m_dimensions):
+            remainder, value_index = divmod(remainder, len(dimension_values));
+            values.append(dimension_values[value_index]);
+        instance_type, tenancy, operating_system, location, pre_installed_software = values;
+        return location, operating_system, tenancy, instance_type, pre_installed_software, license_cycle;
+
+def get_sku_code(index):
+    return 'SYN%011d'%(index);
+
+def get_sku_price(model, layout, index):
+    #Returns (sku_code, tenancy, hourly on-demand price)
+    location, operating_system, tenancy, instance_type, pre_installed_software, license_cycle = layout.get_sku_attributes(index);
+    num_vcpus, memory, price_factor = get_instance_specs(model, instance_type);
+    return get_sku_code(index), tenancy, HOURLY_PRICE_PER_VCPU*num_vcpus*price_factor*get_price_noise(index);
+
+def create_compute_product(model, layout, index):
+    location, operating_system, tenancy, instance_type, pre_installed_software, license_cycle = layout.get_sku_attributes(index);
+    num_vcpus, memory, price_factor = get_instance_specs(model, instance_type);
+    sku_code = get_sku_code(index);
+    attributes = dict([
+        ('servicecode', 'AmazonEC2'), ('location', location), ('locationType', 'AWS Region'), ('instanceType', instance_type),
+        ('currentGeneration', 'Yes'), ('instanceFamily', 'Compute optimized'), ('vcpu', str(num_vcpus)),
+        ('physicalProcessor', 'Intel Xeon E5-2666 v3 (Haswell)'), ('clockSpeed', '2.9 GHz'), ('memory', '%s GiB'%(('%.3f'%(memory)).rstrip('0').rstrip('.'))),
+        ('storage', 'EBS only'), ('networkPerformance', 'Moderate'), ('processorArchitecture', '64-bit'), ('tenancy', tenancy),
+        ('operatingSystem', operating_system), ('licenseModel', 'No License required' if license_cycle == 0 else 'Bring your own license %d'%(license_cycle)),
+        ('usagetype', 'BoxUsage:'+instance_type), ('operation', 'RunInstances'), ('preInstalledSw', pre_installed_software)
+        ]);
+    return sku_code, dict([ ('sku', sku_code), ('productFamily', 'Compute Instance'), ('attributes', attributes) ]);
+
+def create_other_product(location, index):
+    sku_code = 'SYNOTHER%08d'%(index);
+    attributes = dict([ ('servicecode', 'AmazonEC2'), ('location', location), ('locationType', 'AWS Region'),
+        ('usagetype', 'Misc:%d'%(index)) ]);
+    return sku_code, dict([ ('sku', sku_code), ('productFamily', OTHER_PRODUCT_FAMILIES[index % len(OTHER_PRODUCT_FAMILIES)]),
+        ('attributes', attributes) ]);
+
+def create_price_dimensions(sku_term_key, prices):
+    price_dimensions = {};
+    for rate_code, unit, price in prices:
+        rate_key = sku_term_key+'.'+rate_code;
+        price_dimensions[rate_key] = dict([ ('rateCode', rate_key), ('description', 'Synthetic price'), ('unit', unit),
+            ('pricePerUnit', dict([ ('USD', '%.10f'%(price)) ])) ]);
+    return price_dimensions;
+
+def create_term(sku_code, offer_term_code, prices, term_attributes=None):
+    sku_term_key = sku_code+'.'+offer_term_code;
+    term = dict([ ('offerTermCode', offer_term_code), ('sku', sku_code), ('effectiveDate', '2017-01-01T00:00:00Z'),
+        ('priceDimensions', create_price_dimensions(sku_term_key, prices)), ('termAttributes', term_attributes or {}) ]);
+    return dict([ (sku_term_key, term) ]);
+
+def get_reserved_offer_terms(model):
+    offer_term_parameters = model['offer_term_parameters'];
+    return [ (offer_term, parameters) for offer_term, parameters in offer_term_parameters.iteritems()
+            if offer_term != 'OnDemand' and 'duration' in parameters ];
+
+def create_reserved_terms(model, sku_code, hourly_price):
+    upfront_portion_code = model['offer_term_parameters']['upfront_portion_code']['code'];
+    hourly_payment_code = model['offer_term_parameters']['hourly_payment_code']['code'];
+    terms = {};
+    for offer_term, parameters in get_reserved_offer_terms(model):
+        payment_option = [ option for option in RESERVED_PAYMENT_OPTIONS if '_'+option+'_' in offer_term+'_' ];
+        upfront_fraction, hourly_fraction = RESERVED_PAYMENT_OPTIONS[payment_option[0] if payment_option else 'partial'];
+        prices = [];
+        if(upfront_fraction is not None):
+            prices.append((upfront_portion_code, 'Quantity', hourly_price*365*24*parameters['duration']*upfront_fraction));
+        prices.append((hourly_payment_code, 'Hrs', hourly_price*hourly_fraction if hourly_fraction is not None else 0.0));
+        terms.update(create_term(sku_code, parameters['code'], prices, dict([ ('LeaseContractLength', '%dyr'%(parameters['duration'])),
+            ('PurchaseOption', offer_term) ])));
+    return terms;
+
+def write_json_object_entries(fptr, entries):
+    #Writes '"key": value' pairs of a JSON object one per line without holding the object in memory
+    is_first = True;
+    for key, value in entries:
+        fptr.write((',\n' if not is_first else '\n')+'    '+json.dumps(key)+': '+json.dumps(value, separators=(',', ':')));
+        is_first = False;
+    fptr.write('\n  ');
+
+def generate_ec2_offer_file(fptr, model, num_skus):
+    #model is the 'compute' section of the AWS model; num_skus counts compute products, other products are added per location
+    layout = OfferFileLayout(model);
+    on_demand_code = model['offer_term_parameters']['OnDemand']['code'];
+    hourly_payment_code = model['offer_term_parameters']['hourly_payment_code']['code'];
+    fptr.write('{\n  "formatVersion" : "v1.0",\n  "disclaimer" : "Synthetic offer file for benchmarks",\n  "offerCode" : "AmazonEC2",\n');
+    fptr.write('  "version" : "20170101000000",\n  "publicationDate" : "2017-01-01T00:00:00Z",\n  "products" : {');
+    num_locations = min(len(layout.m_locations), max(1, num_skus//len(layout.m_instance_types)));
+    def product_entries():
+        for index in xrange(num_skus):
+            yield create_compute_product(model, layout, index);
+        for index in xrange(num_locations*NUM_OTHER_PRODUCTS_PER_LOCATION):
+            yield create_other_product(layout.m_locations[index//NUM_OTHER_PRODUCTS_PER_LOCATION], index);
+    write_json_object_entries(fptr, product_entries());
+    fptr.write('},\n  "terms" : {\n  "OnDemand" : {');
+    def on_demand_entries():
+        for index in xrange(num_skus):
+            sku_code, tenancy, hourly_price = get_sku_price(model, layout, index);
+            yield sku_code, create_term(sku_code, on_demand_code, [ (hourly_payment_code, 'Hrs', hourly_price) ]);
+    write_json_object_entries(fptr, on_demand_entries());
+    fptr.write('},\n  "Reserved" : {');
+    def reserved_entries():
+        for index in xrange(num_skus):
+            sku_code, tenancy, hourly_price = get_sku_price(model, layout, index);
+            #Dedicated hosts are not sold as reserved instances
+            if(tenancy != 'Host'):
+                yield sku_code, create_reserved_terms(model, sku_code, hourly_price);
+    write_json_object_entries(fptr, reserved_entries());
+    fptr.write('}\n  }\n}\n');
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic EC2 offer file with the structure of the AWS price list');
+    required_named_args_group = parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--aws_model_parameters_file', '-m', help='Path to AWS model parameters file', required=True);
+    required_named_args_group.add_argument('--num_skus', '-n', help='Number of compute instance SKUs', required=True, type=int);
+    parser.add_argument('--output', '-o', help='Output file - default: stdout', default=None);
+    arguments = parser.parse_args();
+    model = parse_model_params_file(arguments.aws_model_parameters_file);
+    fptr = open(arguments.output, 'wb') if arguments.output else sys.stdout;
+    generate_ec2_offer_file(fptr, model['compute'], arguments.num_skus);
+    if(arguments.output):
+        fptr.close();
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import math
+
+#Minimum cost covering of a core count by a multiset of instance/server types (an unbounded covering knapsack).
+#
+#Let b be the type with the lowest cost per usable core. Among any u_b instances of other types there is a subset whose cores
+#add up to a multiple of u_b, which can be replaced by copies of b at no higher cost - so some optimal fleet has fewer than u_b
+#instances of other types and they cover at most (u_b-1)*u_max cores. The DP therefore only runs over that residual instead of
+#over num_cores, which keeps it fast for 100k+ cores. Only one type per distinct size (the cheapest) can be in an optimal fleet,
+#so hundreds of types reduce to at most u_max sizes.
+
+def reduce_cover_items(items):
+    #items: list of (num_usable_cores, cost) - returns [ (num_usable_cores, cost, item_index) ] with the cheapest item per size
+    #(earliest on ties) and without items beaten by a larger item that costs no more
+    best_per_size = {};
+    for item_index, (size, cost) in enumerate(items):
+        if(size < 1):
+            continue;
+        if(size not in best_per_size or cost < best_per_size[size][1]):
+            best_per_size[size] = (size, cost, item_index);
+    reduced_items = [];
+    min_cost_of_larger = None;
+    for size in sorted(best_per_size.keys(), reverse=True):
+        size, cost, item_index = best_per_size[size];
+        if(min_cost_of_larger is not None and min_cost_of_larger <= cost):
+            continue;
+        reduced_items.append((size, cost, item_index));
+        min_cost_of_larger = cost if min_cost_of_larger is None else min(min_cost_of_larger, cost);
+    reduced_items.reverse();
+    return reduced_items;
+
+def compute_residual_cover_table(reduced_items, max_residual):
+    #min_costs[r] = minimum cost of covering at least r cores, choices[r] = position in reduced_items of the last item used
+    min_costs = [ 0.0 ]*(max_residual+1);
+    choices = [ -1 ]*(max_residual+1);
+    for residual in xrange(1, max_residual+1):
+        best_cost = None;
+        best_choice = -1;
+        for position, (size, cost, item_index) in enumerate(reduced_items):
+            curr_cost = cost+min_costs[residual-size if residual > size else 0];
+            if(best_cost is None or curr_cost < best_cost):
+                best_cost = curr_cost;
+                best_choice = position;
+        min_costs[residual] = best_cost;
+        choices[residual] = best_choice;
+    return min_costs, choices;
+
+def enumerate_cover_solutions(items, demand):
+    #Returns [ (estimated_cost, { item_index: count }) ] - the best fleet for every feasible number of instances of the type with the
+    #lowest cost per core, cheapest first. Callers that price fleets non-linearly (racks, discounts) can evaluate several of them.
+    reduced_items = reduce_cover_items(items);
+    if(len(reduced_items) == 0):
+        return [];
+    demand = int(math.ceil(demand));
+    if(demand <= 0):
+        return [ (0.0, {}) ];
+    best_position = min(range(len(reduced_items)),
+            key=lambda position: (float(reduced_items[position][1])/reduced_items[position][0], position));
+    best_size, best_cost, best_item_index = reduced_items[best_position];
+    max_size = max([ size for size, cost, item_index in reduced_items ]);
+    max_residual = min(demand, (best_size-1)*max_size);
+    min_costs, choices = compute_residual_cover_table(reduced_items, max_residual);
+    solutions = [];
+    min_count = max(0, int(math.ceil(float(demand-max_residual)/best_size)));
+    max_count = int(math.ceil(float(demand)/best_size));
+    for count in xrange(min_count, max_count+1):
+        residual = max(0, demand-count*best_size);
+        counts = {};
+        if(count > 0):
+            counts[best_item_index] = count;
+        remaining = residual;
+        while(remaining > 0):
+            size, cost, item_index = reduced_items[choices[remaining]];
+            counts[item_index] = counts.get(item_index, 0)+1;
+            remaining -= size;
+        solutions.append((count*best_cost+min_costs[residual], counts));
+    solutions.sort(key=lambda solution: solution[0]);
+    return solutions;
+
+def solve_min_cost_cover(items, demand):
+    #Returns (estimated_cost, { item_index: count }) or None if no item has a usable core
+    solutions = enumerate_cover_solutions(items, demand);
+    return solutions[0] if solutions else None;
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from collections import OrderedDict
+import amazon
+import ec2_pricing
+import amazon_batch
+import private_cloud_batch
+from ccc_model_common import parse_model_params_file
+
+#Monte Carlo sensitivity analysis of both cost models. A parameter is either a workload input ('core_utilization') or a
+#numeric model field addressed by provider and path ('private_cloud.compute.server_discount_percentage',
+#'private_cloud.compute.server_params.0.base_cost'). Sampled model fields are substituted as (S,1) columns, so a whole
+#batch of draws is priced by one call of each batch engine. Fields the batch engines only read as Python scalars (tier
+#tables, EBS tier filters) cannot be sampled.
+
+PROVIDERS = [ 'private_cloud', 'aws' ];
+#Inputs of the batch engines
+PRIVATE_CLOUD_BATCH_INPUTS = [ 'num_cores', 'memory_per_core', 'storage', 'bandwidth', 'bandwidth_utilization', 'operating_period_in_years',
+        'private_cloud_hosting', 'storage_type', 'backup_percentage_per_month', 'include_IT_cost' ];
+AWS_BATCH_INPUTS = [ 'num_cores', 'memory_per_core', 'storage', 'bandwidth', 'bandwidth_utilization', 'operating_period_in_years',
+        'core_utilization', 'storage_utilization', 'backup_percentage_per_month', 'iops_per_GB_requested', 'storage_bandwidth_per_TB_requested',
+        'aws_support' ];
+#Inputs that only select tiers or options and cannot vary within a batch
+NON_SAMPLED_INPUTS = [ 'private_cloud_hosting', 'storage_type', 'include_IT_cost', 'iops_per_GB_requested', 'storage_bandwidth_per_TB_requested',
+        'aws_support' ];
+#Tier tables the AWS batch engine takes compiled from the pricing catalog - sampling them would have no effect
+NON_SAMPLED_MODEL_FIELDS = [ ('aws', [ 'compute', 'reserved_discount_tiers' ]), ('aws', [ 'network', 'pricing_tiers' ]), ('aws', [ 'support' ]) ];
+DEFAULT_PERCENTILES = [ 5, 10, 25, 50, 75, 90, 95 ];
+DEFAULT_NUM_SAMPLES = 100000;
+#Draws priced per call of the batch engines - the AWS engine allocates a few (batch size x EC2 candidates) arrays
+DEFAULT_BATCH_SIZE = 8192;
+#The tornado moves one parameter at a time from its median to these percentiles of its distribution
+DEFAULT_TORNADO_PERCENTILES = (10, 90);
+
+def draw_samples(distribution, num_samples, random_state):
+    distribution_type = distribution['type'];
+    if(distribution_type == 'uniform'):
+        samples = random_state.uniform(distribution['low'], distribution['high'], num_samples);
+    elif(distribution_type == 'triangular'):
+        samples = random_state.triangular(distribution['low'], distribution['mode'], distribution['high'], num_samples);
+    elif(distribution_type == 'normal'):
+        samples = random_state.normal(distribution['mean'], distribution['std'], num_samples);
+    elif(distribution_type == 'lognormal'):
+        #mean and sigma of the underlying normal distribution
+        samples = random_state.lognormal(distribution['mean'], distribution['sigma'], num_samples);
+    elif(distribution_type == 'discrete'):
+        probabilities = None;
+        if('weights' in distribution):
+            probabilities = np.asarray(distribution['weights'], dtype=np.float64);
+            probabilities = probabilities/probabilities.sum();
+        samples = random_state.choice(np.asarray(distribution['values'], dtype=np.float64), num_samples, p=probabilities);
+    else:
+        raise ValueError('Unknown distribution type : %s'%(distribution_type));
+    if('min' in distribution or 'max' in distribution):
+        samples = np.clip(samples, distribution.get('min', -np.inf), distribution.get('max', np.inf));
+    return samples;
+
+def parse_parameter_name(name):
+    #Returns (provider, path) for model fields and (None, name) for inputs
+    parts = name.split('.');
+    if(parts[0] in PROVIDERS and len(parts) > 1):
+        path = [ int(part) if part.isdigit() else part for part in parts[1:] ];
+        for provider, field_path in NON_SAMPLED_MODEL_FIELDS:
+            if(parts[0] == provider and path[:len(field_path)] == field_path):
+                raise ValueError('Parameter cannot be sampled : %s'%(name));
+        return (parts[0], path);
+    if(name not in PRIVATE_CLOUD_BATCH_INPUTS and name not in AWS_BATCH_INPUTS):
+        raise ValueError('Unknown parameter : %s'%(name));
+    if(name in NON_SAMPLED_INPUTS):
+        raise ValueError('Parameter cannot be sampled : %s'%(name));
+    return (None, name);
+
+def set_model_field(model, path, value):
+    #Returns a copy of model with the field at path replaced - only the dicts/lists along the path are copied
+    if(len(path) == 0):
+        if(isinstance(model, bool) or not isinstance(model, (int, long, float))):
+            raise ValueError('Only numeric model fields can be sampled');
+        return value;
+    if(isinstance(model, list)):
+        if(not isinstance(path[0], int) or path[0] >= len(model)):
+            raise ValueError('Unknown model field : %s'%(str(path[0])));
+        model_copy = list(model);
+    else:
+        if(not isinstance(model, dict) or path[0] not in model):
+            raise ValueError('Unknown model field : %s'%(str(path[0])));
+        model_copy = dict(model);
+    model_copy[path[0]] = set_model_field(model[path[0]], path[1:], value);
+    return model_copy;
+
+class MonteCarloContext:
+
+    #Fixed inputs and models of both providers, and the distributions of the sampled parameters
+    def __init__(self, scenario, distributions, private_cloud_model, aws_model, ec2_pricing_model):
+        #An input the batch engines ignore would make the totals differ from compute_tco for the same scenario - unset
+        #(None or False) options are harmless
+        unsupported_keys = [ key for key, value in scenario.iteritems() if key not in PRIVATE_CLOUD_BATCH_INPUTS and key not in AWS_BATCH_INPUTS
+                and value is not None and value is not False ];
+        if(len(unsupported_keys) > 0):
+            raise ValueError('Scenario inputs not supported by the batch engines : %s'%(', '.join(sorted(unsupported_keys))));
+        self.m_scenario = scenario;
+        self.m_distributions = OrderedDict(distributions);
+        self.m_parameters = OrderedDict([ (name, parse_parameter_name(name)) for name in self.m_distributions ]);
+        self.m_models = { 'private_cloud': private_cloud_model, 'aws': aws_model };
+        self.m_price_matrix = amazon_batch.Ec2PriceMatrix(amazon.PricingCatalog(aws_model, ec2_pricing_model));
+        #Check the paths once on the point estimates
+        for name, (provider, path) in self.m_parameters.iteritems():
+            if(provider):
+                set_model_field(self.m_models[provider], path, 0);
+
+    def get_inputs(self, input_names, parameter_values, num_samples):
+        inputs = OrderedDict();
+        for name in input_names:
+            if(name in parameter_values):
+                inputs[name] = parameter_values[name];
+            elif(name in self.m_scenario):
+                value = self.m_scenario[name];
+                inputs[name] = value if (name in NON_SAMPLED_INPUTS or value is None) else np.full(num_samples, value, dtype=np.float64);
+        return inputs;
+
+    def get_model(self, provider, parameter_values):
+        model = self.m_models[provider];
+        for name, (parameter_provider, path) in self.m_parameters.iteritems():
+            if(parameter_provider == provider):
+                model = set_model_field(model, path, parameter_values[name].reshape(-1, 1));
+        return model;
+
+    def evaluate(self, parameter_values, num_samples):
+        #parameter_values: { parameter name: (S,) array } - returns the (S,) cost summaries of both providers
+        private_cloud_model = self.get_model('private_cloud', parameter_values);
+        private_cloud_result = private_cloud_batch.compute_tco_batch(private_cloud_model,
+                server_arrays=private_cloud_batch.create_server_params_arrays(private_cloud_model),
+                **self.get_inputs(PRIVATE_CLOUD_BATCH_INPUTS, parameter_values, num_samples));
+        aws_result = amazon_batch.compute_tco_batch(self.get_model('aws', parameter_values), self.m_price_matrix,
+                **self.get_inputs(AWS_BATCH_INPUTS, parameter_values, num_samples));
+        return (private_cloud_result['summary'], aws_result['summary']);
+
+def create_distribution_summary(values, percentiles):
+    values = values[np.isfinite(values)];
+    summary_dict = OrderedDict();
+    summary_dict['num_samples'] = int(values.size);
+    if(values.size == 0):
+        return summary_dict;
+    summary_dict['mean'] = float(np.mean(values));
+    summary_dict['std'] = float(np.std(values));
+    summary_dict['min'] = float(np.min(values));
+    summary_dict['max'] = float(np.max(values));
+    summary_dict['percentiles'] = OrderedDict([ ('p%g'%(percentile), float(value))
+        for percentile, value in zip(percentiles, np.percentile(values, percentiles)) ]);
+    return summary_dict;
+
+def compute_tornado(context, parameter_samples, tornado_percentiles=DEFAULT_TORNADO_PERCENTILES):
+    #Row 0 has every parameter at its median, rows 2i+1 and 2i+2 move parameter i to the low and high percentiles.
+    #All rows are priced in one batch.
+    names = list(parameter_samples.keys());
+    num_rows = 1+2*len(names);
+    parameter_values = OrderedDict();
+    for idx, name in enumerate(names):
+        median, low, high = np.percentile(parameter_samples[name], [ 50, tornado_percentiles[0], tornado_percentiles[1] ]);
+        values = np.full(num_rows, median, dtype=np.float64);
+        values[2*idx+1] = low;
+        values[2*idx+2] = high;
+        parameter_values[name] = values;
+    private_cloud_summary, aws_summary = context.evaluate(parameter_values, num_rows);
+    private_cloud_cost = private_cloud_summary['total_cost'];
+    aws_cost = aws_summary['total_cost'];
+    difference = aws_cost-private_cloud_cost;
+    tornado_dict = OrderedDict();
+    tornado_dict['percentiles'] = list(tornado_percentiles);
+    tornado_dict['base'] = OrderedDict([ ('private_cloud_cost', float(private_cloud_cost[0])), ('aws_cost', float(aws_cost[0])),
+        ('difference', float(difference[0])) ]);
+    parameters = [];
+    for idx, name in enumerate(names):
+        low_row, high_row = 2*idx+1, 2*idx+2;
+        parameter_dict = OrderedDict();
+        parameter_dict['parameter'] = name;
+        parameter_dict['values'] = [ float(parameter_values[name][low_row]), float(parameter_values[name][high_row]) ];
+        parameter_dict['private_cloud_cost'] = [ float(private_cloud_cost[low_row]), float(private_cloud_cost[high_row]) ];
+        parameter_dict['aws_cost'] = [ float(aws_cost[low_row]), float(aws_cost[high_row]) ];
+        parameter_dict['difference'] = [ float(difference[low_row]), float(difference[high_row]) ];
+        parameter_dict['swing'] = abs(parameter_dict['difference'][1]-parameter_dict['difference'][0]);
+        parameters.append(parameter_dict);
+    #Largest effect on (AWS - private cloud) first
+    parameters.sort(key=lambda parameter_dict: -parameter_dict['swing'] if np.isfinite(parameter_dict['swing']) else 0);
+    tornado_dict['parameters'] = parameters;
+    return tornado_dict;
+
+def run_montecarlo(context, num_samples=DEFAULT_NUM_SAMPLES, seed=None, batch_size=DEFAULT_BATCH_SIZE, percentiles=DEFAULT_PERCENTILES,
+        tornado_percentiles=DEFAULT_TORNADO_PERCENTILES):
+    start_time = time.time();
+    random_state = np.random.RandomState(seed);
+    parameter_samples = OrderedDict([ (name, draw_samples(distribution, num_samples, random_state))
+        for name, distribution in context.m_distributions.iteritems() ]);
+    summaries = { 'private_cloud': OrderedDict(), 'aws': OrderedDict() };
+    for batch_start in range(0, num_samples, batch_size):
+        batch_end = min(num_samples, batch_start+batch_size);
+        batch_values = OrderedDict([ (name, samples[batch_start:batch_end]) for name, samples in parameter_samples.iteritems() ]);
+        for provider, summary in zip(PROVIDERS, context.evaluate(batch_values, batch_end-batch_start)):
+            for key, values in summary.iteritems():
+                #Costs that do not apply (IT without include_IT_cost) are None, as in compute_tco
+                summaries[provider].setdefault(key, []).append(np.broadcast_to(values, (batch_end-batch_start,))
+                        if values is not None else None);
+    result = OrderedDict();
+    result['num_samples'] = num_samples;
+    result['seed'] = seed;
+    for provider in PROVIDERS:
+        provider_dict = OrderedDict();
+        for key, value_list in summaries[provider].iteritems():
+            provider_dict[key] = create_distribution_summary(np.concatenate(value_list), percentiles) if value_list[0] is not None else None;
+        result[provider] = provider_dict;
+    private_cloud_cost = np.concatenate(summaries['private_cloud']['total_cost']);
+    aws_cost = np.concatenate(summaries['aws']['total_cost']);
+    is_feasible = np.isfinite(private_cloud_cost) & np.isfinite(aws_cost);
+    result['num_infeasible_samples'] = int(num_samples-np.count_nonzero(is_feasible));
+    result['difference'] = create_distribution_summary(aws_cost[is_feasible]-private_cloud_cost[is_feasible], percentiles);
+    result['probability_private_cloud_wins'] = float(np.mean(private_cloud_cost[is_feasible] < aws_cost[is_feasible])) \
+            if np.any(is_feasible) else None;
+    result['tornado'] = compute_tornado(context, parameter_samples, tornado_percentiles) if parameter_samples else None;
+    result['wall_time_s'] = time.time()-start_time;
+    return result;
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo sensitivity analysis of the private cloud and AWS cost models');
+    required_named_args_group = parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--spec', help='JSON file with the fixed "scenario" inputs and the "distributions" of the'
+            ' sampled parameters', required=True);
+    required_named_args_group.add_argument('--pvt_cloud_model_parameters_file', help='Path to private cloud model parameters file',
+            required=True);
+    required_named_args_group.add_argument('--aws_model_parameters_file', help='Path to AWS model parameters file', required=True);
+    parser.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+    parser.add_argument('--ec2_pricing_index_file', help='Path to a pricing index created by "ec2_pricing.py build-index"', default=None);
+    parser.add_argument('--num_samples', '-n', help='Number of draws - default: %d'%(DEFAULT_NUM_SAMPLES), default=DEFAULT_NUM_SAMPLES,
+            type=int);
+    parser.add_argument('--seed', help='Seed of the random number generator - default: random', default=None, type=int);
+    parser.add_argument('--batch_size', help='Draws priced per batch - default: %d'%(DEFAULT_BATCH_SIZE), default=DEFAULT_BATCH_SIZE, type=int);
+    parser.add_argument('--percentiles', nargs='+', type=float, default=DEFAULT_PERCENTILES,
+            help='Reported percentiles - default: %s'%(' '.join([ str(percentile) for percentile in DEFAULT_PERCENTILES ])));
+    parser.add_argument('--tornado_percentiles', nargs=2, type=float, default=list(DEFAULT_TORNADO_PERCENTILES),
+            help='Low and high percentiles of every parameter in the tornado - default: %g %g'%DEFAULT_TORNADO_PERCENTILES);
+    parser.add_argument('--output', '-o', help='Output file - default: stdout', default=None);
+    arguments = parser.parse_args();
+    if(not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file):
+        parser.error('one of --ec2_pricing_json_file or --ec2_pricing_index_file is required');
+    if(arguments.num_samples < 1 or arguments.batch_size < 1):
+        parser.error('--num_samples and --batch_size must be positive');
+    spec = parse_model_params_file(arguments.spec);
+    private_cloud_model = parse_model_params_file(arguments.pvt_cloud_model_parameters_file);
+    aws_model = parse_model_params_file(arguments.aws_model_parameters_file);
+    if(arguments.ec2_pricing_index_file):
+        ec2_pricing_model = ec2_pricing.load_pricing_index(arguments.ec2_pricing_index_file, aws_model['compute'],
+                ec2_pricing_json_file=arguments.ec2_pricing_json_file);
+    else:
+        ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(arguments.ec2_pricing_json_file, aws_model['compute']);
+    try:
+        context = MonteCarloContext(spec.get('scenario', {}), spec.get('distributions', {}), private_cloud_model, aws_model,
+                ec2_pricing_model);
+    except ValueError as e:
+        parser.error(str(e));
+    result = run_montecarlo(context, num_samples=arguments.num_samples, seed=arguments.seed, batch_size=arguments.batch_size,
+            percentiles=arguments.percentiles, tornado_percentiles=tuple(arguments.tornado_percentiles));
+    fptr = open(arguments.output, 'wb') if arguments.output else sys.stdout;
+    fptr.write(json.dumps(result, indent=4, separators=(',', ': '))+'\n');
+    if(arguments.output):
+        fptr.close();
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+#Pareto frontier (skyline) of compute configurations.
+#
+#Every objective is turned into one to minimize by negating the maximized ones. The points are sorted lexicographically - a point can
+#then only be dominated by points before it, so each point only has to be compared with the skyline found so far (sort-filter skyline).
+#The sorted points are filtered a block at a time with numpy: a block is compared with the skyline and with itself in one broadcast.
+#A point dominated by a dominated point of its block is also dominated by whatever dominates that one (dominance is transitive), so
+#the block needs no sequential pass. That is O(n*(s+b)) comparisons for n points, a skyline of s points and blocks of b points, which
+#stays fast for thousands of candidates per query.
+
+SKYLINE_BLOCK_SIZE = 256;
+#(objective, direction) - 1 is minimized, -1 is maximized. Spare cores and memory are what rounding up to whole machines adds.
+FRONTIER_OBJECTIVES = [ ('total_cost', 1), ('spare_cores', -1), ('spare_memory', -1), ('num_machines', 1), ('num_racks', 1),
+        ('total_power', 1) ];
+
+def create_objective_points(objective_columns, objectives=FRONTIER_OBJECTIVES):
+    #objective_columns: { objective: values per configuration } - objectives without a column (e.g. the racks of cloud instances)
+    #are left out. Returns an (n, d) array of values to minimize.
+    columns = [ direction*np.asarray(objective_columns[objective], dtype=np.float64) for objective, direction in objectives
+            if objective in objective_columns ];
+    return np.column_stack(columns);
+
+def find_dominated(points, other_points):
+    #is_dominated[i] is True if a row of other_points is no worse than points[i] in every objective and better in at least one
+    no_worse = np.all(other_points[np.newaxis, :, :] <= points[:, np.newaxis, :], axis=2);
+    better = np.any(other_points[np.newaxis, :, :] < points[:, np.newaxis, :], axis=2);
+    return np.any(no_worse & better, axis=1);
+
+def find_skyline(points):
+    #points: (n, d) array of objectives to minimize - returns the indices of the non-dominated points in lexicographic order of
+    #their objectives. Points with identical objectives do not dominate each other and are all kept.
+    points = np.asarray(points, dtype=np.float64);
+    num_points = points.shape[0];
+    if(num_points == 0):
+        return np.zeros(0, dtype=np.int64);
+    order = np.lexsort(points.T[::-1]);
+    sorted_points = points[order];
+    skyline = sorted_points[:0];
+    skyline_positions = [];
+    for block_start in xrange(0, num_points, SKYLINE_BLOCK_SIZE):
+        block = sorted_points[block_start:block_start+SKYLINE_BLOCK_SIZE];
+        is_dominated = find_dominated(block, block);
+        if(len(skyline) > 0):
+            is_dominated |= find_dominated(block, skyline);
+        kept_positions = np.flatnonzero(~is_dominated);
+        skyline = np.concatenate([ skyline, block[kept_positions] ]);
+        skyline_positions.append(kept_positions+block_start);
+    return order[np.concatenate(skyline_positions)];
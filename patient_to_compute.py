@@ -3,11 +3,27 @@
 import private_cloud;
 import amazon;
 import ccc_model_common;
+import ec2_pricing;
+from tco_profile import Profiler
+from tco_profile import profile_stage
+from tco_profile import dump_cost_dict
+from ccc_model_common import NoServerConfigurationFound
 import argparse;
 import sys;
+import csv;
 import math;
 import json;
 from collections import OrderedDict
+from ccc_model_common import get_configuration_name
+
+#Streaming mode: configurations are read one at a time from a JSONL or CSV file and every result row is written as soon as
+#it is computed, so memory does not grow with the number of configurations
+PATIENTS_STATS_KEYS = [ 'num_patients_per_year', 'num_samples_per_patient_per_year', 'num_samples_processed_per_core_per_day',
+        'storage_per_sample' ];
+#The rows carry the inputs the costs were computed with, so that 'ec2_pricing.py refresh' can reprice them
+STREAM_RESULT_KEYS = [ 'name', 'provider', 'num_patients_per_year', 'num_samples_per_patient_per_year', 'num_cores', 'memory_per_core',
+        'operating_period_in_years', 'core_utilization', 'raw_storage_in_TB', 'usable_storage_in_TB', 'compute', 'storage', 'network',
+        'support', 'IT', 'total_cost', 'configuration', 'error' ];
 
 def determine_cores_and_storage(patients_stats_dict, operating_period_in_years=3):
     num_samples_per_year = patients_stats_dict['num_patients_per_year']*patients_stats_dict['num_samples_per_patient_per_year'];
@@ -28,54 +44,204 @@ def modify_cost_dict(cost_dict, name, config_dict, params):
         cost_dict['name'] = name;
         cost_dict['summary'] = summary_dict;
 
+def parse_number(value):
+    try:
+        return int(value);
+    except ValueError:
+        return float(value);
+
+def read_configurations_jsonl(fptr):
+    for line in fptr:
+        if(line.strip()):
+            yield json.loads(line, object_pairs_hook=OrderedDict);
+
+def read_configurations_csv(fptr):
+    #One configuration per row with a header row - the patients stats columns are numbers, 'name' (optional) is kept as is
+    for row in csv.DictReader(fptr):
+        config = OrderedDict();
+        for key, value in row.iteritems():
+            if(key is None or value is None or value == ''):
+                continue;
+            config[key] = parse_number(value) if key in PATIENTS_STATS_KEYS else value;
+        yield config;
+
+def get_input_format(filename):
+    if(filename.endswith('.jsonl') or filename.endswith('.ndjson')):
+        return 'jsonl';
+    if(filename.endswith('.csv')):
+        return 'csv';
+    return 'json';
+
+class ModelState:
+
+    #Models and pricing shared by all configurations
+    def __init__(self, arguments, profiler=None):
+        with profile_stage(profiler, 'load_model_parameters'):
+            self.m_pvt_cloud_model = ccc_model_common.parse_model_params_file(arguments.pvt_cloud_model_parameters_file);
+            self.m_aws_model = ccc_model_common.parse_model_params_file(arguments.aws_model_parameters_file);
+        with profile_stage(profiler, 'load_ec2_pricing'):
+            if(arguments.ec2_pricing_index_file):
+                self.m_ec2_pricing_dict = ec2_pricing.load_pricing_index(arguments.ec2_pricing_index_file, self.m_aws_model['compute'],
+                        ec2_pricing_json_file=arguments.ec2_pricing_json_file);
+            else:
+                self.m_ec2_pricing_dict = ec2_pricing.load_ec2_pricing_model(arguments.ec2_pricing_json_file, self.m_aws_model['compute'],
+                        profiler=profiler);
+        with profile_stage(profiler, 'aws.create_pricing_catalog'):
+            self.m_pricing_catalog = amazon.PricingCatalog(self.m_aws_model, self.m_ec2_pricing_dict);
+        self.m_compiled_pvt_cloud_model = private_cloud.CompiledPrivateCloudModel(self.m_pvt_cloud_model);
+
+def compute_private_cloud_configuration_cost(model_state, config, config_name, arguments, profiler=None, row_inputs=None):
+    #row_inputs (optional OrderedDict) is filled with the scenario inputs the costs are computed with
+    num_cores, usable_storage = determine_cores_and_storage(config, arguments.operating_period);
+    storage = ccc_model_common.determine_raw_storage(model_state.m_pvt_cloud_model, usable_storage);
+    pvt_config = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=model_state.m_pvt_cloud_model, num_cores=num_cores,
+            memory_per_core=arguments.memory_per_core, storage=storage, bandwidth=arguments.bandwidth,
+            bandwidth_utilization=arguments.bandwidth_utilization, include_IT_cost=arguments.include_IT_cost,
+            operating_period_in_years=arguments.operating_period, profiler=profiler);
+    if(row_inputs is not None):
+        row_inputs['memory_per_core'] = pvt_config.m_memory_per_core;
+        row_inputs['operating_period_in_years'] = pvt_config.m_operating_period_in_years;
+    pvt_cost_dict = private_cloud.compute_tco(pvt_config, do_print=False, compiled_model=model_state.m_compiled_pvt_cloud_model);
+    modify_cost_dict(pvt_cost_dict, config_name, config, OrderedDict([('num_cores', num_cores), ('raw_storage_in_TB', storage),
+        ('usable_storage_in_TB', usable_storage)]));
+    return pvt_cost_dict;
+
+def compute_aws_configuration_cost(model_state, config, config_name, arguments, profiler=None, row_inputs=None):
+    #The raw storage is sized with the private cloud model so that both providers store the same data
+    num_cores, usable_storage = determine_cores_and_storage(config, arguments.operating_period);
+    storage = ccc_model_common.determine_raw_storage(model_state.m_pvt_cloud_model, usable_storage);
+    aws_config = amazon.AmazonArgumentsHandler(model_parameters_dict=model_state.m_aws_model, ec2_pricing_dict=model_state.m_ec2_pricing_dict,
+            num_cores=num_cores, memory_per_core=arguments.memory_per_core, storage=storage, bandwidth=arguments.bandwidth,
+            bandwidth_utilization=arguments.bandwidth_utilization, aws_support=arguments.aws_support, profiler=profiler);
+    if(row_inputs is not None):
+        row_inputs['memory_per_core'] = aws_config.m_memory_per_core;
+        row_inputs['operating_period_in_years'] = aws_config.m_operating_period_in_years;
+        row_inputs['core_utilization'] = aws_config.m_core_utilization;
+    aws_cost_dict = amazon.compute_tco(aws_config, do_print=False, pricing_catalog=model_state.m_pricing_catalog);
+    modify_cost_dict(aws_cost_dict, config_name, config, OrderedDict([('num_cores', num_cores), ('raw_storage_in_TB', storage),
+        ('usable_storage_in_TB', usable_storage) ]));
+    return aws_cost_dict;
+
+def compute_configuration_costs(model_state, config, config_name, arguments, profiler=None):
+    #Returns (private cloud cost dict, AWS cost dict) of one patients configuration
+    return (compute_private_cloud_configuration_cost(model_state, config, config_name, arguments, profiler=profiler),
+            compute_aws_configuration_cost(model_state, config, config_name, arguments, profiler=profiler));
+
+def create_result_rows(model_state, config, config_name, arguments, profiler=None):
+    #One flat row per provider - a provider without a feasible server gets a row with an 'error' instead of costs
+    rows = [];
+    for provider, compute_function in [ ('private_cloud', compute_private_cloud_configuration_cost), ('aws', compute_aws_configuration_cost) ]:
+        row = OrderedDict([ ('name', config_name), ('provider', provider) ]);
+        row_inputs = OrderedDict();
+        try:
+            cost_dict = compute_function(model_state, config, config_name, arguments, profiler=profiler, row_inputs=row_inputs);
+        except NoServerConfigurationFound as e:
+            row.update(row_inputs);
+            row['error'] = e.value;
+            rows.append(row);
+            continue;
+        row.update(cost_dict['summary']);
+        row.update(row_inputs);
+        row['configuration'] = get_configuration_name(provider, cost_dict['compute']);
+        rows.append(row);
+    return rows;
+
+class NDJSONResultWriter:
+
+    def __init__(self, fptr):
+        self.m_fptr = fptr;
+
+    def write(self, row):
+        self.m_fptr.write(json.dumps(row)+'\n');
+        self.m_fptr.flush();
+
+class CSVResultWriter:
+
+    def __init__(self, fptr):
+        self.m_fptr = fptr;
+        self.m_writer = csv.DictWriter(fptr, STREAM_RESULT_KEYS, restval='', extrasaction='ignore');
+        self.m_writer.writeheader();
+
+    def write(self, row):
+        self.m_writer.writerow(row);
+        self.m_fptr.flush();
+
+def stream_configurations(model_state, configurations, result_writer, arguments, profiler=None):
+    num_configurations = 0;
+    for config in configurations:
+        config_name = config['name'] if ('name' in config) else str(num_configurations);
+        for row in create_result_rows(model_state, config, config_name, arguments, profiler=profiler):
+            result_writer.write(row);
+        num_configurations += 1;
+    return num_configurations;
+
 def main():
     parser = argparse.ArgumentParser(description='Patients to compute calculator');
     required_named_args_group = parser.add_argument_group('Required named arguments');
-    required_named_args_group.add_argument('--patients_file', help='JSON file containing patients stats', required=True);
+    required_named_args_group.add_argument('--patients_file', help='File containing patients stats - JSON with a "configurations" list,'
+            ' or one configuration per line (.jsonl/.ndjson) or per row (.csv) which are read as a stream', required=True);
     required_named_args_group.add_argument('--pvt_cloud_model_parameters_file', help='Path to cloud model parameters file', required=True);
     required_named_args_group.add_argument('--aws_model_parameters_file', help='Path to cloud model parameters file', required=True);
-    required_named_args_group.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', required=True);
+    required_named_args_group.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+    required_named_args_group.add_argument('--ec2_pricing_index_file',
+            help='Path to a pricing index created by "ec2_pricing.py build-index" (can be used instead of --ec2_pricing_json_file)',
+            default=None);
     required_named_args_group.add_argument('--memory_per_core', help='Memory/RAM (in GB) per core', required=True, type=int);
     required_named_args_group.add_argument('--bandwidth', '-b', help='External bandwidth (in Mbps)', required=True, type=int);
     required_named_args_group.add_argument('--bandwidth_utilization', help='Percentage of external bandwidth used', required=True, type=float);
     parser.add_argument('--operating_period', help='Operating period in years - default: 3 years', default=3, type=int);
     parser.add_argument('--include_IT_cost', help='Include IT cost (default: False)', action='store_true');
     parser.add_argument('--aws_support', choices=['business', 'enterprise'], default=None);
+    parser.add_argument('--profile', help='Add wall time, peak memory and candidate counts per stage to the output', action='store_true');
+    parser.add_argument('--input_format', help='Format of the patients file - default: from the file extension, "-" reads JSONL from stdin',
+            default=None, choices=['json', 'jsonl', 'csv']);
+    parser.add_argument('--output_format', help='json(default): all cost dicts followed by the CSV summaries once every configuration is'
+            ' done, ndjson or csv: one summary row per configuration and provider, written as it is computed', default='json',
+            choices=['json', 'ndjson', 'csv']);
+    parser.add_argument('--output', '-o', help='Output file - default: stdout', default=None);
     arguments = parser.parse_args();
-    patients_dict = ccc_model_common.parse_model_params_file(arguments.patients_file);
-    pvt_cloud_model = ccc_model_common.parse_model_params_file(arguments.pvt_cloud_model_parameters_file);
-    aws_model = ccc_model_common.parse_model_params_file(arguments.aws_model_parameters_file);
-    ec2_pricing_dict = ccc_model_common.parse_model_params_file(arguments.ec2_pricing_json_file);
-    pvt_cost_dict_list = [];
-    aws_cost_dict_list = [];
-    config_idx = 0;
-    for config in patients_dict['configurations']:
-        config_name = config['name'] if ('name' in config) else str(config_idx);
-        num_cores, usable_storage = determine_cores_and_storage(config, arguments.operating_period);
-        storage = ccc_model_common.determine_raw_storage(pvt_cloud_model, usable_storage);
-        pvt_config = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=pvt_cloud_model, num_cores=num_cores,
-                memory_per_core=arguments.memory_per_core, storage=storage, bandwidth=arguments.bandwidth,
-                bandwidth_utilization=arguments.bandwidth_utilization, include_IT_cost=arguments.include_IT_cost,
-                operating_period_in_years=arguments.operating_period);
-        cost_dict = private_cloud.compute_tco(pvt_config, do_print=False);
-        modify_cost_dict(cost_dict, config_name, config, OrderedDict([('num_cores', num_cores), ('raw_storage_in_TB', storage),
-            ('usable_storage_in_TB', usable_storage)]));
-        pvt_cost_dict_list.append(cost_dict);
-        aws_config = amazon.AmazonArgumentsHandler(model_parameters_dict=aws_model, ec2_pricing_dict=ec2_pricing_dict,
-                num_cores=num_cores, memory_per_core=arguments.memory_per_core, storage=storage, bandwidth=arguments.bandwidth,
-                bandwidth_utilization=arguments.bandwidth_utilization, aws_support=arguments.aws_support);
-        cost_dict = amazon.compute_tco(aws_config, do_print=False);
-        modify_cost_dict(cost_dict, config_name, config, OrderedDict([('num_cores', num_cores), ('raw_storage_in_TB', storage),
-            ('usable_storage_in_TB', usable_storage) ]));
-        aws_cost_dict_list.append(cost_dict);
-        config_idx += 1;
-    complete_dict = OrderedDict();
-    complete_dict['private_cloud'] = pvt_cost_dict_list;
-    complete_dict['AWS'] = aws_cost_dict_list;
-    print(json.dumps(complete_dict, indent=4, separators=(',', ': ')));
-    sys.stdout.write('Private cloud');
-    ccc_model_common.print_cost_summary_csv(pvt_cost_dict_list);
-    sys.stdout.write('\nAWS');
-    ccc_model_common.print_cost_summary_csv(aws_cost_dict_list);
+    if(not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file):
+        parser.error('one of --ec2_pricing_json_file or --ec2_pricing_index_file is required');
+    input_format = arguments.input_format;
+    if(not input_format):
+        input_format = 'jsonl' if arguments.patients_file == '-' else get_input_format(arguments.patients_file);
+    profiler = Profiler() if arguments.profile else None;
+    model_state = ModelState(arguments, profiler=profiler);
+    output_fptr = open(arguments.output, 'wb') if arguments.output else sys.stdout;
+    patients_fptr = None;
+    if(input_format == 'json'):
+        with profile_stage(profiler, 'load_model_parameters'):
+            configurations = ccc_model_common.parse_model_params_file(arguments.patients_file)['configurations'];
+    else:
+        patients_fptr = sys.stdin if arguments.patients_file == '-' else open(arguments.patients_file, 'rb');
+        configurations = read_configurations_csv(patients_fptr) if input_format == 'csv' else read_configurations_jsonl(patients_fptr);
+    if(arguments.output_format != 'json'):
+        result_writer = CSVResultWriter(output_fptr) if arguments.output_format == 'csv' else NDJSONResultWriter(output_fptr);
+        num_configurations = stream_configurations(model_state, configurations, result_writer, arguments, profiler=profiler);
+        if(profiler is not None):
+            sys.stderr.write(json.dumps(profiler.get_profile(), indent=4, separators=(',', ': '))+'\n');
+        sys.stderr.write('Evaluated %d configurations\n'%(num_configurations));
+    else:
+        pvt_cost_dict_list = [];
+        aws_cost_dict_list = [];
+        config_idx = 0;
+        for config in configurations:
+            config_name = config['name'] if ('name' in config) else str(config_idx);
+            pvt_cost_dict, aws_cost_dict = compute_configuration_costs(model_state, config, config_name, arguments, profiler=profiler);
+            pvt_cost_dict_list.append(pvt_cost_dict);
+            aws_cost_dict_list.append(aws_cost_dict);
+            config_idx += 1;
+        complete_dict = OrderedDict();
+        complete_dict['private_cloud'] = pvt_cost_dict_list;
+        complete_dict['AWS'] = aws_cost_dict_list;
+        output_fptr.write(dump_cost_dict(complete_dict, profiler, indent=4, separators=(',', ': '))+'\n');
+        output_fptr.write('Private cloud');
+        ccc_model_common.print_cost_summary_csv(pvt_cost_dict_list, output_fptr);
+        output_fptr.write('\nAWS');
+        ccc_model_common.print_cost_summary_csv(aws_cost_dict_list, output_fptr);
+    if(patients_fptr is not None and patients_fptr is not sys.stdin):
+        patients_fptr.close();
+    if(arguments.output):
+        output_fptr.close();
 if __name__ == "__main__":
     main()
@@ -8,16 +8,31 @@ from collections import OrderedDict
 from ccc_model_common import ArgumentsHandler
 from ccc_model_common import NoServerConfigurationFound
 from ccc_model_common import determine_usable_storage
+from ccc_model_common import InvalidModelParameters
+from ccc_model_common import get_required_param
+from ccc_model_common import get_required_number
+from tco_cache import compute_stage
+from tco_cache import get_compiled_model
+from tco_profile import profile_stage
+from tco_profile import add_profile_count
+from tco_profile import dump_cost_dict
+from mixed_fleet import enumerate_cover_solutions
+from rack_packing import RackSpec
+from rack_packing import pack_racks
+from rack_packing import create_server_item_types
+from rack_packing import create_storage_shelf_item_type
 
 class PrivateCloudArgumentsHandler(ArgumentsHandler):
 
     m_private_cloud_hosting = 'colocation';
     m_storage_type = 'NAS';
+    m_shared_racks = False;
 
     def add_private_cloud_optional_arguments(self, parser):
         parser.add_argument('--private_cloud_hosting', '-p', help='Type of private cloud hosting - valid options are: colocation(default), on_premise',
                 default='colocation', choices=['colocation', 'on_premise']);
         parser.add_argument('--storage_type', help='Storage type - NAS(default) or SAN', default='NAS', choices=['SAN','NAS']);
+        parser.add_argument('--shared_racks', help='Pack servers and storage shelves into shared racks (default: False)', action='store_true');
 
     def __init__(self, argparse_obj=None, model_parameters_file=None, model_parameters_dict=None,
             num_cores=None, memory_per_core=None, storage=None, bandwidth=None, bandwidth_utilization=None,
@@ -31,6 +46,7 @@ class PrivateCloudArgumentsHandler(ArgumentsHandler):
             arguments = argparse_obj.parse_args();
             self.m_private_cloud_hosting = arguments.private_cloud_hosting;
             self.m_storage_type = arguments.storage_type;
+            self.m_shared_racks = arguments.shared_racks;
 
 def determine_num_usable_cores_in_server_type(server_info, memory_per_core):
     max_cores_in_server = server_info['sockets']*server_info['max_cores_per_socket']
@@ -139,26 +155,274 @@ def compute_IT_cost(model, cost_dict, operating_period_in_years):
             +IT_cost_dict['num_network_admins'])*IT_params['admin_annual_salary']*operating_period_in_years;
     return IT_cost_dict;
 
-def select_optimal_server_configuration(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost):
+class ServerType(object):
+
+    __slots__ = ('m_sockets', 'm_max_cores_in_server', 'm_max_memory', 'm_has_memory_pricing', 'm_base_cost', 'm_per_core', 'm_per_GB',
+            'm_base_memory', 'm_cost', 'm_max_num_servers_per_rack');
+
+    def __init__(self, model, server_info, path):
+        self.m_sockets = get_required_number(server_info, 'sockets', path);
+        self.m_max_cores_in_server = self.m_sockets*get_required_number(server_info, 'max_cores_per_socket', path);
+        self.m_max_memory = get_required_number(server_info, 'max_memory', path);
+        self.m_has_memory_pricing = ('base_cost' in server_info and 'per_GB' in server_info and 'per_core' in server_info \
+                and 'base_memory' in server_info);
+        if(self.m_has_memory_pricing):
+            self.m_base_cost = get_required_number(server_info, 'base_cost', path);
+            self.m_per_core = get_required_number(server_info, 'per_core', path);
+            self.m_per_GB = get_required_number(server_info, 'per_GB', path);
+            self.m_base_memory = get_required_number(server_info, 'base_memory', path);
+            self.m_cost = None;
+        else:
+            self.m_base_cost = self.m_per_core = self.m_per_GB = self.m_base_memory = None;
+            self.m_cost = get_required_number(server_info, 'cost', path);
+        if(get_required_number(server_info, 'rack_space', path) <= 0 or get_required_number(server_info, 'power', path) <= 0):
+            raise InvalidModelParameters('Model parameters %s.rack_space and %s.power must be positive'%(path, path));
+        self.m_max_num_servers_per_rack = determine_max_num_servers_per_rack(model, server_info['rack_space'], server_info['power']);
+
+class BandwidthPricing(object):
+
+    #One level of the bandwidth pricing of a hosting type - tiers are (limit, BandwidthPricing) and are searched like determine_bandwidth_cost
+    __slots__ = ('m_tiers', 'm_monthly_recurring_cost', 'm_price_per_Mbps');
+
+    def __init__(self, bandwidth_pricing_info, path):
+        self.m_tiers = [];
+        for tier_idx, tier_info in enumerate(bandwidth_pricing_info.get('bandwidth_cost_tiers', [])):
+            tier_path = '%s.bandwidth_cost_tiers.%d'%(path, tier_idx);
+            self.m_tiers.append((get_required_number(tier_info, 'limit', tier_path), BandwidthPricing(tier_info, tier_path)));
+        self.m_monthly_recurring_cost = bandwidth_pricing_info.get('monthly_recurring_cost');
+        self.m_price_per_Mbps = bandwidth_pricing_info.get('price_per_Mbps');
+
+    def __call__(self, bandwidth, bandwidth_utilization, operating_period_in_years):
+        for limit, tier_pricing in self.m_tiers:
+            if(bandwidth <= limit):
+                return tier_pricing(bandwidth, bandwidth_utilization, operating_period_in_years);
+        total_cost = 0;
+        if(self.m_monthly_recurring_cost is not None):
+            total_cost += operating_period_in_years*12*self.m_monthly_recurring_cost;
+        if(self.m_price_per_Mbps is not None):
+            total_cost += operating_period_in_years*12*self.m_price_per_Mbps*bandwidth*(float(bandwidth_utilization)/100)
+        return total_cost
+
+class CompiledPrivateCloudModel(object):
+
+    #Validates a private cloud model once and keeps the numbers the selectors need in plain attributes, with every factor that does
+    #not depend on the query folded in the same order as the dict based functions - so both give identical costs
+    __slots__ = ('m_model', 'm_server_types', 'm_server_discount_factor', 'm_server_deployment_cost', 'm_maintenance_fraction',
+            'm_spare_fraction', 'm_rack_purchase_cost', 'm_pdu_cost_per_rack', 'm_top_of_rack_switch_cost_per_rack',
+            'm_monthly_charge_per_rack', 'm_bandwidth_pricing', 'm_IT_params');
+
+    def __init__(self, model):
+        compute_params = get_required_param(model, 'compute', 'model');
+        self.m_model = model;
+        for key in [ 'rack_power_limit', 'server_discount_percentage', 'server_deployment_cost', 'server_annual_maintenance_cost_percentage',
+                'spare_server_addition_annual_percentage', 'rack_purchase_cost', 'pdu_cost', 'num_pdus_per_rack', 'top_of_rack_switch_cost',
+                'num_top_of_rack_switches_per_rack' ]:
+            get_required_number(compute_params, key, 'compute');
+        get_required_number(compute_params, 'rack_server_capacity_limit' if 'rack_server_capacity_limit' in compute_params else 'rack_capacity',
+                'compute');
+        self.m_server_types = [];
+        for idx, server_info in enumerate(get_required_param(compute_params, 'server_params', 'compute')):
+            self.m_server_types.append(ServerType(model, server_info, 'compute.server_params.%d'%(idx)));
+        self.m_server_discount_factor = float(100-compute_params['server_discount_percentage'])/100;
+        self.m_server_deployment_cost = compute_params['server_deployment_cost'];
+        self.m_maintenance_fraction = float(compute_params['server_annual_maintenance_cost_percentage'])/100;
+        self.m_spare_fraction = float(compute_params['spare_server_addition_annual_percentage'])/100;
+        self.m_rack_purchase_cost = compute_params['rack_purchase_cost'];
+        self.m_pdu_cost_per_rack = compute_params['pdu_cost']*compute_params['num_pdus_per_rack'];
+        self.m_top_of_rack_switch_cost_per_rack = compute_params['top_of_rack_switch_cost']*compute_params['num_top_of_rack_switches_per_rack'];
+        self.m_monthly_charge_per_rack = dict([ (private_cloud_hosting, op_cost_dict.get('monthly_charge_per_rack'))
+            for private_cloud_hosting, op_cost_dict in get_required_param(compute_params, 'rack_operational_cost_info', 'compute').iteritems() ]);
+        network_params = get_required_param(model, 'network', 'model');
+        self.m_bandwidth_pricing = dict([ (private_cloud_hosting, BandwidthPricing(network_params[private_cloud_hosting],
+            'network.'+private_cloud_hosting)) for private_cloud_hosting in self.m_monthly_charge_per_rack if private_cloud_hosting in network_params ]);
+        self.m_IT_params = None;
+        if('IT' in model):
+            #(num_servers_per_admin, network_admin_percentage, admin_annual_salary)
+            self.m_IT_params = tuple([ get_required_number(model['IT'], key, 'IT')
+                for key in [ 'num_servers_per_admin', 'network_admin_percentage', 'admin_annual_salary' ] ]);
+
+    def get_monthly_charge_per_rack(self, private_cloud_hosting):
+        if(private_cloud_hosting not in self.m_monthly_charge_per_rack):
+            raise InvalidModelParameters('Missing model parameter compute.rack_operational_cost_info.%s'%(private_cloud_hosting));
+        return self.m_monthly_charge_per_rack[private_cloud_hosting];
+
+def determine_num_usable_cores(server_type, memory_per_core):
+    #determine_num_usable_cores_in_server_type of a compiled server type
+    num_usable_cores = min(int(float(server_type.m_max_memory)/memory_per_core), server_type.m_max_cores_in_server);
+    return int(math.ceil(float(num_usable_cores)/server_type.m_sockets))*server_type.m_sockets;
+
+def compute_server_type_total_cost(compiled_model, server_type, num_cores, memory_per_core, monthly_charge_per_rack, operating_period_in_years):
+    #Returns (num_servers, summary total_cost) with the arithmetic of determine_total_cost_for_server, or None
+    num_usable_cores = determine_num_usable_cores(server_type, memory_per_core);
+    if(num_usable_cores < 1):
+        return None;
+    num_servers = int(math.ceil(float(num_cores)/num_usable_cores));
+    if(server_type.m_has_memory_pricing):
+        server_cost = server_type.m_per_GB*(num_usable_cores*memory_per_core) \
+                + (server_type.m_per_core*num_usable_cores + server_type.m_base_cost - server_type.m_per_GB*server_type.m_base_memory);
+    else:
+        server_cost = server_type.m_cost;
+    server_purchase_cost = num_servers*(compiled_model.m_server_discount_factor*server_cost);
+    server_maintenance_cost = compiled_model.m_maintenance_fraction*(server_purchase_cost*operating_period_in_years);
+    spare_server_addition_cost = compiled_model.m_spare_fraction*((server_purchase_cost+server_maintenance_cost)*operating_period_in_years);
+    num_racks = int(math.ceil(float(num_servers)/server_type.m_max_num_servers_per_rack));
+    hardware_cost = server_purchase_cost+num_servers*compiled_model.m_server_deployment_cost+server_maintenance_cost \
+            +spare_server_addition_cost+compiled_model.m_rack_purchase_cost*num_racks+compiled_model.m_pdu_cost_per_rack*num_racks \
+            +compiled_model.m_top_of_rack_switch_cost_per_rack*num_racks;
+    per_rack_cost = 12*operating_period_in_years*monthly_charge_per_rack if monthly_charge_per_rack is not None else None;
+    return (num_servers, hardware_cost+num_racks*per_rack_cost);
+
+def determine_compute_IT_cost(compiled_model, num_servers, operating_period_in_years):
+    #IT cost of compute_IT_cost without storage
+    if(compiled_model.m_IT_params is None):
+        raise InvalidModelParameters('Missing model parameter model.IT');
+    num_servers_per_admin, network_admin_percentage, admin_annual_salary = compiled_model.m_IT_params;
+    num_compute_admins = int(math.ceil(float(num_servers)/num_servers_per_admin));
+    return (num_compute_admins+0+float(network_admin_percentage*num_compute_admins)/100)*admin_annual_salary*operating_period_in_years;
+
+def select_optimal_server_configuration(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost,
+        profiler=None, compiled_model=None):
+    #Server types are compared on plain numbers, the cost dict is only built for the cheapest one
+    if(not compiled_model):
+        with profile_stage(profiler, 'private_cloud.compile_model'):
+            compiled_model = CompiledPrivateCloudModel(model);
+    monthly_charge_per_rack = compiled_model.get_monthly_charge_per_rack(private_cloud_hosting);
     min_cost = 10000000000000
     min_cost_idx = -1;
-    min_cost_dict = None;
-    for idx in range(len(model['compute']['server_params'])):
-        server_info = model['compute']['server_params'][idx];
-        cost_dict = determine_total_cost_for_server(model, server_info, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years);
-        if(not cost_dict):
+    num_infeasible = 0;
+    for idx, server_type in enumerate(compiled_model.m_server_types):
+        server_type_cost = compute_server_type_total_cost(compiled_model, server_type, num_cores, memory_per_core, monthly_charge_per_rack,
+                operating_period_in_years);
+        if(not server_type_cost):
+            num_infeasible += 1;
             continue;
-        IT_cost = 0;
+        num_servers, total_cost = server_type_cost;
         if(include_IT_cost):
-            tmp_cost_dict = { 'compute' : { 'num_servers': cost_dict['num_servers'] }, 'storage': { 'raw_storage_size': 0 } };
-            IT_cost = compute_IT_cost(model, tmp_cost_dict, operating_period_in_years)['summary']['total_cost'];
-            cost_dict['IT_cost'] = IT_cost;
-        if(cost_dict['summary']['total_cost']+IT_cost < min_cost):
-            min_cost = cost_dict['summary']['total_cost']+IT_cost;
+            total_cost += determine_compute_IT_cost(compiled_model, num_servers, operating_period_in_years);
+        if(total_cost < min_cost):
+            min_cost = total_cost;
             min_cost_idx = idx;
-            min_cost_dict = cost_dict;
+    add_profile_count(profiler, 'private_cloud.compute.candidates_evaluated', len(compiled_model.m_server_types));
+    add_profile_count(profiler, 'private_cloud.compute.candidates_infeasible', num_infeasible);
     if(min_cost_idx < 0):
         raise NoServerConfigurationFound(('No valid server configuration found for specified memory per core value : %d')%(memory_per_core))
+    min_cost_dict = determine_total_cost_for_server(model, model['compute']['server_params'][min_cost_idx], num_cores, memory_per_core,
+            private_cloud_hosting, operating_period_in_years);
+    min_cost_dict['server_type_index'] = min_cost_idx;
+    if(include_IT_cost):
+        tmp_cost_dict = { 'compute' : { 'num_servers': min_cost_dict['num_servers'] }, 'storage': { 'raw_storage_size': 0 } };
+        min_cost_dict['IT_cost'] = compute_IT_cost(model, tmp_cost_dict, operating_period_in_years)['summary']['total_cost'];
+    return min_cost_dict;
+
+def select_pareto_frontier(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost,
+        profiler=None, compiled_model=None):
+    #Every server type not dominated in total cost, spare cores, spare memory, number of servers, racks and power, cheapest first
+    from pareto import create_objective_points
+    from pareto import find_skyline
+    if(not compiled_model):
+        with profile_stage(profiler, 'private_cloud.compile_model'):
+            compiled_model = CompiledPrivateCloudModel(model);
+    server_params = model['compute']['server_params'];
+    configurations = [];
+    for idx in range(len(compiled_model.m_server_types)):
+        cost_dict = determine_total_cost_for_server(model, server_params[idx], num_cores, memory_per_core, private_cloud_hosting,
+                operating_period_in_years);
+        if(not cost_dict):
+            continue;
+        cost_dict['server_type_index'] = idx;
+        cost_dict['spare_cores'] = cost_dict['num_servers']*cost_dict['num_usable_cores_per_server']-num_cores;
+        cost_dict['spare_memory'] = cost_dict['num_servers']*cost_dict['memory_per_server']-num_cores*memory_per_core;
+        if(include_IT_cost):
+            tmp_cost_dict = { 'compute' : { 'num_servers': cost_dict['num_servers'] }, 'storage': { 'raw_storage_size': 0 } };
+            cost_dict['IT_cost'] = compute_IT_cost(model, tmp_cost_dict, operating_period_in_years)['summary']['total_cost'];
+        configurations.append(cost_dict);
+    add_profile_count(profiler, 'private_cloud.compute.candidates_evaluated', len(compiled_model.m_server_types));
+    add_profile_count(profiler, 'private_cloud.compute.candidates_infeasible', len(compiled_model.m_server_types)-len(configurations));
+    if(len(configurations) == 0):
+        raise NoServerConfigurationFound(('No valid server configuration found for specified memory per core value : %d')%(memory_per_core))
+    points = create_objective_points({
+        'total_cost': [ cost_dict['summary']['total_cost']+cost_dict.get('IT_cost', 0) for cost_dict in configurations ],
+        'spare_cores': [ cost_dict['spare_cores'] for cost_dict in configurations ],
+        'spare_memory': [ cost_dict['spare_memory'] for cost_dict in configurations ],
+        'num_machines': [ cost_dict['num_servers'] for cost_dict in configurations ],
+        'num_racks': [ cost_dict['num_racks'] for cost_dict in configurations ],
+        'total_power': [ cost_dict['summary']['total_power'] for cost_dict in configurations ] });
+    return [ configurations[idx] for idx in find_skyline(points) ];
+
+def determine_amortized_cost_per_server(model, server_info, memory_per_core, private_cloud_hosting, operating_period_in_years,
+        include_IT_cost):
+    #Cost of one more server of this type, with its share of a rack (and of an admin) - the linear cost used by the covering DP
+    server_cost_dict = determine_total_cost_for_server(model, server_info, 1, memory_per_core, private_cloud_hosting, operating_period_in_years);
+    if(not server_cost_dict):
+        return None;
+    per_server_cost = server_cost_dict['server_purchase_cost']+server_cost_dict['server_deployment_cost'] \
+            +server_cost_dict['server_maintenance_cost']+server_cost_dict['spare_server_addition_cost'];
+    per_rack_cost = determine_rack_purchase_cost(model, 1)+determine_pdu_cost(model, 1)+determine_top_of_rack_switch_cost(model, 1) \
+            +determine_rack_operational_cost(model, 1, private_cloud_hosting, operating_period_in_years);
+    per_server_cost += float(per_rack_cost)/server_cost_dict['max_num_servers_per_rack'];
+    if(include_IT_cost):
+        IT_params = model['IT'];
+        per_server_cost += float(IT_params['admin_annual_salary']*operating_period_in_years \
+                *(1+float(IT_params['network_admin_percentage'])/100))/IT_params['num_servers_per_admin'];
+    return per_server_cost;
+
+def evaluate_mixed_fleet(model, fleet_counts, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost):
+    #fleet_counts: { server type index: number of servers }. Every server type fills its own racks.
+    server_params = model['compute']['server_params'];
+    cost_dict = OrderedDict();
+    cost_dict['fleet'] = [];
+    cost_dict['num_servers'] = 0;
+    cost_dict['num_racks'] = 0;
+    cost_dict['summary'] = OrderedDict([ ('hardware_cost', 0), ('operational_cost', 0), ('total_cost', 0), ('total_power', 0) ]);
+    for idx in sorted(fleet_counts.keys()):
+        server_info = server_params[idx];
+        num_usable_cores_per_server = determine_num_usable_cores_in_server_type(server_info, memory_per_core);
+        server_cost_dict = determine_total_cost_for_server(model, server_info, fleet_counts[idx]*num_usable_cores_per_server, memory_per_core,
+                private_cloud_hosting, operating_period_in_years);
+        server_cost_dict['server_type_index'] = idx;
+        cost_dict['fleet'].append(server_cost_dict);
+        cost_dict['num_servers'] += server_cost_dict['num_servers'];
+        cost_dict['num_racks'] += server_cost_dict['num_racks'];
+        for key in cost_dict['summary']:
+            cost_dict['summary'][key] += server_cost_dict['summary'][key];
+    if(include_IT_cost):
+        tmp_cost_dict = { 'compute' : { 'num_servers': cost_dict['num_servers'] }, 'storage': { 'raw_storage_size': 0 } };
+        cost_dict['IT_cost'] = compute_IT_cost(model, tmp_cost_dict, operating_period_in_years)['summary']['total_cost'];
+    return cost_dict;
+
+def select_optimal_mixed_fleet(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost,
+        profiler=None, compiled_model=None):
+    #Cheapest multiset of server types covering num_cores - never worse than the best single server type.
+    #The covering DP amortizes racks and admins per server, the fleets it proposes are then priced exactly.
+    if(not compiled_model):
+        with profile_stage(profiler, 'private_cloud.compile_model'):
+            compiled_model = CompiledPrivateCloudModel(model);
+    server_params = model['compute']['server_params'];
+    fleets = [];
+    cover_items = [];
+    for idx, server_type in enumerate(compiled_model.m_server_types):
+        num_usable_cores_per_server = determine_num_usable_cores(server_type, memory_per_core);
+        #Server types without a usable core are not priced
+        per_server_cost = determine_amortized_cost_per_server(model, server_params[idx], memory_per_core, private_cloud_hosting,
+                operating_period_in_years, include_IT_cost) if num_usable_cores_per_server >= 1 else None;
+        if(per_server_cost is None):
+            cover_items.append((0, 0));
+            continue;
+        #Single server type fleets first, so that they win ties
+        fleets.append({ idx: determine_num_servers(num_cores, num_usable_cores_per_server) });
+        cover_items.append((num_usable_cores_per_server, per_server_cost));
+    if(len(fleets) == 0):
+        raise NoServerConfigurationFound(('No valid server configuration found for specified memory per core value : %d')%(memory_per_core))
+    fleets += [ fleet_counts for estimated_cost, fleet_counts in enumerate_cover_solutions(cover_items, num_cores) ];
+    min_cost = None;
+    min_cost_dict = None;
+    for fleet_counts in fleets:
+        cost_dict = evaluate_mixed_fleet(model, fleet_counts, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost);
+        total_cost = cost_dict['summary']['total_cost']+cost_dict.get('IT_cost', 0);
+        if(min_cost is None or total_cost < min_cost):
+            min_cost = total_cost;
+            min_cost_dict = cost_dict;
+    add_profile_count(profiler, 'private_cloud.compute.mixed_fleets_evaluated', len(fleets));
     return min_cost_dict;
 
 def compute_storage_cost(model, raw_storage_size, private_cloud_hosting, operating_period_in_years, storage_type, backup_percentage_per_month):
@@ -187,6 +451,39 @@ def compute_storage_cost(model, raw_storage_size, private_cloud_hosting, operati
             + cost_dict['summary']['backup_cost'] + cost_dict['summary']['operational_cost'];
     return cost_dict;
 
+def compute_shared_rack_cost(model, compute_cost_dict, storage_cost_dict, private_cloud_hosting, operating_period_in_years):
+    #Packs the servers and storage shelves into shared racks - the summary is the change of the rack costs against the separate
+    #server racks of compute_cost_dict and storage racks of storage_cost_dict. Racks with servers are bought and charged like server
+    #racks, racks with storage shelves only like storage racks.
+    cost_dict = OrderedDict();
+    item_types = create_server_item_types(compute_cost_dict)+[ create_storage_shelf_item_type(model, storage_cost_dict['raw_storage_size']) ];
+    server_rack_cost = determine_rack_purchase_cost(model, 1)+determine_pdu_cost(model, 1)+determine_top_of_rack_switch_cost(model, 1) \
+            +determine_rack_operational_cost(model, 1, private_cloud_hosting, operating_period_in_years);
+    storage_rack_cost = model['storage']['rack_monthly_operational_cost']*12*operating_period_in_years;
+    cost_dict['packing'] = pack_racks(item_types, RackSpec(model), rack_cost_function=lambda num_racks, num_server_racks:
+            num_server_racks*server_rack_cost+(num_racks-num_server_racks)*storage_rack_cost);
+    cost_dict['num_racks'] = cost_dict['packing']['num_racks'];
+    cost_dict['num_server_racks'] = cost_dict['packing']['num_server_racks'];
+    cost_dict['num_storage_racks'] = cost_dict['num_racks']-cost_dict['num_server_racks'];
+    cost_dict['num_separate_racks'] = compute_cost_dict['num_racks']+storage_cost_dict['num_racks'];
+    server_cost_dicts = compute_cost_dict['fleet'] if 'fleet' in compute_cost_dict else [ compute_cost_dict ];
+    separate_hardware_cost = sum([ server_cost_dict['rack_purchase_cost']+server_cost_dict['pdu_cost']+server_cost_dict['top_of_rack_switch_cost']
+        for server_cost_dict in server_cost_dicts ]);
+    separate_operational_cost = sum([ server_cost_dict['rack_operational_cost'] for server_cost_dict in server_cost_dicts ]) \
+            +storage_cost_dict['rack_operational_cost'];
+    cost_dict['rack_purchase_cost'] = determine_rack_purchase_cost(model, cost_dict['num_server_racks']);
+    cost_dict['pdu_cost'] = determine_pdu_cost(model, cost_dict['num_server_racks']);
+    cost_dict['top_of_rack_switch_cost'] = determine_top_of_rack_switch_cost(model, cost_dict['num_server_racks']);
+    cost_dict['rack_operational_cost'] = determine_rack_operational_cost(model, cost_dict['num_server_racks'], private_cloud_hosting,
+            operating_period_in_years) \
+            +cost_dict['num_storage_racks']*model['storage']['rack_monthly_operational_cost']*12*operating_period_in_years;
+    cost_dict['summary'] = OrderedDict();
+    cost_dict['summary']['hardware_cost'] = cost_dict['rack_purchase_cost']+cost_dict['pdu_cost']+cost_dict['top_of_rack_switch_cost'] \
+            -separate_hardware_cost;
+    cost_dict['summary']['operational_cost'] = cost_dict['rack_operational_cost']-separate_operational_cost;
+    cost_dict['summary']['total_cost'] = cost_dict['summary']['hardware_cost']+cost_dict['summary']['operational_cost'];
+    return cost_dict;
+
 def determine_bandwidth_cost(bandwidth_pricing_info, bandwidth, bandwidth_utilization, operating_period_in_years):
     if('bandwidth_cost_tiers' in bandwidth_pricing_info):
         for tier_info in bandwidth_pricing_info['bandwidth_cost_tiers']:
@@ -199,34 +496,91 @@ def determine_bandwidth_cost(bandwidth_pricing_info, bandwidth, bandwidth_utiliz
         total_cost += operating_period_in_years*12*bandwidth_pricing_info['price_per_Mbps']*bandwidth*(float(bandwidth_utilization)/100)
     return total_cost
 
-def compute_network_cost(model, bandwidth, bandwidth_utilization, private_cloud_hosting, operating_period_in_years, compute_hardware_cost):
+def compute_network_cost(model, bandwidth, bandwidth_utilization, private_cloud_hosting, operating_period_in_years, compute_hardware_cost,
+        compiled_model=None):
     cost_dict = OrderedDict();
     network_params = model['network'];
     cost_dict['network_purchase_cost'] = (float(network_params['purchase_percentage_of_compute'])/100)*compute_hardware_cost;
     cost_dict['network_maintenance_cost'] = (float(network_params['annual_maintenance_overhead_percentage_of_purchase'])/100)* \
             cost_dict['network_purchase_cost']*operating_period_in_years;
-    bandwidth_pricing_info = network_params[private_cloud_hosting]; 
-    cost_dict['bandwidth_cost'] = determine_bandwidth_cost(bandwidth_pricing_info, bandwidth, bandwidth_utilization, operating_period_in_years);
+    if(compiled_model and private_cloud_hosting in compiled_model.m_bandwidth_pricing):
+        cost_dict['bandwidth_cost'] = compiled_model.m_bandwidth_pricing[private_cloud_hosting](bandwidth, bandwidth_utilization,
+                operating_period_in_years);
+    else:
+        bandwidth_pricing_info = network_params[private_cloud_hosting]; 
+        cost_dict['bandwidth_cost'] = determine_bandwidth_cost(bandwidth_pricing_info, bandwidth, bandwidth_utilization, operating_period_in_years);
     cost_dict['summary'] = OrderedDict();
     cost_dict['summary']['hardware_cost'] = cost_dict['network_purchase_cost']+cost_dict['network_maintenance_cost'];
     cost_dict['summary']['bandwidth_cost'] = cost_dict['bandwidth_cost'];
     cost_dict['summary']['total_cost'] = cost_dict['summary']['hardware_cost'] + cost_dict['summary']['bandwidth_cost'];
     return cost_dict;
 
-def compute_tco(args_handler, do_print=False):
+def compute_tco(args_handler, do_print=False, stage_cache=None, compiled_model=None):
     model = args_handler.m_model;
+    num_cores = args_handler.m_num_cores;
+    memory_per_core = args_handler.m_memory_per_core;
+    storage = args_handler.m_storage;
+    bandwidth = args_handler.m_bandwidth;
+    bandwidth_utilization = args_handler.m_bandwidth_utilization;
+    private_cloud_hosting = args_handler.m_private_cloud_hosting;
+    operating_period_in_years = args_handler.m_operating_period_in_years;
+    storage_type = args_handler.m_storage_type;
+    backup_percentage_per_month = args_handler.m_backup_percentage_per_month;
+    include_IT_cost = args_handler.m_include_IT_cost;
+    mixed_fleet = args_handler.m_mixed_fleet;
+    compute_frontier = args_handler.m_compute_frontier;
+    shared_racks = args_handler.m_shared_racks;
+    profiler = args_handler.m_profiler;
     cost_dict = OrderedDict();
-    cost_dict['compute'] = select_optimal_server_configuration(model, args_handler.m_num_cores, args_handler.m_memory_per_core,
-            args_handler.m_private_cloud_hosting, args_handler.m_operating_period_in_years, args_handler.m_include_IT_cost);
-    cost_dict['storage'] = compute_storage_cost(model, args_handler.m_storage, args_handler.m_private_cloud_hosting,
-            args_handler.m_operating_period_in_years, args_handler.m_storage_type, args_handler.m_backup_percentage_per_month);
-    cost_dict['network'] = compute_network_cost(model, args_handler.m_bandwidth, args_handler.m_bandwidth_utilization,
-            args_handler.m_private_cloud_hosting, args_handler.m_operating_period_in_years, cost_dict['compute']['summary']['hardware_cost']);
+    #Compiled once per model - by the caller, or by the stage cache keyed by the model hash - and shared by the selectors
+    if(not compiled_model):
+        with profile_stage(profiler, 'private_cloud.compile_model'):
+            compiled_model = get_compiled_model(stage_cache, model, CompiledPrivateCloudModel);
+    if(mixed_fleet):
+        select_function = lambda: select_optimal_mixed_fleet(model, num_cores, memory_per_core, private_cloud_hosting,
+                operating_period_in_years, include_IT_cost, profiler=profiler, compiled_model=compiled_model);
+    else:
+        select_function = lambda: select_optimal_server_configuration(model, num_cores, memory_per_core, private_cloud_hosting,
+                operating_period_in_years, include_IT_cost, profiler=profiler, compiled_model=compiled_model);
+    with profile_stage(profiler, 'private_cloud.compute'):
+        cost_dict['compute'] = compute_stage(stage_cache, 'compute', (model,),
+                (num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost, mixed_fleet),
+                select_function);
+    #The cheapest configuration stays the compute cost, the frontier shows the alternatives
+    if(compute_frontier):
+        with profile_stage(profiler, 'private_cloud.compute_frontier'):
+            cost_dict['compute_frontier'] = compute_stage(stage_cache, 'compute_frontier', (model,),
+                    (num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost),
+                    lambda: select_pareto_frontier(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years,
+                        include_IT_cost, profiler=profiler, compiled_model=compiled_model));
+    with profile_stage(profiler, 'private_cloud.storage'):
+        cost_dict['storage'] = compute_stage(stage_cache, 'storage', (model,),
+                (storage, private_cloud_hosting, operating_period_in_years, storage_type, backup_percentage_per_month),
+                lambda: compute_storage_cost(model, storage, private_cloud_hosting, operating_period_in_years, storage_type,
+                    backup_percentage_per_month));
+    compute_hardware_cost = cost_dict['compute']['summary']['hardware_cost'];
+    with profile_stage(profiler, 'private_cloud.network'):
+        cost_dict['network'] = compute_stage(stage_cache, 'network', (model,),
+                (bandwidth, bandwidth_utilization, private_cloud_hosting, operating_period_in_years, compute_hardware_cost),
+                lambda: compute_network_cost(model, bandwidth, bandwidth_utilization, private_cloud_hosting, operating_period_in_years,
+                    compute_hardware_cost, compiled_model=compiled_model));
     cost_dict['IT'] = None;
     total_cost = cost_dict['compute']['summary']['total_cost']+cost_dict['storage']['summary']['total_cost'] \
             + cost_dict['network']['summary']['total_cost'];
+    #The network purchase stays a percentage of the compute hardware with separate racks
+    if(shared_racks):
+        with profile_stage(profiler, 'private_cloud.racks'):
+            cost_dict['racks'] = compute_stage(stage_cache, 'racks', (model,),
+                    (num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years, include_IT_cost, mixed_fleet, storage,
+                        storage_type, backup_percentage_per_month),
+                    lambda: compute_shared_rack_cost(model, cost_dict['compute'], cost_dict['storage'], private_cloud_hosting,
+                        operating_period_in_years));
+        total_cost += cost_dict['racks']['summary']['total_cost'];
     if(args_handler.m_include_IT_cost):
-        cost_dict['IT'] = compute_IT_cost(model, cost_dict, args_handler.m_operating_period_in_years);
+        with profile_stage(profiler, 'private_cloud.IT'):
+            cost_dict['IT'] = compute_stage(stage_cache, 'IT', (model,),
+                    (cost_dict['compute']['num_servers'], cost_dict['storage']['raw_storage_size'], operating_period_in_years),
+                    lambda: compute_IT_cost(model, cost_dict, operating_period_in_years));
         total_cost += cost_dict['IT']['summary']['total_cost'];
     cost_dict['summary'] = OrderedDict([
         ('compute', cost_dict['compute']['summary']['total_cost']),
@@ -235,8 +589,11 @@ def compute_tco(args_handler, do_print=False):
         ('IT', cost_dict['IT']['summary']['total_cost'] if args_handler.m_include_IT_cost else None),
         ('total_cost', total_cost),
         ]);
+    if(shared_racks):
+        cost_dict['summary']['racks'] = cost_dict['racks']['summary']['total_cost'];
+        cost_dict['summary']['total_cost'] = cost_dict['summary'].pop('total_cost');
     if(do_print):
-        print(json.dumps(cost_dict, indent=4, separators=(',', ': ')));
+        print(dump_cost_dict(cost_dict, profiler, indent=4, separators=(',', ': ')));
     return cost_dict;
 
 def main():
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+import numpy as np
+from collections import OrderedDict
+from ccc_batch_common import as_scenario_column
+from ccc_batch_common import get_num_scenarios
+
+#Batch (NumPy) version of the private cloud model. Scenarios are laid out along axis 0 as (S,1) columns and server
+#types along axis 1, so every model field may also be given as an (S,1) array. All arithmetic is done in the same order
+#as the scalar functions in private_cloud.py so that the results are bit-for-bit identical.
+
+def stack_server_values(values):
+    #Server fields are scalars, or (S,1) arrays when they vary per scenario - returns a (1,T) or an (S,T) array
+    values = [ np.asarray(value, dtype=np.float64) for value in values ];
+    if(all([ value.ndim == 0 for value in values ])):
+        return np.array([ values ], dtype=np.float64);
+    num_scenarios = get_num_scenarios(*values);
+    return np.column_stack([ np.broadcast_to(value.reshape(-1), (num_scenarios,)) for value in values ]);
+
+def create_server_params_arrays(model):
+    server_params_list = model['compute']['server_params'];
+    arrays = OrderedDict();
+    for key in [ 'sockets', 'max_cores_per_socket', 'max_memory', 'rack_space', 'power' ]:
+        arrays[key] = stack_server_values([ server_info[key] for server_info in server_params_list ]);
+    #Servers priced by components vs servers with a fixed 'cost'
+    arrays['has_component_pricing'] = np.array([ [ ('base_cost' in server_info and 'per_GB' in server_info and 'per_core' in server_info \
+            and 'base_memory' in server_info) for server_info in server_params_list ] ]);
+    for key in [ 'base_cost', 'per_GB', 'per_core', 'base_memory', 'cost' ]:
+        arrays[key] = stack_server_values([ server_info.get(key, 0) for server_info in server_params_list ]);
+    return arrays;
+
+def determine_num_usable_cores_batch(server_arrays, memory_per_core):
+    max_cores_in_server = server_arrays['sockets']*server_arrays['max_cores_per_socket'];
+    max_usable_cores = np.floor(server_arrays['max_memory']/memory_per_core);
+    num_usable_cores = np.minimum(max_usable_cores, max_cores_in_server);
+    num_cores_per_socket = np.ceil(num_usable_cores/server_arrays['sockets']);
+    return num_cores_per_socket*server_arrays['sockets'];
+
+def determine_server_purchase_cost_batch(model, server_arrays, memory_per_core, num_usable_cores):
+    memory_needed = num_usable_cores*memory_per_core;
+    server_cost_with_baseline_memory = server_arrays['per_core']*num_usable_cores + server_arrays['base_cost'];
+    component_server_cost = server_arrays['per_GB']*memory_needed + (server_cost_with_baseline_memory \
+            - server_arrays['per_GB']*server_arrays['base_memory']);
+    server_cost = np.where(server_arrays['has_component_pricing'], component_server_cost, server_arrays['cost']);
+    return ((100-np.asarray(model['compute']['server_discount_percentage'], dtype=np.float64))/100)*server_cost;
+
+def determine_max_num_servers_per_rack_batch(model, server_arrays):
+    if('rack_server_capacity_limit' in model['compute']):
+        rack_server_capacity_limit = model['compute']['rack_server_capacity_limit']
+    else:
+        rack_server_capacity_limit = model['compute']['rack_capacity'];
+    by_space = np.floor(np.asarray(rack_server_capacity_limit, dtype=np.float64)/server_arrays['rack_space']);
+    by_power = np.floor(np.asarray(model['compute']['rack_power_limit'], dtype=np.float64)/server_arrays['power']);
+    return np.minimum(by_space, by_power);
+
+def compute_IT_cost_batch(model, num_servers, raw_storage_size, operating_period_in_years):
+    IT_params = model['IT'];
+    num_compute_admins = np.ceil(num_servers/np.asarray(IT_params['num_servers_per_admin'], dtype=np.float64));
+    num_storage_admins = np.ceil(raw_storage_size/np.asarray(IT_params['storage_per_admin'], dtype=np.float64));
+    num_network_admins = (IT_params['network_admin_percentage']*num_compute_admins)/100;
+    IT_cost_dict = OrderedDict();
+    IT_cost_dict['num_compute_admins'] = num_compute_admins;
+    IT_cost_dict['num_storage_admins'] = num_storage_admins;
+    IT_cost_dict['num_network_admins'] = num_network_admins;
+    IT_cost_dict['total_cost'] = (num_compute_admins+num_storage_admins+num_network_admins)*IT_params['admin_annual_salary'] \
+            *operating_period_in_years;
+    return IT_cost_dict;
+
+def compute_server_costs_batch(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years,
+        include_IT_cost=False, server_arrays=None):
+    #Returns (S,T) arrays - invalid server types have a total_cost of inf
+    num_scenarios = get_num_scenarios(num_cores, memory_per_core, operating_period_in_years);
+    num_cores = as_scenario_column(num_cores, num_scenarios);
+    memory_per_core = as_scenario_column(memory_per_core, num_scenarios);
+    operating_period_in_years = as_scenario_column(operating_period_in_years, num_scenarios);
+    if(server_arrays is None):
+        server_arrays = create_server_params_arrays(model);
+    compute_params = model['compute'];
+    cost_arrays = OrderedDict();
+    num_usable_cores_per_server = determine_num_usable_cores_batch(server_arrays, memory_per_core);
+    is_valid = (num_usable_cores_per_server >= 1);
+    #Avoid divisions by 0 for invalid types, they are masked out below
+    safe_num_usable_cores_per_server = np.where(is_valid, num_usable_cores_per_server, 1);
+    cost_arrays['num_usable_cores_per_server'] = num_usable_cores_per_server;
+    cost_arrays['memory_per_server'] = num_usable_cores_per_server*memory_per_core;
+    cost_arrays['num_servers'] = np.ceil(num_cores/safe_num_usable_cores_per_server);
+    cost_arrays['server_unit_purchase_cost'] = determine_server_purchase_cost_batch(model, server_arrays, memory_per_core,
+            safe_num_usable_cores_per_server);
+    cost_arrays['server_purchase_cost'] = cost_arrays['num_servers']*cost_arrays['server_unit_purchase_cost'];
+    cost_arrays['server_deployment_cost'] = cost_arrays['num_servers']*compute_params['server_deployment_cost'];
+    cost_arrays['server_maintenance_cost'] = (np.asarray(compute_params['server_annual_maintenance_cost_percentage'],
+        dtype=np.float64)/100)*(cost_arrays['server_purchase_cost']*operating_period_in_years);
+    cost_arrays['spare_server_addition_cost'] = (np.asarray(compute_params['spare_server_addition_annual_percentage'],
+        dtype=np.float64)/100)*((cost_arrays['server_purchase_cost']+cost_arrays['server_maintenance_cost'])*operating_period_in_years);
+    cost_arrays['max_num_servers_per_rack'] = determine_max_num_servers_per_rack_batch(model, server_arrays)*np.ones_like(num_cores);
+    cost_arrays['num_racks'] = np.ceil(cost_arrays['num_servers']/cost_arrays['max_num_servers_per_rack']);
+    cost_arrays['rack_purchase_cost'] = compute_params['rack_purchase_cost']*cost_arrays['num_racks'];
+    per_rack_cost = 12*operating_period_in_years*compute_params['rack_operational_cost_info'][private_cloud_hosting]['monthly_charge_per_rack'];
+    cost_arrays['rack_operational_cost'] = cost_arrays['num_racks']*per_rack_cost;
+    cost_arrays['pdu_cost'] = compute_params['pdu_cost']*compute_params['num_pdus_per_rack']*cost_arrays['num_racks'];
+    cost_arrays['top_of_rack_switch_cost'] = compute_params['top_of_rack_switch_cost']*compute_params['num_top_of_rack_switches_per_rack'] \
+            *cost_arrays['num_racks'];
+    cost_arrays['hardware_cost'] = cost_arrays['server_purchase_cost']+cost_arrays['server_deployment_cost'] \
+            +cost_arrays['server_maintenance_cost']+cost_arrays['spare_server_addition_cost'] \
+            +cost_arrays['rack_purchase_cost']+cost_arrays['pdu_cost']+cost_arrays['top_of_rack_switch_cost'];
+    cost_arrays['operational_cost'] = cost_arrays['rack_operational_cost'];
+    cost_arrays['total_cost'] = cost_arrays['hardware_cost']+cost_arrays['operational_cost'];
+    cost_arrays['total_power'] = server_arrays['power']*cost_arrays['num_servers'];
+    cost_arrays['IT_cost'] = np.zeros_like(cost_arrays['total_cost']);
+    if(include_IT_cost):
+        cost_arrays['IT_cost'] = compute_IT_cost_batch(model, cost_arrays['num_servers'], 0, operating_period_in_years)['total_cost'];
+    cost_arrays['selection_cost'] = np.where(is_valid, cost_arrays['total_cost']+cost_arrays['IT_cost'], np.inf);
+    cost_arrays['is_valid'] = is_valid;
+    return cost_arrays;
+
+def select_optimal_server_configuration_batch(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years,
+        include_IT_cost=False, server_arrays=None):
+    #Returns (S,) arrays for the cheapest server type of every scenario - server_index is -1 where no type is valid
+    cost_arrays = compute_server_costs_batch(model, num_cores, memory_per_core, private_cloud_hosting, operating_period_in_years,
+            include_IT_cost=include_IT_cost, server_arrays=server_arrays);
+    selection_cost = cost_arrays['selection_cost'];
+    scenario_idx = np.arange(selection_cost.shape[0]);
+    server_index = np.argmin(selection_cost, axis=1);
+    has_valid_server = np.isfinite(selection_cost[scenario_idx, server_index]);
+    result = OrderedDict();
+    result['server_index'] = np.where(has_valid_server, server_index, -1);
+    for key, values in cost_arrays.iteritems():
+        if(key in [ 'selection_cost', 'is_valid' ]):
+            continue;
+        result[key] = np.where(has_valid_server, values[scenario_idx, server_index], np.nan);
+    return result;
+
+def compute_storage_cost_batch(model, raw_storage_size, operating_period_in_years, storage_type, backup_percentage_per_month):
+    storage_params = model['storage'];
+    cost_arrays = OrderedDict();
+    cost_arrays['raw_storage_size'] = raw_storage_size;
+    usable_storage = ((100-np.asarray(storage_params['os_penalty_percentage'], dtype=np.float64))/100)*raw_storage_size;
+    cost_arrays['usable_storage'] = ((100-np.asarray(storage_params['raid_penalty_percentage'], dtype=np.float64))/100)*usable_storage;
+    cost_per_TB = ((100-np.asarray(storage_params['discount_percentage'], dtype=np.float64))/100)*storage_params['cost_per_TB'][storage_type];
+    cost_arrays['storage_purchase_cost'] = raw_storage_size*cost_per_TB;
+    num_backup_devices_to_store_all_data = np.ceil(cost_arrays['usable_storage']/storage_params['backup_capacity_per_device_in_TB']);
+    incremental_backup_data_size = (backup_percentage_per_month/100)*cost_arrays['usable_storage'];
+    cost_arrays['incremental_backup_data_size'] = incremental_backup_data_size;
+    num_backup_devices_for_incremental_backup = np.ceil((incremental_backup_data_size*1024*1024)/ \
+            (storage_params['backup_speed_per_device_in_MBps']*storage_params['backup_time_window_in_hours']*3600));
+    cost_arrays['num_backup_devices_to_store_all_data'] = num_backup_devices_to_store_all_data;
+    cost_arrays['num_backup_devices_for_incremental_backup'] = num_backup_devices_for_incremental_backup;
+    cost_arrays['num_backup_devices_needed'] = np.maximum(num_backup_devices_to_store_all_data, num_backup_devices_for_incremental_backup);
+    cost_arrays['backup_storage_cost'] = cost_arrays['num_backup_devices_needed']*storage_params['backup_device_cost'];
+    cost_arrays['num_racks'] = np.ceil(raw_storage_size/np.asarray(storage_params['rack_storage_capacity'], dtype=np.float64));
+    cost_arrays['rack_operational_cost'] = cost_arrays['num_racks']*storage_params['rack_monthly_operational_cost']*12*operating_period_in_years;
+    cost_arrays['hardware_cost'] = cost_arrays['storage_purchase_cost'];
+    cost_arrays['backup_cost'] = cost_arrays['backup_storage_cost'];
+    cost_arrays['operational_cost'] = cost_arrays['rack_operational_cost'];
+    cost_arrays['total_cost'] = cost_arrays['hardware_cost']+cost_arrays['backup_cost']+cost_arrays['operational_cost'];
+    return cost_arrays;
+
+def determine_bandwidth_cost_batch(bandwidth_pricing_info, bandwidth, bandwidth_utilization, operating_period_in_years):
+    #Same tier selection as determine_bandwidth_cost: first tier with bandwidth <= limit, else the outer dict
+    pricing_info_list = [];
+    if('bandwidth_cost_tiers' in bandwidth_pricing_info):
+        pricing_info_list = list(bandwidth_pricing_info['bandwidth_cost_tiers']);
+    limits = np.array([ tier_info['limit'] for tier_info in pricing_info_list ] + [ np.inf ], dtype=np.float64);
+    pricing_info_list.append(bandwidth_pricing_info);
+    #Bandwidths above every tier limit map to the trailing inf, i.e. to the outer dict
+    tier_idx = np.searchsorted(limits, bandwidth, side='left');
+    monthly_recurring_cost = np.array([ pricing_info.get('monthly_recurring_cost', 0) for pricing_info in pricing_info_list ],
+            dtype=np.float64)[tier_idx];
+    price_per_Mbps = np.array([ pricing_info.get('price_per_Mbps', 0) for pricing_info in pricing_info_list ], dtype=np.float64)[tier_idx];
+    return operating_period_in_years*12*monthly_recurring_cost \
+            + operating_period_in_years*12*price_per_Mbps*bandwidth*(bandwidth_utilization/100);
+
+def compute_network_cost_batch(model, bandwidth, bandwidth_utilization, private_cloud_hosting, operating_period_in_years,
+        compute_hardware_cost):
+    network_params = model['network'];
+    cost_arrays = OrderedDict();
+    cost_arrays['network_purchase_cost'] = (np.asarray(network_params['purchase_percentage_of_compute'], dtype=np.float64)/100) \
+            *compute_hardware_cost;
+    cost_arrays['network_maintenance_cost'] = (np.asarray(network_params['annual_maintenance_overhead_percentage_of_purchase'],
+        dtype=np.float64)/100)*cost_arrays['network_purchase_cost']*operating_period_in_years;
+    cost_arrays['bandwidth_cost'] = determine_bandwidth_cost_batch(network_params[private_cloud_hosting], bandwidth, bandwidth_utilization,
+            operating_period_in_years);
+    cost_arrays['hardware_cost'] = cost_arrays['network_purchase_cost']+cost_arrays['network_maintenance_cost'];
+    cost_arrays['total_cost'] = cost_arrays['hardware_cost']+cost_arrays['bandwidth_cost'];
+    return cost_arrays;
+
+def compute_tco_batch(model, num_cores, memory_per_core, storage, bandwidth, bandwidth_utilization, operating_period_in_years=3,
+        private_cloud_hosting='colocation', storage_type='NAS', backup_percentage_per_month=5, include_IT_cost=False,
+        server_arrays=None):
+    #Batch equivalent of private_cloud.compute_tco - all inputs may be scalars or length S arrays
+    num_scenarios = get_num_scenarios(num_cores, memory_per_core, storage, bandwidth, bandwidth_utilization,
+            operating_period_in_years, backup_percentage_per_month);
+    num_cores = as_scenario_column(num_cores, num_scenarios);
+    memory_per_core = as_scenario_column(memory_per_core, num_scenarios);
+    storage = as_scenario_column(storage, num_scenarios);
+    bandwidth = as_scenario_column(bandwidth, num_scenarios);
+    bandwidth_utilization = as_scenario_column(bandwidth_utilization, num_scenarios);
+    operating_period_in_years = as_scenario_column(operating_period_in_years, num_scenarios);
+    backup_percentage_per_month = as_scenario_column(backup_percentage_per_month, num_scenarios);
+    compute_arrays = select_optimal_server_configuration_batch(model, num_cores, memory_per_core, private_cloud_hosting,
+            operating_period_in_years, include_IT_cost=include_IT_cost, server_arrays=server_arrays);
+    compute_arrays = OrderedDict([ (key, values.reshape(-1, 1)) for key, values in compute_arrays.iteritems() ]);
+    storage_arrays = compute_storage_cost_batch(model, storage, operating_period_in_years, storage_type, backup_percentage_per_month);
+    network_arrays = compute_network_cost_batch(model, bandwidth, bandwidth_utilization, private_cloud_hosting, operating_period_in_years,
+            compute_arrays['hardware_cost']);
+    total_cost = compute_arrays['total_cost']+storage_arrays['total_cost']+network_arrays['total_cost'];
+    IT_cost = None;
+    if(include_IT_cost):
+        IT_cost = compute_IT_cost_batch(model, compute_arrays['num_servers'], storage, operating_period_in_years)['total_cost'];
+        total_cost = total_cost+IT_cost;
+    result = OrderedDict();
+    result['compute'] = OrderedDict([ (key, values.ravel()) for key, values in compute_arrays.iteritems() ]);
+    result['storage'] = OrderedDict([ (key, np.broadcast_to(values, total_cost.shape).ravel()) for key, values in storage_arrays.iteritems() ]);
+    result['network'] = OrderedDict([ (key, values.ravel()) for key, values in network_arrays.iteritems() ]);
+    result['summary'] = OrderedDict([
+        ('compute', compute_arrays['total_cost'].ravel()),
+        ('storage', storage_arrays['total_cost'].ravel()),
+        ('network', network_arrays['total_cost'].ravel()),
+        ('IT', IT_cost.ravel() if IT_cost is not None else None),
+        ('total_cost', total_cost.ravel()),
+        ]);
+    return result;
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+import json
+import math
+import argparse
+from collections import OrderedDict
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import InvalidModelParameters
+from ccc_model_common import get_required_param
+from ccc_model_common import get_required_number
+from ccc_model_common import parse_model_params_file
+
+#Places servers and storage shelves into shared racks under the space (rack_capacity) and power (rack_power_limit) limits of a
+#rack. Every rack holds its PDUs and top of rack switches, servers may use at most rack_server_capacity_limit units of a rack.
+#
+#This is a vector (space, power) bin packing. Items come in a few types with large counts, so racks with the same contents are
+#kept as one group [ num_racks, space_left, power_left, server_space_left, contents ] and first fit decreasing places a whole
+#type at once: a type splits at most one group, so the packing costs O(num_types^2) whatever the number of servers. First fit
+#decreasing fills the power of a rack with the first type before it sees the others, so a pattern greedy is run as well: it
+#picks the rack contents that use the most (normalized) space plus power and repeats them as often as the remaining counts allow.
+#The cheapest packing (by default the one with the fewest racks) over several item orders, the pattern greedy and the packing
+#without mixed racks is kept. The lower bound is the larger of the total space, power and server space divided by the capacity of
+#a rack.
+
+#Slack for the power sums - e.g. 10/0.55 servers must fit 18 times whatever the rounding of the remaining power
+PACKING_EPSILON = 1e-9;
+
+class RackItemType(object):
+
+    __slots__ = ('m_name', 'm_rack_space', 'm_power', 'm_count', 'm_is_server');
+
+    def __init__(self, name, rack_space, power, count, is_server):
+        if(rack_space <= 0 or power < 0):
+            raise InvalidModelParameters('Rack item %s needs a positive rack space and a non-negative power'%(name));
+        self.m_name = name;
+        self.m_rack_space = rack_space;
+        self.m_power = power;
+        self.m_count = count;
+        self.m_is_server = is_server;
+
+class RackSpec(object):
+
+    #Space and power of a rack left for servers and storage once its PDUs and switches are installed
+    __slots__ = ('m_space', 'm_power', 'm_server_space', 'm_num_pdus', 'm_num_switches');
+
+    def __init__(self, model):
+        compute_params = get_required_param(model, 'compute', 'model');
+        self.m_num_pdus = get_required_number(compute_params, 'num_pdus_per_rack', 'compute');
+        self.m_num_switches = get_required_number(compute_params, 'num_top_of_rack_switches_per_rack', 'compute');
+        overhead_space = self.m_num_pdus*compute_params.get('pdu_space', 0) \
+                +self.m_num_switches*get_required_number(compute_params, 'top_of_rack_switch_space', 'compute');
+        overhead_power = self.m_num_switches*compute_params.get('top_of_rack_switch_power', 0);
+        self.m_space = get_required_number(compute_params, 'rack_capacity', 'compute')-overhead_space;
+        self.m_power = get_required_number(compute_params, 'rack_power_limit', 'compute')-overhead_power;
+        self.m_server_space = min(compute_params.get('rack_server_capacity_limit', self.m_space), self.m_space);
+        if(self.m_space <= 0 or self.m_power <= 0):
+            raise InvalidModelParameters('The PDUs and top of rack switches leave no space or power in a rack');
+
+def get_num_fitting(item_type, space_left, power_left, server_space_left):
+    num_fitting = int(math.floor(float(space_left)/item_type.m_rack_space+PACKING_EPSILON));
+    if(item_type.m_power > 0):
+        num_fitting = min(num_fitting, int(math.floor(float(power_left)/item_type.m_power+PACKING_EPSILON)));
+    if(item_type.m_is_server):
+        num_fitting = min(num_fitting, int(math.floor(float(server_space_left)/item_type.m_rack_space+PACKING_EPSILON)));
+    return max(num_fitting, 0);
+
+def fill_rack_group(rack_group, item_type, num_per_rack, num_racks):
+    #Returns the group of num_racks racks of rack_group with num_per_rack more items of item_type
+    num_group_racks, space_left, power_left, server_space_left, contents = rack_group;
+    contents = contents+((item_type.m_name, num_per_rack),);
+    return [ num_racks, space_left-num_per_rack*item_type.m_rack_space, power_left-num_per_rack*item_type.m_power,
+            server_space_left-(num_per_rack*item_type.m_rack_space if item_type.m_is_server else 0), contents ];
+
+def place_item_type(rack_groups, item_type, rack_spec):
+    #First fit of all the items of item_type - the groups keep the order in which their racks were opened
+    count = item_type.m_count;
+    group_idx = 0;
+    while(count > 0 and group_idx < len(rack_groups)):
+        rack_group = rack_groups[group_idx];
+        num_per_rack = get_num_fitting(item_type, rack_group[1], rack_group[2], rack_group[3]);
+        if(num_per_rack == 0):
+            group_idx += 1;
+            continue;
+        num_full_racks = min(count//num_per_rack, rack_group[0]);
+        new_groups = [];
+        if(num_full_racks > 0):
+            new_groups.append(fill_rack_group(rack_group, item_type, num_per_rack, num_full_racks));
+            count -= num_full_racks*num_per_rack;
+        num_racks_left = rack_group[0]-num_full_racks;
+        if(count > 0 and num_racks_left > 0):
+            new_groups.append(fill_rack_group(rack_group, item_type, count, 1));
+            count = 0;
+            num_racks_left -= 1;
+        if(num_racks_left > 0):
+            new_groups.append([ num_racks_left ]+rack_group[1:]);
+        rack_groups[group_idx:group_idx+1] = new_groups;
+        group_idx += len(new_groups);
+    if(count > 0):
+        empty_rack_group = [ 0, rack_spec.m_space, rack_spec.m_power, rack_spec.m_server_space, () ];
+        num_per_rack = get_num_fitting(item_type, rack_spec.m_space, rack_spec.m_power, rack_spec.m_server_space);
+        if(num_per_rack == 0):
+            raise NoServerConfigurationFound('%s does not fit in a rack'%(item_type.m_name));
+        if(count//num_per_rack > 0):
+            rack_groups.append(fill_rack_group(empty_rack_group, item_type, num_per_rack, count//num_per_rack));
+        if(count%num_per_rack > 0):
+            rack_groups.append(fill_rack_group(empty_rack_group, item_type, count%num_per_rack, 1));
+
+def pack_item_types(item_types, rack_spec):
+    rack_groups = [];
+    for item_type in item_types:
+        if(item_type.m_count > 0):
+            place_item_type(rack_groups, item_type, rack_spec);
+    return rack_groups;
+
+def fill_pattern(item_types, counts, remaining_counts, rack_spec):
+    #Adds items in the order of item_types to the rack contents counts - returns (counts, space_left, power_left)
+    counts = list(counts);
+    space_left = rack_spec.m_space-sum([ count*item_type.m_rack_space for count, item_type in zip(counts, item_types) ]);
+    power_left = rack_spec.m_power-sum([ count*item_type.m_power for count, item_type in zip(counts, item_types) ]);
+    server_space_left = rack_spec.m_server_space-sum([ count*item_type.m_rack_space for count, item_type in zip(counts, item_types)
+        if item_type.m_is_server ]);
+    for idx, item_type in enumerate(item_types):
+        num_added = min(get_num_fitting(item_type, space_left, power_left, server_space_left), remaining_counts[idx]-counts[idx]);
+        if(num_added > 0):
+            counts[idx] += num_added;
+            space_left -= num_added*item_type.m_rack_space;
+            power_left -= num_added*item_type.m_power;
+            server_space_left -= num_added*item_type.m_rack_space if item_type.m_is_server else 0;
+    return counts, space_left, power_left;
+
+def create_best_pattern(item_types, remaining_counts, rack_spec):
+    #Rack contents with x items of one type (every feasible x) and the other types added first fit decreasing
+    best_pattern = None;
+    best_score = None;
+    no_items = [ 0 ]*len(item_types);
+    for idx, item_type in enumerate(item_types):
+        max_num = min(remaining_counts[idx], get_num_fitting(item_type, rack_spec.m_space, rack_spec.m_power, rack_spec.m_server_space));
+        for num in xrange(1, max_num+1):
+            counts = list(no_items);
+            counts[idx] = num;
+            counts, space_left, power_left = fill_pattern(item_types, counts, remaining_counts, rack_spec);
+            score = (rack_spec.m_space-space_left)/float(rack_spec.m_space)+(rack_spec.m_power-power_left)/float(rack_spec.m_power);
+            if(best_score is None or score > best_score+PACKING_EPSILON):
+                best_score = score;
+                best_pattern = (counts, space_left, power_left);
+    return best_pattern;
+
+def pack_by_patterns(item_types, rack_spec):
+    #item_types in first fit decreasing order - returns rack groups like pack_item_types
+    remaining_counts = [ item_type.m_count for item_type in item_types ];
+    rack_groups = [];
+    while(sum(remaining_counts) > 0):
+        best_pattern = create_best_pattern(item_types, remaining_counts, rack_spec);
+        if(best_pattern is None):
+            item_type = [ item_type for count, item_type in zip(remaining_counts, item_types) if count > 0 ][0];
+            raise NoServerConfigurationFound('%s does not fit in a rack'%(item_type.m_name));
+        counts, space_left, power_left = best_pattern;
+        num_racks = min([ remaining_counts[idx]//count for idx, count in enumerate(counts) if count > 0 ]);
+        server_space_used = sum([ count*item_type.m_rack_space for count, item_type in zip(counts, item_types) if item_type.m_is_server ]);
+        rack_groups.append([ num_racks, space_left, power_left, rack_spec.m_server_space-server_space_used,
+            tuple([ (item_type.m_name, count) for count, item_type in zip(counts, item_types) if count > 0 ]) ]);
+        remaining_counts = [ remaining_count-num_racks*count for remaining_count, count in zip(remaining_counts, counts) ];
+    return rack_groups;
+
+def determine_lower_bound(item_types, rack_spec):
+    total_space = sum([ item_type.m_count*item_type.m_rack_space for item_type in item_types ]);
+    total_power = sum([ item_type.m_count*item_type.m_power for item_type in item_types ]);
+    total_server_space = sum([ item_type.m_count*item_type.m_rack_space for item_type in item_types if item_type.m_is_server ]);
+    return max(int(math.ceil(float(total_space)/rack_spec.m_space-PACKING_EPSILON)),
+            int(math.ceil(float(total_power)/rack_spec.m_power-PACKING_EPSILON)),
+            int(math.ceil(float(total_server_space)/rack_spec.m_server_space-PACKING_EPSILON)) if rack_spec.m_server_space > 0 else 0, 0);
+
+def get_item_orders(item_types, rack_spec):
+    #Decreasing by the largest share of a rack, by space and by power - servers first on ties as they have the extra limit
+    orders = [];
+    for size_function in [ lambda item_type: max(float(item_type.m_rack_space)/rack_spec.m_space, float(item_type.m_power)/rack_spec.m_power),
+            lambda item_type: float(item_type.m_rack_space)/rack_spec.m_space, lambda item_type: float(item_type.m_power)/rack_spec.m_power ]:
+        order = sorted(item_types, key=lambda item_type: (-size_function(item_type), not item_type.m_is_server));
+        if(order not in orders):
+            orders.append(order);
+    return orders;
+
+def count_racks(rack_groups, server_names):
+    #Returns (num_racks, num_server_racks) - server racks hold at least one server
+    return (sum([ rack_group[0] for rack_group in rack_groups ]),
+            sum([ rack_group[0] for rack_group in rack_groups if any([ name in server_names for name, count in rack_group[4] ]) ]));
+
+def pack_racks(item_types, rack_spec, rack_cost_function=None):
+    #Returns the packing dict of the cheapest candidate packing - rack_cost_function(num_racks, num_server_racks) defaults to num_racks
+    server_names = set([ item_type.m_name for item_type in item_types if item_type.m_is_server ]);
+    orders = get_item_orders(item_types, rack_spec);
+    candidates = [ pack_item_types(order, rack_spec) for order in orders ]+[ pack_by_patterns(orders[0], rack_spec),
+            sum([ pack_item_types([ item_type ], rack_spec) for item_type in orders[0] ], []) ];
+    best_rack_groups = None;
+    best_cost = None;
+    for rack_groups in candidates:
+        num_racks, num_server_racks = count_racks(rack_groups, server_names);
+        cost = rack_cost_function(num_racks, num_server_racks) if rack_cost_function else num_racks;
+        if(best_cost is None or cost < best_cost):
+            best_cost = cost;
+            best_rack_groups = rack_groups;
+    packing_dict = OrderedDict();
+    packing_dict['num_racks'], packing_dict['num_server_racks'] = count_racks(best_rack_groups, server_names);
+    packing_dict['lower_bound'] = determine_lower_bound(item_types, rack_spec);
+    packing_dict['gap'] = packing_dict['num_racks']-packing_dict['lower_bound'];
+    packing_dict['relative_gap'] = float(packing_dict['gap'])/packing_dict['lower_bound'] if packing_dict['lower_bound'] > 0 else 0.0;
+    packing_dict['space_utilization'] = float(sum([ item_type.m_count*item_type.m_rack_space for item_type in item_types ])) \
+            /(packing_dict['num_racks']*rack_spec.m_space) if packing_dict['num_racks'] > 0 else 0.0;
+    packing_dict['power_utilization'] = float(sum([ item_type.m_count*item_type.m_power for item_type in item_types ])) \
+            /(packing_dict['num_racks']*rack_spec.m_power) if packing_dict['num_racks'] > 0 else 0.0;
+    packing_dict['racks'] = [ OrderedDict([ ('num_racks', num_racks), ('contents', OrderedDict(contents)),
+        ('space_used', rack_spec.m_space-space_left), ('power_used', rack_spec.m_power-power_left) ])
+        for num_racks, space_left, power_left, server_space_left, contents in best_rack_groups ];
+    return packing_dict;
+
+def create_storage_shelf_item_type(model, raw_storage_size):
+    storage_params = get_required_param(model, 'storage', 'model');
+    num_shelves = int(math.ceil(float(raw_storage_size)/get_required_number(storage_params, 'shelf_capacity_in_TB', 'storage')));
+    return RackItemType('storage_shelf', get_required_number(storage_params, 'shelf_rack_space', 'storage'),
+            get_required_number(storage_params, 'shelf_power', 'storage'), num_shelves, False);
+
+def get_server_item_name(server_type_index):
+    return 'server_type_%d'%(server_type_index);
+
+def create_server_item_types(compute_cost_dict):
+    #One item type per server type of the private cloud compute cost dict (single server type or mixed fleet) - named by the index
+    #in compute.server_params, since server types may share a socket count
+    server_cost_dicts = compute_cost_dict['fleet'] if 'fleet' in compute_cost_dict else [ compute_cost_dict ];
+    return [ RackItemType(get_server_item_name(server_cost_dict['server_type_index']), server_cost_dict['rack_space_per_server'],
+        server_cost_dict['server_unit_power'], server_cost_dict['num_servers'], True) for server_cost_dict in server_cost_dicts ];
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack servers and storage shelves into shared racks');
+    required_named_args_group = parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--model_parameters_file', '-m', help='Path to private cloud model parameters file', required=True);
+    parser.add_argument('--num_servers', nargs='+', type=int, default=[],
+            help='Number of servers of every server type of the model, in the order of compute.server_params');
+    parser.add_argument('--storage', '-s', help='Raw storage size (in TB) - default: 0', default=0, type=float);
+    arguments = parser.parse_args();
+    model = parse_model_params_file(arguments.model_parameters_file);
+    server_params = model['compute']['server_params'];
+    if(len(arguments.num_servers) > len(server_params)):
+        parser.error('the model has %d server types'%(len(server_params)));
+    item_types = [ RackItemType(get_server_item_name(idx), server_params[idx]['rack_space'], server_params[idx]['power'],
+        num_servers, True) for idx, num_servers in enumerate(arguments.num_servers) ];
+    if(arguments.storage > 0):
+        item_types.append(create_storage_shelf_item_type(model, arguments.storage));
+    print(json.dumps(pack_racks(item_types, RackSpec(model)), indent=4, separators=(',', ': ')));
+
+if __name__ == "__main__":
+    main()
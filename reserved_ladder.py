@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+
+import sys
+import csv
+import json
+import math
+import argparse
+import numpy as np
+from collections import OrderedDict
+import amazon
+import ec2_pricing
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+
+#Reserved vs on demand laddering of one EC2 instance type against an hourly core demand profile.
+#
+#The profile is converted to a number of instances per hour and split into 1 year blocks. Instance slot k (k=1..peak) is busy
+#in the hours where at least k instances are needed - sorting each block gives its load-duration curve, the number of busy
+#hours of every slot. Slots are independent: for each of them a shortest path over the block boundaries chooses between
+#on demand hours for one block and a reservation of any term starting at that boundary (all slots at once with numpy).
+#Slot k+1 is never busier than slot k, so the plan is a ladder - the lowest slots are reserved for the longest terms.
+#
+#Costs follow compute_candidate_cost: the upfront part of a reservation is paid in full, its hourly part for the hours of the
+#operating period it overlaps. The reserved instance discount is applied to the reserved spend of the chosen plan.
+
+HOURS_PER_YEAR = 365*24;
+
+def load_core_demand_profile(filename, column=None):
+    #Returns the number of cores needed in every hour - a .npy file or a CSV file with one row per hour. The CSV may have a header
+    #row, column is a column name or index (default: the last column).
+    if(filename.endswith('.npy')):
+        profile = np.asarray(np.load(filename), dtype=np.float64).ravel();
+    else:
+        fptr = open(filename, 'rb');
+        rows = [ row for row in csv.reader(fptr) if len(row) > 0 ];
+        fptr.close();
+        if(column is not None and not str(column).lstrip('-').isdigit()):
+            if(len(rows) == 0 or column not in rows[0]):
+                raise ValueError('Column %s not found in %s'%(column, filename));
+            column_idx = rows[0].index(column);
+            rows = rows[1:];
+        else:
+            column_idx = int(column) if column is not None else -1;
+            #Header row
+            try:
+                if(len(rows) > 0):
+                    float(rows[0][column_idx]);
+            except ValueError:
+                rows = rows[1:];
+        profile = np.array([ float(row[column_idx]) for row in rows ], dtype=np.float64);
+    if(len(profile) == 0):
+        raise ValueError('Core demand profile %s is empty'%(filename));
+    if(not np.all(np.isfinite(profile)) or np.any(profile < 0)):
+        raise ValueError('Core demand profile %s has negative or non-numeric values'%(filename));
+    return profile;
+
+def create_load_duration_curves(num_instances_per_hour, num_blocks, hours_per_block):
+    #Returns the (B,K) number of busy hours of instance slot k+1 in block b
+    peak = int(num_instances_per_hour.max());
+    levels = np.arange(1, peak+1);
+    curves = np.zeros((num_blocks, peak));
+    for block in range(num_blocks):
+        sorted_block = np.sort(num_instances_per_hour[block*hours_per_block:(block+1)*hours_per_block]);
+        curves[block] = len(sorted_block)-np.searchsorted(sorted_block, levels, side='left');
+    return curves;
+
+def solve_ladder(load_duration_curves, on_demand_rate, reserved_options, hours_per_block):
+    #reserved_options: [ (num_blocks_in_term, upfront_rate, hourly_rate) ], on_demand_rate may be None (no on demand offer).
+    #Returns (num_reserved_purchases (R,B) - instances reserved with option r starting at block b,
+    #on_demand_hours (B,) - on demand instance hours of every block) of the cheapest plan of every slot.
+    num_blocks, num_levels = load_duration_curves.shape;
+    level_indices = np.arange(num_levels);
+    min_costs = np.full((num_blocks+1, num_levels), np.inf);
+    min_costs[0] = 0;
+    #Previous boundary and option (-1: on demand) of the cheapest path to every boundary
+    choice_starts = np.zeros((num_blocks+1, num_levels), dtype=np.int64);
+    choice_options = np.full((num_blocks+1, num_levels), -1, dtype=np.int64);
+    for block in range(num_blocks):
+        if(on_demand_rate is not None):
+            curr_costs = min_costs[block]+on_demand_rate*load_duration_curves[block];
+        else:
+            curr_costs = np.where(load_duration_curves[block] > 0, np.inf, min_costs[block]);
+        is_better = curr_costs < min_costs[block+1];
+        min_costs[block+1] = np.where(is_better, curr_costs, min_costs[block+1]);
+        choice_starts[block+1] = np.where(is_better, block, choice_starts[block+1]);
+        choice_options[block+1] = np.where(is_better, -1, choice_options[block+1]);
+        for option, (num_term_blocks, upfront_rate, hourly_rate) in enumerate(reserved_options):
+            end_block = min(block+num_term_blocks, num_blocks);
+            term_cost = (upfront_rate or 0)+(hourly_rate or 0)*(end_block-block)*hours_per_block;
+            curr_costs = min_costs[block]+term_cost;
+            is_better = curr_costs < min_costs[end_block];
+            min_costs[end_block] = np.where(is_better, curr_costs, min_costs[end_block]);
+            choice_starts[end_block] = np.where(is_better, block, choice_starts[end_block]);
+            choice_options[end_block] = np.where(is_better, option, choice_options[end_block]);
+    if(not np.all(np.isfinite(min_costs[num_blocks]))):
+        return None;
+    num_reserved_purchases = np.zeros((len(reserved_options), num_blocks), dtype=np.int64);
+    on_demand_hours = np.zeros(num_blocks);
+    positions = np.full(num_levels, num_blocks, dtype=np.int64);
+    while(np.any(positions > 0)):
+        active = positions > 0;
+        starts = choice_starts[positions[active], level_indices[active]];
+        options = choice_options[positions[active], level_indices[active]];
+        is_on_demand = options < 0;
+        on_demand_hours += np.bincount(starts[is_on_demand], weights=load_duration_curves[starts[is_on_demand], level_indices[active][is_on_demand]],
+                minlength=num_blocks);
+        np.add.at(num_reserved_purchases, (options[~is_on_demand], starts[~is_on_demand]), 1);
+        positions[active] = starts;
+    return num_reserved_purchases, on_demand_hours;
+
+def evaluate_ladder(pricing_catalog, candidate_indices, num_instances_per_hour, operating_period_in_years):
+    #Cheapest ladder of the offer terms in candidate_indices (one instance type and tenancy) - returns a cost dict or None
+    hours_per_block = HOURS_PER_YEAR;
+    num_blocks = int(math.ceil(float(len(num_instances_per_hour))/hours_per_block));
+    on_demand_candidate = None;
+    reserved_candidates = [];
+    for idx in candidate_indices:
+        candidate = pricing_catalog.m_candidates[idx];
+        if(candidate.m_offer_term == 'OnDemand'):
+            on_demand_candidate = candidate;
+        elif(candidate.m_duration):
+            reserved_candidates.append(candidate);
+    reserved_options = [ (max(1, int(round(candidate.m_duration))), candidate.m_upfront_rate, candidate.m_hourly_rate)
+            for candidate in reserved_candidates ];
+    on_demand_rate = (on_demand_candidate.m_hourly_rate or 0) if on_demand_candidate else None;
+    load_duration_curves = create_load_duration_curves(num_instances_per_hour, num_blocks, hours_per_block);
+    solution = solve_ladder(load_duration_curves, on_demand_rate, reserved_options, hours_per_block);
+    if(solution is None):
+        return None;
+    num_reserved_purchases, on_demand_hours = solution;
+    cost_dict = OrderedDict();
+    cost_dict['ladder'] = [];
+    hourly_cost = 0;
+    upfront_cost = 0;
+    reserved_cost = 0;
+    for option, candidate in enumerate(reserved_candidates):
+        num_term_blocks = reserved_options[option][0];
+        for block in np.flatnonzero(num_reserved_purchases[option]):
+            num_instances = int(num_reserved_purchases[option, block]);
+            num_hours = (min(block+num_term_blocks, num_blocks)-block)*hours_per_block;
+            curr_hourly_cost = num_instances*candidate.m_hourly_rate*num_hours if candidate.m_hourly_rate is not None else None;
+            curr_upfront_cost = num_instances*candidate.m_upfront_rate if candidate.m_upfront_rate is not None else None;
+            curr_cost = (curr_hourly_cost or 0)+(curr_upfront_cost or 0);
+            cost_dict['ladder'].append(OrderedDict([ ('offer_term', candidate.m_offer_term), ('offer_term_code', candidate.m_offer_term_code),
+                ('start_year', int(block)), ('num_instances', num_instances), ('total_hourly_cost', curr_hourly_cost),
+                ('total_upfront_cost', curr_upfront_cost), ('total_cost', curr_cost) ]));
+            hourly_cost += curr_hourly_cost or 0;
+            upfront_cost += curr_upfront_cost or 0;
+            reserved_cost += curr_cost;
+    on_demand_cost = on_demand_rate*on_demand_hours if on_demand_candidate else np.zeros(num_blocks);
+    cost_dict['on_demand'] = OrderedDict([ ('offer_term_code', on_demand_candidate.m_offer_term_code if on_demand_candidate else None),
+        ('instance_hours_per_year', on_demand_hours.tolist()), ('cost_per_year', on_demand_cost.tolist()) ]);
+    hourly_cost += float(on_demand_cost.sum());
+    #apply reserved instance discount
+    discount_value = pricing_catalog.m_reserved_discount_function(reserved_cost) if reserved_cost > 0 else 0;
+    cost_dict['summary'] = OrderedDict();
+    cost_dict['summary']['ec2_cost'] = hourly_cost+upfront_cost;
+    cost_dict['summary']['ec2_hourly_cost'] = hourly_cost;
+    cost_dict['summary']['ec2_upfront_cost'] = upfront_cost;
+    cost_dict['summary']['reserved_cost'] = reserved_cost;
+    cost_dict['summary']['discount'] = discount_value;
+    cost_dict['summary']['total_cost'] = hourly_cost+upfront_cost-discount_value;
+    return cost_dict;
+
+def create_hourly_demand(core_demand_profile, operating_period_in_years=None):
+    #The profile is repeated (or cut) to cover the operating period - by default the whole years it spans
+    if(operating_period_in_years is None):
+        operating_period_in_years = max(1, int(math.ceil(float(len(core_demand_profile))/HOURS_PER_YEAR)));
+    return np.resize(core_demand_profile, operating_period_in_years*HOURS_PER_YEAR), operating_period_in_years;
+
+def select_optimal_ladder(model, ec2_pricing_model, core_demand_profile, memory_per_core, operating_period_in_years=None,
+        pricing_catalog=None):
+    #Cheapest (instance type, tenancy) and ladder of its offer terms for an hourly core demand profile
+    if(not pricing_catalog):
+        pricing_catalog = amazon.PricingCatalog(model, ec2_pricing_model);
+    hourly_demand, operating_period_in_years = create_hourly_demand(core_demand_profile, operating_period_in_years);
+    min_cost_dict = None;
+    for instance_type_group in pricing_catalog.m_instance_type_groups:
+        num_usable_cores_per_instance = amazon.compute_num_usable_cores_per_instance(instance_type_group.m_num_cores,
+                instance_type_group.m_memory, memory_per_core);
+        if(num_usable_cores_per_instance < 1):
+            continue;
+        #Float noise in the profile must not add an instance
+        num_instances_per_hour = np.ceil(np.round(hourly_demand/num_usable_cores_per_instance, 9)).astype(np.int64);
+        tenancy_to_candidate_indices = OrderedDict();
+        for idx in instance_type_group.m_candidate_indices:
+            tenancy_to_candidate_indices.setdefault(pricing_catalog.m_candidates[idx].m_tenancy, []).append(idx);
+        for tenancy, candidate_indices in tenancy_to_candidate_indices.iteritems():
+            cost_dict = evaluate_ladder(pricing_catalog, candidate_indices, num_instances_per_hour, operating_period_in_years);
+            if(cost_dict is None):
+                continue;
+            if(min_cost_dict is None or cost_dict['summary']['total_cost'] < min_cost_dict['summary']['total_cost']):
+                candidate = pricing_catalog.m_candidates[candidate_indices[0]];
+                min_cost_dict = OrderedDict([ ('instance_type', candidate.m_instance_type), ('tenancy', tenancy),
+                    ('num_usable_cores_per_instance', num_usable_cores_per_instance), ('memory', candidate.m_memory),
+                    ('peak_num_instances', int(num_instances_per_hour.max())) ]);
+                min_cost_dict.update(cost_dict);
+    if(not min_cost_dict):
+        raise NoServerConfigurationFound(('No valid EC2 instance found for specified memory per core value : %d')%(memory_per_core));
+    min_cost_dict['operating_period_in_years'] = operating_period_in_years;
+    return min_cost_dict;
+
+def create_demand_summary(core_demand_profile):
+    summary = OrderedDict();
+    summary['num_hours'] = len(core_demand_profile);
+    summary['peak_num_cores'] = float(core_demand_profile.max());
+    summary['mean_num_cores'] = float(core_demand_profile.mean());
+    summary['core_utilization'] = 100*summary['mean_num_cores']/summary['peak_num_cores'] if summary['peak_num_cores'] > 0 else 0;
+    return summary;
+
+def main():
+    parser = argparse.ArgumentParser(description='Cheapest ladder of reserved EC2 terms and on demand instances for an hourly core demand profile');
+    required_named_args_group = parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--core_demand_file', help='Hourly number of cores needed - a .npy file or a CSV file with one row'
+            ' per hour', required=True);
+    required_named_args_group.add_argument('--aws_model_parameters_file', help='Path to AWS model parameters file', required=True);
+    required_named_args_group.add_argument('--memory_per_core', help='Memory/RAM (in GB) per core', required=True, type=int);
+    parser.add_argument('--column', help='CSV column with the number of cores (name or index) - default: the last column', default=None);
+    parser.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+    parser.add_argument('--ec2_pricing_index_file', help='Path to a pricing index created by "ec2_pricing.py build-index"', default=None);
+    parser.add_argument('--operating_period', help='Operating period in years, the profile is repeated to cover it - default: the'
+            ' whole years spanned by the profile', default=None, type=int);
+    parser.add_argument('--compare_single_term', help='Add the single offer term configuration of amazon.py (peak cores at the profile\'s'
+            ' average core utilization)', action='store_true');
+    arguments = parser.parse_args();
+    if(not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file):
+        parser.error('one of --ec2_pricing_json_file or --ec2_pricing_index_file is required');
+    if(arguments.operating_period is not None and arguments.operating_period < 1):
+        parser.error('--operating_period must be at least 1 year');
+    aws_model = parse_model_params_file(arguments.aws_model_parameters_file);
+    if(arguments.ec2_pricing_index_file):
+        ec2_pricing_model = ec2_pricing.load_pricing_index(arguments.ec2_pricing_index_file, aws_model['compute'],
+                ec2_pricing_json_file=arguments.ec2_pricing_json_file);
+    else:
+        ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(arguments.ec2_pricing_json_file, aws_model['compute']);
+    pricing_catalog = amazon.PricingCatalog(aws_model, ec2_pricing_model);
+    core_demand_profile = load_core_demand_profile(arguments.core_demand_file, column=arguments.column);
+    result = OrderedDict();
+    result['demand'] = create_demand_summary(core_demand_profile);
+    result['ladder'] = select_optimal_ladder(aws_model, ec2_pricing_model, core_demand_profile, arguments.memory_per_core,
+            operating_period_in_years=arguments.operating_period, pricing_catalog=pricing_catalog);
+    if(arguments.compare_single_term):
+        result['single_term'] = amazon.select_optimal_server_configuration(aws_model, ec2_pricing_model,
+                int(math.ceil(result['demand']['peak_num_cores'])), arguments.memory_per_core, result['ladder']['operating_period_in_years'],
+                result['demand']['core_utilization'], pricing_catalog=pricing_catalog);
+    print(json.dumps(result, indent=4, separators=(',', ': ')));
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+import os
+import json
+import argparse
+import numpy as np
+from collections import OrderedDict
+
+#Columnar result store - a directory with one raw little-endian binary file per column and a schema.json. Numeric columns are
+#float64 (NaN when missing), string and other non-numeric columns are int32 codes into the 'categories' list of the column
+#(-1 when missing). Columns are opened as numpy memmaps, so the queries only page in the columns they use, a chunk of rows at a
+#time, and never load a whole column into memory.
+
+RESULT_STORE_FORMAT_VERSION = 1;
+SCHEMA_FILENAME = 'schema.json';
+NUMERIC = 'numeric';
+CATEGORICAL = 'categorical';
+DTYPES = { NUMERIC: '<f8', CATEGORICAL: '<i4' };
+#Rows buffered by the writer before they are appended to the column files
+WRITE_CHUNK_SIZE = 65536;
+#Rows read per step by the queries
+QUERY_CHUNK_SIZE = 1 << 20;
+#Group key of missing numeric values (NaN never equals itself)
+MISSING_NUMERIC_KEY = -np.inf;
+COMPARISON_OPERATORS = OrderedDict([ ('>=', np.greater_equal), ('<=', np.less_equal), ('!=', np.not_equal), ('==', np.equal),
+    ('>', np.greater), ('<', np.less), ('=', np.equal) ]);
+
+class ResultStoreError(Exception):
+
+    def __init__(self, value):
+        self.value = value;
+
+    def __str__(self):
+        return repr(self.value);
+
+def is_numeric_value(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool);
+
+def get_category_key(value):
+    #Categories are compared by their JSON text, so that e.g. None, True and 'True' stay different
+    return json.dumps(value, sort_keys=True);
+
+class ColumnarResultWriter:
+
+    #columns: list of (name, kind) - rows are dicts, keys that are not columns are ignored
+    def __init__(self, directory, columns, chunk_size=WRITE_CHUNK_SIZE):
+        if(not os.path.isdir(directory)):
+            os.makedirs(directory);
+        #The schema is written by close - without it an incomplete store cannot be opened
+        if(os.path.exists(os.path.join(directory, SCHEMA_FILENAME))):
+            os.remove(os.path.join(directory, SCHEMA_FILENAME));
+        self.m_directory = directory;
+        self.m_columns = [ (name, kind) for name, kind in columns ];
+        self.m_chunk_size = chunk_size;
+        self.m_num_rows = 0;
+        self.m_buffers = OrderedDict([ (name, []) for name, kind in self.m_columns ]);
+        self.m_categories = dict([ (name, []) for name, kind in self.m_columns if kind == CATEGORICAL ]);
+        self.m_category_codes = dict([ (name, {}) for name, kind in self.m_columns if kind == CATEGORICAL ]);
+        self.m_fptrs = OrderedDict([ (name, open(os.path.join(directory, name+'.bin'), 'wb')) for name, kind in self.m_columns ]);
+
+    def encode(self, name, kind, value):
+        if(kind == NUMERIC):
+            return float(value) if value is not None else np.nan;
+        if(value is None):
+            return -1;
+        category_key = get_category_key(value);
+        category_codes = self.m_category_codes[name];
+        if(category_key not in category_codes):
+            category_codes[category_key] = len(self.m_categories[name]);
+            self.m_categories[name].append(value);
+        return category_codes[category_key];
+
+    def write(self, result):
+        for name, kind in self.m_columns:
+            self.m_buffers[name].append(self.encode(name, kind, result.get(name)));
+        self.m_num_rows += 1;
+        if(len(self.m_buffers[self.m_columns[0][0]]) >= self.m_chunk_size):
+            self.flush();
+
+    def flush(self):
+        for name, kind in self.m_columns:
+            np.asarray(self.m_buffers[name], dtype=DTYPES[kind]).tofile(self.m_fptrs[name]);
+            self.m_buffers[name] = [];
+            self.m_fptrs[name].flush();
+
+    def close(self):
+        self.flush();
+        for fptr in self.m_fptrs.itervalues():
+            fptr.close();
+        schema = OrderedDict();
+        schema['format_version'] = RESULT_STORE_FORMAT_VERSION;
+        schema['num_rows'] = self.m_num_rows;
+        schema['columns'] = [ OrderedDict([ ('name', name), ('kind', kind), ('dtype', DTYPES[kind]) ]
+            +([ ('categories', self.m_categories[name]) ] if kind == CATEGORICAL else [])) for name, kind in self.m_columns ];
+        fptr = open(os.path.join(self.m_directory, SCHEMA_FILENAME), 'wb');
+        json.dump(schema, fptr, indent=4, separators=(',', ': '));
+        fptr.close();
+
+def create_grid_columns(grid, input_keys, result_keys, categorical_result_keys):
+    #Fixed schema of a sweep: the inputs in the grid (numeric if all their values are numbers) and the results
+    columns = [ ('provider', CATEGORICAL) ];
+    for key in input_keys:
+        if(key in grid and key not in [ name for name, kind in columns ]):
+            columns.append((key, NUMERIC if all([ is_numeric_value(value) for value in grid[key] ]) else CATEGORICAL));
+    columns += [ (key, CATEGORICAL if key in categorical_result_keys else NUMERIC) for key in result_keys ];
+    return columns;
+
+class ResultStore:
+
+    def __init__(self, directory):
+        schema_file = os.path.join(directory, SCHEMA_FILENAME);
+        if(not os.path.exists(schema_file)):
+            raise ResultStoreError('No result store in %s'%(directory));
+        fptr = open(schema_file, 'rb');
+        schema = json.load(fptr, object_pairs_hook=OrderedDict);
+        fptr.close();
+        if(schema.get('format_version') != RESULT_STORE_FORMAT_VERSION):
+            raise ResultStoreError('Unsupported result store format in %s'%(directory));
+        self.m_directory = directory;
+        self.m_num_rows = schema['num_rows'];
+        self.m_columns = OrderedDict([ (column['name'], column) for column in schema['columns'] ]);
+        self.m_memmaps = {};
+
+    def get_column(self, name):
+        if(name not in self.m_columns):
+            raise ResultStoreError('Unknown column %s - columns are: %s'%(name, ', '.join(self.m_columns.keys())));
+        if(name not in self.m_memmaps):
+            if(self.m_num_rows == 0):
+                self.m_memmaps[name] = np.zeros(0, dtype=self.m_columns[name]['dtype']);
+            else:
+                self.m_memmaps[name] = np.memmap(os.path.join(self.m_directory, name+'.bin'), dtype=self.m_columns[name]['dtype'],
+                        mode='r', shape=(self.m_num_rows,));
+        return self.m_memmaps[name];
+
+    def is_categorical(self, name):
+        return self.m_columns[name]['kind'] == CATEGORICAL;
+
+    def decode(self, name, value):
+        if(self.is_categorical(name)):
+            return self.m_columns[name]['categories'][value] if value >= 0 else None;
+        return float(value) if not np.isnan(value) else None;
+
+    def get_category_code(self, name, value):
+        #-2 never matches a row
+        if(value is None):
+            return -1;
+        category_key = get_category_key(value);
+        for code, category in enumerate(self.m_columns[name]['categories']):
+            if(get_category_key(category) == category_key):
+                return code;
+        return -2;
+
+    def get_chunks(self):
+        for start in xrange(0, self.m_num_rows, QUERY_CHUNK_SIZE):
+            yield start, min(start+QUERY_CHUNK_SIZE, self.m_num_rows);
+
+    def evaluate_conditions(self, conditions, start, end):
+        #conditions: list of (column, operator, value) - returns the mask of the rows [start, end) matching all of them
+        mask = np.ones(end-start, dtype=bool);
+        for name, operator, value in conditions:
+            column = self.get_column(name)[start:end];
+            if(self.is_categorical(name)):
+                if(operator not in [ '=', '==', '!=' ]):
+                    raise ResultStoreError('Column %s is categorical - only =, == and != are supported'%(name));
+                value = self.get_category_code(name, value);
+            elif(value is None):
+                if(operator not in [ '=', '==', '!=' ]):
+                    raise ResultStoreError('Missing values of %s can only be compared with =, == and !='%(name));
+                mask &= np.isnan(column) if operator != '!=' else ~np.isnan(column);
+                continue;
+            mask &= COMPARISON_OPERATORS[operator](column, value);
+        return mask;
+
+    def filter(self, conditions):
+        #Returns the indices of the rows matching all the conditions
+        return np.concatenate([ np.flatnonzero(self.evaluate_conditions(conditions, start, end))+start
+            for start, end in self.get_chunks() ]+[ np.zeros(0, dtype=np.int64) ]);
+
+    def get_rows(self, row_indices, columns=None):
+        columns = columns if columns else self.m_columns.keys();
+        row_indices = np.asarray(row_indices, dtype=np.int64);
+        values = [ (name, self.get_column(name)[row_indices]) for name in columns ];
+        return [ OrderedDict([ ('row', int(row_index)) ]+[ (name, self.decode(name, column_values[idx])) for name, column_values in values ])
+            for idx, row_index in enumerate(row_indices) ];
+
+    def top_k(self, k, value_column='total_cost', conditions=None, largest=False):
+        #Indices of the k rows with the lowest (highest) values, ties broken by row - rows without a value are skipped
+        best_values = np.zeros(0);
+        best_indices = np.zeros(0, dtype=np.int64);
+        for start, end in self.get_chunks():
+            values = np.array(self.get_column(value_column)[start:end], dtype=np.float64);
+            mask = ~np.isnan(values);
+            if(conditions):
+                mask &= self.evaluate_conditions(conditions, start, end);
+            indices = np.flatnonzero(mask);
+            best_values = np.concatenate([ best_values, -values[indices] if largest else values[indices] ]);
+            best_indices = np.concatenate([ best_indices, indices+start ]);
+            if(len(best_values) > k):
+                order = np.lexsort((best_indices, best_values))[:k];
+                best_values = best_values[order];
+                best_indices = best_indices[order];
+        order = np.lexsort((best_indices, best_values));
+        return best_indices[order];
+
+    def group_by(self, key_columns, value_column='total_cost', conditions=None):
+        #Returns [ OrderedDict(keys..., count, min, mean, max, min_row) ] sorted by the minimum - rows without a value are skipped
+        groups = {};
+        for start, end in self.get_chunks():
+            values = np.array(self.get_column(value_column)[start:end], dtype=np.float64);
+            mask = ~np.isnan(values);
+            if(conditions):
+                mask &= self.evaluate_conditions(conditions, start, end);
+            indices = np.flatnonzero(mask);
+            if(len(indices) == 0):
+                continue;
+            values = values[indices];
+            keys = np.column_stack([ np.asarray(self.get_column(name)[start:end], dtype=np.float64)[indices] for name in key_columns ]);
+            keys[np.isnan(keys)] = MISSING_NUMERIC_KEY;
+            unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True);
+            #Sorted by group then by value, so the first row of a group is its minimum
+            order = np.lexsort((values, inverse));
+            sorted_inverse = inverse[order];
+            starts = np.concatenate([ [ 0 ], np.flatnonzero(np.diff(sorted_inverse))+1 ]);
+            ends = np.concatenate([ starts[1:], [ len(order) ] ]);
+            sums = np.add.reduceat(values[order], starts);
+            for group_idx in xrange(len(starts)):
+                key = tuple(unique_keys[sorted_inverse[starts[group_idx]]]);
+                min_value = values[order[starts[group_idx]]];
+                min_row = int(indices[order[starts[group_idx]]]+start);
+                max_value = values[order[ends[group_idx]-1]];
+                count = int(ends[group_idx]-starts[group_idx]);
+                if(key not in groups):
+                    groups[key] = [ 0, 0.0, min_value, min_row, max_value ];
+                group = groups[key];
+                group[0] += count;
+                group[1] += sums[group_idx];
+                if(min_value < group[2]):
+                    group[2] = min_value;
+                    group[3] = min_row;
+                group[4] = max(group[4], max_value);
+        result = [];
+        for key, (count, total, min_value, min_row, max_value) in sorted(groups.iteritems(), key=lambda item: (item[1][2], item[1][3])):
+            group_dict = OrderedDict([ (name, self.decode(name, int(key_value)) if self.is_categorical(name) else
+                (key_value if key_value != MISSING_NUMERIC_KEY else None)) for name, key_value in zip(key_columns, key) ]);
+            group_dict['count'] = count;
+            group_dict['min'] = float(min_value);
+            group_dict['mean'] = float(total)/count;
+            group_dict['max'] = float(max_value);
+            group_dict['min_row'] = min_row;
+            result.append(group_dict);
+        return result;
+
+def parse_condition(condition_string):
+    #'column<operator>value' - the value is parsed as JSON if possible, e.g. provider=aws, num_cores>=64, aws_support=null
+    for operator in COMPARISON_OPERATORS:
+        if(operator in condition_string):
+            name, value_string = condition_string.split(operator, 1);
+            try:
+                value = json.loads(value_string);
+            except ValueError:
+                value = value_string;
+            return (name.strip(), operator, value);
+    raise ResultStoreError('Invalid condition %s - expected <column><operator><value> with one of %s'%(condition_string,
+        ' '.join(COMPARISON_OPERATORS.keys())));
+
+def main():
+    parser = argparse.ArgumentParser(description='Query a columnar result store written by "sweep.py --output_format columnar"');
+    parser.add_argument('directory', help='Result store directory');
+    parser.add_argument('--where', nargs='+', default=[], help='Conditions <column><operator><value>, e.g. provider=aws num_cores>=64');
+    parser.add_argument('--value_column', help='Column to rank and aggregate - default: total_cost', default='total_cost');
+    parser.add_argument('--top_k', help='Print the k rows with the lowest value', default=None, type=int);
+    parser.add_argument('--largest', help='Rank the highest values first', action='store_true');
+    parser.add_argument('--group_by', nargs='+', default=None, help='Print count, min, mean and max of the value per group of these columns');
+    parser.add_argument('--columns', nargs='+', default=None, help='Columns of the printed rows - default: all');
+    arguments = parser.parse_args();
+    store = ResultStore(arguments.directory);
+    conditions = [ parse_condition(condition_string) for condition_string in arguments.where ];
+    result = OrderedDict([ ('num_rows', store.m_num_rows) ]);
+    if(arguments.group_by):
+        result['groups'] = store.group_by(arguments.group_by, value_column=arguments.value_column, conditions=conditions);
+    elif(arguments.top_k is not None):
+        result['rows'] = store.get_rows(store.top_k(arguments.top_k, value_column=arguments.value_column, conditions=conditions,
+            largest=arguments.largest), columns=arguments.columns);
+    else:
+        row_indices = store.filter(conditions);
+        result['num_matching_rows'] = len(row_indices);
+    print(json.dumps(result, indent=4, separators=(',', ': ')));
+
+if __name__ == "__main__":
+    main()
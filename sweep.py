@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+import sys
+import csv
+import json
+import argparse
+import itertools
+import multiprocessing
+from collections import OrderedDict
+import private_cloud
+import amazon
+import ec2_pricing
+import result_store
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from ccc_model_common import COMMON_SCENARIO_KEYS
+from ccc_model_common import PROVIDER_SCENARIO_KEYS
+from ccc_model_common import get_configuration_name
+from tco_cache import StageCache
+from tco_cache import DEFAULT_STAGE_CACHE_SIZE
+
+PROVIDERS = [ 'private_cloud', 'aws' ];
+#Cost summary keys get a '_cost' suffix so that e.g. the 'storage' cost does not clash with the 'storage' input
+RESULT_KEYS = [ 'compute_cost', 'storage_cost', 'network_cost', 'support_cost', 'IT_cost', 'racks_cost', 'total_cost', 'configuration',
+        'error' ];
+
+#Models and pricing are loaded once in the parent and inherited by forked workers - the initializer only
+#loads them again on platforms where workers are spawned
+worker_state = None;
+
+def load_worker_state(model_files, stage_cache_size=DEFAULT_STAGE_CACHE_SIZE):
+    #Every worker keeps its own stage cache - consecutive scenarios of a grid often differ in a single parameter
+    state = { 'model_files': model_files, 'stage_cache_size': stage_cache_size,
+            'stage_cache': StageCache(stage_cache_size) if stage_cache_size > 0 else None };
+    if(model_files.get('pvt_cloud_model_parameters_file')):
+        state['private_cloud_model'] = parse_model_params_file(model_files['pvt_cloud_model_parameters_file']);
+        state['compiled_private_cloud_model'] = private_cloud.CompiledPrivateCloudModel(state['private_cloud_model']);
+    if(model_files.get('aws_model_parameters_file')):
+        aws_model = parse_model_params_file(model_files['aws_model_parameters_file']);
+        if(model_files.get('ec2_pricing_index_file')):
+            ec2_pricing_model = ec2_pricing.load_pricing_index(model_files['ec2_pricing_index_file'], aws_model['compute'],
+                    ec2_pricing_json_file=model_files.get('ec2_pricing_json_file'));
+        else:
+            ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(model_files['ec2_pricing_json_file'], aws_model['compute']);
+        state['aws_model'] = aws_model;
+        state['ec2_pricing_model'] = ec2_pricing_model;
+        state['pricing_catalog'] = amazon.PricingCatalog(aws_model, ec2_pricing_model);
+    return state;
+
+def init_worker(model_files, stage_cache_size=DEFAULT_STAGE_CACHE_SIZE):
+    global worker_state;
+    if(worker_state is None or worker_state['model_files'] != model_files or worker_state['stage_cache_size'] != stage_cache_size):
+        worker_state = load_worker_state(model_files, stage_cache_size);
+
+def validate_grid(grid):
+    #Every key must be an input of at least one of the selected providers - a misspelt key would otherwise be silently ignored
+    providers = grid.get('provider', PROVIDERS);
+    unknown_providers = [ provider for provider in providers if provider not in PROVIDERS ];
+    if(len(unknown_providers) > 0):
+        raise ValueError('Unknown providers in the grid : %s'%(', '.join([ str(provider) for provider in unknown_providers ])));
+    accepted_keys = set([ 'provider' ]+COMMON_SCENARIO_KEYS);
+    for provider in providers:
+        accepted_keys.update(PROVIDER_SCENARIO_KEYS[provider]);
+    unknown_keys = [ key for key in grid if key not in accepted_keys ];
+    if(len(unknown_keys) > 0):
+        raise ValueError('Grid keys not accepted by any of the providers %s : %s'%(', '.join(providers), ', '.join(unknown_keys)));
+
+def generate_scenarios(grid):
+    #The grid is validated when the generator is created, not when the first scenario is drawn
+    validate_grid(grid);
+    return iterate_scenarios(grid);
+
+def iterate_scenarios(grid):
+    for provider in grid.get('provider', PROVIDERS):
+        keys = [ key for key in COMMON_SCENARIO_KEYS+PROVIDER_SCENARIO_KEYS[provider] if key in grid ];
+        for values in itertools.product(*[ grid[key] for key in keys ]):
+            scenario = OrderedDict([ ('provider', provider) ]);
+            for key, value in zip(keys, values):
+                scenario[key] = value;
+            yield scenario;
+
+def create_frontier_entry(provider, compute_cost_dict):
+    #Configuration name and the objectives of one configuration on the compute frontier
+    frontier_entry = OrderedDict([ ('configuration', get_configuration_name(provider, compute_cost_dict)) ]);
+    if(provider == 'aws'):
+        frontier_entry['total_cost'] = compute_cost_dict['summary']['total_cost'];
+        frontier_entry['num_machines'] = compute_cost_dict['num_instances'];
+    else:
+        frontier_entry['total_cost'] = compute_cost_dict['summary']['total_cost']+compute_cost_dict.get('IT_cost', 0);
+        frontier_entry['num_machines'] = compute_cost_dict['num_servers'];
+        frontier_entry['num_racks'] = compute_cost_dict['num_racks'];
+        frontier_entry['total_power'] = compute_cost_dict['summary']['total_power'];
+    frontier_entry['spare_cores'] = compute_cost_dict['spare_cores'];
+    frontier_entry['spare_memory'] = compute_cost_dict['spare_memory'];
+    return frontier_entry;
+
+def evaluate_scenario(scenario):
+    params = dict(scenario);
+    provider = params.pop('provider');
+    result = OrderedDict(scenario);
+    try:
+        if(provider == 'aws'):
+            args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=worker_state['aws_model'],
+                    ec2_pricing_dict=worker_state['ec2_pricing_model'], **params);
+            cost_dict = amazon.compute_tco(args_handler, pricing_catalog=worker_state['pricing_catalog'],
+                    stage_cache=worker_state['stage_cache']);
+        else:
+            args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=worker_state['private_cloud_model'], **params);
+            cost_dict = private_cloud.compute_tco(args_handler, stage_cache=worker_state['stage_cache'],
+                    compiled_model=worker_state['compiled_private_cloud_model']);
+        for key, value in cost_dict['summary'].iteritems():
+            result[key if key == 'total_cost' else key+'_cost'] = value;
+        result['configuration'] = get_configuration_name(provider, cost_dict['compute']);
+        #Only the ndjson output has room for the list
+        if('compute_frontier' in cost_dict):
+            result['compute_frontier'] = [ create_frontier_entry(provider, compute_cost_dict)
+                    for compute_cost_dict in cost_dict['compute_frontier'] ];
+    except NoServerConfigurationFound as e:
+        result['error'] = e.value;
+    return result;
+
+def evaluate_scenario_chunk(scenario_chunk):
+    return [ evaluate_scenario(scenario) for scenario in scenario_chunk ];
+
+def chunk_iterator(iterator, chunk_size):
+    while(True):
+        chunk = list(itertools.islice(iterator, chunk_size));
+        if(len(chunk) == 0):
+            return;
+        yield chunk;
+
+class NDJSONResultWriter:
+
+    def __init__(self, fptr):
+        self.m_fptr = fptr;
+
+    def write(self, result):
+        self.m_fptr.write(json.dumps(result)+'\n');
+
+class CSVResultWriter:
+
+    def __init__(self, fptr, grid):
+        columns = [ 'provider' ];
+        for provider in grid.get('provider', PROVIDERS):
+            columns += [ key for key in COMMON_SCENARIO_KEYS+PROVIDER_SCENARIO_KEYS[provider] if key in grid and key not in columns ];
+        self.m_writer = csv.DictWriter(fptr, columns+RESULT_KEYS, restval='', extrasaction='ignore');
+        self.m_writer.writeheader();
+
+    def write(self, result):
+        self.m_writer.writerow(result);
+
+class ColumnarResultWriter(result_store.ColumnarResultWriter):
+
+    def __init__(self, directory, grid):
+        input_keys = [];
+        for provider in grid.get('provider', PROVIDERS):
+            input_keys += [ key for key in COMMON_SCENARIO_KEYS+PROVIDER_SCENARIO_KEYS[provider] if key not in input_keys ];
+        result_store.ColumnarResultWriter.__init__(self, directory, result_store.create_grid_columns(grid, input_keys, RESULT_KEYS,
+            [ 'configuration', 'error' ]));
+
+def run_sweep(grid, model_files, result_writer, num_workers=None, chunk_size=64, stage_cache_size=DEFAULT_STAGE_CACHE_SIZE):
+    global worker_state;
+    scenarios = generate_scenarios(grid);
+    worker_state = load_worker_state(model_files, stage_cache_size);
+    num_results = 0;
+    scenario_chunks = chunk_iterator(scenarios, chunk_size);
+    if(num_workers == 1):
+        result_chunks = itertools.imap(evaluate_scenario_chunk, scenario_chunks);
+        pool = None;
+    else:
+        pool = multiprocessing.Pool(processes=num_workers, initializer=init_worker, initargs=(model_files, stage_cache_size));
+        result_chunks = pool.imap(evaluate_scenario_chunk, scenario_chunks);
+    for result_chunk in result_chunks:
+        for result in result_chunk:
+            result_writer.write(result);
+            num_results += 1;
+    if(pool):
+        pool.close();
+        pool.join();
+    return num_results;
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep over the private cloud and AWS cost models');
+    required_named_args_group = parser.add_argument_group('Required named arguments');
+    required_named_args_group.add_argument('--grid_spec', help='JSON file mapping parameter names (and "provider") to lists of values',
+            required=True);
+    parser.add_argument('--pvt_cloud_model_parameters_file', help='Path to private cloud model parameters file', default=None);
+    parser.add_argument('--aws_model_parameters_file', help='Path to AWS model parameters file', default=None);
+    parser.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+    parser.add_argument('--ec2_pricing_index_file', help='Path to a pricing index created by "ec2_pricing.py build-index"', default=None);
+    parser.add_argument('--output', '-o', help='Output file (directory for columnar) - default: stdout', default=None);
+    parser.add_argument('--output_format', help='Output format - ndjson(default), csv or columnar (a result store queried with result_store.py)',
+            default='ndjson', choices=['ndjson', 'csv', 'columnar']);
+    parser.add_argument('--num_workers', '-j', help='Number of worker processes - default: number of CPUs', default=None, type=int);
+    parser.add_argument('--chunk_size', help='Scenarios per task sent to a worker - default: 64', default=64, type=int);
+    parser.add_argument('--stage_cache_size', help='Maximum number of cached compute_tco stage results per worker, 0 disables the cache'
+            ' - default: %d'%(DEFAULT_STAGE_CACHE_SIZE), default=DEFAULT_STAGE_CACHE_SIZE, type=int);
+    arguments = parser.parse_args();
+    grid = parse_model_params_file(arguments.grid_spec);
+    try:
+        validate_grid(grid);
+    except ValueError as e:
+        parser.error(str(e));
+    providers = grid.get('provider', PROVIDERS);
+    if('private_cloud' in providers and not arguments.pvt_cloud_model_parameters_file):
+        parser.error('--pvt_cloud_model_parameters_file is required to sweep the private cloud');
+    if('aws' in providers and (not arguments.aws_model_parameters_file or \
+            (not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file))):
+        parser.error('--aws_model_parameters_file and one of --ec2_pricing_json_file or --ec2_pricing_index_file are required to sweep AWS');
+    model_files = OrderedDict([
+        ('pvt_cloud_model_parameters_file', arguments.pvt_cloud_model_parameters_file if 'private_cloud' in providers else None),
+        ('aws_model_parameters_file', arguments.aws_model_parameters_file if 'aws' in providers else None),
+        ('ec2_pricing_json_file', arguments.ec2_pricing_json_file),
+        ('ec2_pricing_index_file', arguments.ec2_pricing_index_file)
+        ]);
+    if(arguments.output_format == 'columnar' and not arguments.output):
+        parser.error('--output is required for the columnar output format');
+    if(arguments.output_format != 'ndjson' and any(grid.get('compute_frontier', []))):
+        parser.error('compute_frontier in the grid requires the ndjson output format');
+    fptr = None;
+    if(arguments.output_format == 'columnar'):
+        result_writer = ColumnarResultWriter(arguments.output, grid);
+    elif(arguments.output_format == 'csv'):
+        fptr = open(arguments.output, 'wb') if arguments.output else sys.stdout;
+        result_writer = CSVResultWriter(fptr, grid);
+    else:
+        fptr = open(arguments.output, 'wb') if arguments.output else sys.stdout;
+        result_writer = NDJSONResultWriter(fptr);
+    num_results = run_sweep(grid, model_files, result_writer, num_workers=arguments.num_workers, chunk_size=arguments.chunk_size,
+            stage_cache_size=arguments.stage_cache_size);
+    if(arguments.output_format == 'columnar'):
+        result_writer.close();
+    elif(arguments.output):
+        fptr.close();
+    sys.stderr.write('Evaluated %d scenarios\n'%(num_results));
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_STAGE_CACHE_SIZE = 4096;
+#Number of distinct model objects whose hashes are remembered
+MODEL_HASH_CACHE_SIZE = 16;
+
+class LRUCache:
+
+    def __init__(self, max_size):
+        self.m_max_size = max_size;
+        self.m_entries = OrderedDict();
+        self.m_num_hits = 0;
+        self.m_num_misses = 0;
+        self.m_num_evictions = 0;
+
+    #Returns (found, value)
+    def get(self, key):
+        if(key not in self.m_entries):
+            self.m_num_misses += 1;
+            return (False, None);
+        self.m_num_hits += 1;
+        value = self.m_entries.pop(key);
+        self.m_entries[key] = value;
+        return (True, value);
+
+    def put(self, key, value):
+        if(key in self.m_entries):
+            del self.m_entries[key];
+        elif(len(self.m_entries) >= self.m_max_size):
+            self.m_entries.popitem(last=False);
+            self.m_num_evictions += 1;
+        self.m_entries[key] = value;
+
+    def clear(self):
+        self.m_entries.clear();
+
+    def get_stats(self):
+        stats = OrderedDict();
+        stats['size'] = len(self.m_entries);
+        stats['max_size'] = self.m_max_size;
+        stats['hits'] = self.m_num_hits;
+        stats['misses'] = self.m_num_misses;
+        stats['evictions'] = self.m_num_evictions;
+        num_lookups = self.m_num_hits+self.m_num_misses;
+        stats['hit_rate'] = (float(self.m_num_hits)/num_lookups) if num_lookups else None;
+        return stats;
+
+#Cost dicts only nest dicts (and the occasional list) of scalars - much cheaper than copy.deepcopy of OrderedDicts
+def copy_cost_dict(value):
+    if(isinstance(value, OrderedDict)):
+        return OrderedDict([ (key, copy_cost_dict(sub_value)) for key, sub_value in value.iteritems() ]);
+    if(isinstance(value, dict)):
+        return dict([ (key, copy_cost_dict(sub_value)) for key, sub_value in value.iteritems() ]);
+    if(isinstance(value, list)):
+        return [ copy_cost_dict(sub_value) for sub_value in value ];
+    return value;
+
+def compute_model_hash(model):
+    return hashlib.sha256(json.dumps(model, sort_keys=True, separators=(',', ':'))).hexdigest();
+
+class StageCache:
+
+    #Memoizes the stages (compute, storage, network, support, IT) of compute_tco. The key of a stage is its name,
+    #the hashes of the models it reads and the scalar inputs it depends on - so a query that only changes the bandwidth
+    #reuses the compute and storage results. Models are treated as immutable once they have been hashed.
+    def __init__(self, max_size=DEFAULT_STAGE_CACHE_SIZE):
+        self.m_cache = LRUCache(max_size);
+        self.m_model_hashes = LRUCache(MODEL_HASH_CACHE_SIZE);
+        #Compiled forms of the models (private_cloud.CompiledPrivateCloudModel), built once per model hash
+        self.m_compiled_models = LRUCache(MODEL_HASH_CACHE_SIZE);
+        self.m_stage_stats = OrderedDict();
+        #The cache may be shared by the request threads of a server; stages are computed outside the lock
+        self.m_lock = threading.Lock();
+
+    def get_model_hash(self, model):
+        #Keep a reference to the model so that its id cannot be reused while the entry exists
+        found, entry = self.m_model_hashes.get(id(model));
+        if(found and entry[0] is model):
+            return entry[1];
+        model_hash = compute_model_hash(model);
+        self.m_model_hashes.put(id(model), (model, model_hash));
+        return model_hash;
+
+    def get_or_compute(self, stage, models, inputs, compute_function):
+        with self.m_lock:
+            key = (stage, tuple([ self.get_model_hash(model) for model in models ]), inputs);
+            if(stage not in self.m_stage_stats):
+                self.m_stage_stats[stage] = OrderedDict([ ('hits', 0), ('misses', 0) ]);
+            found, value = self.m_cache.get(key);
+            self.m_stage_stats[stage]['hits' if found else 'misses'] += 1;
+        if(not found):
+            value = compute_function();
+            with self.m_lock:
+                self.m_cache.put(key, value);
+        #Callers are free to modify the returned cost dicts
+        return copy_cost_dict(value);
+
+    def get_compiled_model(self, model, compile_function):
+        with self.m_lock:
+            key = (compile_function, self.get_model_hash(model));
+            found, compiled_model = self.m_compiled_models.get(key);
+        if(not found):
+            compiled_model = compile_function(model);
+            with self.m_lock:
+                self.m_compiled_models.put(key, compiled_model);
+        return compiled_model;
+
+    def clear(self):
+        with self.m_lock:
+            self.m_cache.clear();
+            self.m_compiled_models.clear();
+
+    def get_stats(self):
+        with self.m_lock:
+            stats = self.m_cache.get_stats();
+            stats['stages'] = copy_cost_dict(self.m_stage_stats);
+        return stats;
+
+def compute_stage(stage_cache, stage, models, inputs, compute_function):
+    if(stage_cache is None):
+        return compute_function();
+    return stage_cache.get_or_compute(stage, models, inputs, compute_function);
+
+def get_compiled_model(stage_cache, model, compile_function):
+    if(stage_cache is None):
+        return compile_function(model);
+    return stage_cache.get_compiled_model(model, compile_function);
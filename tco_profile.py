@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import sys
+import json
+import time
+from collections import OrderedDict
+try:
+    import resource
+except ImportError:
+    resource = None;
+
+#Callables hook(event, name, value) notified of every stage ('stage', name, metrics dict) and counter ('counter', name, increment),
+#whether or not a Profiler is passed to the cost functions - this lets a host process collect the metrics without patching
+profile_hooks = [];
+
+def register_profile_hook(hook):
+    if(hook not in profile_hooks):
+        profile_hooks.append(hook);
+
+def unregister_profile_hook(hook):
+    if(hook in profile_hooks):
+        profile_hooks.remove(hook);
+
+def get_peak_rss_in_MB():
+    if(resource is None):
+        return None;
+    #ru_maxrss is in KB on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss;
+    return float(peak_rss)/(1024*1024 if sys.platform == 'darwin' else 1024);
+
+class Profiler:
+
+    def __init__(self):
+        self.m_start_time = time.time();
+        self.m_stages = OrderedDict();
+        self.m_counters = OrderedDict();
+
+    def add_stage(self, name, metrics):
+        if(name not in self.m_stages):
+            self.m_stages[name] = OrderedDict([ ('calls', 0), ('wall_time_s', 0.0), ('max_wall_time_s', 0.0), ('peak_rss_MB', None),
+                ('peak_rss_increase_MB', None) ]);
+        stage_dict = self.m_stages[name];
+        stage_dict['calls'] += 1;
+        stage_dict['wall_time_s'] += metrics['wall_time_s'];
+        stage_dict['max_wall_time_s'] = max(stage_dict['max_wall_time_s'], metrics['wall_time_s']);
+        if(metrics['peak_rss_MB'] is not None):
+            stage_dict['peak_rss_MB'] = max(stage_dict['peak_rss_MB'], metrics['peak_rss_MB']);
+            stage_dict['peak_rss_increase_MB'] = max(stage_dict['peak_rss_increase_MB'], metrics['peak_rss_increase_MB']);
+
+    def add_count(self, name, increment):
+        self.m_counters[name] = self.m_counters.get(name, 0)+increment;
+
+    def get_profile(self):
+        profile = OrderedDict();
+        profile['total_wall_time_s'] = time.time()-self.m_start_time;
+        profile['peak_rss_MB'] = get_peak_rss_in_MB();
+        profile['stages'] = OrderedDict([ (name, OrderedDict(stage_dict)) for name, stage_dict in self.m_stages.iteritems() ]);
+        profile['counters'] = OrderedDict(self.m_counters);
+        return profile;
+
+class ProfileStage:
+
+    #Context manager that times a stage and records it in the profiler (if any) and the registered hooks
+    def __init__(self, profiler, name):
+        self.m_profiler = profiler;
+        self.m_name = name;
+
+    def __enter__(self):
+        self.m_start_peak_rss = get_peak_rss_in_MB();
+        self.m_start_time = time.time();
+        return self;
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        metrics = OrderedDict();
+        metrics['wall_time_s'] = time.time()-self.m_start_time;
+        metrics['peak_rss_MB'] = get_peak_rss_in_MB();
+        #ru_maxrss only grows - an increase means this stage set a new peak
+        metrics['peak_rss_increase_MB'] = (metrics['peak_rss_MB']-self.m_start_peak_rss) if metrics['peak_rss_MB'] is not None else None;
+        if(self.m_profiler is not None):
+            self.m_profiler.add_stage(self.m_name, metrics);
+        for hook in list(profile_hooks):
+            hook('stage', self.m_name, metrics);
+        return False;
+
+class NullProfileStage:
+
+    def __enter__(self):
+        return self;
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False;
+
+NULL_PROFILE_STAGE = NullProfileStage();
+
+def profile_stage(profiler, name):
+    if(profiler is None and not profile_hooks):
+        return NULL_PROFILE_STAGE;
+    return ProfileStage(profiler, name);
+
+def add_profile_count(profiler, name, increment):
+    if(profiler is not None):
+        profiler.add_count(name, increment);
+    for hook in list(profile_hooks):
+        hook('counter', name, increment);
+
+def dump_cost_dict(cost_dict, profiler=None, **kwargs):
+    #Serialization is measured on a first pass so that the printed profile can include it
+    if(profiler is not None):
+        with profile_stage(profiler, 'serialize_output'):
+            json.dumps(cost_dict, **kwargs);
+        cost_dict['profile'] = profiler.get_profile();
+    return json.dumps(cost_dict, **kwargs);
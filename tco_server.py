@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import collections
+import SocketServer
+import BaseHTTPServer
+from collections import OrderedDict
+import private_cloud
+import amazon
+import ec2_pricing
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from ccc_model_common import COMMON_SCENARIO_KEYS
+from ccc_model_common import PROVIDER_SCENARIO_KEYS
+from tco_cache import StageCache
+from tco_cache import DEFAULT_STAGE_CACHE_SIZE
+
+LATENCY_WINDOW_SIZE = 4096;
+
+class LatencyRecorder:
+
+    def __init__(self, window_size=LATENCY_WINDOW_SIZE):
+        self.m_num_requests = 0;
+        self.m_num_errors = 0;
+        self.m_num_items = 0;
+        self.m_total_time = 0.0;
+        self.m_max_time = 0.0;
+        #Percentiles are computed over the most recent requests only
+        self.m_recent_times = collections.deque(maxlen=window_size);
+
+    def record(self, elapsed_time, num_items, is_error=False):
+        self.m_num_requests += 1;
+        self.m_num_items += num_items;
+        self.m_total_time += elapsed_time;
+        self.m_max_time = max(self.m_max_time, elapsed_time);
+        self.m_recent_times.append(elapsed_time);
+        if(is_error):
+            self.m_num_errors += 1;
+
+    def get_summary(self):
+        summary = OrderedDict();
+        summary['num_requests'] = self.m_num_requests;
+        summary['num_errors'] = self.m_num_errors;
+        summary['num_items'] = self.m_num_items;
+        summary['mean_latency_ms'] = (1000*self.m_total_time/self.m_num_requests) if self.m_num_requests else None;
+        summary['max_latency_ms'] = 1000*self.m_max_time;
+        recent_times = sorted(self.m_recent_times);
+        for percentile in [ 50, 95, 99 ]:
+            summary['p%d_latency_ms'%(percentile)] = (1000*recent_times[min(len(recent_times)-1, (percentile*len(recent_times))//100)]) \
+                    if recent_times else None;
+        return summary;
+
+class TCOService:
+
+    #Keeps the models and the EC2 pricing resident and reloads them when any of the model files changes
+    def __init__(self, model_files, reload_check_interval=1.0, stage_cache_size=DEFAULT_STAGE_CACHE_SIZE):
+        self.m_model_files = model_files;
+        self.m_stage_cache = StageCache(stage_cache_size) if stage_cache_size > 0 else None;
+        self.m_reload_check_interval = reload_check_interval;
+        self.m_last_reload_check = 0;
+        self.m_file_mtimes = None;
+        self.m_num_reloads = 0;
+        self.m_num_reload_errors = 0;
+        self.m_last_reload_error = None;
+        self.m_reload_lock = threading.Lock();
+        self.m_reload_thread = None;
+        self.m_metrics_lock = threading.Lock();
+        self.m_latency_recorders = OrderedDict();
+        self.m_state = None;
+        self.load_models();
+
+    def get_file_mtimes(self):
+        #A file that is missing for a moment (replaced by a rename) has no mtime
+        file_mtimes = {};
+        for key, filename in self.m_model_files.iteritems():
+            if(filename):
+                try:
+                    file_mtimes[key] = os.stat(filename).st_mtime;
+                except OSError:
+                    file_mtimes[key] = None;
+        return file_mtimes;
+
+    def load_models(self):
+        file_mtimes = self.get_file_mtimes();
+        model_files = self.m_model_files;
+        state = { 'private_cloud_model': None, 'compiled_private_cloud_model': None, 'aws_model': None, 'ec2_pricing_model': None,
+                'pricing_catalog': None };
+        if(model_files.get('pvt_cloud_model_parameters_file')):
+            state['private_cloud_model'] = parse_model_params_file(model_files['pvt_cloud_model_parameters_file']);
+            state['compiled_private_cloud_model'] = private_cloud.CompiledPrivateCloudModel(state['private_cloud_model']);
+        if(model_files.get('aws_model_parameters_file')):
+            aws_model = parse_model_params_file(model_files['aws_model_parameters_file']);
+            if(model_files.get('ec2_pricing_index_file')):
+                ec2_pricing_model = ec2_pricing.load_pricing_index(model_files['ec2_pricing_index_file'], aws_model['compute'],
+                        ec2_pricing_json_file=model_files.get('ec2_pricing_json_file'));
+            else:
+                ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(model_files['ec2_pricing_json_file'], aws_model['compute']);
+            state['aws_model'] = aws_model;
+            state['ec2_pricing_model'] = ec2_pricing_model;
+            state['pricing_catalog'] = amazon.PricingCatalog(aws_model, ec2_pricing_model);
+        #Swap everything at once so that a request never sees a half-reloaded state
+        self.m_state = state;
+        #Rebuilding the pricing index rewrites the index file, so record the mtimes after loading
+        self.m_file_mtimes = self.get_file_mtimes() if model_files.get('ec2_pricing_index_file') else file_mtimes;
+
+    def reload_if_changed(self):
+        #Called on the request path - only stats the files. A change starts a reload in a background thread and requests keep
+        #using the current m_state until the new one is swapped in. At most one reload runs at a time, a change noticed while
+        #one is running is picked up by the next check after it finishes. Returns True if a reload was started.
+        now = time.time();
+        if(now - self.m_last_reload_check < self.m_reload_check_interval):
+            return False;
+        self.m_last_reload_check = now;
+        if(self.get_file_mtimes() == self.m_file_mtimes):
+            return False;
+        if(not self.m_reload_lock.acquire(False)):
+            return False;
+        self.m_reload_thread = threading.Thread(target=self.reload_models);
+        self.m_reload_thread.daemon = True;
+        self.m_reload_thread.start();
+        return True;
+
+    def reload_models(self):
+        #Runs with m_reload_lock held by reload_if_changed
+        try:
+            file_mtimes = self.get_file_mtimes();
+            try:
+                self.load_models();
+            except Exception as e:
+                #Keep serving the previous models. The mtimes are recorded anyway so that a malformed or half written file
+                #is only loaded again once it changes, not on every request.
+                self.m_file_mtimes = file_mtimes;
+                self.m_num_reload_errors += 1;
+                self.m_last_reload_error = '%s: %s'%(type(e).__name__, e);
+                sys.stderr.write('Reloading the models failed, keeping the previous ones - %s\n'%(self.m_last_reload_error));
+                return;
+            #Stale entries are never hit again since the model hashes change - drop them right away
+            if(self.m_stage_cache):
+                self.m_stage_cache.clear();
+            self.m_num_reloads += 1;
+        finally:
+            self.m_reload_lock.release();
+
+    def compute_private_cloud_tco(self, state, params):
+        if(state['private_cloud_model'] is None):
+            raise ValueError('Service was started without a private cloud model');
+        args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=state['private_cloud_model'], **params);
+        return private_cloud.compute_tco(args_handler, stage_cache=self.m_stage_cache, compiled_model=state['compiled_private_cloud_model']);
+
+    def compute_aws_tco(self, state, params):
+        if(state['aws_model'] is None):
+            raise ValueError('Service was started without an AWS model');
+        args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=state['aws_model'], ec2_pricing_dict=state['ec2_pricing_model'],
+                **params);
+        return amazon.compute_tco(args_handler, pricing_catalog=state['pricing_catalog'], stage_cache=self.m_stage_cache);
+
+    def evaluate(self, endpoint, request_body):
+        #A body with a JSON list is a batch - every item gets its own result or error
+        provider, compute_function = { '/private_cloud/tco': ('private_cloud', self.compute_private_cloud_tco),
+                '/aws/tco': ('aws', self.compute_aws_tco) }[endpoint];
+        allowed_keys = set(COMMON_SCENARIO_KEYS+PROVIDER_SCENARIO_KEYS[provider]);
+        state = self.m_state;
+        is_batch = isinstance(request_body, list);
+        results = [];
+        for params in (request_body if is_batch else [ request_body ]):
+            if(not isinstance(params, dict)):
+                raise ValueError('Request parameters must be JSON objects');
+            unknown_keys = set(params.keys()) - allowed_keys;
+            if(len(unknown_keys) > 0):
+                raise ValueError('Unknown parameters: %s'%(', '.join(sorted(unknown_keys))));
+            try:
+                results.append(compute_function(state, dict([ (str(key), value) for key, value in params.iteritems() ])));
+            except NoServerConfigurationFound as e:
+                results.append({ 'error': e.value });
+        return (results if is_batch else results[0]), len(results);
+
+    def record_latency(self, endpoint, elapsed_time, num_items, is_error=False):
+        with self.m_metrics_lock:
+            if(endpoint not in self.m_latency_recorders):
+                self.m_latency_recorders[endpoint] = LatencyRecorder();
+            self.m_latency_recorders[endpoint].record(elapsed_time, num_items, is_error);
+
+    def get_metrics(self):
+        metrics = OrderedDict();
+        metrics['num_reloads'] = self.m_num_reloads;
+        metrics['num_reload_errors'] = self.m_num_reload_errors;
+        metrics['reload_in_progress'] = self.m_reload_lock.locked();
+        metrics['last_reload_error'] = self.m_last_reload_error;
+        with self.m_metrics_lock:
+            metrics['endpoints'] = OrderedDict([ (endpoint, recorder.get_summary())
+                for endpoint, recorder in self.m_latency_recorders.iteritems() ]);
+        metrics['stage_cache'] = self.m_stage_cache.get_stats() if self.m_stage_cache else None;
+        return metrics;
+
+class TCORequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1';
+
+    def send_json(self, status, response):
+        body = json.dumps(response, separators=(',', ':'));
+        self.send_response(status);
+        self.send_header('Content-Type', 'application/json');
+        self.send_header('Content-Length', str(len(body)));
+        self.end_headers();
+        self.wfile.write(body);
+
+    def do_GET(self):
+        service = self.server.m_service;
+        if(self.path == '/metrics'):
+            self.send_json(200, service.get_metrics());
+        elif(self.path == '/health'):
+            self.send_json(200, { 'status': 'ok' });
+        else:
+            self.send_json(404, { 'error': 'Unknown endpoint %s'%(self.path) });
+
+    def do_POST(self):
+        service = self.server.m_service;
+        start_time = time.time();
+        if(self.path not in [ '/private_cloud/tco', '/aws/tco' ]):
+            self.send_json(404, { 'error': 'Unknown endpoint %s'%(self.path) });
+            return;
+        num_items = 0;
+        try:
+            service.reload_if_changed();
+            request_body = json.loads(self.rfile.read(int(self.headers.getheader('Content-Length', 0))));
+            response, num_items = service.evaluate(self.path, request_body);
+            status = 200;
+        except (ValueError, TypeError, KeyError) as e:
+            response = { 'error': str(e) };
+            status = 400;
+        except Exception as e:
+            #A model that fails on these inputs must not drop the connection without a reply
+            response = { 'error': '%s: %s'%(type(e).__name__, e) };
+            status = 500;
+        self.send_json(status, response);
+        service.record_latency(self.path, time.time()-start_time, num_items, is_error=(status != 200));
+
+    def address_string(self):
+        #Unix sockets have no client address
+        return str(self.client_address[0]) if self.client_address else 'unix';
+
+    def log_message(self, format, *args):
+        if(self.server.m_verbose):
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args);
+
+class TCOHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True;
+
+    def __init__(self, server_address, service, verbose=False):
+        BaseHTTPServer.HTTPServer.__init__(self, server_address, TCORequestHandler);
+        self.m_service = service;
+        self.m_verbose = verbose;
+
+class TCOUnixHTTPServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+
+    daemon_threads = True;
+
+    def __init__(self, socket_path, service, verbose=False):
+        if(os.path.exists(socket_path)):
+            os.unlink(socket_path);
+        SocketServer.UnixStreamServer.__init__(self, socket_path, TCORequestHandler);
+        self.m_service = service;
+        self.m_verbose = verbose;
+
+def main():
+    parser = argparse.ArgumentParser(description='Local TCO service that keeps the private cloud model, the AWS model and EC2 pricing resident');
+    parser.add_argument('--pvt_cloud_model_parameters_file', help='Path to private cloud model parameters file', default=None);
+    parser.add_argument('--aws_model_parameters_file', help='Path to AWS model parameters file', default=None);
+    parser.add_argument('--ec2_pricing_json_file', help='Path to AWS EC2 pricing JSON file', default=None);
+    parser.add_argument('--ec2_pricing_index_file', help='Path to a pricing index created by "ec2_pricing.py build-index"', default=None);
+    parser.add_argument('--host', help='Address to listen on - default: 127.0.0.1', default='127.0.0.1');
+    parser.add_argument('--port', help='TCP port to listen on - default: 8080', default=8080, type=int);
+    parser.add_argument('--unix_socket', help='Listen on this Unix socket instead of TCP', default=None);
+    parser.add_argument('--reload_check_interval', help='Seconds between checks for changed model files - default: 1', default=1.0,
+            type=float);
+    parser.add_argument('--stage_cache_size', help='Maximum number of cached compute_tco stage results, 0 disables the cache - default: %d'
+            %(DEFAULT_STAGE_CACHE_SIZE), default=DEFAULT_STAGE_CACHE_SIZE, type=int);
+    parser.add_argument('--verbose', help='Log every request', action='store_true');
+    arguments = parser.parse_args();
+    if(not arguments.pvt_cloud_model_parameters_file and not arguments.aws_model_parameters_file):
+        parser.error('at least one of --pvt_cloud_model_parameters_file or --aws_model_parameters_file is required');
+    if(arguments.aws_model_parameters_file and not arguments.ec2_pricing_json_file and not arguments.ec2_pricing_index_file):
+        parser.error('one of --ec2_pricing_json_file or --ec2_pricing_index_file is required with --aws_model_parameters_file');
+    model_files = OrderedDict([
+        ('pvt_cloud_model_parameters_file', arguments.pvt_cloud_model_parameters_file),
+        ('aws_model_parameters_file', arguments.aws_model_parameters_file),
+        ('ec2_pricing_json_file', arguments.ec2_pricing_json_file if arguments.aws_model_parameters_file else None),
+        ('ec2_pricing_index_file', arguments.ec2_pricing_index_file if arguments.aws_model_parameters_file else None)
+        ]);
+    service = TCOService(model_files, reload_check_interval=arguments.reload_check_interval,
+            stage_cache_size=arguments.stage_cache_size);
+    if(arguments.unix_socket):
+        server = TCOUnixHTTPServer(arguments.unix_socket, service, verbose=arguments.verbose);
+        sys.stderr.write('Listening on %s\n'%(arguments.unix_socket));
+    else:
+        server = TCOHTTPServer((arguments.host, arguments.port), service, verbose=arguments.verbose);
+        sys.stderr.write('Listening on http://%s:%d\n'%(arguments.host, arguments.port));
+    try:
+        server.serve_forever();
+    except KeyboardInterrupt:
+        pass;
+    server.server_close();
+
+if __name__ == "__main__":
+    main()
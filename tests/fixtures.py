@@ -0,0 +1,18 @@
+import os
+import generate_ec2_offer_file
+from ccc_model_common import parse_model_params_file
+
+#Shared test data - the models shipped with the repo and a small synthetic EC2 offer file generated from the AWS model
+
+MODELS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models');
+PRIVATE_CLOUD_MODEL_FILE = os.path.join(MODELS_DIRECTORY, 'amazon_private_cloud.json');
+AWS_MODEL_FILE = os.path.join(MODELS_DIRECTORY, 'amazon_aws.json');
+#Enough SKUs for every instance and tenancy of the AWS model in its location and operating system, plus some that are filtered out
+NUM_OFFER_FILE_SKUS = 2000;
+
+def write_ec2_offer_file(directory, num_skus=NUM_OFFER_FILE_SKUS):
+    filename = os.path.join(directory, 'ec2_offer_file.json');
+    fptr = open(filename, 'wb');
+    generate_ec2_offer_file.generate_ec2_offer_file(fptr, parse_model_params_file(AWS_MODEL_FILE)['compute'], num_skus);
+    fptr.close();
+    return filename;
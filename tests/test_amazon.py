@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+import itertools
+import unittest
+import amazon
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from fixtures import AWS_MODEL_FILE, write_ec2_offer_file
+
+class AmazonTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_ec2_pricing_model = parse_model_params_file(write_ec2_offer_file(cls.m_directory));
+        cls.m_pricing_catalog = amazon.PricingCatalog(cls.m_model, cls.m_ec2_pricing_model);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+def is_feasible_volume_layout(ebs_tier, provisioned_GB, num_volumes, provisioned_iops, storage_GB, iops_requested, throughput_requested):
+    #n striped volumes holding provisioned_GB deliver min(n*per volume limit, provisioned_GB*per GB rate)
+    if(provisioned_GB < storage_GB):
+        return False;
+    if(ebs_tier.m_min_size_per_volume_GB is not None and provisioned_GB < num_volumes*ebs_tier.m_min_size_per_volume_GB):
+        return False;
+    if(ebs_tier.m_max_size_per_volume_GB is not None and provisioned_GB > num_volumes*ebs_tier.m_max_size_per_volume_GB):
+        return False;
+    iops_rate = ebs_tier.m_baseline_iops_per_GB;
+    throughput_rate = float(ebs_tier.m_baseline_bandwidth_per_TB)/1024 if ebs_tier.m_baseline_bandwidth_per_TB is not None else None;
+    for requested, rate_per_GB, max_per_volume in [ (provisioned_iops or iops_requested, iops_rate, ebs_tier.m_max_iops_per_volume),
+            (throughput_requested, throughput_rate, ebs_tier.m_max_bandwidth_per_volume) ]:
+        if(not requested):
+            continue;
+        if(rate_per_GB is None and max_per_volume is None):
+            return False;
+        if(rate_per_GB is not None and provisioned_GB*rate_per_GB < requested-1e-9):
+            return False;
+        if(max_per_volume is not None and num_volumes*max_per_volume < requested-1e-9):
+            return False;
+    return True;
+
+def compute_min_volume_layout_cost(ebs_tiers, storage_GB, months, iops_requested, throughput_requested, max_num_volumes=4096):
+    #Smallest whole number of GB for every tier and number of volumes - found by bisection, feasibility grows with the size.
+    #More volumes only raise the minimum size, so the first feasible number of volumes is the cheapest of the tier.
+    min_cost = None;
+    for ebs_tier in ebs_tiers:
+        provisioned_iops = iops_requested if (iops_requested and ebs_tier.m_price_per_iops_per_month is not None) else 0;
+        for num_volumes in xrange(1, max_num_volumes+1):
+            low = int(storage_GB);
+            high = num_volumes*(ebs_tier.m_max_size_per_volume_GB or 10**7);
+            if(not is_feasible_volume_layout(ebs_tier, high, num_volumes, provisioned_iops, storage_GB, iops_requested, throughput_requested)):
+                continue;
+            while(low < high):
+                middle = (low+high)/2;
+                if(is_feasible_volume_layout(ebs_tier, middle, num_volumes, provisioned_iops, storage_GB, iops_requested,
+                    throughput_requested)):
+                    high = middle;
+                else:
+                    low = middle+1;
+            cost = (high*ebs_tier.m_price_per_GB_per_month+provisioned_iops*(ebs_tier.m_price_per_iops_per_month or 0))*months;
+            if(min_cost is None or cost < min_cost):
+                min_cost = cost;
+            break;
+    return min_cost;
+
+class RacingDict(dict):
+
+    #Cache cleared by another thread right after every store
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value);
+        self.clear();
+
+class PrunedSearchTest(AmazonTestCase):
+
+    def test_pruned_equals_exhaustive(self):
+        for num_cores, memory_per_core, operating_period_in_years, core_utilization in itertools.product([ 1, 7, 64, 1000, 33333 ],
+                [ 0.5, 1, 2, 4, 7.3, 16, 64, 300 ], [ 1, 3, 5 ], [ 0, 30, 100 ]):
+            exhaustive_result = amazon.select_optimal_candidate_exhaustive(self.m_pricing_catalog, num_cores, memory_per_core,
+                    operating_period_in_years, core_utilization);
+            pruned_result = amazon.select_optimal_candidate_pruned(self.m_pricing_catalog, num_cores, memory_per_core,
+                    operating_period_in_years, core_utilization);
+            self.assertIs(pruned_result[0], exhaustive_result[0]);
+            self.assertEqual(pruned_result[1], exhaustive_result[1]);
+
+    def test_search_bounds_cache_cleared_concurrently(self):
+        pricing_catalog = amazon.PricingCatalog(self.m_model, self.m_ec2_pricing_model);
+        expected_bounds = pricing_catalog.get_search_bounds(3, 100);
+        pricing_catalog.m_search_bounds = RacingDict();
+        self.assertEqual(pricing_catalog.get_search_bounds(3, 100), expected_bounds);
+
+class EbsVolumeLayoutTest(AmazonTestCase):
+
+    #The striped layout must deliver the aggregate IOPS and MB/s and be the cheapest one of any tier, up to whole GB rounding
+
+    def test_layout_matches_exhaustive(self):
+        ebs_tiers = amazon.create_ebs_tiers(self.m_model);
+        months = 36;
+        max_price_per_GB = max([ ebs_tier.m_price_per_GB_per_month for ebs_tier in ebs_tiers ]);
+        ebs_types = set();
+        for usable_storage, iops_requested, throughput_requested in itertools.product([ 0.001, 0.5, 2, 40 ], [ None, 3000, 50000, 200000 ],
+                [ None, 250, 1000, 4000 ]):
+            cost_dict = amazon.select_ebs_volume_layout(ebs_tiers, usable_storage, months, iops_requested, throughput_requested);
+            ebs_tier = [ ebs_tier for ebs_tier in ebs_tiers if ebs_tier.m_name == cost_dict['ebs_type'] ][0];
+            ebs_types.add(ebs_tier.m_name);
+            self.assertTrue(is_feasible_volume_layout(ebs_tier, cost_dict['provisioned_storage_GB'], cost_dict['num_volumes'],
+                cost_dict['provisioned_iops'], usable_storage*1024, iops_requested, throughput_requested), cost_dict);
+            self.assertAlmostEqual(cost_dict['storage_per_volume_GB']*cost_dict['num_volumes'], cost_dict['provisioned_storage_GB'], places=6);
+            min_cost = compute_min_volume_layout_cost(ebs_tiers, usable_storage*1024, months, iops_requested, throughput_requested);
+            self.assertLessEqual(cost_dict['ebs_cost'], min_cost+1e-6, cost_dict);
+            self.assertLessEqual(min_cost, cost_dict['ebs_cost']+max_price_per_GB*months+1e-6, cost_dict);
+        self.assertGreater(len(ebs_types), 2);
+
+    def test_no_adequate_tier(self):
+        ebs_tiers = [ amazon.EbsTier({ 'name': 'magnetic', 'price_per_GB_per_month': 0.05 }, 'storage.ebs.pricing_tiers.0') ];
+        self.assertRaises(NoServerConfigurationFound, amazon.select_ebs_volume_layout, ebs_tiers, 1, 36, 1000, None);
+        self.assertEqual(amazon.select_ebs_volume_layout(ebs_tiers, 1, 36, None, None)['num_volumes'], 1);
+
+    def test_compute_tco_storage(self):
+        scenario = dict(num_cores=64, memory_per_core=4, storage=50, bandwidth=100, bandwidth_utilization=50);
+        args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=self.m_model, ec2_pricing_dict=self.m_ec2_pricing_model,
+                **scenario);
+        self.assertNotIn('num_volumes', amazon.compute_tco(args_handler)['storage']);
+        args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=self.m_model, ec2_pricing_dict=self.m_ec2_pricing_model,
+                storage_iops_requested=100000, storage_throughput_requested=2000, **scenario);
+        storage_cost_dict = amazon.compute_tco(args_handler)['storage'];
+        usable_storage = amazon.determine_usable_storage(self.m_model, 50);
+        cost_dict = amazon.select_ebs_volume_layout(amazon.create_ebs_tiers(self.m_model), usable_storage, 36, 100000, 2000);
+        for key, value in cost_dict.iteritems():
+            self.assertEqual(storage_cost_dict[key], value, key);
+        self.assertGreater(storage_cost_dict['num_volumes'], 1);
+
+if __name__ == '__main__':
+    unittest.main()
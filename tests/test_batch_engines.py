@@ -0,0 +1,210 @@
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import amazon
+import amazon_batch
+import private_cloud
+import private_cloud_batch
+import montecarlo
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE, AWS_MODEL_FILE, write_ec2_offer_file
+
+#The batch engines (and montecarlo on top of them) must give exactly the costs of compute_tco for the same scenario - the
+#arithmetic is done in the same order, so the costs are compared for equality and not within a tolerance
+
+NUM_SCENARIOS = 60;
+
+def create_scenarios(seed, num_scenarios=NUM_SCENARIOS, aws=False):
+    #Edge values (no storage, no utilization, more memory per core than any server has) are drawn more often than the rest
+    generator = random.Random(seed);
+    scenarios = [];
+    for idx in xrange(num_scenarios):
+        scenario = dict(num_cores=generator.choice([ 1, 3, 17, 100, 999, 12345, generator.randint(1, 50000) ]),
+                memory_per_core=generator.choice([ 1, 2, 4, 8, 16, 32, 64, 300, 2.5, 7.3 ]),
+                storage=generator.choice([ 0, 1, 10, 333, 1501, generator.uniform(0, 5000) ]),
+                bandwidth=generator.choice([ 1, 5, 6, 10, 30, 31, 100, 150, generator.uniform(0, 500) ]),
+                bandwidth_utilization=generator.choice([ 0, 50, 100, 33.3 ]),
+                operating_period_in_years=generator.choice([ 1, 2, 3, 5, 7 ]),
+                backup_percentage_per_month=generator.choice([ 0, 5, 12.5 ]));
+        if(aws):
+            scenario['core_utilization'] = generator.choice([ 0, 30, 100, 57.5 ]);
+            scenario['storage_utilization'] = generator.choice([ 100, 40 ]);
+        scenarios.append(scenario);
+    return scenarios;
+
+def get_scenario_columns(scenarios):
+    return dict([ (key, np.array([ scenario[key] for scenario in scenarios ])) for key in scenarios[0] ]);
+
+class BatchTestCase(unittest.TestCase):
+
+    def assertCostEqual(self, scalar_value, batch_value, message):
+        #Costs the scalar model leaves out are NaN in the batch arrays
+        if(scalar_value is None):
+            self.assertTrue(np.isnan(batch_value), message);
+        else:
+            self.assertEqual(scalar_value, batch_value, message);
+
+class PrivateCloudBatchTest(BatchTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+        cls.m_scenarios = create_scenarios(1);
+
+    def check_scenarios(self, private_cloud_hosting, storage_type, include_IT_cost):
+        columns = get_scenario_columns(self.m_scenarios);
+        result = private_cloud_batch.compute_tco_batch(self.m_model, private_cloud_hosting=private_cloud_hosting,
+                storage_type=storage_type, include_IT_cost=include_IT_cost, **columns);
+        #As in compute_tco, an IT cost that is not included is None and not an array of NaNs
+        if(not include_IT_cost):
+            self.assertIsNone(result['summary']['IT']);
+        for idx, scenario in enumerate(self.m_scenarios):
+            args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=self.m_model,
+                    private_cloud_hosting=private_cloud_hosting, storage_type=storage_type, include_IT_cost=include_IT_cost, **scenario);
+            try:
+                cost_dict = private_cloud.compute_tco(args_handler);
+            except NoServerConfigurationFound:
+                self.assertEqual(result['compute']['server_index'][idx], -1);
+                continue;
+            for section in [ 'compute', 'storage', 'network' ]:
+                for key, value in cost_dict[section]['summary'].iteritems():
+                    self.assertCostEqual(value, result[section][key][idx], '%s %s of scenario %d'%(section, key, idx));
+            for key, value in cost_dict['summary'].iteritems():
+                if(result['summary'][key] is None):
+                    self.assertIsNone(value, 'summary %s of scenario %d'%(key, idx));
+                else:
+                    self.assertCostEqual(value, result['summary'][key][idx], 'summary %s of scenario %d'%(key, idx));
+
+    def test_colocation(self):
+        self.check_scenarios('colocation', 'NAS', False);
+
+    def test_on_premise_with_IT_cost(self):
+        self.check_scenarios('on_premise', 'SAN', True);
+
+class AwsBatchTest(BatchTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_ec2_pricing_model = parse_model_params_file(write_ec2_offer_file(cls.m_directory));
+        cls.m_pricing_catalog = amazon.PricingCatalog(cls.m_model, cls.m_ec2_pricing_model);
+        cls.m_price_matrix = amazon_batch.Ec2PriceMatrix(cls.m_pricing_catalog);
+        cls.m_scenarios = create_scenarios(2, aws=True);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def check_scenarios(self, aws_support, iops_per_GB_requested, storage_bandwidth_per_TB_requested):
+        columns = get_scenario_columns(self.m_scenarios);
+        result = amazon_batch.compute_tco_batch(self.m_model, self.m_price_matrix, aws_support=aws_support,
+                iops_per_GB_requested=iops_per_GB_requested, storage_bandwidth_per_TB_requested=storage_bandwidth_per_TB_requested,
+                **columns);
+        for idx, scenario in enumerate(self.m_scenarios):
+            args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=self.m_model, ec2_pricing_dict=self.m_ec2_pricing_model,
+                    aws_support=aws_support, iops_per_GB_requested=iops_per_GB_requested,
+                    storage_bandwidth_per_TB_requested=storage_bandwidth_per_TB_requested, **scenario);
+            try:
+                cost_dict = amazon.compute_tco(args_handler, pricing_catalog=self.m_pricing_catalog);
+            except NoServerConfigurationFound:
+                self.assertEqual(result['compute']['candidate_index'][idx], -1);
+                continue;
+            candidate = self.m_pricing_catalog.m_candidates[result['compute']['candidate_index'][idx]];
+            self.assertEqual(candidate.m_instance_type, cost_dict['compute']['instance_type']);
+            self.assertEqual(cost_dict['compute']['num_instances'], result['compute']['num_instances'][idx]);
+            for key, value in cost_dict['compute']['summary'].iteritems():
+                self.assertCostEqual(value, result['compute'][key][idx], 'compute %s of scenario %d'%(key, idx));
+            self.assertEqual(cost_dict['storage']['ebs_type'],
+                    result['storage']['ebs_tier_names'][result['storage']['ebs_type_index'][idx]]);
+            for key in [ 'usable_storage', 'ebs_cost', 'backup_onetime_cost', 'backup_monthly_cost' ]:
+                self.assertEqual(cost_dict['storage'][key], result['storage'][key][idx], 'storage %s of scenario %d'%(key, idx));
+            for key, value in cost_dict['summary'].iteritems():
+                self.assertCostEqual(value, result['summary'][key][idx], 'summary %s of scenario %d'%(key, idx));
+
+    def test_without_support(self):
+        self.check_scenarios(None, None, None);
+
+    def test_business_support_with_iops(self):
+        self.check_scenarios('business', 20, None);
+
+    def test_enterprise_support_with_storage_bandwidth(self):
+        self.check_scenarios('enterprise', None, 12);
+
+    def test_tier_tables_shared_with_catalog(self):
+        self.assertIs(self.m_price_matrix.m_reserved_discount_function, self.m_pricing_catalog.m_reserved_discount_function);
+        self.assertIs(self.m_price_matrix.m_network_pricing_function, self.m_pricing_catalog.m_network_pricing_function);
+        self.assertIs(self.m_price_matrix.m_support_functions, self.m_pricing_catalog.m_support_functions);
+
+class MonteCarloTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_private_cloud_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+        cls.m_aws_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_ec2_pricing_model = parse_model_params_file(write_ec2_offer_file(cls.m_directory));
+        cls.m_scenario = dict(num_cores=512, memory_per_core=4, storage=100, bandwidth=100, bandwidth_utilization=50,
+                operating_period_in_years=3, private_cloud_hosting='colocation', storage_type='NAS', aws_support='business',
+                include_IT_cost=True);
+        cls.m_distributions = {
+                'private_cloud.compute.server_discount_percentage': { 'type': 'triangular', 'low': 15, 'mode': 25, 'high': 35 },
+                'private_cloud.compute.server_params.1.base_cost': { 'type': 'uniform', 'low': 3000, 'high': 8000 },
+                'memory_per_core': { 'type': 'discrete', 'values': [ 2, 4, 8 ] },
+                'core_utilization': { 'type': 'triangular', 'low': 40, 'mode': 70, 'high': 100 },
+                'aws.network.percentage_outbound_traffic': { 'type': 'uniform', 'low': 10, 'high': 50 }
+                };
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def create_context(self, scenario=None, distributions=None):
+        return montecarlo.MonteCarloContext(scenario if scenario is not None else self.m_scenario,
+                distributions if distributions is not None else self.m_distributions, self.m_private_cloud_model, self.m_aws_model,
+                self.m_ec2_pricing_model);
+
+    def test_samples_match_compute_tco(self):
+        context = self.create_context();
+        random_state = np.random.RandomState(3);
+        parameter_values = dict([ (name, montecarlo.draw_samples(distribution, NUM_SCENARIOS, random_state))
+            for name, distribution in self.m_distributions.iteritems() ]);
+        private_cloud_summary, aws_summary = context.evaluate(parameter_values, NUM_SCENARIOS);
+        pricing_catalog = amazon.PricingCatalog(self.m_aws_model, self.m_ec2_pricing_model);
+        for idx in xrange(NUM_SCENARIOS):
+            models = { 'private_cloud': self.m_private_cloud_model, 'aws': self.m_aws_model };
+            inputs = dict(self.m_scenario);
+            for name, values in parameter_values.iteritems():
+                provider, path = montecarlo.parse_parameter_name(name);
+                if(provider):
+                    models[provider] = montecarlo.set_model_field(models[provider], path, float(values[idx]));
+                else:
+                    inputs[name] = float(values[idx]);
+            args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=models['private_cloud'],
+                    **dict([ (key, value) for key, value in inputs.iteritems() if key in montecarlo.PRIVATE_CLOUD_BATCH_INPUTS ]));
+            self.assertEqual(private_cloud.compute_tco(args_handler)['summary']['total_cost'], private_cloud_summary['total_cost'][idx]);
+            args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=models['aws'], ec2_pricing_dict=self.m_ec2_pricing_model,
+                    **dict([ (key, value) for key, value in inputs.iteritems() if key in montecarlo.AWS_BATCH_INPUTS ]));
+            self.assertEqual(amazon.compute_tco(args_handler, pricing_catalog=pricing_catalog)['summary']['total_cost'],
+                    aws_summary['total_cost'][idx]);
+
+    def test_IT_cost_not_included(self):
+        scenario = dict(self.m_scenario);
+        scenario['include_IT_cost'] = False;
+        result = montecarlo.run_montecarlo(self.create_context(scenario=scenario), num_samples=100, seed=1);
+        self.assertIsNone(result['private_cloud']['IT']);
+
+    def test_unsupported_scenario_input(self):
+        scenario = dict(self.m_scenario);
+        scenario['shared_racks'] = True;
+        self.assertRaises(ValueError, self.create_context, scenario=scenario);
+
+    def test_compiled_tier_tables_cannot_be_sampled(self):
+        distributions = { 'aws.compute.reserved_discount_tiers.0.rate': { 'type': 'uniform', 'low': 0, 'high': 5 } };
+        self.assertRaises(ValueError, self.create_context, distributions=distributions);
+
+if __name__ == '__main__':
+    unittest.main()
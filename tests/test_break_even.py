@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+import unittest
+import amazon
+import break_even
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE, AWS_MODEL_FILE, write_ec2_offer_file
+
+#The bounded search must find every value where the cheaper provider changes - the same ones as evaluating every value
+
+SCENARIOS = [
+        ('num_cores', dict(memory_per_core=8, storage=0, bandwidth=100, bandwidth_utilization=50, core_utilization=40,
+            private_cloud_hosting='on_premise'), 1, 1000),
+        ('num_cores', dict(memory_per_core=2, storage=100, bandwidth=100, bandwidth_utilization=50, core_utilization=100,
+            private_cloud_hosting='on_premise', include_IT_cost=True), 1, 1000),
+        ('num_cores', dict(memory_per_core=4, storage=100, bandwidth=100, bandwidth_utilization=50, core_utilization=10), 1, 1000),
+        ('storage', dict(num_cores=512, memory_per_core=4, bandwidth=100, bandwidth_utilization=50), 0, 1000)
+        ];
+
+class BreakEvenTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_private_cloud_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+        cls.m_aws_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_ec2_pricing_model = parse_model_params_file(write_ec2_offer_file(cls.m_directory));
+        cls.m_pricing_catalog = amazon.PricingCatalog(cls.m_aws_model, cls.m_ec2_pricing_model);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def create_cost_curves(self, variable, scenario):
+        return break_even.CostCurves(variable, scenario, self.m_private_cloud_model, self.m_aws_model, self.m_ec2_pricing_model,
+                pricing_catalog=self.m_pricing_catalog);
+
+    def test_changes_match_exhaustive(self):
+        num_changes = 0;
+        for variable, scenario, low, high in SCENARIOS:
+            cost_curves = self.create_cost_curves(variable, scenario);
+            changes = break_even.find_cheaper_provider_changes(cost_curves, low, high);
+            #Skipped intervals are not evaluated
+            self.assertLess(cost_curves.get_num_evaluations(), (high-low+1)/2);
+            exhaustive_cost_curves = self.create_cost_curves(variable, scenario);
+            cheaper_providers = [ break_even.get_cheaper_provider(exhaustive_cost_curves.get_costs(value)) for value in xrange(low, high+1) ];
+            self.assertEqual(changes, [ low+idx for idx in xrange(high-low) if cheaper_providers[idx] != cheaper_providers[idx+1] ],
+                    (variable, scenario));
+            num_changes += len(changes);
+        self.assertGreater(num_changes, 10);
+
+    def test_solve_break_even(self):
+        variable, scenario, low, high = SCENARIOS[0];
+        result = break_even.solve_break_even(self.create_cost_curves(variable, scenario), low, high);
+        self.assertGreater(len(result['crossovers']), 0);
+        self.assertEqual(len(result['segments']), len(result['crossovers'])+1);
+        for crossover_dict, segment_dict, next_segment_dict in zip(result['crossovers'], result['segments'], result['segments'][1:]):
+            self.assertEqual(crossover_dict['above']['value'], crossover_dict['below']['value']+1);
+            self.assertNotEqual(crossover_dict['cheaper_below'], crossover_dict['cheaper_above']);
+            self.assertEqual(segment_dict['to'], crossover_dict['below']['value']);
+            self.assertEqual(next_segment_dict['from'], crossover_dict['above']['value']);
+            self.assertEqual(segment_dict['cheaper'], crossover_dict['cheaper_below']);
+            self.assertEqual(next_segment_dict['cheaper'], crossover_dict['cheaper_above']);
+        self.assertEqual((result['segments'][0]['from'], result['segments'][-1]['to']), (low, high));
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import amazon
+import private_cloud
+import capacity_growth
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE, AWS_MODEL_FILE, write_ec2_offer_file
+
+COMPUTE_COST_KEYS = [ 'server_purchase_cost', 'server_deployment_cost', 'server_maintenance_cost', 'spare_server_addition_cost',
+        'rack_purchase_cost', 'pdu_cost', 'top_of_rack_switch_cost', 'rack_operational_cost' ];
+
+def create_configurations(storage_per_sample=0.05, growth=True):
+    configurations = [];
+    for idx, num_patients_per_year in enumerate([ 1000, 50000, 400000 ]):
+        config = dict(num_patients_per_year=num_patients_per_year, num_samples_per_patient_per_year=1,
+                num_samples_processed_per_core_per_day=0.5, storage_per_sample=storage_per_sample);
+        if(growth):
+            config['growth'] = { 'annual_growth_percentage': 20*idx } if idx < 2 else \
+                    { 'num_patients_per_year': [ 400000, 100000, 800000, 600000 ] };
+        configurations.append(config);
+    return configurations;
+
+class CapacityGrowthTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_private_cloud_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+        cls.m_aws_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_pricing_catalog = amazon.PricingCatalog(cls.m_aws_model, parse_model_params_file(write_ec2_offer_file(cls.m_directory)));
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def test_yearly_patients(self):
+        patients = capacity_growth.create_patients_arrays(create_configurations(), 72);
+        self.assertEqual(list(patients[2, ::12]), [ 400000, 100000, 800000, 600000, 600000, 600000 ]);
+        self.assertTrue(np.all(patients[0] == 1000));
+        self.assertAlmostEqual(patients[1, 24], 50000*1.2*1.2, places=6);
+
+    def test_flat_demand_matches_single_shot_compute(self):
+        #Everything bought in month 0 costs what the single-shot model charges for the same operating period
+        for operating_period_in_years in [ 3, 5 ]:
+            demand = capacity_growth.create_demand_arrays(self.m_private_cloud_model, create_configurations(storage_per_sample=0,
+                growth=False), 12*operating_period_in_years);
+            plan = capacity_growth.compute_private_cloud_plan(self.m_private_cloud_model, demand, 4, 100, 50);
+            monthly_costs = plan['monthly_costs'];
+            for idx in range(demand['num_cores'].shape[0]):
+                args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=self.m_private_cloud_model,
+                        num_cores=int(demand['num_cores'][idx, 0]), memory_per_core=4, storage=0, bandwidth=100, bandwidth_utilization=50,
+                        operating_period_in_years=operating_period_in_years);
+                cost_dict = private_cloud.compute_tco(args_handler);
+                self.assertEqual(plan['server_index'][idx], cost_dict['compute']['server_type_index']);
+                self.assertEqual(plan['num_servers'][idx, -1], cost_dict['compute']['num_servers']);
+                self.assertAlmostEqual(sum([ monthly_costs[key][idx].sum() for key in COMPUTE_COST_KEYS ]),
+                        cost_dict['compute']['summary']['total_cost'], places=6);
+                self.assertAlmostEqual(monthly_costs['network_purchase_cost'][idx].sum(), cost_dict['network']['network_purchase_cost'],
+                        places=6);
+                self.assertAlmostEqual(monthly_costs['bandwidth_cost'][idx].sum(), cost_dict['network']['bandwidth_cost'], places=6);
+
+    def test_capacity_covers_demand(self):
+        demand, private_cloud_plan, aws_plan = capacity_growth.simulate_capacity_growth(create_configurations(), self.m_private_cloud_model,
+                self.m_aws_model, self.m_pricing_catalog, 4, 100, 50, operating_period_in_years=4, include_IT_cost=True);
+        server_params = self.m_private_cloud_model['compute']['server_params'];
+        for idx in range(demand['num_cores'].shape[0]):
+            num_servers = private_cloud_plan['num_servers'][idx];
+            #Servers and storage are never removed
+            self.assertTrue(np.all(np.diff(num_servers) >= 0));
+            self.assertTrue(np.all(np.diff(private_cloud_plan['raw_storage'][idx]) >= 0));
+            num_usable_cores_per_server = private_cloud.determine_num_usable_cores_in_server_type(
+                    server_params[private_cloud_plan['server_index'][idx]], 4);
+            self.assertTrue(np.all(num_servers*num_usable_cores_per_server >= demand['num_cores'][idx]));
+            self.assertTrue(np.all(private_cloud_plan['raw_storage'][idx] >= demand['raw_storage'][idx]));
+            for key, values in private_cloud_plan['monthly_costs'].iteritems():
+                self.assertTrue(np.all(values[idx] >= 0), key);
+            self.assertTrue(np.all(aws_plan['reserved_cores'][idx]+aws_plan['on_demand_cores'][idx] >= demand['num_cores'][idx]));
+
+    def test_aws_plan_not_worse_than_on_demand(self):
+        #Running everything on demand is one of the options of the plan
+        demand = capacity_growth.create_demand_arrays(self.m_private_cloud_model, create_configurations(), 48);
+        plan = capacity_growth.compute_aws_plan(self.m_aws_model, self.m_pricing_catalog, demand, 4, 100, 50, core_utilization=60);
+        on_demand_items, reserved_items = capacity_growth.create_ec2_offers(self.m_pricing_catalog, 4, 60);
+        on_demand_cost = capacity_growth.compute_on_demand_cost(on_demand_items, demand['num_cores']).sum(axis=1);
+        monthly_costs = plan['monthly_costs'];
+        ec2_cost = sum([ monthly_costs[key].sum(axis=1) for key in [ 'ec2_reserved_upfront_cost', 'ec2_reserved_hourly_cost',
+            'ec2_on_demand_cost', 'ec2_discount' ] ])+plan['reserved_commitment_after_plan'];
+        self.assertTrue(np.all(ec2_cost <= on_demand_cost*(1+1e-12)));
+        self.assertTrue(np.any(plan['reserved_candidate_index'] >= 0));
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from ccc_model_common import PiecewiseLinearFunction
+from ccc_model_common import piecewise_linear_function
+from ccc_model_common import parse_model_params_file
+from fixtures import AWS_MODEL_FILE
+
+#The compiled tier tables must give exactly the results of piecewise_linear_function, for single values and for arrays
+
+def get_tier_tables():
+    #(tier table, segment key, cost key) of every tier table of the AWS model, plus an unsorted one
+    model = parse_model_params_file(AWS_MODEL_FILE);
+    tier_tables = [ (model['compute']['reserved_discount_tiers'], 'segment_limit', 'rate'),
+            (model['network']['pricing_tiers'], 'segment_limit_GB', 'cost_per_GB') ];
+    tier_tables += [ (support_tiers, 'segment_limit', 'rate') for support_tiers in model['support'].itervalues() ];
+    tier_tables.append(([ { 'segment_limit': 100, 'rate': 0.5 }, { 'segment_limit': 10, 'rate': 0.25 },
+        { 'segment_limit': 1000, 'rate': 0.125 } ], 'segment_limit', 'rate'));
+    return tier_tables;
+
+def get_test_values(tier_table, segment_key):
+    #The limits themselves, values around them, no value, negative values and values beyond the last limit
+    values = [ -5, 0, 0.5, 1e12 ];
+    for range_dict in tier_table:
+        limit = range_dict[segment_key];
+        values += [ limit, limit-0.5, limit+0.5, limit*1.37 ];
+    return values;
+
+class PiecewiseLinearFunctionTest(unittest.TestCase):
+
+    def test_single_values(self):
+        for tier_table, segment_key, cost_key in get_tier_tables():
+            function = PiecewiseLinearFunction(tier_table, segment_key, cost_key);
+            for value in get_test_values(tier_table, segment_key):
+                self.assertEqual(function(value), piecewise_linear_function(tier_table, segment_key, cost_key, value), value);
+
+    def test_arrays(self):
+        for tier_table, segment_key, cost_key in get_tier_tables():
+            function = PiecewiseLinearFunction(tier_table, segment_key, cost_key);
+            values = get_test_values(tier_table, segment_key);
+            expected_costs = [ piecewise_linear_function(tier_table, segment_key, cost_key, value) for value in values ];
+            #Twice - the second call reuses the arrays built by the first
+            for repeat in xrange(2):
+                self.assertEqual(list(function.evaluate_array(np.array(values))), expected_costs);
+
+    def test_empty_tier_table(self):
+        function = PiecewiseLinearFunction([], 'segment_limit', 'rate');
+        self.assertEqual(function(10), 0);
+        self.assertEqual(list(function.evaluate_array([ 0, 10 ])), [ 0, 0 ]);
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+import io
+import os
+import json
+from collections import OrderedDict
+import shutil
+import tempfile
+import unittest
+import amazon
+import ec2_pricing
+import sweep
+from ccc_model_common import parse_model_params_file
+from fixtures import AWS_MODEL_FILE, write_ec2_offer_file
+
+def write_repriced_offer_file(offer_file, filename, price_factors):
+    #Copy of offer_file with the on-demand prices of every instance type in price_factors ({ instance type: factor }) multiplied
+    offer = json.load(open(offer_file, 'rb'));
+    for sku, product_info in offer['products'].iteritems():
+        price_factor = price_factors.get(product_info.get('attributes', {}).get('instanceType'));
+        if(price_factor is None):
+            continue;
+        for term_info in offer['terms']['OnDemand'].get(sku, {}).itervalues():
+            for price_dimension in term_info['priceDimensions'].itervalues():
+                price_dimension['pricePerUnit']['USD'] = repr(float(price_dimension['pricePerUnit']['USD'])*price_factor);
+    fptr = open(filename, 'wb');
+    json.dump(offer, fptr);
+    fptr.close();
+    return filename;
+
+def write_terms_first_offer_file(offer_file, filename):
+    offer = json.load(open(offer_file, 'rb'), object_pairs_hook=OrderedDict);
+    fptr = open(filename, 'wb');
+    json.dump(OrderedDict([ ('terms', offer['terms']) ]+[ (key, value) for key, value in offer.iteritems() if key != 'terms' ]), fptr);
+    fptr.close();
+    return filename;
+
+class SmallReadFile:
+
+    #Returns at most 97 characters per read, so that values are split between the chunks of JSONStreamReader
+    def __init__(self, fptr):
+        self.m_fptr = fptr;
+
+    def read(self, size):
+        return self.m_fptr.read(min(size, 97));
+
+class Ec2PricingTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_model_dict = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_model = cls.m_model_dict['compute'];
+        cls.m_offer_file = write_ec2_offer_file(cls.m_directory);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+class StreamingLoaderTest(Ec2PricingTestCase):
+
+    def load_filtered_offer_file(self, filename):
+        #The offer file read whole and filtered the way stream_ec2_pricing_model filters while reading
+        product_filter = ec2_pricing.create_product_filter(self.m_model);
+        offer = json.load(open(filename, 'rb'));
+        offer['products'] = dict([ (sku, product_info) for sku, product_info in offer['products'].iteritems()
+            if product_filter.is_product_needed(product_info) ]);
+        offer['terms'] = dict([ (term_type, dict([ (sku, ec2_pricing.filter_sku_terms(product_filter, sku_terms_dict))
+            for sku, sku_terms_dict in terms_dict.iteritems() if sku in offer['products'] ]))
+            for term_type, terms_dict in offer['terms'].iteritems() ]);
+        return offer;
+
+    def drop_empty_terms(self, ec2_pricing_model):
+        #SKUs without needed terms are equivalent to SKUs without terms
+        for term_type, terms_dict in ec2_pricing_model['terms'].iteritems():
+            ec2_pricing_model['terms'][term_type] = dict([ (sku, sku_terms_dict) for sku, sku_terms_dict in terms_dict.iteritems()
+                if sku_terms_dict ]);
+        return ec2_pricing_model;
+
+    def test_stream_equals_whole_document(self):
+        expected_model = self.load_filtered_offer_file(self.m_offer_file);
+        self.assertTrue(len(expected_model['products']) > 0);
+        product_filter = ec2_pricing.create_product_filter(self.m_model);
+        fptr = io.open(self.m_offer_file, 'r', encoding='utf-8');
+        streamed_model = ec2_pricing.stream_ec2_pricing_model(SmallReadFile(fptr), product_filter);
+        fptr.close();
+        self.assertEqual(streamed_model, expected_model);
+        self.assertEqual(ec2_pricing.load_ec2_pricing_model(self.m_offer_file, self.m_model), expected_model);
+
+    def test_terms_before_products(self):
+        filename = write_terms_first_offer_file(self.m_offer_file, os.path.join(self.m_directory, 'terms_first.json'));
+        self.assertEqual(self.drop_empty_terms(ec2_pricing.load_ec2_pricing_model(filename, self.m_model)),
+                self.drop_empty_terms(ec2_pricing.load_ec2_pricing_model(self.m_offer_file, self.m_model)));
+
+    def test_pending_terms_bound(self):
+        filename = write_terms_first_offer_file(self.m_offer_file, os.path.join(self.m_directory, 'terms_first.json'));
+        product_filter = ec2_pricing.create_product_filter(self.m_model);
+        fptr = io.open(filename, 'r', encoding='utf-8');
+        self.assertRaises(ec2_pricing.PricingIndexError, ec2_pricing.stream_ec2_pricing_model, fptr, product_filter, max_pending_terms=10);
+        fptr.close();
+
+class PricingIndexTest(Ec2PricingTestCase):
+
+    def get_candidates(self, ec2_pricing_model):
+        return [ candidate.__dict__ for candidate in amazon.PricingCatalog(self.m_model_dict, ec2_pricing_model).m_candidates ];
+
+    def copy_offer_file(self, filename):
+        shutil.copy(self.m_offer_file, filename);
+        #Old enough for a size and mtime match to be trusted - whole seconds survive os.utime exactly
+        mtime = int(os.stat(filename).st_mtime)-60;
+        os.utime(filename, (mtime, mtime));
+        return filename;
+
+    def test_round_trip(self):
+        index_file = os.path.join(self.m_directory, 'index_round_trip.json');
+        ec2_pricing.write_pricing_index(ec2_pricing.create_pricing_index(self.m_offer_file, self.m_model), index_file);
+        index = ec2_pricing.read_pricing_index(index_file);
+        self.assertEqual(index['source_hash'], ec2_pricing.compute_file_hash(self.m_offer_file));
+        self.assertTrue(ec2_pricing.check_pricing_index_coverage(index, self.m_model));
+        expected_candidates = self.get_candidates(ec2_pricing.load_ec2_pricing_model(self.m_offer_file, self.m_model));
+        self.assertTrue(len(expected_candidates) > 0);
+        self.assertEqual(self.get_candidates(ec2_pricing.ec2_pricing_model_from_index(index)), expected_candidates);
+
+    def test_load_builds_and_reuses_index(self):
+        offer_file = self.copy_offer_file(os.path.join(self.m_directory, 'offer_reuse.json'));
+        index_file = os.path.join(self.m_directory, 'index_reuse.json');
+        ec2_pricing_model = ec2_pricing.load_pricing_index(index_file, self.m_model, ec2_pricing_json_file=offer_file);
+        #Not rewritten while it is current
+        index_mtime = int(os.stat(index_file).st_mtime)-10;
+        os.utime(index_file, (index_mtime, index_mtime));
+        self.assertEqual(ec2_pricing.load_pricing_index(index_file, self.m_model, ec2_pricing_json_file=offer_file), ec2_pricing_model);
+        self.assertEqual(os.stat(index_file).st_mtime, index_mtime);
+        self.assertEqual(ec2_pricing.load_pricing_index(index_file, self.m_model), ec2_pricing_model);
+
+    def test_staleness(self):
+        offer_file = self.copy_offer_file(os.path.join(self.m_directory, 'offer_stale.json'));
+        index = ec2_pricing.create_pricing_index(offer_file, self.m_model);
+        self.assertTrue(ec2_pricing.is_pricing_index_current(index, offer_file));
+        #Touched but unchanged - the hash decides
+        os.utime(offer_file, None);
+        self.assertTrue(ec2_pricing.is_pricing_index_current(index, offer_file));
+        #Rewritten with the same size and mtime
+        mtime = int(os.stat(offer_file).st_mtime)-60;
+        os.utime(offer_file, (mtime, mtime));
+        source_stat = os.stat(offer_file);
+        contents = open(offer_file, 'rb').read();
+        position = contents.index('"USD":"')+len('"USD":"');
+        fptr = open(offer_file, 'wb');
+        fptr.write(contents[:position]+('9' if contents[position] != '9' else '8')+contents[position+1:]);
+        fptr.close();
+        os.utime(offer_file, (source_stat.st_atime, source_stat.st_mtime));
+        index = ec2_pricing.create_pricing_index(self.m_offer_file, self.m_model);
+        index['source_size'] = source_stat.st_size;
+        index['source_mtime'] = source_stat.st_mtime;
+        #Hashed long after the mtime the match is trusted, hashed within the mtime resolution the hash is compared
+        index['source_hash_time'] = source_stat.st_mtime+2*ec2_pricing.MTIME_RESOLUTION_IN_SECONDS;
+        self.assertTrue(ec2_pricing.is_pricing_index_current(index, offer_file));
+        index['source_hash_time'] = source_stat.st_mtime;
+        self.assertFalse(ec2_pricing.is_pricing_index_current(index, offer_file));
+        del index['source_hash_time'];
+        self.assertFalse(ec2_pricing.is_pricing_index_current(index, offer_file));
+
+    def test_unsupported_format(self):
+        index_file = os.path.join(self.m_directory, 'index_format.json');
+        index = ec2_pricing.create_pricing_index(self.m_offer_file, self.m_model);
+        index['format_version'] = ec2_pricing.PRICING_INDEX_FORMAT_VERSION+1;
+        ec2_pricing.write_pricing_index(index, index_file);
+        self.assertRaises(ec2_pricing.PricingIndexError, ec2_pricing.read_pricing_index, index_file);
+
+class StaleResultsTest(Ec2PricingTestCase):
+
+    #AWS sweep results before and after the on-demand price of an unused instance type is cut and the one of a used instance type
+    #raised - the refresh must flag exactly the rows whose result changed
+    GRID = {
+            'provider': [ 'aws' ],
+            'num_cores': [ 16, 256 ],
+            'memory_per_core': [ 2, 4, 8 ],
+            'storage': [ 10 ],
+            'bandwidth': [ 10 ],
+            'bandwidth_utilization': [ 50 ],
+            'operating_period_in_years': [ 1, 3 ],
+            'core_utilization': [ 20, 100 ]
+            };
+
+    @classmethod
+    def setUpClass(cls):
+        super(StaleResultsTest, cls).setUpClass();
+        cls.m_new_offer_file = write_repriced_offer_file(cls.m_offer_file, os.path.join(cls.m_directory, 'new_offer_file.json'),
+                { 'm4.2xlarge': 0.85, 'c4.large': 1.1 });
+        old_index = ec2_pricing.create_pricing_index(cls.m_offer_file, cls.m_model);
+        cls.m_new_index, cls.m_change_records = ec2_pricing.refresh_pricing_index(old_index, cls.m_new_offer_file, cls.m_model);
+        cls.m_changed_candidates = ec2_pricing.create_changed_candidates(cls.m_change_records, cls.m_model_dict, cls.m_new_index);
+        cls.m_results_file = os.path.join(cls.m_directory, 'old_results.ndjson');
+        cls.m_old_rows = cls.run_sweep(cls.m_offer_file, cls.m_results_file);
+        cls.m_new_rows = cls.run_sweep(cls.m_new_offer_file, os.path.join(cls.m_directory, 'new_results.ndjson'));
+
+    @classmethod
+    def run_sweep(cls, offer_file, filename):
+        fptr = open(filename, 'wb');
+        sweep.run_sweep(cls.GRID, { 'aws_model_parameters_file': AWS_MODEL_FILE, 'ec2_pricing_json_file': offer_file },
+                sweep.NDJSONResultWriter(fptr), num_workers=1);
+        fptr.close();
+        return [ json.loads(line) for line in open(filename, 'rb') ];
+
+    def write_rows(self, rows, filename):
+        fptr = open(filename, 'wb');
+        for row in rows:
+            fptr.write(json.dumps(row)+'\n');
+        fptr.close();
+        return filename;
+
+    def find_stale_results(self, filename):
+        return ec2_pricing.find_stale_results(filename, self.m_change_records, self.m_model, self.m_changed_candidates);
+
+    def test_change_records(self):
+        self.assertTrue(len(self.m_change_records) > 0);
+        for record in self.m_change_records:
+            self.assertEqual(record['change'], 'repriced');
+            self.assertIn(record['instance_type'], [ 'm4.2xlarge', 'c4.large' ]);
+            self.assertEqual(record['offer_term'], 'OnDemand');
+            self.assertEqual(record['possibly_cheaper'], record['instance_type'] == 'm4.2xlarge');
+
+    def test_stale_rows_match_rerun(self):
+        old_rows = self.m_old_rows;
+        new_rows = self.m_new_rows;
+        report = self.find_stale_results(self.m_results_file);
+        self.assertEqual(report['num_rows'], len(old_rows));
+        stale_results = dict([ (stale_result['row'], stale_result) for stale_result in report['stale_results'] ]);
+        changed_rows = set([ idx for idx, (old_row, new_row) in enumerate(zip(old_rows, new_rows))
+            if old_row['compute_cost'] != new_row['compute_cost'] ]);
+        self.assertTrue(0 < len(changed_rows) < len(old_rows));
+        self.assertEqual(set(stale_results.keys()), changed_rows);
+        self.assertEqual(set([ stale_result['reason'] for stale_result in stale_results.itervalues() ]),
+                set([ 'cheaper_candidate_available', 'configuration_repriced' ]));
+        for idx, stale_result in stale_results.iteritems():
+            if(stale_result['reason'] == 'cheaper_candidate_available'):
+                self.assertTrue(stale_result['cheaper_compute_cost'] < old_rows[idx]['compute_cost']);
+                self.assertEqual(stale_result['cheaper_configuration'].split('/')[0], 'm4.2xlarge');
+            else:
+                self.assertEqual(stale_result['reason'], 'configuration_repriced');
+                self.assertEqual(stale_result['configuration'], 'c4.large/Shared/OnDemand');
+
+    def test_rows_without_inputs_are_not_repriced(self):
+        #No defaults are assumed for missing inputs, and the total cost is no stand-in for the compute cost
+        rows = [ dict([ (key, value) for key, value in self.m_old_rows[0].iteritems() if key != missing_key ])
+            for missing_key in [ 'core_utilization', 'operating_period_in_years', 'memory_per_core', 'compute_cost' ] ];
+        for row in rows:
+            row['configuration'] = 'm4.xlarge/Shared/1year_all_upfront';
+        report = self.find_stale_results(self.write_rows(rows, os.path.join(self.m_directory, 'partial_results.ndjson')));
+        self.assertEqual([ stale_result['reason'] for stale_result in report['stale_results'] ], [ 'cheaper_candidate_possible' ]*len(rows));
+
+if __name__ == '__main__':
+    unittest.main()
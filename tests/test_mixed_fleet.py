@@ -0,0 +1,107 @@
+import copy
+import random
+import shutil
+import tempfile
+import itertools
+import unittest
+import amazon
+import private_cloud
+import mixed_fleet
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE, AWS_MODEL_FILE, write_ec2_offer_file
+
+#The covering DP must find the exact minimum cost cover, and a mixed fleet must cover the cores and never cost more than the best
+#single server/instance type
+
+NUM_CORES = [ 1, 7, 64, 100, 999, 4097, 33333 ];
+
+def compute_min_cover_cost(items, demand):
+    #Plain DP over the whole demand
+    min_costs = [ 0 ]*(demand+1);
+    for residual in xrange(1, demand+1):
+        min_costs[residual] = min([ cost+min_costs[max(0, residual-size)] for size, cost in items if size >= 1 ]);
+    return min_costs[demand];
+
+class CoverSolverTest(unittest.TestCase):
+
+    def test_min_cost_cover(self):
+        generator = random.Random(5);
+        for repeat in xrange(100):
+            #Integer costs so that the sums are exact
+            items = [ (generator.choice([ 0, 1, 2, 3, 4, 6, 8, 12, 16, 36 ]), generator.randint(1, 400))
+                for idx in xrange(generator.randint(1, 6)) ];
+            demand = generator.randint(0, 300);
+            solution = mixed_fleet.solve_min_cost_cover(items, demand);
+            if(all([ size < 1 for size, cost in items ])):
+                self.assertIsNone(solution);
+                continue;
+            estimated_cost, counts = solution;
+            self.assertEqual(estimated_cost, compute_min_cover_cost(items, demand), (items, demand));
+            self.assertEqual(sum([ items[idx][1]*count for idx, count in counts.iteritems() ]), estimated_cost);
+            self.assertGreaterEqual(sum([ items[idx][0]*count for idx, count in counts.iteritems() ]), demand);
+
+    def test_no_usable_item(self):
+        self.assertIsNone(mixed_fleet.solve_min_cost_cover([ (0, 10) ], 5));
+        self.assertEqual(mixed_fleet.solve_min_cost_cover([ (4, 10) ], 0), (0.0, {}));
+
+class PrivateCloudMixedFleetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+
+    def test_not_worse_than_single_server_type(self):
+        for num_cores, memory_per_core, private_cloud_hosting, include_IT_cost in itertools.product(NUM_CORES, [ 1, 4, 7.3, 32 ],
+                [ 'colocation', 'on_premise' ], [ False, True ]):
+            inputs = (self.m_model, num_cores, memory_per_core, private_cloud_hosting, 3, include_IT_cost);
+            try:
+                single_cost_dict = private_cloud.select_optimal_server_configuration(*inputs);
+            except NoServerConfigurationFound:
+                self.assertRaises(NoServerConfigurationFound, private_cloud.select_optimal_mixed_fleet, *inputs);
+                continue;
+            cost_dict = private_cloud.select_optimal_mixed_fleet(*inputs);
+            self.assertLessEqual(cost_dict['summary']['total_cost']+cost_dict.get('IT_cost', 0),
+                    single_cost_dict['summary']['total_cost']+single_cost_dict.get('IT_cost', 0), inputs[1:]);
+            self.assertGreaterEqual(sum([ server_cost_dict['num_servers']*server_cost_dict['num_usable_cores_per_server']
+                for server_cost_dict in cost_dict['fleet'] ]), num_cores);
+
+    def test_mixed_fleet_cheaper(self):
+        #A large server with the lowest cost per core and a small one: without rack costs, 36 cores take a large and a small server
+        model = copy.deepcopy(self.m_model);
+        for key in [ 'rack_purchase_cost', 'pdu_cost', 'top_of_rack_switch_cost' ]:
+            model['compute'][key] = 0;
+        model['compute']['rack_operational_cost_info']['colocation']['monthly_charge_per_rack'] = 0;
+        model['compute']['server_params'] = [ { 'sockets': 2, 'max_cores_per_socket': 16, 'max_memory': 1024, 'cost': 10000,
+            'rack_space': 1, 'power': 0.5 }, { 'sockets': 1, 'max_cores_per_socket': 4, 'max_memory': 128, 'cost': 2000, 'rack_space': 1,
+                'power': 0.2 } ];
+        single_cost_dict = private_cloud.select_optimal_server_configuration(model, 36, 4, 'colocation', 3, False);
+        cost_dict = private_cloud.select_optimal_mixed_fleet(model, 36, 4, 'colocation', 3, False);
+        self.assertEqual(dict([ (server_cost_dict['server_type_index'], server_cost_dict['num_servers'])
+            for server_cost_dict in cost_dict['fleet'] ]), { 0: 1, 1: 1 });
+        self.assertLess(cost_dict['summary']['total_cost'], single_cost_dict['summary']['total_cost']);
+
+class AwsMixedFleetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_ec2_pricing_model = parse_model_params_file(write_ec2_offer_file(cls.m_directory));
+        cls.m_pricing_catalog = amazon.PricingCatalog(cls.m_model, cls.m_ec2_pricing_model);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def test_not_worse_than_single_instance_type(self):
+        for num_cores, memory_per_core, operating_period_in_years, core_utilization in itertools.product(NUM_CORES, [ 1, 4, 7.3, 32 ],
+                [ 1, 3 ], [ 30, 100 ]):
+            inputs = (self.m_model, self.m_ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years, core_utilization);
+            single_cost_dict = amazon.select_optimal_server_configuration(*inputs, pricing_catalog=self.m_pricing_catalog);
+            cost_dict = amazon.select_optimal_mixed_fleet(*inputs, pricing_catalog=self.m_pricing_catalog);
+            self.assertLessEqual(cost_dict['summary']['total_cost'], single_cost_dict['summary']['total_cost'], inputs[2:]);
+            self.assertGreaterEqual(cost_dict['num_usable_cores'], num_cores);
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import random
+import shutil
+import tempfile
+import itertools
+import unittest
+import numpy as np
+import amazon
+import private_cloud
+import pareto
+from sweep import create_frontier_entry
+from ccc_model_common import get_configuration_name
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE, AWS_MODEL_FILE, write_ec2_offer_file
+
+#The skyline must be exactly the points no other point dominates, and no entry of a compute frontier may be dominated by another
+
+def is_dominated_by(point, other_point, tolerance=0):
+    return all([ other_value <= value+tolerance for value, other_value in zip(point, other_point) ]) \
+            and any([ other_value < value-tolerance for value, other_value in zip(point, other_point) ]);
+
+def create_entry_point(frontier_entry):
+    return [ direction*frontier_entry[objective] for objective, direction in pareto.FRONTIER_OBJECTIVES if objective in frontier_entry ];
+
+class SkylineTest(unittest.TestCase):
+
+    def test_matches_pairwise_comparison(self):
+        generator = random.Random(3);
+        for num_points in [ 1, 2, 10, 255, 256, 257, 600 ]:
+            for num_objectives in [ 1, 2, 4, 6 ]:
+                #Few distinct values so that ties and duplicates are common
+                points = np.array([ [ generator.randint(0, 6) for objective in xrange(num_objectives) ] for idx in xrange(num_points) ],
+                        dtype=np.float64);
+                skyline = pareto.find_skyline(points);
+                non_dominated = [ idx for idx in xrange(num_points) if not any([ is_dominated_by(points[idx], other_point)
+                    for other_point in points ]) ];
+                self.assertEqual(sorted(skyline), non_dominated, (num_points, num_objectives));
+                self.assertEqual([ tuple(point) for point in points[skyline] ], sorted([ tuple(point) for point in points[skyline] ]));
+
+    def test_no_points(self):
+        self.assertEqual(len(pareto.find_skyline(np.zeros((0, 3)))), 0);
+
+    def test_objective_points(self):
+        points = pareto.create_objective_points({ 'num_machines': [ 3, 4 ], 'total_cost': [ 10, 20 ], 'spare_cores': [ 1, 2 ] });
+        self.assertEqual(points.tolist(), [ [ 10, -1, 3 ], [ 20, -2, 4 ] ]);
+
+class FrontierTestCase(unittest.TestCase):
+
+    def check_frontier(self, provider, frontier, min_total_cost):
+        frontier_entries = [ create_frontier_entry(provider, cost_dict) for cost_dict in frontier ];
+        self.assertGreater(len(frontier_entries), 0);
+        points = [ create_entry_point(frontier_entry) for frontier_entry in frontier_entries ];
+        for point, frontier_entry in zip(points, frontier_entries):
+            self.assertFalse(any([ is_dominated_by(point, other_point, tolerance=1e-6) for other_point in points ]), frontier_entry);
+        total_costs = [ frontier_entry['total_cost'] for frontier_entry in frontier_entries ];
+        self.assertEqual(total_costs, sorted(total_costs));
+        self.assertAlmostEqual(total_costs[0], min_total_cost, places=6);
+        return frontier_entries;
+
+class PrivateCloudFrontierTest(FrontierTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+
+    def test_frontier(self):
+        num_alternatives = 0;
+        for num_cores, memory_per_core, include_IT_cost in itertools.product([ 1, 10, 512, 5000 ], [ 2, 8, 32 ], [ False, True ]):
+            inputs = (self.m_model, num_cores, memory_per_core, 'colocation', 3, include_IT_cost);
+            cost_dict = private_cloud.select_optimal_server_configuration(*inputs);
+            frontier = private_cloud.select_pareto_frontier(*inputs);
+            frontier_entries = self.check_frontier('private_cloud', frontier, cost_dict['summary']['total_cost']+cost_dict.get('IT_cost', 0));
+            num_alternatives += len(frontier_entries)-1;
+            for frontier_cost_dict in frontier:
+                self.assertGreaterEqual(frontier_cost_dict['spare_cores'], 0);
+                self.assertGreaterEqual(frontier_cost_dict['spare_memory'], 0);
+        self.assertGreater(num_alternatives, 0);
+
+class AwsFrontierTest(FrontierTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_ec2_pricing_model = parse_model_params_file(write_ec2_offer_file(cls.m_directory));
+        cls.m_pricing_catalog = amazon.PricingCatalog(cls.m_model, cls.m_ec2_pricing_model);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def test_frontier(self):
+        num_alternatives = 0;
+        for num_cores, memory_per_core, operating_period_in_years, core_utilization in itertools.product([ 1, 64, 999 ], [ 1, 4, 7.3 ],
+                [ 1, 3 ], [ 30, 100 ]):
+            inputs = (self.m_model, self.m_ec2_pricing_model, num_cores, memory_per_core, operating_period_in_years, core_utilization);
+            cost_dict = amazon.select_optimal_server_configuration(*inputs, pricing_catalog=self.m_pricing_catalog);
+            frontier = amazon.select_pareto_frontier(*inputs, pricing_catalog=self.m_pricing_catalog);
+            frontier_entries = self.check_frontier('aws', frontier, cost_dict['summary']['total_cost']);
+            num_alternatives += len(frontier_entries)-1;
+            #Every candidate not on the frontier is dominated by a frontier entry
+            points = [ create_entry_point(frontier_entry) for frontier_entry in frontier_entries ];
+            configurations = set([ frontier_entry['configuration'] for frontier_entry in frontier_entries ]);
+            for candidate in self.m_pricing_catalog.m_candidates:
+                candidate_cost = amazon.compute_candidate_cost(candidate, num_cores, core_utilization, memory_per_core, operating_period_in_years);
+                if(not candidate_cost):
+                    continue;
+                candidate_cost_dict = amazon.create_candidate_cost_dict(candidate, candidate_cost);
+                if(get_configuration_name('aws', candidate_cost_dict) in configurations):
+                    continue;
+                discount = 0;
+                if(candidate.m_offer_term != 'OnDemand'):
+                    discount = self.m_pricing_catalog.m_reserved_discount_function(candidate_cost_dict['total_cost']);
+                point = [ candidate_cost_dict['total_cost']-discount,
+                        -(candidate_cost_dict['num_instances']*candidate_cost_dict['num_usable_cores_per_instance']-num_cores),
+                        -(candidate_cost_dict['num_instances']*candidate.m_memory-num_cores*memory_per_core), candidate_cost_dict['num_instances'] ];
+                self.assertTrue(any([ all([ frontier_value <= value+1e-6 for value, frontier_value in zip(point, frontier_point) ])
+                    for frontier_point in points ]), candidate_cost_dict);
+        self.assertGreater(num_alternatives, 0);
+
+if __name__ == '__main__':
+    unittest.main()
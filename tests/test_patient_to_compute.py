@@ -0,0 +1,96 @@
+import os
+import csv
+import json
+import shutil
+import tempfile
+import argparse
+import unittest
+import ec2_pricing
+import patient_to_compute
+from fixtures import PRIVATE_CLOUD_MODEL_FILE, AWS_MODEL_FILE, write_ec2_offer_file
+
+#Streamed rows (--output_format ndjson or csv) must hold exactly the values of the rows computed in memory, including the
+#scenario inputs that 'ec2_pricing.py refresh' needs to reprice them
+
+CONFIGURATIONS = [
+        { 'name': 'small', 'num_patients_per_year': 1000, 'num_samples_per_patient_per_year': 2,
+            'num_samples_processed_per_core_per_day': 0.5, 'storage_per_sample': 0.1 },
+        { 'name': 'large', 'num_patients_per_year': 200000, 'num_samples_per_patient_per_year': 1,
+            'num_samples_processed_per_core_per_day': 0.25, 'storage_per_sample': 0.05 },
+        { 'num_patients_per_year': 35, 'num_samples_per_patient_per_year': 3, 'num_samples_processed_per_core_per_day': 1,
+            'storage_per_sample': 1.5 }
+        ];
+
+class StreamConfigurationsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_arguments = argparse.Namespace(pvt_cloud_model_parameters_file=PRIVATE_CLOUD_MODEL_FILE,
+                aws_model_parameters_file=AWS_MODEL_FILE, ec2_pricing_json_file=write_ec2_offer_file(cls.m_directory),
+                ec2_pricing_index_file=None, memory_per_core=4, bandwidth=100, bandwidth_utilization=50, operating_period=5,
+                include_IT_cost=True, aws_support='business');
+        cls.m_model_state = patient_to_compute.ModelState(cls.m_arguments);
+        cls.m_rows = [];
+        for idx, config in enumerate(CONFIGURATIONS):
+            cls.m_rows += patient_to_compute.create_result_rows(cls.m_model_state, config, config.get('name', str(idx)), cls.m_arguments);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def stream_configurations(self, filename, result_writer_class):
+        fptr = open(filename, 'wb');
+        num_configurations = patient_to_compute.stream_configurations(self.m_model_state, iter(CONFIGURATIONS), result_writer_class(fptr),
+                self.m_arguments);
+        fptr.close();
+        self.assertEqual(num_configurations, len(CONFIGURATIONS));
+
+    def test_rows_carry_inputs(self):
+        self.assertEqual([ row['provider'] for row in self.m_rows ], [ 'private_cloud', 'aws' ]*len(CONFIGURATIONS));
+        for row in self.m_rows:
+            self.assertEqual(row['memory_per_core'], 4);
+            if(row['provider'] == 'aws'):
+                #Not passed to the AWS model by patient_to_compute - the rows hold the defaults of the arguments handler it used
+                self.assertEqual(row['operating_period_in_years'], 3);
+                self.assertEqual(row['core_utilization'], 100);
+            else:
+                self.assertEqual(row['operating_period_in_years'], 5);
+                self.assertNotIn('core_utilization', row);
+
+    def test_ndjson_rows(self):
+        filename = os.path.join(self.m_directory, 'results.ndjson');
+        self.stream_configurations(filename, patient_to_compute.NDJSONResultWriter);
+        self.assertEqual([ json.loads(line) for line in open(filename, 'rb') ], self.m_rows);
+
+    def test_csv_rows(self):
+        filename = os.path.join(self.m_directory, 'results.csv');
+        self.stream_configurations(filename, patient_to_compute.CSVResultWriter);
+        csv_rows = list(csv.DictReader(open(filename, 'rb')));
+        self.assertEqual(len(csv_rows), len(self.m_rows));
+        for csv_row, row in zip(csv_rows, self.m_rows):
+            self.assertEqual(sorted(csv_row.keys()), sorted(patient_to_compute.STREAM_RESULT_KEYS));
+            for key in patient_to_compute.STREAM_RESULT_KEYS:
+                value = row.get(key);
+                if(value is None):
+                    self.assertEqual(csv_row[key], '', key);
+                elif(isinstance(value, basestring)):
+                    self.assertEqual(csv_row[key], value, key);
+                else:
+                    self.assertEqual(float(csv_row[key]), value, key);
+
+    def test_csv_rows_can_be_repriced(self):
+        #Every candidate is priced with the inputs of the row - none is cheaper than the one the row was computed with
+        filename = os.path.join(self.m_directory, 'reprice.csv');
+        self.stream_configurations(filename, patient_to_compute.CSVResultWriter);
+        pricing_catalog = self.m_model_state.m_pricing_catalog;
+        num_aws_rows = 0;
+        for row in ec2_pricing.read_result_rows(filename):
+            if(row['provider'] != 'aws'):
+                continue;
+            num_aws_rows += 1;
+            self.assertEqual(ec2_pricing.find_cheaper_changed_candidate(pricing_catalog, pricing_catalog.m_candidates, row), (None, None));
+        self.assertEqual(num_aws_rows, len(CONFIGURATIONS));
+
+if __name__ == '__main__':
+    unittest.main()
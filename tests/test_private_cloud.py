@@ -0,0 +1,70 @@
+import copy
+import unittest
+import private_cloud
+from tco_cache import StageCache
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE
+
+SCENARIOS = [ dict(num_cores=num_cores, memory_per_core=memory_per_core, storage=100, bandwidth=100, bandwidth_utilization=50,
+    include_IT_cost=True, mixed_fleet=mixed_fleet, compute_frontier=True)
+    for num_cores in [ 10, 512, 5000 ] for memory_per_core in [ 2, 8 ] for mixed_fleet in [ False, True ] ];
+
+CompiledPrivateCloudModel = private_cloud.CompiledPrivateCloudModel;
+
+class CountingCompiledModel(CompiledPrivateCloudModel):
+
+    __slots__ = ();
+    s_num_compiled = 0;
+
+    def __init__(self, model):
+        CountingCompiledModel.s_num_compiled += 1;
+        CompiledPrivateCloudModel.__init__(self, model);
+
+class CompiledModelReuseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+
+    def setUp(self):
+        CountingCompiledModel.s_num_compiled = 0;
+        private_cloud.CompiledPrivateCloudModel = CountingCompiledModel;
+
+    def tearDown(self):
+        private_cloud.CompiledPrivateCloudModel = CompiledPrivateCloudModel;
+
+    def compute_tco(self, model, scenario, **kwargs):
+        args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=model, **scenario);
+        return private_cloud.compute_tco(args_handler, **kwargs);
+
+    def test_compiled_once_per_model_hash(self):
+        stage_cache = StageCache();
+        for scenario in SCENARIOS:
+            self.compute_tco(self.m_model, scenario, stage_cache=stage_cache);
+        #An equal copy has the same hash
+        self.compute_tco(copy.deepcopy(self.m_model), SCENARIOS[0], stage_cache=stage_cache);
+        self.assertEqual(CountingCompiledModel.s_num_compiled, 1);
+        changed_model = copy.deepcopy(self.m_model);
+        changed_model['compute']['rack_purchase_cost'] *= 2;
+        self.compute_tco(changed_model, SCENARIOS[0], stage_cache=stage_cache);
+        self.assertEqual(CountingCompiledModel.s_num_compiled, 2);
+        stage_cache.clear();
+        self.compute_tco(self.m_model, SCENARIOS[0], stage_cache=stage_cache);
+        self.assertEqual(CountingCompiledModel.s_num_compiled, 3);
+
+    def test_compiled_once_per_query(self):
+        #Without a stage cache, the selectors and the network stage share the model compiled by compute_tco
+        for scenario in SCENARIOS:
+            self.compute_tco(self.m_model, scenario);
+        self.assertEqual(CountingCompiledModel.s_num_compiled, len(SCENARIOS));
+
+    def test_passed_compiled_model(self):
+        compiled_model = private_cloud.CompiledPrivateCloudModel(self.m_model);
+        stage_cache = StageCache();
+        for scenario in SCENARIOS:
+            self.assertEqual(self.compute_tco(self.m_model, scenario, compiled_model=compiled_model),
+                    self.compute_tco(self.m_model, scenario, stage_cache=stage_cache));
+        self.assertEqual(CountingCompiledModel.s_num_compiled, 2);
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import copy
+import random
+import unittest
+import rack_packing
+import private_cloud
+from ccc_model_common import NoServerConfigurationFound
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE
+
+#Every packing must respect the space, power and server space of a rack, place every item and use at least the lower bound of
+#racks - for a handful of items, exactly the minimum number of racks
+
+def create_random_item_types(generator, max_count):
+    return [ rack_packing.RackItemType('item_%d'%(idx), generator.choice([ 1, 2, 4 ]), generator.choice([ 0, 0.3, 0.55, 0.75, 0.8, 2.5 ]),
+        generator.randint(0, max_count), generator.random() < 0.7) for idx in xrange(generator.randint(1, 4)) ];
+
+def compute_min_num_racks(items, rack_spec, racks=None):
+    #Every assignment of the items (rack_space, power, is_server) to racks [ space_left, power_left, server_space_left ]
+    racks = racks if racks is not None else [];
+    if(not items):
+        return len(racks);
+    rack_space, power, is_server = items[0];
+    min_num_racks = None;
+    for rack in racks+[ [ rack_spec.m_space, rack_spec.m_power, rack_spec.m_server_space ] ]:
+        if(rack_space > rack[0] or power > rack[1]+rack_packing.PACKING_EPSILON or (is_server and rack_space > rack[2])):
+            continue;
+        new_racks = [ list(other_rack) for other_rack in racks if other_rack is not rack ];
+        new_racks.append([ rack[0]-rack_space, rack[1]-power, rack[2]-(rack_space if is_server else 0) ]);
+        num_racks = compute_min_num_racks(items[1:], rack_spec, new_racks);
+        if(num_racks is not None and (min_num_racks is None or num_racks < min_num_racks)):
+            min_num_racks = num_racks;
+    return min_num_racks;
+
+class PackRacksTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+        cls.m_rack_spec = rack_packing.RackSpec(cls.m_model);
+
+    def check_packing(self, item_types, packing_dict):
+        rack_spec = self.m_rack_spec;
+        item_types_by_name = dict([ (item_type.m_name, item_type) for item_type in item_types ]);
+        num_placed = dict([ (item_type.m_name, 0) for item_type in item_types ]);
+        for rack_dict in packing_dict['racks']:
+            self.assertGreater(rack_dict['num_racks'], 0);
+            contents = [ (item_types_by_name[name], count) for name, count in rack_dict['contents'].iteritems() ];
+            space_used = sum([ item_type.m_rack_space*count for item_type, count in contents ]);
+            power_used = sum([ item_type.m_power*count for item_type, count in contents ]);
+            self.assertLessEqual(space_used, rack_spec.m_space);
+            self.assertLessEqual(power_used, rack_spec.m_power+rack_packing.PACKING_EPSILON);
+            self.assertLessEqual(sum([ item_type.m_rack_space*count for item_type, count in contents if item_type.m_is_server ]),
+                    rack_spec.m_server_space);
+            self.assertAlmostEqual(rack_dict['space_used'], space_used, places=9);
+            self.assertAlmostEqual(rack_dict['power_used'], power_used, places=9);
+            for item_type, count in contents:
+                num_placed[item_type.m_name] += rack_dict['num_racks']*count;
+        self.assertEqual(num_placed, dict([ (item_type.m_name, item_type.m_count) for item_type in item_types ]));
+        self.assertEqual(packing_dict['num_racks'], sum([ rack_dict['num_racks'] for rack_dict in packing_dict['racks'] ]));
+        self.assertGreaterEqual(packing_dict['num_racks'], packing_dict['lower_bound']);
+        self.assertEqual(packing_dict['gap'], packing_dict['num_racks']-packing_dict['lower_bound']);
+
+    def test_packing_feasible_and_above_lower_bound(self):
+        generator = random.Random(11);
+        for repeat in xrange(300):
+            item_types = create_random_item_types(generator, 300);
+            self.check_packing(item_types, rack_packing.pack_racks(item_types, self.m_rack_spec));
+
+    def test_lower_bound_and_exact_minimum(self):
+        generator = random.Random(13);
+        num_above_exact = 0;
+        for repeat in xrange(200):
+            item_types = create_random_item_types(generator, 3);
+            packing_dict = rack_packing.pack_racks(item_types, self.m_rack_spec);
+            self.check_packing(item_types, packing_dict);
+            min_num_racks = compute_min_num_racks(sum([ [ (item_type.m_rack_space, item_type.m_power, item_type.m_is_server) ]*item_type.m_count
+                for item_type in item_types ], []), self.m_rack_spec);
+            self.assertLessEqual(packing_dict['lower_bound'], min_num_racks);
+            self.assertGreaterEqual(packing_dict['num_racks'], min_num_racks);
+            num_above_exact += packing_dict['num_racks'] > min_num_racks;
+        self.assertEqual(num_above_exact, 0);
+
+    def test_item_does_not_fit(self):
+        item_types = [ rack_packing.RackItemType('huge', 4, 20, 1, True) ];
+        self.assertRaises(NoServerConfigurationFound, rack_packing.pack_racks, item_types, self.m_rack_spec);
+
+    def test_rack_spec(self):
+        #2 switches of 1 unit and 0.15 kW each in a 42 unit, 10 kW rack
+        self.assertEqual(self.m_rack_spec.m_space, 40);
+        self.assertAlmostEqual(self.m_rack_spec.m_power, 9.7, places=9);
+        self.assertEqual(self.m_rack_spec.m_server_space, 28);
+
+class SharedRackCostTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+
+    def test_shared_racks(self):
+        rack_spec = rack_packing.RackSpec(self.m_model);
+        for num_cores in [ 10, 512, 5000 ]:
+            for storage in [ 0, 100, 2000 ]:
+                for mixed_fleet in [ False, True ]:
+                    args_handler = private_cloud.PrivateCloudArgumentsHandler(model_parameters_dict=self.m_model, num_cores=num_cores,
+                            memory_per_core=4, storage=storage, bandwidth=100, bandwidth_utilization=50, mixed_fleet=mixed_fleet,
+                            shared_racks=True);
+                    cost_dict = private_cloud.compute_tco(args_handler);
+                    racks_cost_dict = cost_dict['racks'];
+                    item_types = rack_packing.create_server_item_types(cost_dict['compute'])+[
+                            rack_packing.create_storage_shelf_item_type(self.m_model, cost_dict['storage']['raw_storage_size']) ];
+                    self.assertGreaterEqual(racks_cost_dict['num_racks'], rack_packing.determine_lower_bound(item_types, rack_spec));
+                    self.assertEqual(racks_cost_dict['num_racks'], racks_cost_dict['num_server_racks']+racks_cost_dict['num_storage_racks']);
+                    self.assertGreater(racks_cost_dict['num_server_racks'], 0);
+                    self.assertAlmostEqual(racks_cost_dict['rack_purchase_cost'],
+                            racks_cost_dict['num_server_racks']*self.m_model['compute']['rack_purchase_cost'], places=6);
+                    self.assertAlmostEqual(cost_dict['summary']['total_cost'], cost_dict['summary']['compute']+cost_dict['summary']['storage']
+                            +cost_dict['summary']['network']+racks_cost_dict['summary']['total_cost'], places=6);
+
+    def test_not_dearer_than_unmixed_racks(self):
+        #Racks holding a single item type are one of the candidate packings
+        for shelf_power in [ 0.8, 5, 9 ]:
+            model = copy.deepcopy(self.m_model);
+            model['storage']['shelf_power'] = shelf_power;
+            rack_spec = rack_packing.RackSpec(model);
+            server_rack_cost = private_cloud.determine_rack_purchase_cost(model, 1)+private_cloud.determine_pdu_cost(model, 1) \
+                    +private_cloud.determine_top_of_rack_switch_cost(model, 1)+private_cloud.determine_rack_operational_cost(model, 1,
+                        'colocation', 3);
+            storage_rack_cost = model['storage']['rack_monthly_operational_cost']*12*3;
+            for num_cores in [ 10, 512, 5000 ]:
+                compute_cost_dict = private_cloud.select_optimal_mixed_fleet(model, num_cores, 4, 'colocation', 3, False);
+                storage_cost_dict = private_cloud.compute_storage_cost(model, 1000, 'colocation', 3, 'NAS', 5);
+                racks_cost_dict = private_cloud.compute_shared_rack_cost(model, compute_cost_dict, storage_cost_dict, 'colocation', 3);
+                item_types = rack_packing.create_server_item_types(compute_cost_dict)+[
+                        rack_packing.create_storage_shelf_item_type(model, storage_cost_dict['raw_storage_size']) ];
+                unmixed_cost = sum([ rack_packing.pack_racks([ item_type ], rack_spec)['num_racks']*(server_rack_cost if item_type.m_is_server
+                    else storage_rack_cost) for item_type in item_types ]);
+                shared_cost = racks_cost_dict['rack_purchase_cost']+racks_cost_dict['pdu_cost']+racks_cost_dict['top_of_rack_switch_cost'] \
+                        +racks_cost_dict['rack_operational_cost'];
+                self.assertLessEqual(shared_cost, unmixed_cost+1e-6, (shelf_power, num_cores));
+
+if __name__ == '__main__':
+    unittest.main()
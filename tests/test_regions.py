@@ -0,0 +1,79 @@
+import copy
+import shutil
+import tempfile
+import unittest
+import amazon
+import ec2_pricing
+from ccc_model_common import parse_model_params_file
+from fixtures import AWS_MODEL_FILE, write_ec2_offer_file
+
+#Regions compared in a single pass must give the results of compute_tco on a model pinned to each region
+
+#Two locations with every operating system, the last location is not in the offer file
+NUM_OFFER_FILE_SKUS = 4000;
+LOCATIONS = [ 'US West (Oregon)', 'US East (N. Virginia)', 'EU (Ireland)' ];
+OPERATING_SYSTEMS = [ 'Linux', 'Windows' ];
+SCENARIO = dict(num_cores=512, memory_per_core=4, storage=100, bandwidth=100, bandwidth_utilization=50, core_utilization=70,
+        aws_support='business');
+
+class CompareRegionsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_offer_file = write_ec2_offer_file(cls.m_directory, num_skus=NUM_OFFER_FILE_SKUS);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def compute_pinned_tco(self, region):
+        model = copy.deepcopy(self.m_model);
+        model['compute']['location'], model['compute']['operating_system'] = region;
+        args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=model, ec2_pricing_json_file=self.m_offer_file, **SCENARIO);
+        return amazon.compute_tco(args_handler);
+
+    def test_regions_match_pinned_models(self):
+        args_handler = amazon.AmazonArgumentsHandler(model_parameters_dict=self.m_model, ec2_pricing_json_file=self.m_offer_file,
+                locations=LOCATIONS, operating_systems=OPERATING_SYSTEMS, **SCENARIO);
+        comparison_dict = amazon.compare_regions(args_handler);
+        region_cost_dicts = comparison_dict['regions'];
+        self.assertEqual(sorted([ (region_cost_dict['location'], region_cost_dict['operating_system'])
+            for region_cost_dict in region_cost_dicts ]), sorted(args_handler.get_regions()));
+        num_priced_regions = 0;
+        for rank, region_cost_dict in enumerate(region_cost_dicts):
+            region = (region_cost_dict['location'], region_cost_dict['operating_system']);
+            if(region[0] == 'EU (Ireland)'):
+                self.assertIn('error', region_cost_dict);
+                self.assertNotIn('rank', region_cost_dict);
+                continue;
+            num_priced_regions += 1;
+            self.assertEqual(region_cost_dict['rank'], rank+1);
+            cost_dict = self.compute_pinned_tco(region);
+            self.assertEqual(region_cost_dict['summary'], cost_dict['summary'], region);
+            self.assertEqual(region_cost_dict['compute'], cost_dict['compute'], region);
+        self.assertEqual(num_priced_regions, 4);
+        #Priced regions first, cheapest first
+        total_costs = [ region_cost_dict['summary']['total_cost'] for region_cost_dict in region_cost_dicts[:num_priced_regions] ];
+        self.assertEqual(total_costs, sorted(total_costs));
+        self.assertEqual(region_cost_dicts[0]['cost_relative_to_cheapest'], 1);
+
+    def test_catalogs_match_single_region_catalogs(self):
+        regions = amazon.get_regions(self.m_model['compute'], LOCATIONS[:2], OPERATING_SYSTEMS);
+        ec2_pricing_model = ec2_pricing.load_ec2_pricing_model(self.m_offer_file, self.m_model['compute'], locations=LOCATIONS[:2],
+                operating_systems=OPERATING_SYSTEMS);
+        pricing_catalogs = amazon.create_pricing_catalogs(self.m_model, ec2_pricing_model, regions);
+        for region in regions:
+            model = copy.deepcopy(self.m_model);
+            model['compute']['location'], model['compute']['operating_system'] = region;
+            pricing_catalog = amazon.PricingCatalog(model, ec2_pricing_model);
+            self.assertEqual(pricing_catalogs[region].m_region, region);
+            self.assertEqual([ (candidate.m_instance_type, candidate.m_tenancy, candidate.m_offer_term, candidate.m_hourly_rate,
+                candidate.m_upfront_rate) for candidate in pricing_catalogs[region].m_candidates ],
+                [ (candidate.m_instance_type, candidate.m_tenancy, candidate.m_offer_term, candidate.m_hourly_rate, candidate.m_upfront_rate)
+                    for candidate in pricing_catalog.m_candidates ]);
+            self.assertGreater(len(pricing_catalog.m_candidates), 0);
+
+if __name__ == '__main__':
+    unittest.main()
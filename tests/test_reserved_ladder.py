@@ -0,0 +1,118 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import amazon
+import reserved_ladder
+from ccc_model_common import parse_model_params_file
+from fixtures import AWS_MODEL_FILE, write_ec2_offer_file
+
+def compute_min_slot_cost(busy_hours, on_demand_rate, reserved_options, hours_per_block, block=0):
+    #Every sequence of on demand blocks and reservations of one slot
+    num_blocks = len(busy_hours);
+    if(block == num_blocks):
+        return 0;
+    costs = [];
+    if(on_demand_rate is not None or busy_hours[block] == 0):
+        costs.append((on_demand_rate or 0)*busy_hours[block]+compute_min_slot_cost(busy_hours, on_demand_rate, reserved_options,
+            hours_per_block, block+1));
+    for num_term_blocks, upfront_rate, hourly_rate in reserved_options:
+        end_block = min(block+num_term_blocks, num_blocks);
+        costs.append((upfront_rate or 0)+(hourly_rate or 0)*(end_block-block)*hours_per_block+compute_min_slot_cost(busy_hours,
+            on_demand_rate, reserved_options, hours_per_block, end_block));
+    return min(costs) if costs else float('inf');
+
+def compute_plan_cost(solution, on_demand_rate, reserved_options, hours_per_block, num_blocks):
+    num_reserved_purchases, on_demand_hours = solution;
+    cost = (on_demand_rate or 0)*on_demand_hours.sum();
+    for option, (num_term_blocks, upfront_rate, hourly_rate) in enumerate(reserved_options):
+        for block in range(num_blocks):
+            end_block = min(block+num_term_blocks, num_blocks);
+            cost += num_reserved_purchases[option, block]*((upfront_rate or 0)+(hourly_rate or 0)*(end_block-block)*hours_per_block);
+    return cost;
+
+class SolveLadderTest(unittest.TestCase):
+
+    def test_matches_exhaustive(self):
+        generator = random.Random(7);
+        hours_per_block = 10;
+        for repeat in xrange(200):
+            num_blocks = generator.randint(1, 5);
+            num_instances_per_hour = np.array([ generator.choice([ 0, 1, 2, 3, 5 ]) for hour in xrange(num_blocks*hours_per_block) ]);
+            on_demand_rate = generator.choice([ None, 1.0, 2.5 ]);
+            reserved_options = [ (generator.choice([ 1, 3 ]), generator.choice([ None, 0, 4.0, 12.0 ]), generator.choice([ None, 0.25, 0.5 ]))
+                for option in xrange(generator.randint(0, 3)) ];
+            curves = reserved_ladder.create_load_duration_curves(num_instances_per_hour, num_blocks, hours_per_block);
+            solution = reserved_ladder.solve_ladder(curves, on_demand_rate, reserved_options, hours_per_block);
+            min_cost = sum([ compute_min_slot_cost(curves[:, level], on_demand_rate, reserved_options, hours_per_block)
+                for level in range(curves.shape[1]) ]);
+            if(min_cost == float('inf')):
+                self.assertIsNone(solution);
+                continue;
+            self.assertAlmostEqual(compute_plan_cost(solution, on_demand_rate, reserved_options, hours_per_block, num_blocks), min_cost,
+                    places=9);
+            #A ladder: the busiest slots are reserved, the busy hours of the others run on demand
+            num_reserved = np.zeros(num_blocks, dtype=np.int64);
+            for option, (num_term_blocks, upfront_rate, hourly_rate) in enumerate(reserved_options):
+                for block in range(num_blocks):
+                    num_reserved[block:block+num_term_blocks] += solution[0][option, block];
+            for block in range(num_blocks):
+                self.assertEqual(solution[1][block], curves[block, num_reserved[block]:].sum());
+
+class SelectOptimalLadderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        cls.m_model = parse_model_params_file(AWS_MODEL_FILE);
+        cls.m_ec2_pricing_model = parse_model_params_file(write_ec2_offer_file(cls.m_directory));
+        cls.m_pricing_catalog = amazon.PricingCatalog(cls.m_model, cls.m_ec2_pricing_model);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def select_optimal_ladder(self, core_demand_profile, operating_period_in_years=None):
+        return reserved_ladder.select_optimal_ladder(self.m_model, self.m_ec2_pricing_model, core_demand_profile, 4,
+                operating_period_in_years=operating_period_in_years, pricing_catalog=self.m_pricing_catalog);
+
+    def test_flat_profile_matches_single_term(self):
+        #Without variation in the demand, the best ladder is the single offer term of amazon.py at full utilization
+        for num_cores in [ 8, 100, 1000 ]:
+            for operating_period_in_years in [ 1, 3, 5 ]:
+                cost_dict = self.select_optimal_ladder(np.full(reserved_ladder.HOURS_PER_YEAR, float(num_cores)), operating_period_in_years);
+                single_term_cost_dict = amazon.select_optimal_server_configuration(self.m_model, self.m_ec2_pricing_model, num_cores, 4,
+                        operating_period_in_years, 100, pricing_catalog=self.m_pricing_catalog);
+                self.assertAlmostEqual(cost_dict['summary']['total_cost'], single_term_cost_dict['summary']['total_cost'], places=6);
+                self.assertEqual(cost_dict['operating_period_in_years'], operating_period_in_years);
+
+    def test_variable_profile_not_worse_than_on_demand(self):
+        hours = np.arange(2*reserved_ladder.HOURS_PER_YEAR);
+        core_demand_profile = 200+150*np.sin(2*np.pi*hours/24)+100*(hours >= reserved_ladder.HOURS_PER_YEAR);
+        cost_dict = self.select_optimal_ladder(core_demand_profile);
+        self.assertEqual(cost_dict['operating_period_in_years'], 2);
+        self.assertGreater(len(cost_dict['ladder']), 0);
+        self.assertGreater(sum(cost_dict['on_demand']['instance_hours_per_year']), 0);
+        #Running the chosen type only on demand
+        on_demand_candidates = [ candidate for candidate in self.m_pricing_catalog.m_candidates
+            if candidate.m_instance_type == cost_dict['instance_type'] and candidate.m_tenancy == cost_dict['tenancy']
+            and candidate.m_offer_term == 'OnDemand' ];
+        num_instances_per_hour = np.ceil(np.round(core_demand_profile/cost_dict['num_usable_cores_per_instance'], 9));
+        self.assertLessEqual(cost_dict['summary']['total_cost'], on_demand_candidates[0].m_hourly_rate*num_instances_per_hour.sum());
+
+    def test_no_demand(self):
+        self.assertEqual(self.select_optimal_ladder(np.zeros(100))['summary']['total_cost'], 0);
+
+    def test_load_csv_profile(self):
+        filename = os.path.join(self.m_directory, 'profile.csv');
+        fptr = open(filename, 'wb');
+        fptr.write('hour,cores\n0,10\n1,12.5\n2,0\n');
+        fptr.close();
+        self.assertEqual(list(reserved_ladder.load_core_demand_profile(filename)), [ 10, 12.5, 0 ]);
+        self.assertEqual(list(reserved_ladder.load_core_demand_profile(filename, column='hour')), [ 0, 1, 2 ]);
+        self.assertRaises(ValueError, reserved_ladder.load_core_demand_profile, filename, column='memory');
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+import result_store
+import sweep
+from fixtures import PRIVATE_CLOUD_MODEL_FILE, AWS_MODEL_FILE, write_ec2_offer_file
+
+#A sweep written to a result store must read back as the rows the sweep produced - the queries are then checked against
+#the same rows filtered in Python
+
+GRID = {
+        'provider': [ 'private_cloud', 'aws' ],
+        'num_cores': [ 64, 1024 ],
+        'memory_per_core': [ 2, 8, 300 ],
+        'storage': [ 10, 1000 ],
+        'bandwidth': [ 100 ],
+        'bandwidth_utilization': [ 50 ],
+        'operating_period_in_years': [ 1, 3 ],
+        'private_cloud_hosting': [ 'colocation', 'on_premise' ],
+        'aws_support': [ None, 'business' ]
+        };
+
+class ListResultWriter:
+
+    def __init__(self):
+        self.m_results = [];
+
+    def write(self, result):
+        self.m_results.append(result);
+
+class ResultStoreTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.m_directory = tempfile.mkdtemp();
+        model_files = { 'pvt_cloud_model_parameters_file': PRIVATE_CLOUD_MODEL_FILE, 'aws_model_parameters_file': AWS_MODEL_FILE,
+                'ec2_pricing_json_file': write_ec2_offer_file(cls.m_directory) };
+        list_writer = ListResultWriter();
+        sweep.run_sweep(GRID, model_files, list_writer, num_workers=1);
+        cls.m_results = list_writer.m_results;
+        store_directory = os.path.join(cls.m_directory, 'store');
+        columnar_writer = sweep.ColumnarResultWriter(store_directory, GRID);
+        #Several write chunks
+        columnar_writer.m_chunk_size = 7;
+        sweep.run_sweep(GRID, model_files, columnar_writer, num_workers=1);
+        columnar_writer.close();
+        cls.m_store = result_store.ResultStore(store_directory);
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.m_directory);
+
+    def test_round_trip(self):
+        self.assertEqual(self.m_store.m_num_rows, len(self.m_results));
+        self.assertTrue(any([ 'error' in result for result in self.m_results ]));
+        for row, result in zip(self.m_store.get_rows(range(self.m_store.m_num_rows)), self.m_results):
+            for name, value in row.iteritems():
+                if(name != 'row'):
+                    self.assertEqual(result.get(name), value, '%s of row %d'%(name, row['row']));
+
+    def test_filter(self):
+        conditions = [ ('provider', '=', 'aws'), ('num_cores', '>=', 1024), ('aws_support', '=', None) ];
+        expected_rows = [ idx for idx, result in enumerate(self.m_results) if result['provider'] == 'aws' and result['num_cores'] >= 1024
+                and result.get('aws_support') is None ];
+        self.assertEqual(list(self.m_store.filter(conditions)), expected_rows);
+
+    def test_top_k(self):
+        expected_rows = [ idx for cost, idx in sorted([ (result['total_cost'], idx) for idx, result in enumerate(self.m_results)
+            if result['provider'] == 'private_cloud' and 'total_cost' in result ])[:5] ];
+        self.assertEqual(list(self.m_store.top_k(5, conditions=[ ('provider', '=', 'private_cloud') ])), expected_rows);
+
+    def test_group_by(self):
+        groups = self.m_store.group_by([ 'provider', 'configuration' ]);
+        expected_groups = {};
+        for idx, result in enumerate(self.m_results):
+            if('total_cost' in result):
+                expected_groups.setdefault((result['provider'], result['configuration']), []).append((result['total_cost'], idx));
+        self.assertEqual(len(groups), len(expected_groups));
+        for group in groups:
+            costs = sorted(expected_groups[(group['provider'], group['configuration'])]);
+            self.assertEqual(group['count'], len(costs));
+            self.assertEqual((group['min'], group['min_row']), costs[0]);
+            self.assertEqual(group['max'], costs[-1][0]);
+
+if __name__ == '__main__':
+    unittest.main()
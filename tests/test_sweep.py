@@ -0,0 +1,33 @@
+import unittest
+import sweep
+
+class ValidateGridTest(unittest.TestCase):
+
+    def test_keys_of_any_selected_provider(self):
+        grid = { 'provider': [ 'private_cloud', 'aws' ], 'num_cores': [ 10, 100 ], 'shared_racks': [ False, True ],
+                'aws_support': [ None, 'business', 'enterprise' ] };
+        sweep.validate_grid(grid);
+        scenarios = list(sweep.generate_scenarios(grid));
+        #Every provider only takes its own keys
+        self.assertEqual(len(scenarios), 2*2+2*3);
+        self.assertEqual(set([ key for scenario in scenarios if scenario['provider'] == 'aws' for key in scenario ]),
+                set([ 'provider', 'num_cores', 'aws_support' ]));
+
+    def test_unknown_key(self):
+        self.assertRaises(ValueError, sweep.generate_scenarios, { 'num_cores': [ 10 ], 'num_core': [ 20 ] });
+
+    def test_key_of_unselected_provider(self):
+        grid = { 'provider': [ 'aws' ], 'num_cores': [ 10 ], 'shared_racks': [ True ] };
+        self.assertRaises(ValueError, sweep.generate_scenarios, grid);
+        grid['provider'] = [ 'aws', 'private_cloud' ];
+        self.assertEqual(len(list(sweep.generate_scenarios(grid))), 2);
+
+    def test_unknown_provider(self):
+        self.assertRaises(ValueError, sweep.generate_scenarios, { 'provider': [ 'gcp' ], 'num_cores': [ 10 ] });
+
+    def test_run_sweep_validates_before_loading_models(self):
+        self.assertRaises(ValueError, sweep.run_sweep, { 'provider': [ 'private_cloud' ], 'storage_utilization': [ 50 ] },
+                { 'pvt_cloud_model_parameters_file': 'missing_model.json' }, sweep.NDJSONResultWriter(None), num_workers=1);
+
+if __name__ == '__main__':
+    unittest.main()
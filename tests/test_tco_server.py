@@ -0,0 +1,82 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import tco_server
+from ccc_model_common import parse_model_params_file
+from fixtures import PRIVATE_CLOUD_MODEL_FILE
+
+#Hot reload of TCOService - requests must keep being served from the current models while a reload runs in the background
+
+REQUEST = { 'num_cores': 512, 'memory_per_core': 4, 'storage': 100, 'bandwidth': 100, 'bandwidth_utilization': 50 };
+
+class TCOServiceReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.m_directory = tempfile.mkdtemp();
+        self.m_model_file = os.path.join(self.m_directory, 'private_cloud.json');
+        shutil.copy(PRIVATE_CLOUD_MODEL_FILE, self.m_model_file);
+        self.m_service = tco_server.TCOService({ 'pvt_cloud_model_parameters_file': self.m_model_file }, reload_check_interval=0);
+
+    def tearDown(self):
+        shutil.rmtree(self.m_directory);
+
+    def write_model_file(self, contents):
+        mtime = os.stat(self.m_model_file).st_mtime;
+        fptr = open(self.m_model_file, 'wb');
+        fptr.write(contents);
+        fptr.close();
+        #Coarse mtimes may not change within the test
+        os.utime(self.m_model_file, (mtime+10, mtime+10));
+
+    def evaluate_total_cost(self):
+        return self.m_service.evaluate('/private_cloud/tco', REQUEST)[0]['summary']['total_cost'];
+
+    def test_reload_changed_model(self):
+        total_cost = self.evaluate_total_cost();
+        model = parse_model_params_file(PRIVATE_CLOUD_MODEL_FILE);
+        model['compute']['rack_purchase_cost'] *= 2;
+        self.write_model_file(json.dumps(model));
+        self.assertTrue(self.m_service.reload_if_changed());
+        self.m_service.m_reload_thread.join();
+        self.assertEqual(self.m_service.m_num_reloads, 1);
+        self.assertGreater(self.evaluate_total_cost(), total_cost);
+        self.assertFalse(self.m_service.reload_if_changed());
+
+    def test_requests_served_during_reload(self):
+        total_cost = self.evaluate_total_cost();
+        load_models = self.m_service.load_models;
+        load_started = threading.Event();
+        finish_load = threading.Event();
+        def slow_load_models():
+            load_started.set();
+            finish_load.wait();
+            load_models();
+        self.m_service.load_models = slow_load_models;
+        self.write_model_file(open(PRIVATE_CLOUD_MODEL_FILE, 'rb').read());
+        self.assertTrue(self.m_service.reload_if_changed());
+        load_started.wait();
+        #Neither the check nor the requests wait for the running reload
+        self.assertFalse(self.m_service.reload_if_changed());
+        self.assertTrue(self.m_service.get_metrics()['reload_in_progress']);
+        self.assertEqual(self.evaluate_total_cost(), total_cost);
+        finish_load.set();
+        self.m_service.m_reload_thread.join();
+        self.assertEqual(self.m_service.m_num_reloads, 1);
+        self.assertFalse(self.m_service.get_metrics()['reload_in_progress']);
+
+    def test_failed_reload_keeps_models(self):
+        total_cost = self.evaluate_total_cost();
+        self.write_model_file('{ "compute": ');
+        self.assertTrue(self.m_service.reload_if_changed());
+        self.m_service.m_reload_thread.join();
+        self.assertEqual(self.m_service.m_num_reload_errors, 1);
+        self.assertEqual(self.m_service.m_num_reloads, 0);
+        self.assertEqual(self.evaluate_total_cost(), total_cost);
+        #The broken file is not loaded again until it changes
+        self.assertFalse(self.m_service.reload_if_changed());
+
+if __name__ == '__main__':
+    unittest.main()